@@ -295,7 +295,7 @@ if __name__ == "__main__":
     print()
     
     try:
-        app.run(host='0.0.0.0', port=5000, debug=False)
+        app.run(host='0.0.0.0', port=int(os.environ.get('PORT', 5000)), debug=False)
     except KeyboardInterrupt:
         print("\n⏹️  Server stopped by user")
     except Exception as e:
@@ -2,15 +2,21 @@
 """
 Enhanced Model Selector API with Dual Database Storage
 Separates user conversations from model analytics
+Writes are batched by one writer per database and reads use pooled
+connections (see sqlite_storage)
 """
 
 from flask import Flask, request, jsonify
 from model_selector import ModelSelector
-import sqlite3
 import json
+import os
+import sys
 from datetime import datetime
 import uuid
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from sqlite_storage import get_storage
+
 app = Flask(__name__)
 selector = ModelSelector()
 selector.load_model('model_selector.pkl')
@@ -20,9 +26,7 @@ def init_databases():
     """Initialize both databases with required tables"""
     
     # Database 1: User Conversations
-    conn1 = sqlite3.connect('user_conversations.db')
-    cursor1 = conn1.cursor()
-    cursor1.execute('''
+    get_storage('user_conversations.db').executescript('''
         CREATE TABLE IF NOT EXISTS conversations (
             conversation_id TEXT PRIMARY KEY,
             user_id TEXT,
@@ -36,13 +40,9 @@ def init_databases():
             cost_usd REAL
         )
     ''')
-    conn1.commit()
-    conn1.close()
     
     # Database 2: Model Selection Analytics
-    conn2 = sqlite3.connect('model_analytics.db')
-    cursor2 = conn2.cursor()
-    cursor2.execute('''
+    get_storage('model_analytics.db').executescript('''
         CREATE TABLE IF NOT EXISTS model_predictions (
             prediction_id TEXT PRIMARY KEY,
             prompt TEXT NOT NULL,
@@ -56,14 +56,10 @@ def init_databases():
             prediction_accuracy BOOLEAN
         )
     ''')
-    conn2.commit()
-    conn2.close()
 
 def store_conversation(data):
-    """Store user conversation in conversations database"""
-    conn = sqlite3.connect('user_conversations.db')
-    cursor = conn.cursor()
-    cursor.execute('''
+    """Store user conversation in conversations database (waits for the writer's batch commit)"""
+    get_storage('user_conversations.db').write('''
         INSERT INTO conversations 
         (conversation_id, user_id, session_id, prompt, response, model_used, 
          timestamp, response_time_ms, tokens_used, cost_usd)
@@ -73,15 +69,11 @@ def store_conversation(data):
         data['prompt'], data['response'], data['model_used'],
         data['timestamp'], data.get('response_time_ms'), 
         data.get('tokens_used'), data.get('cost_usd')
-    ))
-    conn.commit()
-    conn.close()
+    ), wait=True)
 
 def store_model_prediction(data):
-    """Store model prediction analytics"""
-    conn = sqlite3.connect('model_analytics.db')
-    cursor = conn.cursor()
-    cursor.execute('''
+    """Store model prediction analytics (waits for the commit: the id is returned to the client)"""
+    get_storage('model_analytics.db').write('''
         INSERT INTO model_predictions 
         (prediction_id, prompt, predicted_model, confidence_score, all_confidences,
          actual_model_used, timestamp, prompt_features)
@@ -91,9 +83,7 @@ def store_model_prediction(data):
         data['confidence_score'], json.dumps(data['all_confidences']),
         data.get('actual_model_used'), data['timestamp'],
         json.dumps(data['prompt_features'])
-    ))
-    conn.commit()
-    conn.close()
+    ), wait=True)
 
 @app.route('/predict', methods=['POST'])
 def predict_model():
@@ -196,47 +186,38 @@ def get_conversations():
     user_id = request.args.get('user_id')
     session_id = request.args.get('session_id')
     
-    conn = sqlite3.connect('user_conversations.db')
-    cursor = conn.cursor()
+    storage = get_storage('user_conversations.db')
     
     if user_id:
-        cursor.execute('SELECT * FROM conversations WHERE user_id = ? ORDER BY timestamp DESC', (user_id,))
+        conversations = storage.read('SELECT * FROM conversations WHERE user_id = ? ORDER BY timestamp DESC', (user_id,))
     elif session_id:
-        cursor.execute('SELECT * FROM conversations WHERE session_id = ? ORDER BY timestamp DESC', (session_id,))
+        conversations = storage.read('SELECT * FROM conversations WHERE session_id = ? ORDER BY timestamp DESC', (session_id,))
     else:
-        cursor.execute('SELECT * FROM conversations ORDER BY timestamp DESC LIMIT 50')
-    
-    conversations = cursor.fetchall()
-    conn.close()
+        conversations = storage.read('SELECT * FROM conversations ORDER BY timestamp DESC LIMIT 50')
     
     return jsonify({
-        'conversations': [dict(zip([col[0] for col in cursor.description], row)) for row in conversations]
+        'conversations': conversations
     })
 
 @app.route('/analytics', methods=['GET'])
 def get_analytics():
     """Get model selection analytics"""
-    conn = sqlite3.connect('model_analytics.db')
-    cursor = conn.cursor()
+    storage = get_storage('model_analytics.db')
     
     # Model usage statistics
-    cursor.execute('''
-        SELECT predicted_model, COUNT(*) as usage_count, AVG(confidence_score) as avg_confidence
+    model_stats = storage.read('''
+        SELECT predicted_model as model, COUNT(*) as usage_count, AVG(confidence_score) as avg_confidence
         FROM model_predictions 
         GROUP BY predicted_model 
         ORDER BY usage_count DESC
     ''')
-    model_stats = cursor.fetchall()
     
     # Recent predictions
-    cursor.execute('SELECT * FROM model_predictions ORDER BY timestamp DESC LIMIT 20')
-    recent_predictions = cursor.fetchall()
-    
-    conn.close()
+    recent_predictions = storage.read('SELECT * FROM model_predictions ORDER BY timestamp DESC LIMIT 20')
     
     return jsonify({
-        'model_statistics': [dict(zip(['model', 'usage_count', 'avg_confidence'], row)) for row in model_stats],
-        'recent_predictions': [dict(zip([col[0] for col in cursor.description], row)) for row in recent_predictions]
+        'model_statistics': model_stats,
+        'recent_predictions': recent_predictions
     })
 
 @app.route('/feedback', methods=['POST'])
@@ -249,15 +230,12 @@ def submit_feedback():
     if not prediction_id or not quality_rating:
         return jsonify({'error': 'Missing prediction_id or rating'}), 400
     
-    conn = sqlite3.connect('model_analytics.db')
-    cursor = conn.cursor()
-    cursor.execute('''
+    # Waits for the commit, so a failed update still surfaces as an error
+    get_storage('model_analytics.db').write('''
         UPDATE model_predictions 
         SET response_quality = ? 
         WHERE prediction_id = ?
-    ''', (quality_rating, prediction_id))
-    conn.commit()
-    conn.close()
+    ''', (quality_rating, prediction_id), wait=True)
     
     return jsonify({'message': 'Feedback recorded successfully'})
 
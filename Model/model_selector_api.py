@@ -25,9 +25,11 @@ except Exception as e:
     print(f"⚠️ Failed to load environment: {e}")
 
 from model_selector import ModelSelector
+from metrics import install_flask_metrics
 
 app = Flask(__name__)
 CORS(app)  # Enable CORS for frontend access
+install_flask_metrics(app, "model_selector_api")  # Request latencies + Prometheus /metrics
 
 # Global model selector instance
 selector = None
@@ -3,15 +3,20 @@
 Smart API using your ModelSelector algorithm for dual database storage
 - User conversations stored in SQLite
 - Model analytics stored separately
+- Writes batched by one writer per database, reads from pooled connections (sqlite_storage)
 - Graceful error handling for missing dependencies
 """
 
-import sqlite3
 import json
 import os
+import sys
+import uuid
 from datetime import datetime
 import logging
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from sqlite_storage import get_storage
+
 # Setup logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -66,9 +71,7 @@ def init_databases():
     """Initialize both databases with required tables"""
     try:
         # Database 1: User Conversations
-        conn1 = sqlite3.connect(CONVERSATIONS_DB)
-        cursor1 = conn1.cursor()
-        cursor1.execute('''
+        get_storage(CONVERSATIONS_DB).executescript('''
             CREATE TABLE IF NOT EXISTS conversations (
                 conversation_id TEXT PRIMARY KEY,
                 user_id TEXT,
@@ -82,13 +85,9 @@ def init_databases():
                 satisfaction_rating INTEGER
             )
         ''')
-        conn1.commit()
-        conn1.close()
         
         # Database 2: Model Selection Analytics
-        conn2 = sqlite3.connect(ANALYTICS_DB)
-        cursor2 = conn2.cursor()
-        cursor2.execute('''
+        get_storage(ANALYTICS_DB).executescript('''
             CREATE TABLE IF NOT EXISTS model_predictions (
                 prediction_id TEXT PRIMARY KEY,
                 prompt TEXT NOT NULL,
@@ -101,8 +100,6 @@ def init_databases():
                 prediction_correct BOOLEAN
             )
         ''')
-        conn2.commit()
-        conn2.close()
         
         logger.info("✅ Databases initialized successfully!")
         return True
@@ -113,19 +110,15 @@ def init_databases():
 def store_conversation(user_id, session_id, prompt, response, model_used, response_time_ms=0, tokens_used=0):
     """Store user conversation in conversations database"""
     try:
-        conn = sqlite3.connect(CONVERSATIONS_DB)
-        cursor = conn.cursor()
-        
-        conversation_id = f"conv_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{user_id[:8]}"
+        # Random suffix: two messages from one user in the same second must not share an id
+        conversation_id = f"conv_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:12]}"
         
-        cursor.execute('''
+        # Committed with the writer's next batch; waited for because the id is returned to the client
+        get_storage(CONVERSATIONS_DB).write('''
             INSERT INTO conversations 
             (conversation_id, user_id, session_id, prompt, response, model_used, response_time_ms, tokens_used)
             VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (conversation_id, user_id, session_id, prompt, response, model_used, response_time_ms, tokens_used))
-        
-        conn.commit()
-        conn.close()
+        ''', (conversation_id, user_id, session_id, prompt, response, model_used, response_time_ms, tokens_used), wait=True)
         return conversation_id
     except Exception as e:
         logger.error(f"Error storing conversation: {e}")
@@ -134,12 +127,9 @@ def store_conversation(user_id, session_id, prompt, response, model_used, respon
 def store_model_prediction(prompt, prediction_result):
     """Store model prediction analytics in analytics database"""
     try:
-        conn = sqlite3.connect(ANALYTICS_DB)
-        cursor = conn.cursor()
+        prediction_id = f"pred_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:12]}"
         
-        prediction_id = f"pred_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}"
-        
-        cursor.execute('''
+        get_storage(ANALYTICS_DB).write('''
             INSERT INTO model_predictions 
             (prediction_id, prompt, predicted_model, confidence_score, all_model_scores, prompt_features)
             VALUES (?, ?, ?, ?, ?, ?)
@@ -150,10 +140,7 @@ def store_model_prediction(prompt, prediction_result):
             prediction_result.get('prediction_confidence', 0.0),
             json.dumps(prediction_result.get('confidence_scores', {})),
             json.dumps(prediction_result.get('prompt_features', {}))
-        ))
-        
-        conn.commit()
-        conn.close()
+        ), wait=True)
         return prediction_id
     except Exception as e:
         logger.error(f"Error storing prediction: {e}")
@@ -263,29 +250,22 @@ def get_conversations():
         user_id = request.args.get('user_id')
         limit = int(request.args.get('limit', 10))
         
-        conn = sqlite3.connect(CONVERSATIONS_DB)
-        cursor = conn.cursor()
+        storage = get_storage(CONVERSATIONS_DB)
         
         if user_id:
-            cursor.execute('''
+            conversations = storage.read('''
                 SELECT * FROM conversations 
                 WHERE user_id = ? 
                 ORDER BY timestamp DESC 
                 LIMIT ?
             ''', (user_id, limit))
         else:
-            cursor.execute('''
+            conversations = storage.read('''
                 SELECT * FROM conversations 
                 ORDER BY timestamp DESC 
                 LIMIT ?
             ''', (limit,))
         
-        rows = cursor.fetchall()
-        columns = [description[0] for description in cursor.description]
-        conversations = [dict(zip(columns, row)) for row in rows]
-        
-        conn.close()
-        
         return jsonify({
             'success': True,
             'conversations': conversations,
@@ -302,19 +282,12 @@ def get_analytics():
     try:
         limit = int(request.args.get('limit', 10))
         
-        conn = sqlite3.connect(ANALYTICS_DB)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
+        predictions = get_storage(ANALYTICS_DB).read('''
             SELECT * FROM model_predictions 
             ORDER BY timestamp DESC 
             LIMIT ?
         ''', (limit,))
         
-        rows = cursor.fetchall()
-        columns = [description[0] for description in cursor.description]
-        predictions = [dict(zip(columns, row)) for row in rows]
-        
         # Parse JSON fields for better display
         for pred in predictions:
             try:
@@ -323,8 +296,6 @@ def get_analytics():
             except:
                 pass
         
-        conn.close()
-        
         return jsonify({
             'success': True,
             'predictions': predictions,
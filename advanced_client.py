@@ -6,7 +6,8 @@ This client implements the complete multi-model orchestration workflow:
 1. Secure API key management
 2. Model selection via ML API
 3. Primary response from best model
-4. Concurrent critique responses from other models
+4. Concurrent critique responses from other models (all of them, or the
+   first min_successful_critiques in quorum mode)
 5. Comprehensive error handling and retries
 6. UI-ready response formatting
 
@@ -15,20 +16,39 @@ Usage:
     
     orchestrator = MultiModelOrchestrator()
     result = await orchestrator.orchestrate_with_critiques("Your prompt here")
+    
+    # Evaluation / dataset runs: results in completion order, resumable
+    async for index, result in orchestrator.orchestrate_many(prompts, checkpoint_path="run.jsonl"):
+        ...
 """
 
 import asyncio
-import aiohttp
+import httpx
 import os
 import logging
 import time
 import json
-from typing import Dict, List, Optional, Tuple, Any
+import copy
+import random
+import hashlib
+import threading
+import contextlib
+import contextvars
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple, Union
 from dataclasses import dataclass, asdict
 from datetime import datetime
-import backoff
 from concurrent.futures import ThreadPoolExecutor
 
+from pipeline import Pipeline
+from http_transport import get_async_client, openrouter_base_url
+from circuit_breaker import circuit_breakers
+from concurrency_limiter import concurrency_limiters
+from token_bucket import rate_limiters
+from token_accounting import size_max_tokens, usage_from_response, detect_intent, estimate_tokens
+from critique_compression import CritiqueCompressor
+from result_store import build_result_store_from_env
+from metrics import outcome_for_status, record_model_call, record_tokens
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -40,6 +60,23 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Unique focus area of each critic, to reduce redundancy between critiques
+CRITIQUE_FOCUS_AREAS = {
+    "TNG DeepSeek": "technical accuracy and logical reasoning",
+    "GLM4.5": "clarity and structure",
+    "GPT-OSS": "completeness and missing information",
+    "MoonshotAI Kimi": "creativity and alternative perspectives",
+    "Llama 4 Maverick": "practical applicability and real-world relevance",
+    "Qwen3": "precision and factual correctness"
+}
+
+# Per-model call slots of the orchestrate_many batch the current task belongs to
+_batch_model_slots: contextvars.ContextVar[Optional[Dict[str, asyncio.Semaphore]]] = \
+    contextvars.ContextVar("batch_model_slots", default=None)
+
+def _prompt_digest(prompt: str) -> str:
+    return hashlib.sha1(prompt.encode("utf-8")).hexdigest()[:16]
+
 @dataclass
 class ModelResponse:
     """Structured response from an AI model"""
@@ -239,7 +276,13 @@ class MultiModelOrchestrator:
                  max_retries: int = 3,
                  timeout: int = 30,
                  max_concurrent: int = 8,
-                 min_successful_critiques: int = 4):
+                 min_successful_critiques: int = 4,
+                 critique_mode: str = "all",
+                 critique_deadline: float = 60.0,
+                 critique_retry_delay: float = 0.5,
+                 late_critiques: str = "cancel",
+                 on_late_critique: Optional[Callable[[str, ModelResponse], Any]] = None,
+                 result_store=None):
         """
         Initialize the advanced orchestrator
         
@@ -249,12 +292,34 @@ class MultiModelOrchestrator:
             timeout: Request timeout in seconds
             max_concurrent: Maximum concurrent API calls
             min_successful_critiques: Minimum number of successful critiques to aim for
+            critique_mode: "all" waits for every critic, then retries the failed ones in a
+                           second round; "quorum" returns as soon as min_successful_critiques
+                           succeeded, each critic retrying on its own
+            critique_deadline: Seconds a quorum round (including retries) may take
+            critique_retry_delay: Base delay of a critic's jittered exponential backoff (quorum)
+            late_critiques: What happens to critics still running when the quorum is reached:
+                            "cancel", or "background" to let them finish and pass their
+                            responses to on_late_critique(prompt, response) (e.g. to persist them)
+            on_late_critique: Sync or async callback for late critiques
+            result_store: Indexed store for save_result and orchestrate_many (see result_store;
+                          default from RESULT_STORE_BACKEND, none if unset)
         """
+        if critique_mode not in ("all", "quorum"):
+            raise ValueError(f"Unknown critique_mode: {critique_mode}")
+        if late_critiques not in ("cancel", "background"):
+            raise ValueError(f"Unknown late_critiques: {late_critiques}")
         self.model_selector_url = model_selector_url
         self.max_retries = max_retries
         self.timeout = timeout
         self.max_concurrent = max_concurrent
         self.min_successful_critiques = min_successful_critiques
+        self.critique_mode = critique_mode
+        self.critique_deadline = critique_deadline
+        self.critique_retry_delay = critique_retry_delay
+        self.late_critiques = late_critiques
+        self.on_late_critique = on_late_critique
+        self._late_tasks = set()  # Late critiques finishing in the background
+        self.result_store = result_store if result_store is not None else build_result_store_from_env()
         
         # Initialize secure key manager
         self.key_manager = SecureAPIKeyManager()
@@ -279,6 +344,7 @@ class MultiModelOrchestrator:
             "Qwen3": 0.0          # Free tier
         }
         
+        self.openrouter_url = f"{openrouter_base_url()}/chat/completions"
         self.session = None
         self.stats = {
             "total_orchestrations": 0,
@@ -288,29 +354,42 @@ class MultiModelOrchestrator:
             "total_cost": 0.0,
             "model_usage": {}
         }
+        # Stats are updated from concurrent orchestrations (and threads running their own loops)
+        self._stats_lock = threading.Lock()
+    
+    def _count(self, key: str, amount: Union[int, float] = 1, model: Optional[str] = None):
+        """Update an aggregate stat (and the model's usage count) atomically"""
+        with self._stats_lock:
+            self.stats[key] += amount
+            if model is not None:
+                self.stats["model_usage"][model] = self.stats["model_usage"].get(model, 0) + 1
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Consistent snapshot of the aggregate stats"""
+        with self._stats_lock:
+            return copy.deepcopy(self.stats)
     
     async def __aenter__(self):
         """Async context manager entry"""
-        self.session = aiohttp.ClientSession(
-            timeout=aiohttp.ClientTimeout(total=self.timeout),
-            connector=aiohttp.TCPConnector(limit=50, limit_per_host=10)
-        )
+        self.session = get_async_client()  # Shared keep-alive pool, see http_transport
         return self
     
     async def __aexit__(self, exc_type, exc_val, exc_tb):
         """Async context manager exit"""
-        if self.session:
-            await self.session.close()
+        await self.wait_for_late_critiques()
+        if self.result_store:
+            self.result_store.flush()
+        # The pooled connections stay open for the next orchestration
+        self.session = None
+    
+    async def wait_for_late_critiques(self):
+        """Wait until critiques still running in the background (late_critiques="background") are handled"""
+        if self._late_tasks:
+            await asyncio.gather(*list(self._late_tasks), return_exceptions=True)
     
-    @backoff.on_exception(
-        backoff.expo,
-        (aiohttp.ClientError, asyncio.TimeoutError),
-        max_tries=3,
-        max_time=60
-    )
     async def _call_model_selector_api(self, prompt: str) -> Tuple[str, Dict[str, float]]:
         """
-        Call model selector API with retry logic
+        Call model selector API (falls back to a default model on any error)
         
         Args:
             prompt: Input prompt to analyze
@@ -321,23 +400,24 @@ class MultiModelOrchestrator:
         try:
             logger.info(f"🎯 Calling model selector for prompt: '{prompt[:50]}...'")
             
-            async with self.session.post(
+            response = await self.session.post(
                 f"{self.model_selector_url}/predict",
                 json={"prompt": prompt},
-                headers={"Content-Type": "application/json"}
-            ) as response:
+                headers={"Content-Type": "application/json"},
+                timeout=self.timeout
+            )
+            
+            if response.status_code == 200:
+                data = response.json()
+                best_model = data["best_model"]
+                confidence_scores = data["confidence_scores"]
                 
-                if response.status == 200:
-                    data = await response.json()
-                    best_model = data["best_model"]
-                    confidence_scores = data["confidence_scores"]
-                    
-                    logger.info(f"✅ Model selector result: {best_model} (confidence: {data['prediction_confidence']:.3f})")
-                    return best_model, confidence_scores
-                else:
-                    error_text = await response.text()
-                    logger.error(f"❌ Model selector API error {response.status}: {error_text}")
-                    raise aiohttp.ClientError(f"Model selector API error: {error_text}")
+                logger.info(f"✅ Model selector result: {best_model} (confidence: {data['prediction_confidence']:.3f})")
+                return best_model, confidence_scores
+            else:
+                error_text = response.text
+                logger.error(f"❌ Model selector API error {response.status_code}: {error_text}")
+                raise httpx.HTTPError(f"Model selector API error: {error_text}")
                     
         except Exception as e:
             logger.error(f"❌ Model selector API call failed: {e}")
@@ -345,20 +425,18 @@ class MultiModelOrchestrator:
             logger.warning("🔄 Using fallback model selection")
             return "GPT-OSS", {"GPT-OSS": 0.7, "TNG DeepSeek": 0.3}
     
-    @backoff.on_exception(
-        backoff.expo,
-        (aiohttp.ClientError, asyncio.TimeoutError),
-        max_tries=3,
-        max_time=120
-    )
     async def _call_openrouter_api(self, 
                                   model_name: str, 
                                   prompt: str,
                                   is_critique: bool = False,
                                   original_response: str = None,
-                                  temperature: float = 0.7) -> ModelResponse:
+                                  temperature: float = 0.7,
+                                  max_tokens: Optional[int] = None) -> ModelResponse:
         """
-        Call OpenRouter API for a specific model with retry logic
+        Call OpenRouter API for a specific model
+        
+        Errors come back as a failed ModelResponse; retries are up to the caller
+        (_critique_with_retries for critics, retry_critiques otherwise).
         
         Args:
             model_name: Name of the AI model
@@ -366,10 +444,26 @@ class MultiModelOrchestrator:
             is_critique: Whether this is a critique request
             original_response: Original response to critique (if applicable)
             temperature: Model temperature setting
+            max_tokens: Completion budget (sized from the prompt and response type if None)
             
         Returns:
             ModelResponse with result
         """
+        # Inside orchestrate_many, wait for one of the batch's slots for this model
+        slots = _batch_model_slots.get()
+        slot = slots.get(model_name) if slots else None
+        async with slot or contextlib.nullcontext():
+            return await self._request_model(model_name, prompt, is_critique, original_response,
+                                             temperature, max_tokens)
+    
+    async def _request_model(self,
+                             model_name: str,
+                             prompt: str,
+                             is_critique: bool,
+                             original_response: Optional[str],
+                             temperature: float,
+                             max_tokens: Optional[int]) -> ModelResponse:
+        """One OpenRouter (or simulated) call, see _call_openrouter_api"""
         # Get model-specific API key
         api_key = self.key_manager.get_model_key(model_name)
         if not api_key:
@@ -394,24 +488,56 @@ class MultiModelOrchestrator:
                 error_message=f"Unknown model: {model_name}"
             )
         
+        if not circuit_breakers.allow_request(model_name):
+            # Fail fast instead of burning a timeout on a model that is known to be down
+            logger.warning(f"⚡ Skipping {model_name}: circuit breaker is open")
+            record_model_call(model_name, "circuit_open")
+            return ModelResponse(
+                model_name=model_name,
+                response_text="",
+                response_type="critique" if is_critique else "primary",
+                tokens_used=0,
+                latency_ms=0,
+                cost_usd=0.0,
+                confidence_score=0.0,
+                success=False,
+                error_message=f"Circuit open for {model_name}",
+                metadata={"circuit_open": True}
+            )
+        
+        try:
+            acquired = await rate_limiters.get(model_name, api_key).acquire_async(timeout=rate_limiters.max_wait)
+        except asyncio.CancelledError:
+            circuit_breakers.release(model_name)
+            raise
+        if not acquired:
+            # Waiting for the model's request budget would take too long: let the caller route elsewhere
+            circuit_breakers.release(model_name)  # No call went out, so no half-open probe either
+            logger.warning(f"🪣 Skipping {model_name}: local rate limit reached")
+            record_model_call(model_name, "rate_limited_locally")
+            return ModelResponse(
+                model_name=model_name,
+                response_text="",
+                response_type="critique" if is_critique else "primary",
+                tokens_used=0,
+                latency_ms=0,
+                cost_usd=0.0,
+                confidence_score=0.0,
+                success=False,
+                error_message=f"Rate limit for {model_name} reached locally",
+                metadata={"rate_limited_locally": True}
+            )
+        
         start_time = time.time()
+        response = None  # The HTTP response, once one arrived
+        response_type = "unknown"
         
         try:
             openrouter_model = self.model_mappings[model_name]
             
             # Prepare the prompt
             if is_critique and original_response:
-                # Add unique focus areas for each model to reduce redundancy
-                focus_areas = {
-                    "TNG DeepSeek": "technical accuracy and logical reasoning",
-                    "GLM4.5": "clarity and structure", 
-                    "GPT-OSS": "completeness and missing information",
-                    "MoonshotAI Kimi": "creativity and alternative perspectives",
-                    "Llama 4 Maverick": "practical applicability and real-world relevance",
-                    "Qwen3": "precision and factual correctness"
-                }
-                
-                focus = focus_areas.get(model_name, "overall quality")
+                focus = CRITIQUE_FOCUS_AREAS.get(model_name, "overall quality")
                 
                 # Customize critique prompts for focused, natural responses
                 if model_name == "TNG DeepSeek":
@@ -448,15 +574,10 @@ Critique:"""
                 "X-Title": "OrchestrateX Advanced Client"
             }
             
-            # Model-specific configuration for response length
-            if model_name == "TNG DeepSeek" and is_critique:
-                max_tokens = 100  # Very short technical critiques
-            elif model_name == "Qwen3" and is_critique:
-                max_tokens = 80   # Very short factual critiques  
-            elif model_name in ["TNG DeepSeek", "Qwen3"]:
-                max_tokens = 1500  # Shorter primary responses
-            else:
-                max_tokens = 4000  # Standard length for other models
+            # Completion budget from the request's intent and the model's context length;
+            # critiques here are asked for 10 words
+            if max_tokens is None:
+                max_tokens = size_max_tokens(model_name, final_prompt, "short_critique" if is_critique else "primary")
             
             payload = {
                 "model": openrouter_model,
@@ -471,74 +592,112 @@ Critique:"""
                 "top_p": 0.9
             }
             
-            async with self.session.post(
-                "https://openrouter.ai/api/v1/chat/completions",
-                json=payload,
-                headers=headers
-            ) as response:
+            # Adaptive per-model/key in-flight limit (AIMD) instead of one fixed constant
+            async with concurrency_limiters.get(model_name, api_key).slot() as permit:
+                response = await self.session.post(
+                    self.openrouter_url,
+                    json=payload,
+                    headers=headers,
+                    timeout=self.timeout
+                )
+                permit.record(status_code=response.status_code)
+            record_model_call(model_name, outcome_for_status(response.status_code), time.time() - start_time)
+            
+            bucket = rate_limiters.get(model_name, api_key)
+            bucket.update_from_headers(response.headers)
+            if response.status_code == 429 and "retry-after" not in response.headers:
+                bucket.penalize()
+            
+            end_time = time.time()
+            latency_ms = int((end_time - start_time) * 1000)
+            
+            if response.status_code == 200:
+                data = response.json()
                 
-                end_time = time.time()
-                latency_ms = int((end_time - start_time) * 1000)
+                if not data.get("choices") or not data["choices"][0].get("message"):
+                    raise httpx.HTTPError("Invalid response format from OpenRouter")
                 
-                if response.status == 200:
-                    data = await response.json()
-                    
-                    if not data.get("choices") or not data["choices"][0].get("message"):
-                        raise aiohttp.ClientError("Invalid response format from OpenRouter")
-                    
-                    response_text = data["choices"][0]["message"]["content"]
-                    usage = data.get("usage", {})
-                    tokens_used = usage.get("total_tokens", 0)
-                    
-                    # Clean up special tokens from GPT-OSS output
-                    if "GPT-OSS" in model_name:
-                        tokens_to_remove = ["<|start|>", "<|assistant|>", "<|channel|>", "<|final|>", "<|message|>", "<|end|>", "assistant", "final", "channel"]
-                        for token in tokens_to_remove:
-                            response_text = response_text.replace(token, "")
-                        response_text = response_text.strip()
-                    
-                    # Calculate cost
-                    cost_usd = (tokens_used / 1000) * self.model_costs.get(model_name, 0.002)
-                    
-                    # Log success
-                    logger.info(f"✅ {model_name} ({response_type}): {len(response_text)} chars, {tokens_used} tokens, ${cost_usd:.4f}, {latency_ms}ms")
-                    
-                    self.stats["total_api_calls"] += 1
-                    self.stats["total_cost"] += cost_usd
-                    self.stats["model_usage"][model_name] = self.stats["model_usage"].get(model_name, 0) + 1
-                    
+                response_text = data["choices"][0]["message"]["content"]
+                usage = usage_from_response(data, final_prompt, response_text, openrouter_model)
+                tokens_used = usage["total_tokens"]
+                record_tokens(model_name, usage["input_tokens"], usage["output_tokens"])
+                
+                # Clean up special tokens from GPT-OSS output
+                if "GPT-OSS" in model_name:
+                    tokens_to_remove = ["<|start|>", "<|assistant|>", "<|channel|>", "<|final|>", "<|message|>", "<|end|>", "assistant", "final", "channel"]
+                    for token in tokens_to_remove:
+                        response_text = response_text.replace(token, "")
+                    response_text = response_text.strip()
+                
+                # Calculate cost
+                cost_usd = (tokens_used / 1000) * self.model_costs.get(model_name, 0.002)
+                
+                # Log success
+                logger.info(f"✅ {model_name} ({response_type}): {len(response_text)} chars, {tokens_used} tokens, ${cost_usd:.4f}, {latency_ms}ms")
+                
+                self._count("total_api_calls", model=model_name)
+                self._count("total_cost", cost_usd)
+                circuit_breakers.record_success(model_name)
+                
+                return ModelResponse(
+                    model_name=model_name,
+                    response_text=response_text,
+                    response_type=response_type,
+                    tokens_used=tokens_used,
+                    latency_ms=latency_ms,
+                    cost_usd=cost_usd,
+                    confidence_score=1.0,  # Full confidence for successful response
+                    success=True,
+                    metadata={
+                        "openrouter_model": openrouter_model,
+                        "finish_reason": data["choices"][0].get("finish_reason"),
+                        "prompt_tokens": usage["input_tokens"],
+                        "completion_tokens": usage["output_tokens"],
+                        "usage_source": usage["usage_source"],
+                        "max_tokens": max_tokens,
+                        "temperature": temperature
+                    }
+                )
+                
+            else:
+                error_text = response.text
+                logger.error(f"❌ OpenRouter API error {response.status_code} for {model_name}: {error_text}")
+                if response.status_code == 429:
+                    # Quota throttling says nothing about the model's health: keep it out of the breaker
+                    circuit_breakers.release(model_name)
                     return ModelResponse(
                         model_name=model_name,
-                        response_text=response_text,
+                        response_text="",
                         response_type=response_type,
-                        tokens_used=tokens_used,
+                        tokens_used=0,
                         latency_ms=latency_ms,
-                        cost_usd=cost_usd,
-                        confidence_score=1.0,  # Full confidence for successful response
-                        success=True,
-                        metadata={
-                            "openrouter_model": openrouter_model,
-                            "finish_reason": data["choices"][0].get("finish_reason"),
-                            "prompt_tokens": usage.get("prompt_tokens", 0),
-                            "completion_tokens": usage.get("completion_tokens", 0),
-                            "temperature": temperature
-                        }
+                        cost_usd=0.0,
+                        confidence_score=0.0,
+                        success=False,
+                        error_message=f"OpenRouter API error: {error_text}",
+                        metadata={"rate_limited": True}
                     )
-                    
-                else:
-                    error_text = await response.text()
-                    logger.error(f"❌ OpenRouter API error {response.status} for {model_name}: {error_text}")
-                    raise aiohttp.ClientError(f"OpenRouter API error: {error_text}")
-                    
+                raise httpx.HTTPError(f"OpenRouter API error: {error_text}")
+                
+        except asyncio.CancelledError:
+            # E.g. a critic cancelled at quorum: give a half-open probe back instead of
+            # leaving it reserved until it goes stale
+            circuit_breakers.release(model_name)
+            raise
         except Exception as e:
             end_time = time.time()
             latency_ms = int((end_time - start_time) * 1000)
             
             logger.error(f"❌ Failed to call {model_name}: {e}")
+            timed_out = isinstance(e, (httpx.TimeoutException, asyncio.TimeoutError))
+            if response is None:
+                # No HTTP response to classify (responses were recorded when they arrived)
+                record_model_call(model_name, "timeout" if timed_out else "error", end_time - start_time)
+            circuit_breakers.record_failure(model_name, timeout=timed_out)
             return ModelResponse(
                 model_name=model_name,
                 response_text="",
-                response_type=response_type if 'response_type' in locals() else "unknown",
+                response_type=response_type,
                 tokens_used=0,
                 latency_ms=latency_ms,
                 cost_usd=0.0,
@@ -599,41 +758,62 @@ Critique:"""
             metadata={"simulated": True, "reason": "No API key available"}
         )
     
-    async def orchestrate_with_critiques(self, prompt: str) -> OrchestrationResult:
+    def _model_keys(self, models: List[str]) -> Dict[str, Optional[str]]:
+        """API key used for each model (as in _call_openrouter_api)"""
+        return {
+            model: self.key_manager.get_model_key(model) or self.key_manager.get_key("openrouter")
+            for model in models
+        }
+    
+    def _build_critique_pipeline(self) -> Pipeline:
         """
-        Complete orchestration workflow with primary response and concurrent critiques
+        Declare the critique workflow as a DAG
         
-        Args:
-            prompt: Input prompt to process
-            
-        Returns:
-            OrchestrationResult with primary response and critiques
+        select → primary → compress → critique:<model> (one stage per model, concurrent) → retry_critiques
+        
+        In quorum mode the critics run inside one stage instead:
+        select → primary → compress → quorum_critiques
         """
-        start_time = time.time()
-        self.stats["total_orchestrations"] += 1
+        pipeline = Pipeline("orchestrate_with_critiques")
+        # Overall cap on concurrent critiques; per-model limits adapt in concurrency_limiter
+        semaphore = asyncio.Semaphore(self.max_concurrent)
         
-        try:
-            logger.info(f"🎭 Starting advanced orchestration for: '{prompt[:50]}...'")
-            
+        async def select(ctx):
             # Step 1: Get model selection
-            selected_model, confidence_scores = await self._call_model_selector_api(prompt)
-            
+            return await self._call_model_selector_api(ctx["prompt"])
+        
+        async def primary(ctx):
             # Step 2: Get primary response from selected model
+            selected_model, _ = ctx["select"]
+            fallback_models = ["GPT-OSS", "Llama 4 Maverick", "TNG DeepSeek"]
+            if not circuit_breakers.is_available(selected_model):
+                # Route around a model whose circuit is open instead of waiting for it to fail
+                replacement = circuit_breakers.pick([m for m in fallback_models + list(self.model_mappings) if m != selected_model])
+                if replacement:
+                    logger.info(f"⚡ {selected_model} circuit is open, routing to {replacement}")
+                    selected_model = replacement
+            if rate_limiters.pick([selected_model], self._model_keys([selected_model])) is None:
+                # The model's request budget is used up for longer than we are willing to wait
+                candidates = circuit_breakers.available([m for m in fallback_models + list(self.model_mappings) if m != selected_model])
+                replacement = rate_limiters.pick(candidates, self._model_keys(candidates))
+                if replacement:
+                    logger.info(f"🪣 {selected_model} is rate limited locally, routing to {replacement}")
+                    selected_model = replacement
+            
             primary_response = await self._call_openrouter_api(
                 selected_model, 
-                prompt, 
+                ctx["prompt"], 
                 is_critique=False
             )
             
             if not primary_response.success:
                 logger.warning(f"⚠️ Primary model {selected_model} failed, trying fallback...")
-                # Try fallback model
-                fallback_models = ["GPT-OSS", "Llama 4 Maverick", "TNG DeepSeek"]
-                for fallback in fallback_models:
+                # Try fallback models that are not known to be down
+                for fallback in circuit_breakers.available(fallback_models):
                     if fallback != selected_model:
                         primary_response = await self._call_openrouter_api(
                             fallback, 
-                            prompt, 
+                            ctx["prompt"], 
                             is_critique=False
                         )
                         if primary_response.success:
@@ -641,36 +821,43 @@ Critique:"""
                             selected_model = fallback
                             break
             
+            logger.info(f"🔄 Getting critiques from {len(self.model_mappings) - 1} other models...")
+            return selected_model, primary_response
+        
+        async def compress(ctx):
+            # Step 2b: One compact view of the primary response per critic focus,
+            # instead of sending the full response to every critic
+            _, primary_response = ctx["primary"]
+            if not primary_response.success:
+                return {}
+            compressor = CritiqueCompressor(primary_response.response_text, ctx["prompt"])
+            views = {
+                model: compressor.view(CRITIQUE_FOCUS_AREAS.get(model, "overall quality"))
+                for model in self.model_mappings
+            }
+            largest = max(estimate_tokens(view) for view in views.values())
+            logger.info(f"🗜️ Critique input: {compressor.original_tokens} tokens compressed to at most {largest} per critic")
+            return views
+        
+        def critique(model):
             # Step 3: Get concurrent critiques from other models
-            other_models = [model for model in self.model_mappings.keys() if model != selected_model]
-            
-            logger.info(f"🔄 Getting critiques from {len(other_models)} other models...")
-            
-            # Create semaphore for concurrency control
-            semaphore = asyncio.Semaphore(self.max_concurrent)
-            
-            async def get_critique_with_semaphore(model):
-                async with semaphore:
-                    return await self._call_openrouter_api(
-                        model,
-                        prompt,
-                        is_critique=True,
-                        original_response=primary_response.response_text if primary_response.success else None,
-                        temperature=0.8  # Slightly higher temperature for critiques
-                    )
-            
-            # Execute critique requests concurrently
-            critique_tasks = [get_critique_with_semaphore(model) for model in other_models]
-            critique_responses = await asyncio.gather(*critique_tasks, return_exceptions=True)
-            
-            # Handle exceptions in critique responses
-            processed_critiques = []
-            for i, response in enumerate(critique_responses):
-                if isinstance(response, Exception):
-                    logger.error(f"❌ Critique from {other_models[i]} failed: {response}")
-                    # Create failed response object
-                    failed_response = ModelResponse(
-                        model_name=other_models[i],
+            async def stage(ctx):
+                selected_model, _ = ctx["primary"]
+                if model == selected_model:
+                    return None
+                try:
+                    async with semaphore:
+                        return await self._call_openrouter_api(
+                            model,
+                            ctx["prompt"],
+                            is_critique=True,
+                            original_response=ctx["compress"].get(model),
+                            temperature=0.8  # Slightly higher temperature for critiques
+                        )
+                except Exception as e:
+                    logger.error(f"❌ Critique from {model} failed: {e}")
+                    return ModelResponse(
+                        model_name=model,
                         response_text="",
                         response_type="critique",
                         tokens_used=0,
@@ -678,19 +865,22 @@ Critique:"""
                         cost_usd=0.0,
                         confidence_score=0.0,
                         success=False,
-                        error_message=str(response)
+                        error_message=str(e)
                     )
-                    processed_critiques.append(failed_response)
-                else:
-                    processed_critiques.append(response)
+            return stage
+        
+        async def retry_critiques(ctx):
+            processed_critiques = [ctx[name] for name in critique_stages if ctx[name] is not None]
             
             # Enhanced retry logic for failed critiques to reach min_successful_critiques
             successful_critiques_count = sum(1 for c in processed_critiques if c.success)
             if successful_critiques_count < self.min_successful_critiques:
                 logger.info(f"🔄 Only {successful_critiques_count} successful critiques, retrying failed models...")
                 
-                # Get failed models
-                failed_models = [c.model_name for c in processed_critiques if not c.success]
+                # Get failed models (skipping those whose circuit is open)
+                failed_models = circuit_breakers.available(
+                    [c.model_name for c in processed_critiques if not c.success]
+                )
                 
                 if failed_models:
                     logger.info(f"🔁 Retrying {len(failed_models)} failed models: {failed_models}")
@@ -699,9 +889,9 @@ Critique:"""
                     async def retry_critique_with_timeout(model):
                         return await self._call_openrouter_api(
                             model,
-                            prompt,
+                            ctx["prompt"],
                             is_critique=True,
-                            original_response=primary_response.response_text if primary_response.success else None,
+                            original_response=ctx["compress"].get(model),
                             temperature=0.9  # Slightly higher temperature for retries
                         )
                     
@@ -714,12 +904,157 @@ Critique:"""
                         if not isinstance(retry_response, Exception) and retry_response.success:
                             # Find and replace the failed critique
                             failed_model = failed_models[i]
-                            for j, critique in enumerate(processed_critiques):
-                                if critique.model_name == failed_model and not critique.success:
+                            for j, critique_response in enumerate(processed_critiques):
+                                if critique_response.model_name == failed_model and not critique_response.success:
                                     processed_critiques[j] = retry_response
                                     logger.info(f"✅ Retry successful for {failed_model}")
                                     break
             
+            return processed_critiques
+        
+        async def quorum_critiques(ctx):
+            selected_model, _ = ctx["primary"]
+            critics = [model for model in self.model_mappings if model != selected_model]
+            return await self._quorum_critiques(ctx["prompt"], critics, ctx["compress"], semaphore)
+        
+        critique_stages = [f"critique:{model}" for model in self.model_mappings]
+        
+        pipeline.add_stage("select", select)
+        pipeline.add_stage("primary", primary, depends_on=["select"])
+        pipeline.add_stage("compress", compress, depends_on=["primary"])
+        if self.critique_mode == "quorum":
+            pipeline.add_stage("quorum_critiques", quorum_critiques, depends_on=["compress"])
+            return pipeline
+        for model, stage_name in zip(self.model_mappings, critique_stages):
+            pipeline.add_stage(stage_name, critique(model), depends_on=["compress"])
+        pipeline.add_stage("retry_critiques", retry_critiques, depends_on=critique_stages)
+        return pipeline
+    
+    async def _critique_with_retries(self, model: str, prompt: str, view: Optional[str],
+                                     semaphore: asyncio.Semaphore, deadline: float) -> ModelResponse:
+        """
+        One critic with its own retries: jittered exponential backoff, as long as
+        the next attempt can start before the deadline
+        """
+        loop = asyncio.get_running_loop()
+        attempt = 0
+        while True:
+            try:
+                async with semaphore:
+                    response = await self._call_openrouter_api(
+                        model,
+                        prompt,
+                        is_critique=True,
+                        original_response=view,
+                        temperature=0.8 if attempt == 0 else 0.9  # Slightly higher temperature for retries
+                    )
+            except Exception as e:
+                response = ModelResponse(
+                    model_name=model,
+                    response_text="",
+                    response_type="critique",
+                    tokens_used=0,
+                    latency_ms=0,
+                    cost_usd=0.0,
+                    confidence_score=0.0,
+                    success=False,
+                    error_message=str(e)
+                )
+            attempt += 1
+            response.metadata["attempts"] = attempt
+            if response.success or attempt > self.max_retries or not circuit_breakers.is_available(model):
+                return response
+            
+            # Full jitter, so critics that failed together do not retry together
+            delay = random.uniform(0, self.critique_retry_delay * (2 ** (attempt - 1)))
+            if loop.time() + delay >= deadline:
+                return response
+            logger.info(f"🔁 Retrying critique from {model} in {delay:.2f}s (attempt {attempt + 1})")
+            await asyncio.sleep(delay)
+    
+    async def _quorum_critiques(self, prompt: str, critics: List[str], views: Dict[str, str],
+                                semaphore: asyncio.Semaphore) -> List[ModelResponse]:
+        """
+        Run the critics until min_successful_critiques of them succeeded (or the
+        deadline passed); the rest are cancelled or finish in the background
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.critique_deadline
+        quorum = min(self.min_successful_critiques, len(critics)) or len(critics)
+        tasks = {
+            asyncio.create_task(self._critique_with_retries(model, prompt, views.get(model), semaphore, deadline)): model
+            for model in critics
+        }
+        
+        responses: Dict[str, ModelResponse] = {}
+        pending = set(tasks)
+        try:
+            while pending and sum(1 for r in responses.values() if r.success) < quorum:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    logger.warning(f"⏰ Critique deadline of {self.critique_deadline}s reached")
+                    break
+                done, pending = await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    responses[tasks[task]] = task.result()
+        finally:
+            if pending:
+                late = [tasks[task] for task in pending]
+                if self.late_critiques == "background":
+                    logger.info(f"🎯 Critique quorum done, {len(late)} critics finish in the background: {late}")
+                    for task in pending:
+                        self._keep_late_critique(prompt, task)
+                else:
+                    logger.info(f"🎯 Critique quorum done, cancelling {len(late)} critics: {late}")
+                    for task in pending:
+                        task.cancel()
+                    # Let them unwind (release slots and connections) before returning
+                    await asyncio.gather(*pending, return_exceptions=True)
+        
+        successful = sum(1 for r in responses.values() if r.success)
+        logger.info(f"📊 Quorum critiques: {successful}/{quorum} needed, {len(responses)}/{len(critics)} critics answered")
+        return [responses[model] for model in critics if model in responses]
+    
+    def _keep_late_critique(self, prompt: str, task: asyncio.Task):
+        """Hand a critique that finishes after the quorum to on_late_critique"""
+        async def finish():
+            try:
+                response = await task
+                if self.on_late_critique:
+                    handled = self.on_late_critique(prompt, response)
+                    if asyncio.iscoroutine(handled):
+                        await handled
+            except Exception as e:
+                logger.error(f"❌ Late critique failed: {e}")
+        
+        late_task = asyncio.create_task(finish())
+        self._late_tasks.add(late_task)
+        late_task.add_done_callback(self._late_tasks.discard)
+    
+    async def orchestrate_with_critiques(self, prompt: str) -> OrchestrationResult:
+        """
+        Complete orchestration workflow with primary response and concurrent critiques
+        
+        Args:
+            prompt: Input prompt to process
+            
+        Returns:
+            OrchestrationResult with primary response and critiques
+        """
+        start_time = time.time()
+        self._count("total_orchestrations")
+        
+        try:
+            logger.info(f"🎭 Starting advanced orchestration for: '{prompt[:50]}...'")
+            
+            # select → primary → critique:<model> (concurrent) → retry_critiques,
+            # or select → primary → quorum_critiques
+            result = await self._build_critique_pipeline().run({"prompt": prompt})
+            
+            _, confidence_scores = result["select"]
+            selected_model, primary_response = result["primary"]
+            processed_critiques = result["quorum_critiques" if self.critique_mode == "quorum" else "retry_critiques"]
+            
             # Update successful critiques count after retries
             successful_critiques_final = sum(1 for c in processed_critiques if c.success)
             logger.info(f"📊 Final critiques: {successful_critiques_final}/{len(processed_critiques)} successful")
@@ -733,10 +1068,7 @@ Critique:"""
             successful_critiques = successful_critiques_final
             overall_success = primary_response.success and successful_critiques > 0
             
-            if overall_success:
-                self.stats["successful_orchestrations"] += 1
-            else:
-                self.stats["failed_orchestrations"] += 1
+            self._count("successful_orchestrations" if overall_success else "failed_orchestrations")
             
             logger.info(f"✅ Orchestration completed: Primary={primary_response.success}, Critiques={successful_critiques}/{len(processed_critiques)}")
             
@@ -762,7 +1094,7 @@ Critique:"""
             total_latency_ms = int((end_time - start_time) * 1000)
             
             logger.error(f"❌ Orchestration failed completely: {e}")
-            self.stats["failed_orchestrations"] += 1
+            self._count("failed_orchestrations")
             
             return OrchestrationResult(
                 original_prompt=prompt,
@@ -786,25 +1118,156 @@ Critique:"""
                 error_summary=str(e)
             )
     
+    async def orchestrate_many(self,
+                               prompts: List[str],
+                               concurrency: int = 16,
+                               per_model_limit: Union[int, Dict[str, int], None] = 4,
+                               checkpoint_path: Optional[str] = None) -> AsyncIterator[Tuple[int, OrchestrationResult]]:
+        """
+        Orchestrate a batch of prompts concurrently (evaluation and dataset runs)
+        
+        Args:
+            prompts: Prompts to process
+            concurrency: Prompts in progress at once across the batch
+            per_model_limit: Calls in flight per model across the batch (one number for
+                             every model, a dict per model name, or None for no batch limit)
+            checkpoint_path: JSONL file recording each successful prompt as it completes;
+                             prompts already recorded there are skipped when the batch is rerun
+        
+        Every result is also appended to the result store, if one is configured.
+        
+        Yields:
+            (index into prompts, OrchestrationResult) as each prompt completes,
+            not in input order
+        """
+        done = self._load_checkpoint(checkpoint_path, prompts) if checkpoint_path else set()
+        if done:
+            logger.info(f"⏩ Resuming batch: {len(done)}/{len(prompts)} prompts already completed in {checkpoint_path}")
+        pending = ((i, prompt) for i, prompt in enumerate(prompts) if i not in done)
+        
+        if isinstance(per_model_limit, dict):
+            limits = per_model_limit
+        else:
+            limits = {model: per_model_limit for model in self.model_mappings} if per_model_limit else {}
+        slots = {model: asyncio.Semaphore(max(1, limit)) for model, limit in limits.items()}
+        
+        results: asyncio.Queue = asyncio.Queue()
+        
+        async def worker():
+            # Every call of this worker's orchestrations (and their pipeline stages) shares the batch's model slots
+            _batch_model_slots.set(slots)
+            try:
+                for index, prompt in pending:
+                    await results.put((index, await self.orchestrate_with_critiques(prompt)))
+            except Exception as e:
+                await results.put(e)
+            finally:
+                await results.put(None)
+        
+        checkpoint = self._open_checkpoint(checkpoint_path) if checkpoint_path else None
+        workers = [asyncio.create_task(worker()) for _ in range(max(1, concurrency))]
+        active, completed, successful = len(workers), 0, 0
+        start_time = time.time()
+        logger.info(f"📦 Batch of {len(prompts) - len(done)} prompts: {len(workers)} at a time, "
+                    f"per-model limit {per_model_limit}")
+        try:
+            while active:
+                item = await results.get()
+                if item is None:
+                    active -= 1
+                    continue
+                if isinstance(item, Exception):
+                    raise item
+                
+                index, result = item
+                completed += 1
+                if self.result_store:
+                    self.result_store.append(result)
+                if result.success:
+                    successful += 1
+                    if checkpoint:
+                        # Recorded before it is handed out, so a crash in the consumer does not redo it
+                        checkpoint.write(json.dumps({
+                            "index": index,
+                            "prompt_sha1": _prompt_digest(prompts[index]),
+                            "result": result.to_dict()
+                        }, ensure_ascii=False) + "\n")
+                        checkpoint.flush()
+                yield index, result
+        finally:
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            if checkpoint:
+                checkpoint.close()
+            if self.result_store:
+                self.result_store.flush()
+            logger.info(f"📦 Batch finished: {completed} prompts ({successful} successful, "
+                        f"{len(done)} resumed) in {time.time() - start_time:.1f}s")
+    
+    @staticmethod
+    def _load_checkpoint(checkpoint_path: str, prompts: List[str]) -> set:
+        """Indices of prompts recorded in the checkpoint of an earlier run of the same batch"""
+        done = set()
+        if not os.path.exists(checkpoint_path):
+            return done
+        with open(checkpoint_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # Last line of an interrupted run
+                index = record.get("index")
+                if (isinstance(index, int) and 0 <= index < len(prompts)
+                        and record.get("prompt_sha1") == _prompt_digest(prompts[index])):
+                    done.add(index)
+        return done
+    
+    @staticmethod
+    def _open_checkpoint(checkpoint_path: str):
+        """Open the checkpoint for appending, after a line cut off by an interrupted run"""
+        torn = False
+        if os.path.exists(checkpoint_path) and os.path.getsize(checkpoint_path) > 0:
+            with open(checkpoint_path, 'rb') as f:
+                f.seek(-1, os.SEEK_END)
+                torn = f.read(1) != b"\n"
+        f = open(checkpoint_path, 'a', encoding='utf-8')
+        if torn:
+            f.write("\n")
+        return f
+    
     def print_stats(self):
         """Print orchestrator statistics"""
+        stats = self.get_stats()
         print("\n📊 Advanced Orchestrator Statistics")
         print("=" * 45)
-        print(f"Total Orchestrations: {self.stats['total_orchestrations']}")
-        print(f"Successful: {self.stats['successful_orchestrations']}")
-        print(f"Failed: {self.stats['failed_orchestrations']}")
+        print(f"Total Orchestrations: {stats['total_orchestrations']}")
+        print(f"Successful: {stats['successful_orchestrations']}")
+        print(f"Failed: {stats['failed_orchestrations']}")
         
-        if self.stats['total_orchestrations'] > 0:
-            success_rate = (self.stats['successful_orchestrations'] / self.stats['total_orchestrations']) * 100
+        if stats['total_orchestrations'] > 0:
+            success_rate = (stats['successful_orchestrations'] / stats['total_orchestrations']) * 100
             print(f"Success Rate: {success_rate:.1f}%")
         
-        print(f"Total API Calls: {self.stats['total_api_calls']}")
-        print(f"Total Cost: ${self.stats['total_cost']:.4f}")
+        print(f"Total API Calls: {stats['total_api_calls']}")
+        print(f"Total Cost: ${stats['total_cost']:.4f}")
         
-        if self.stats['model_usage']:
+        if stats['model_usage']:
             print("\nModel Usage:")
-            for model, count in sorted(self.stats['model_usage'].items()):
+            for model, count in sorted(stats['model_usage'].items()):
                 print(f"  {model}: {count}")
+        
+        concurrency = concurrency_limiters.get_stats()
+        if concurrency:
+            print("\nConcurrency Limits:")
+            for name, stats in sorted(concurrency.items()):
+                print(f"  {name}: limit {stats['limit']}, in flight {stats['in_flight']}, queued {stats['queue_depth']}")
+        
+        buckets = rate_limiters.get_stats()
+        if buckets:
+            print("\nRequest Rate Limits:")
+            for name, stats in sorted(buckets.items()):
+                print(f"  {name}: {stats['rate_per_min']:.0f}/min, {stats['tokens']:.1f} tokens, waited {stats['waited']}x")
     
     async def refine_response_with_critique(self, 
                                           original_prompt: str,
@@ -841,7 +1304,9 @@ Please improve your original response by addressing the feedback above. Keep the
             model_name=primary_model,
             prompt=refinement_prompt,
             is_critique=False,
-            temperature=0.7
+            temperature=0.7,
+            max_tokens=size_max_tokens(primary_model, refinement_prompt, "refinement",
+                                       intent=detect_intent(original_prompt))
         )
         
         # Update response type to indicate it's refined
@@ -873,8 +1338,60 @@ Please improve your original response by addressing the feedback above. Keep the
         """
         logger.info(f"🎭 Starting complete orchestration with refinement for: '{prompt[:50]}...'")
         
-        # Step 1: Get initial orchestration with critiques
-        initial_result = await self.orchestrate_with_critiques(prompt)
+        # initial → choose → refine
+        pipeline = Pipeline("orchestrate_with_user_refinement")
+        
+        async def initial(ctx):
+            # Step 1: Get initial orchestration with critiques
+            return await self.orchestrate_with_critiques(prompt)
+        
+        async def choose(ctx):
+            # Step 2: Present critiques to user (if callback provided)
+            initial_result = ctx["initial"]
+            if not initial_result.success or not initial_result.primary_response.success:
+                return None
+            
+            successful_critiques = [c for c in initial_result.critique_responses if c.success]
+            if not successful_critiques or not user_choice_callback:
+                return None
+            
+            # Step 3: Get user choice
+            try:
+                return user_choice_callback(successful_critiques)
+            except Exception as e:
+                logger.error(f"❌ Error in user choice callback: {e}")
+                return None
+        
+        async def refine(ctx):
+            initial_result, user_choice = ctx["initial"], ctx["choose"]
+            if not user_choice or len(user_choice) != 2:
+                return None
+            
+            chosen_index, should_refine = user_choice
+            successful_critiques = [c for c in initial_result.critique_responses if c.success]
+            if not should_refine or not 0 <= chosen_index < len(successful_critiques):
+                return None
+            
+            chosen_critique = successful_critiques[chosen_index]
+            
+            # Step 4: Refine response based on chosen critique
+            refined_response = await self.refine_response_with_critique(
+                original_prompt=prompt,
+                primary_model=initial_result.selected_model,
+                original_response=initial_result.primary_response.response_text,
+                chosen_critique=chosen_critique.response_text,
+                critique_model=chosen_critique.model_name
+            )
+            
+            logger.info(f"✅ Refinement completed using {chosen_critique.model_name}'s feedback")
+            return refined_response
+        
+        pipeline.add_stage("initial", initial)
+        pipeline.add_stage("choose", choose, depends_on=["initial"])
+        pipeline.add_stage("refine", refine, depends_on=["choose"], required=False)
+        result = await pipeline.run()
+        
+        initial_result = result["initial"]
         
         if not initial_result.success or not initial_result.primary_response.success:
             logger.error("❌ Initial orchestration failed, cannot proceed with refinement")
@@ -885,7 +1402,6 @@ Please improve your original response by addressing the feedback above. Keep the
                 "user_choice": None
             }
         
-        # Step 2: Present critiques to user (if callback provided)
         successful_critiques = [c for c in initial_result.critique_responses if c.success]
         
         if not successful_critiques:
@@ -897,44 +1413,19 @@ Please improve your original response by addressing the feedback above. Keep the
                 "user_choice": None
             }
         
-        user_choice = None
-        refined_response = None
-        
-        # Step 3: Get user choice (if callback provided)
-        if user_choice_callback:
-            try:
-                user_choice = user_choice_callback(successful_critiques)
-                
-                if user_choice and len(user_choice) == 2:
-                    chosen_index, should_refine = user_choice
-                    
-                    if should_refine and 0 <= chosen_index < len(successful_critiques):
-                        chosen_critique = successful_critiques[chosen_index]
-                        
-                        # Step 4: Refine response based on chosen critique
-                        refined_response = await self.refine_response_with_critique(
-                            original_prompt=prompt,
-                            primary_model=initial_result.selected_model,
-                            original_response=initial_result.primary_response.response_text,
-                            chosen_critique=chosen_critique.response_text,
-                            critique_model=chosen_critique.model_name
-                        )
-                        
-                        logger.info(f"✅ Refinement completed using {chosen_critique.model_name}'s feedback")
-                    
-            except Exception as e:
-                logger.error(f"❌ Error in user choice callback: {e}")
-        
         return {
             "stage": "complete",
             "initial_result": initial_result,
-            "refined_response": refined_response,
-            "user_choice": user_choice,
+            "refined_response": result["refine"],
+            "user_choice": result["choose"],
             "available_critiques": successful_critiques
         }
 
     def save_result(self, result: OrchestrationResult, filename: str = None):
-        """Save orchestration result to JSON file"""
+        """Save orchestration result to the result store, or to a JSON file if there is none (or one is named)"""
+        if not filename and self.result_store:
+            self.result_store.append(result)
+            return
         if not filename:
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
             filename = f"orchestration_result_{timestamp}.json"
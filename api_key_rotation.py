@@ -5,41 +5,123 @@ Handles automatic rotation of API keys when rate limits are reached
 """
 
 import os
+import sys
 import time
 import json
 import logging
-from typing import Dict, List, Optional, Tuple
+from typing import Any, Dict, List, Optional, Tuple
 from datetime import datetime, timedelta
 import threading
-from collections import defaultdict
+import itertools
+from collections import deque
+
+from token_bucket import rate_limiters, parse_reset
+from shared_key_state import SharedStateWatcher, build_shared_state_from_env, key_id
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+DEFAULT_HISTORY_SIZE = 1000
+SCHEDULE_REFRESH_SECONDS = 5.0  # How often key weights are re-read from the observed quotas
+MAX_KEY_WEIGHT = 10
+UTILIZATION_WINDOW_SECONDS = 60.0
+
+class ProviderKeyState:
+    """
+    Rotation state of one provider's keys, guarded by its own lock
+
+    A rate-limited key is out of service until its own deadline on the
+    monotonic clock (the server's reset time when it sent one); the
+    wall-clock time is only kept for status reports.
+    """
+
+    def __init__(self, key_count: int):
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.last_reset = datetime.now()
+        self.current_key_index = 0
+        self.limited_until: List[Optional[float]] = [None] * key_count  # time.monotonic() the key may be used again
+        self.limited_wall: List[Optional[datetime]] = [None] * key_count
+        self.limited_shared = [False] * key_count  # Cooldown is in the shared state (may be cleared from there)
+
+        # Per-key usage and the weighted round-robin schedule of healthy key indices
+        self.key_requests = [0] * key_count
+        self.key_recent: List[deque] = [deque() for _ in range(key_count)]  # Monotonic times of recent requests
+        self.weights = [1] * key_count
+        self.schedule: Tuple[int, ...] = ()
+        self.schedule_expires = 0.0  # Monotonic time at which the schedule must be rebuilt
+        self.tickets = itertools.count()
+
+    def is_limited(self, index: int, now: float) -> bool:
+        limited_until = self.limited_until[index]
+        return limited_until is not None and now < limited_until
+
+    def clear(self, index: int):
+        self.limited_until[index] = None
+        self.limited_wall[index] = None
+        self.limited_shared[index] = False
+
 class APIKeyRotationManager:
     """
     Manages API key rotation for multiple providers with rate limit detection
+
+    Each provider has its own lock, and looking up a key whose current index is
+    not rate limited takes no lock at all, so concurrent callers (one thread per
+    model call under fan-out) do not queue behind each other. Rotation history
+    is a fixed-size ring buffer; evicted events can be spilled to a JSONL file.
+
+    With a shared_state backend (see shared_key_state), rate limits one
+    instance runs into are published and applied by every other instance
+    within one poll interval, and request counts are summed across instances.
+    Publishing happens on the watcher thread (usage in one increment per key
+    and poll), so callers on an event loop never wait for the backend.
+
+    Scheduling (KEY_SCHEDULER):
+        balanced: spread requests over all healthy keys by weighted round-robin,
+                  weighted by each key's observed quota (requests/min of its
+                  token bucket, corrected from x-ratelimit-* headers)
+        sticky:   use one key until it is rate limited, then rotate
     """
     
-    def __init__(self, env_file: str = "orche.env"):
+    def __init__(self, env_file: str = "orche.env", history_size: Optional[int] = None,
+                 history_spill_path: Optional[str] = None, scheduler: Optional[str] = None,
+                 shared_state=None, state_poll_seconds: Optional[float] = None):
         self.env_file = env_file
+        self.scheduler = scheduler or os.environ.get('KEY_SCHEDULER', 'balanced')
+        self.rate_limiters = rate_limiters  # Source of each key's observed quota
         self.api_keys: Dict[str, Dict] = {}
-        self.key_usage: Dict[str, Dict] = defaultdict(lambda: {
-            'requests': 0, 
-            'last_reset': datetime.now(),
-            'rate_limited': False,
-            'current_key_index': 0
-        })
-        self.rotation_history: List[Dict] = []
-        self.lock = threading.Lock()
+        self._states: Dict[str, ProviderKeyState] = {}
+        history_size = history_size or int(os.environ.get('ROTATION_HISTORY_SIZE', DEFAULT_HISTORY_SIZE))
+        self.rotation_history: deque = deque(maxlen=history_size)
+        self.history_spill_path = history_spill_path or os.environ.get('ROTATION_HISTORY_SPILL_PATH')
+        self._history_lock = threading.Lock()
+        self.lock = threading.Lock()  # Only guards creating provider state
         
-        # Rate limit recovery time (how long to wait before retrying a rate-limited key)
+        # Changes for the shared state, published by the watcher thread
+        self._outbox_lock = threading.Lock()
+        self._unpublished_usage: Dict[Tuple[str, str], int] = {}
+        self._unpublished_cooldowns: Dict[Tuple[str, int], Tuple[str, float]] = {}
+        self._publish_failing = False
+        
+        # How long a rate-limited key rests when the server did not say when its window resets
         self.rate_limit_recovery_time = timedelta(minutes=15)
         
         self._load_api_keys()
+        
+        self.shared_state = shared_state
+        self._watcher = None
+        if shared_state is not None:
+            poll_seconds = state_poll_seconds or float(os.environ.get('ROTATION_STATE_POLL_SECONDS', 0.05))
+            self._watcher = SharedStateWatcher(shared_state, self.sync_shared_state, poll_seconds,
+                                               on_poll=self.publish_pending).start()
+            logger.info(f"🔗 Sharing key state via {type(shared_state).__name__} (poll every {poll_seconds * 1000:.0f}ms)")
         logger.info(f"🔑 API Key Rotation Manager initialized with {len(self.api_keys)} providers")
 
+    @property
+    def _recovery_seconds(self) -> float:
+        return self.rate_limit_recovery_time.total_seconds()
+
     def _load_from_environment(self):
         """Load API keys from environment variables"""
         providers_found = 0
@@ -68,7 +150,8 @@ class APIKeyRotationManager:
         # First try to load from environment variables (for Cloud Run)
         env_keys = self._load_from_environment()
         if env_keys:
-            logger.info(f"🔑 Loaded {len(env_keys)} providers from environment variables")
+            logger.info(f"🔑 Loaded {len(self.api_keys)} providers from environment variables")
+            self._init_key_usage()
             return
 
         # Fallback to file (for local development)
@@ -123,82 +206,265 @@ class APIKeyRotationManager:
                     if provider_name in self.api_keys:
                         self.api_keys[provider_name]['model_id'] = value
         
-        # Initialize usage tracking for all providers
-        for provider in self.api_keys.keys():
-            self.key_usage[provider] = {
-                'requests': 0,
-                'last_reset': datetime.now(),
-                'rate_limited': False,
-                'current_key_index': 0,
-                'key_status': {i: {'rate_limited': False, 'last_limited': None} 
-                             for i in range(len(self.api_keys[provider]['all_keys']))}
-            }
-        
+        self._init_key_usage()
         logger.info(f"✅ Loaded API keys for providers: {list(self.api_keys.keys())}")
     
+    def _init_key_usage(self):
+        """Initialize usage tracking for all providers"""
+        for provider, config in self.api_keys.items():
+            self._states[provider] = ProviderKeyState(len(config['all_keys']))
+    
+    def _state(self, provider: str) -> ProviderKeyState:
+        """Rotation state of a provider (created for keys added after loading)"""
+        state = self._states.get(provider)
+        key_count = len(self.api_keys[provider]['all_keys'])
+        if state is None or len(state.limited_until) != key_count:
+            with self.lock:
+                state = self._states.get(provider)
+                if state is None or len(state.limited_until) != key_count:
+                    state = ProviderKeyState(key_count)
+                    self._states[provider] = state
+        return state
+    
+    def _publish(self, action: str, *args):
+        """Apply a change to the shared state backend; failures only cost cross-instance visibility"""
+        if self.shared_state is None:
+            return
+        try:
+            getattr(self.shared_state, action)(*args)
+        except Exception as e:
+            logger.warning(f"⚠️ Could not publish {action} to shared key state: {e}")
+    
+    def publish_pending(self):
+        """Send queued cooldowns and summed usage increments to the shared state (watcher thread)"""
+        if self.shared_state is None:
+            return
+        with self._outbox_lock:
+            cooldowns, self._unpublished_cooldowns = self._unpublished_cooldowns, {}
+            usage, self._unpublished_usage = self._unpublished_usage, {}
+        if not cooldowns and not usage:
+            return
+        try:
+            for (provider, index), (key, until) in list(cooldowns.items()):
+                self.shared_state.mark_limited(provider, key, until)
+                del cooldowns[(provider, index)]
+                state = self._state(provider)
+                with state.lock:
+                    local = state.limited_until[index]
+                    if local is not None and abs(local - time.monotonic() - (until - time.time())) <= 0.5:
+                        state.limited_shared[index] = True  # Unless the key was limited again meanwhile
+            for (provider, key), amount in list(usage.items()):
+                self.shared_state.incr_usage(provider, key, amount)
+                del usage[(provider, key)]
+            self._publish_failing = False
+        except Exception as e:
+            if not self._publish_failing:
+                logger.warning(f"⚠️ Could not publish to shared key state, retrying: {e}")
+            self._publish_failing = True
+            # Keep what was not sent for the next poll (newer cooldowns win, counts add up)
+            wall = time.time()
+            with self._outbox_lock:
+                for slot, (key, until) in cooldowns.items():
+                    if until > wall:
+                        newer = self._unpublished_cooldowns.get(slot)
+                        if newer is None or newer[1] < until:
+                            self._unpublished_cooldowns[slot] = (key, until)
+                for slot, amount in usage.items():
+                    self._unpublished_usage[slot] = self._unpublished_usage.get(slot, 0) + amount
+    
+    def sync_shared_state(self):
+        """
+        Apply the cooldowns other instances published to the local key state
+
+        A local cooldown that has not been published yet is kept; only
+        cooldowns known to the shared state are cleared from there.
+        """
+        if self.shared_state is None:
+            return
+        for provider, config in list(self.api_keys.items()):
+            cooldowns = self.shared_state.cooldowns(provider)
+            state = self._state(provider)
+            with state.lock:
+                now, wall = time.monotonic(), time.time()
+                changed = False
+                for i, api_key in enumerate(config['all_keys']):
+                    until = cooldowns.get(key_id(api_key))
+                    local = state.limited_until[i]
+                    if until is not None:
+                        # Same remaining cooldown on this instance's monotonic clock
+                        limited_until = now + (until - wall)
+                        if local is None or limited_until > local + 0.5 or \
+                                (state.limited_shared[i] and abs(local - limited_until) > 0.5):
+                            state.limited_until[i] = limited_until
+                            state.limited_wall[i] = state.limited_wall[i] or datetime.now()
+                            state.limited_shared[i] = True
+                            changed = True
+                    elif local is not None and state.limited_shared[i]:
+                        state.clear(i)
+                        changed = True
+                if changed:
+                    state.schedule_expires = 0.0
+                    logger.info(f"🔗 {provider} key cooldowns updated from shared state")
+    
+    def close(self):
+        """Stop following the shared state"""
+        if self._watcher is not None:
+            self._watcher.stop()
+            self._watcher = None
+            self.publish_pending()
+    
+    def _record_event(self, event: Dict[str, Any]):
+        """Append to the rotation history ring buffer, spilling the evicted event to disk"""
+        with self._history_lock:
+            if self.history_spill_path and len(self.rotation_history) == self.rotation_history.maxlen:
+                try:
+                    with open(self.history_spill_path, 'a', encoding='utf-8') as f:
+                        f.write(json.dumps(self.rotation_history[0], default=str) + "\n")
+                except OSError as e:
+                    logger.warning(f"⚠️ Could not spill rotation history to {self.history_spill_path}: {e}")
+            self.rotation_history.append(event)
+    
     def get_current_api_key(self, provider: str) -> Optional[str]:
         """Get the current active API key for a provider"""
-        with self.lock:
-            if provider not in self.api_keys:
-                logger.error(f"❌ Provider {provider} not found")
-                return None
-            
-            provider_config = self.api_keys[provider]
-            usage_info = self.key_usage[provider]
-            current_index = usage_info['current_key_index']
+        provider_config = self.api_keys.get(provider)
+        if provider_config is None:
+            logger.error(f"❌ Provider {provider} not found")
+            return None
+        
+        state = self._state(provider)
+        all_keys = provider_config['all_keys']
+        
+        if self.scheduler == 'balanced' and len(all_keys) > 1:
+            schedule = state.schedule
+            if time.monotonic() >= state.schedule_expires:
+                with state.lock:
+                    schedule = self._build_schedule(provider, state, time.monotonic())
+            if schedule:
+                # Lock-free: the ticket counter hands every caller the next slot of the schedule
+                index = schedule[next(state.tickets) % len(schedule)]
+                state.current_key_index = index
+                return all_keys[index]
+            # Every key is rate limited: fall back to the current key until one recovers
+        
+        current_index = state.current_key_index
+        
+        # Fast path (no lock): the current key is not rate limited
+        if state.limited_until[current_index] is None:
+            return all_keys[current_index]
+        
+        with state.lock:
+            now = time.monotonic()
+            current_index = state.current_key_index
             
-            # Check if current key is rate limited and if recovery time has passed
-            key_status = usage_info['key_status'][current_index]
-            if key_status['rate_limited'] and key_status['last_limited']:
-                if datetime.now() - key_status['last_limited'] > self.rate_limit_recovery_time:
-                    # Recovery time passed, reset rate limit status
-                    key_status['rate_limited'] = False
-                    key_status['last_limited'] = None
-                    logger.info(f"🔄 Provider {provider} key {current_index} recovered from rate limit")
+            # Check if current key is rate limited and if its reset time has passed
+            if state.limited_until[current_index] is not None and not state.is_limited(current_index, now):
+                state.clear(current_index)
+                logger.info(f"🔄 Provider {provider} key {current_index} recovered from rate limit")
             
             # If current key is still rate limited, try to rotate
-            if key_status['rate_limited']:
-                self._rotate_to_next_available_key(provider)
-                current_index = usage_info['current_key_index']
+            if state.limited_until[current_index] is not None:
+                self._rotate_to_next_available_key(provider, state, now)
+                current_index = state.current_key_index
             
-            current_key = provider_config['all_keys'][current_index]
             logger.debug(f"🔑 Using key index {current_index} for provider {provider}")
-            return current_key
+            return all_keys[current_index]
     
-    def _rotate_to_next_available_key(self, provider: str) -> bool:
-        """Rotate to the next available (non-rate-limited) key"""
-        provider_config = self.api_keys[provider]
-        usage_info = self.key_usage[provider]
-        total_keys = len(provider_config['all_keys'])
+    def _key_quota(self, provider: str, api_key: str) -> float:
+        """Observed requests per minute of one key"""
+        try:
+            return max(self.rate_limiters.get(provider, api_key).rate_per_min, 0.001)
+        except Exception:
+            return 1.0
+    
+    def _key_capacity(self, provider: str, api_key: str) -> Tuple[float, float]:
+        """
+        (requests/min the key can sustain until its server window resets,
+         seconds until the server accepts it again if its quota is used up)
+        """
+        try:
+            bucket = self.rate_limiters.get(provider, api_key)
+            return bucket.effective_rate(), bucket.blocked_for()
+        except Exception:
+            return 1.0, 0.0
+    
+    def refresh_schedule(self, provider: str):
+        """Rebuild the provider's key schedule on the next lookup (e.g. after a quota update)"""
+        state = self._states.get(provider)
+        if state is not None:
+            state.schedule_expires = 0.0
+    
+    def _build_schedule(self, provider: str, state: ProviderKeyState, now: float) -> Tuple[int, ...]:
+        """
+        Weighted round-robin order of the healthy keys; caller holds state.lock
+        
+        Keys are weighted by what they can sustain until their server window
+        resets (relative to the smallest) and interleaved (smooth weighted
+        round-robin), so a key with twice the quota gets every other request
+        rather than two in a row. Keys whose quota is used up are left out until
+        their reset, before they would answer 429, as long as another key is left.
+        """
+        all_keys = self.api_keys[provider]['all_keys']
+        expires = now + SCHEDULE_REFRESH_SECONDS
+        healthy, capacity, exhausted = [], {}, set()
+        for i in range(len(all_keys)):
+            if state.is_limited(i, now):
+                expires = min(expires, state.limited_until[i])
+                continue
+            if state.limited_until[i] is not None:
+                state.clear(i)
+                logger.info(f"🔄 Provider {provider} key {i} recovered from rate limit")
+            healthy.append(i)
+            rate, blocked_for = self._key_capacity(provider, all_keys[i])
+            capacity[i] = rate
+            if blocked_for > 0:
+                exhausted.add(i)
+                expires = min(expires, now + blocked_for)
+        if exhausted and len(exhausted) < len(healthy):
+            healthy = [i for i in healthy if i not in exhausted]
+        
+        quotas = {i: max(capacity[i], 0.001) for i in healthy}
+        lowest = min(quotas.values(), default=1.0)
+        weights = {i: max(1, min(MAX_KEY_WEIGHT, round(quota / lowest))) for i, quota in quotas.items()}
+        total = sum(weights.values())
+        current = {i: 0 for i in healthy}
+        schedule = []
+        for _ in range(total):
+            for i in healthy:
+                current[i] += weights[i]
+            chosen = max(healthy, key=lambda i: current[i])
+            current[chosen] -= total
+            schedule.append(chosen)
+        
+        state.weights = [weights.get(i, 0) for i in range(len(all_keys))]
+        state.schedule = tuple(schedule)
+        state.schedule_expires = expires
+        return state.schedule
+    
+    def _rotate_to_next_available_key(self, provider: str, state: ProviderKeyState, now: float) -> bool:
+        """Rotate to the next available (non-rate-limited) key; caller holds state.lock"""
+        total_keys = len(self.api_keys[provider]['all_keys'])
         
         # Try all keys to find a non-rate-limited one
         for i in range(total_keys):
-            next_index = (usage_info['current_key_index'] + i + 1) % total_keys
-            key_status = usage_info['key_status'][next_index]
+            next_index = (state.current_key_index + i + 1) % total_keys
             
             # Check if this key is available (not rate limited or recovered)
-            if not key_status['rate_limited'] or (
-                key_status['last_limited'] and 
-                datetime.now() - key_status['last_limited'] > self.rate_limit_recovery_time
-            ):
+            if not state.is_limited(next_index, now):
                 # Found an available key
-                old_index = usage_info['current_key_index']
-                usage_info['current_key_index'] = next_index
+                old_index = state.current_key_index
                 
                 # Reset rate limit status if recovery time passed
-                if key_status['rate_limited']:
-                    key_status['rate_limited'] = False
-                    key_status['last_limited'] = None
+                state.clear(next_index)
+                state.current_key_index = next_index
                 
                 # Log rotation
-                rotation_event = {
+                self._record_event({
                     'timestamp': datetime.now().isoformat(),
                     'provider': provider,
                     'from_key_index': old_index,
                     'to_key_index': next_index,
                     'reason': 'rate_limit_avoidance'
-                }
-                self.rotation_history.append(rotation_event)
+                })
                 
                 logger.warning(f"🔄 Rotated {provider} from key {old_index} to key {next_index}")
                 return True
@@ -207,93 +473,165 @@ class APIKeyRotationManager:
         logger.error(f"❌ All API keys for provider {provider} are rate limited!")
         return False
     
-    def handle_rate_limit_error(self, provider: str, error_response: dict = None) -> bool:
+    def _cooldown_seconds(self, error_response: Optional[dict]) -> Tuple[float, str]:
+        """How long a rate-limited key rests: until the server's reset if it said, else the fallback"""
+        headers = {str(k).lower(): v for k, v in ((error_response or {}).get('headers') or {}).items()}
+        for header in ('retry-after', 'x-ratelimit-reset-requests', 'x-ratelimit-reset'):
+            if header in headers:
+                reset_in = parse_reset(headers[header])
+                if reset_in is not None:
+                    return reset_in, header
+        return self._recovery_seconds, 'fallback'
+    
+    def handle_rate_limit_error(self, provider: str, error_response: dict = None, api_key: Optional[str] = None) -> bool:
         """
-        Handle rate limit error by marking current key as rate limited and rotating
-        Returns True if rotation was successful, False if all keys are rate limited
+        Handle rate limit error by marking the key as rate limited and rotating
+        
+        api_key is the key that got the 429 (default: the current key). The key
+        returns to service at the reset time from error_response['headers']
+        (Retry-After / x-ratelimit-reset), or after rate_limit_recovery_time if
+        there is none.
+        Returns True if another key is available, False if all keys are rate limited
         """
-        with self.lock:
-            if provider not in self.api_keys:
-                logger.error(f"❌ Provider {provider} not found")
-                return False
-            
-            usage_info = self.key_usage[provider]
-            current_index = usage_info['current_key_index']
+        if provider not in self.api_keys:
+            logger.error(f"❌ Provider {provider} not found")
+            return False
+        
+        all_keys = self.api_keys[provider]['all_keys']
+        state = self._state(provider)
+        with state.lock:
+            now = time.monotonic()
+            current_index = all_keys.index(api_key) if api_key in all_keys else state.current_key_index
+            state.schedule_expires = 0.0  # Take the key out of the balanced schedule
             
-            # Mark current key as rate limited
-            usage_info['key_status'][current_index]['rate_limited'] = True
-            usage_info['key_status'][current_index]['last_limited'] = datetime.now()
+            # Mark current key as rate limited until the server's reset
+            cooldown, source = self._cooldown_seconds(error_response)
+            state.limited_until[current_index] = now + cooldown
+            state.limited_wall[current_index] = datetime.now()
+            state.limited_shared[current_index] = False
             
-            logger.warning(f"⚠️ Rate limit detected for {provider} key {current_index}")
+            logger.warning(f"⚠️ Rate limit detected for {provider} key {current_index}, resting {cooldown:.1f}s ({source})")
             
             # Log the rate limit event
-            rate_limit_event = {
-                'timestamp': datetime.now().isoformat(),
+            self._record_event({
+                'timestamp': state.limited_wall[current_index].isoformat(),
                 'provider': provider,
                 'key_index': current_index,
                 'error_response': error_response,
+                'cooldown_seconds': round(cooldown, 3),
+                'cooldown_source': source,
                 'action': 'marked_rate_limited'
-            }
-            self.rotation_history.append(rate_limit_event)
+            })
             
             # Try to rotate to next available key
-            return self._rotate_to_next_available_key(provider)
+            if current_index != state.current_key_index and not state.is_limited(state.current_key_index, now):
+                rotated = True
+            else:
+                state.current_key_index = current_index
+                rotated = self._rotate_to_next_available_key(provider, state, now)
+        
+        # Let the other instances skip this key instead of finding out by their own 429s
+        if self.shared_state is not None:
+            with self._outbox_lock:
+                self._unpublished_cooldowns[(provider, current_index)] = (key_id(all_keys[current_index]),
+                                                                          time.time() + cooldown)
+        return rotated
     
-    def increment_request_count(self, provider: str):
-        """Increment request count for monitoring purposes"""
-        with self.lock:
-            if provider in self.key_usage:
-                self.key_usage[provider]['requests'] += 1
+    def increment_request_count(self, provider: str, api_key: Optional[str] = None):
+        """Increment request count for monitoring purposes (per key if api_key is given)"""
+        if provider in self.api_keys:
+            all_keys = self.api_keys[provider]['all_keys']
+            state = self._state(provider)
+            with state.lock:
+                state.requests += 1
+                if api_key in all_keys:
+                    index = all_keys.index(api_key)
+                    now = time.monotonic()
+                    state.key_requests[index] += 1
+                    recent = state.key_recent[index]
+                    recent.append(now)
+                    while recent and recent[0] < now - UTILIZATION_WINDOW_SECONDS:
+                        recent.popleft()
+            if api_key in all_keys and self.shared_state is not None:
+                slot = (provider, key_id(api_key))
+                with self._outbox_lock:
+                    self._unpublished_usage[slot] = self._unpublished_usage.get(slot, 0) + 1
     
     def get_provider_status(self, provider: str) -> Dict:
         """Get detailed status information for a provider"""
         if provider not in self.api_keys:
             return {'error': f'Provider {provider} not found'}
         
-        with self.lock:
-            provider_config = self.api_keys[provider]
-            usage_info = self.key_usage[provider]
-            
+        provider_config = self.api_keys[provider]
+        state = self._state(provider)
+        with state.lock:
+            now = time.monotonic()
             status = {
                 'provider': provider,
+                'scheduler': self.scheduler,
                 'model_id': provider_config['model_id'],
                 'total_keys': len(provider_config['all_keys']),
-                'current_key_index': usage_info['current_key_index'],
-                'total_requests': usage_info['requests'],
-                'last_reset': usage_info['last_reset'].isoformat(),
+                'current_key_index': state.current_key_index,
+                'total_requests': state.requests,
+                'last_reset': state.last_reset.isoformat(),
                 'keys_status': []
             }
             
+            shared_usage = {}
+            if self.shared_state is not None:
+                status['shared_state'] = type(self.shared_state).__name__
+                try:
+                    shared_usage = self.shared_state.usage(provider)
+                except Exception as e:
+                    logger.warning(f"⚠️ Could not read shared key usage: {e}")
+                with self._outbox_lock:
+                    for (usage_provider, key), amount in self._unpublished_usage.items():
+                        if usage_provider == provider:
+                            shared_usage[key] = shared_usage.get(key, 0) + amount
+            counted = sum(state.key_requests) or 1
             for i, key in enumerate(provider_config['all_keys']):
-                key_status = usage_info['key_status'][i]
+                last_limited = state.limited_wall[i]
+                recent = sum(1 for t in state.key_recent[i] if t >= now - UTILIZATION_WINDOW_SECONDS)
+                quota = self._key_quota(provider, key)
                 status['keys_status'].append({
                     'index': i,
                     'key_preview': f"{key[:15]}...{key[-10:]}",
-                    'is_current': i == usage_info['current_key_index'],
-                    'rate_limited': key_status['rate_limited'],
-                    'last_limited': key_status['last_limited'].isoformat() if key_status['last_limited'] else None
+                    'is_current': i == state.current_key_index,
+                    'rate_limited': state.is_limited(i, now),
+                    'last_limited': last_limited.isoformat() if last_limited else None,
+                    'resumes_in_seconds': round(state.limited_until[i] - now, 1) if state.is_limited(i, now) else None,
+                    'requests': state.key_requests[i],
+                    'share': round(state.key_requests[i] / counted, 3),
+                    'weight': state.weights[i],
+                    'quota_rpm': round(quota, 1),
+                    'requests_last_minute': recent,
+                    'utilization': round(recent * 60.0 / UTILIZATION_WINDOW_SECONDS / quota, 3)
                 })
+                if self.shared_state is not None:
+                    status['keys_status'][-1]['requests_all_instances'] = shared_usage.get(key_id(key), 0)
             
             return status
     
     def get_all_provider_status(self) -> Dict:
         """Get status for all providers"""
-        return {provider: self.get_provider_status(provider) for provider in self.api_keys.keys()}
+        return {provider: self.get_provider_status(provider) for provider in list(self.api_keys.keys())}
     
     def get_rotation_history(self, limit: int = 50) -> List[Dict]:
         """Get recent rotation history"""
-        return self.rotation_history[-limit:]
+        history = list(self.rotation_history)
+        return history[-limit:] if limit else []
     
     def reset_provider_limits(self, provider: str):
         """Manually reset rate limits for a provider (admin function)"""
-        with self.lock:
-            if provider in self.key_usage:
-                usage_info = self.key_usage[provider]
-                for key_status in usage_info['key_status'].values():
-                    key_status['rate_limited'] = False
-                    key_status['last_limited'] = None
-                usage_info['current_key_index'] = 0
+        if provider in self.api_keys:
+            state = self._state(provider)
+            with state.lock:
+                for i in range(len(state.limited_until)):
+                    state.clear(i)
+                state.current_key_index = 0
+                state.schedule_expires = 0.0
                 logger.info(f"🔄 Manually reset rate limits for provider {provider}")
+            self._publish('clear', provider, [key_id(api_key) for api_key in self.api_keys[provider]['all_keys']])
     
     def export_status_report(self) -> Dict:
         """Export comprehensive status report"""
@@ -303,26 +641,27 @@ class APIKeyRotationManager:
             'providers_status': self.get_all_provider_status(),
             'recent_rotations': self.get_rotation_history(20),
             'system_info': {
-                'rate_limit_recovery_time_minutes': self.rate_limit_recovery_time.total_seconds() / 60,
-                'rotation_manager_version': '1.0.0'
+                'fallback_recovery_time_minutes': self.rate_limit_recovery_time.total_seconds() / 60,
+                'rotation_history_size': self.rotation_history.maxlen,
+                'rotation_manager_version': '1.1.0'
             }
         }
 
 # Global instance
-rotation_manager = APIKeyRotationManager()
+rotation_manager = APIKeyRotationManager(shared_state=build_shared_state_from_env())
 
 # Convenience functions for easy import
 def get_api_key(provider: str) -> Optional[str]:
     """Get current API key for provider"""
     return rotation_manager.get_current_api_key(provider)
 
-def handle_rate_limit(provider: str, error_response: dict = None) -> bool:
+def handle_rate_limit(provider: str, error_response: dict = None, api_key: Optional[str] = None) -> bool:
     """Handle rate limit error"""
-    return rotation_manager.handle_rate_limit_error(provider, error_response)
+    return rotation_manager.handle_rate_limit_error(provider, error_response, api_key)
 
-def increment_usage(provider: str):
+def increment_usage(provider: str, api_key: Optional[str] = None):
     """Increment request count"""
-    rotation_manager.increment_request_count(provider)
+    rotation_manager.increment_request_count(provider, api_key)
 
 def get_status(provider: str = None) -> Dict:
     """Get status for provider or all providers"""
@@ -331,7 +670,85 @@ def get_status(provider: str = None) -> Dict:
     else:
         return rotation_manager.get_all_provider_status()
 
+def benchmark_contention(threads: int = 64, calls_per_thread: int = 2000, providers: int = 6,
+                         keys_per_provider: int = 3, serialized: bool = False,
+                         scheduler: str = 'balanced') -> Dict[str, Any]:
+    """
+    Measure key lookup throughput with many threads pulling keys at once
+
+    Each call does what rate_limit_handler does per model call: get the current
+    key and count the request. serialized=True puts every call behind one global
+    lock, like the manager did before per-provider locking, for comparison.
+    """
+    manager = APIKeyRotationManager(env_file=os.devnull, scheduler=scheduler)
+    manager.api_keys = {
+        f"BENCH{p}": {
+            'primary_key': f"sk-bench-{p}-0-{'x' * 40}",
+            'backup_keys': [],
+            'model_id': None,
+            'all_keys': [f"sk-bench-{p}-{k}-{'x' * 40}" for k in range(keys_per_provider)]
+        }
+        for p in range(providers)
+    }
+    manager._init_key_usage()
+    names = list(manager.api_keys)
+    global_lock = threading.Lock()
+    latencies: List[List[float]] = [[] for _ in range(threads)]
+    start_barrier = threading.Barrier(threads + 1)
+    
+    def worker(n: int):
+        samples = latencies[n]
+        start_barrier.wait()
+        for i in range(calls_per_thread):
+            provider = names[(n + i) % len(names)]
+            started = time.perf_counter()
+            if serialized:
+                with global_lock:
+                    manager.get_current_api_key(provider)
+                    manager.increment_request_count(provider)
+            else:
+                manager.get_current_api_key(provider)
+                manager.increment_request_count(provider)
+            samples.append(time.perf_counter() - started)
+    
+    workers = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    for thread in workers:
+        thread.start()
+    start_barrier.wait()
+    started = time.perf_counter()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    
+    samples = sorted(sample for per_thread in latencies for sample in per_thread)
+    total_calls = threads * calls_per_thread
+    counted = sum(manager.get_provider_status(name)['total_requests'] for name in names)
+    return {
+        'threads': threads,
+        'calls': total_calls,
+        'serialized': serialized,
+        'elapsed_seconds': round(elapsed, 3),
+        'calls_per_second': round(total_calls / elapsed, 1),
+        'p50_us': round(samples[len(samples) // 2] * 1e6, 2),
+        'p99_us': round(samples[min(len(samples) - 1, int(len(samples) * 0.99))] * 1e6, 2),
+        'requests_counted': counted
+    }
+
 if __name__ == "__main__":
+    if "--benchmark" in sys.argv:
+        # Contention benchmark: python api_key_rotation.py --benchmark [threads] [calls per thread]
+        args = [int(arg) for arg in sys.argv[sys.argv.index("--benchmark") + 1:] if arg.isdigit()]
+        threads = args[0] if args else 64
+        calls = args[1] if len(args) > 1 else 2000
+        logging.getLogger(__name__).setLevel(logging.WARNING)
+        print(f"🏁 Key lookup contention benchmark: {threads} threads x {calls} calls")
+        for serialized in (True, False):
+            result = benchmark_contention(threads, calls, serialized=serialized)
+            label = "global lock     " if serialized else "per-provider    "
+            print(f"{label} {result['calls_per_second']:>12,.0f} calls/s   "
+                  f"p50 {result['p50_us']:>8.2f}µs   p99 {result['p99_us']:>9.2f}µs")
+        sys.exit(0)
+    
     # Test the rotation manager
     print("🔑 API Key Rotation Manager Test")
     print("=" * 50)
@@ -1 +1,11 @@
- 
+"""
+OrchestrateX backend application package
+"""
+
+import os
+import sys
+
+# Shared root-level modules (response cache, rate limiting, ...) live in the repository root
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if REPO_ROOT not in sys.path:
+    sys.path.append(REPO_ROOT)
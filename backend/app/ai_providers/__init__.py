@@ -5,10 +5,11 @@ AI Provider Base Classes and Configuration
 from abc import ABC, abstractmethod
 from typing import Dict, List, Optional, Any
 from pydantic import BaseModel
-import httpx
 import asyncio
 from datetime import datetime
 
+from http_transport import get_async_client
+
 class AIProviderResponse(BaseModel):
     """Standard response format from AI providers"""
     provider: str
@@ -34,7 +35,16 @@ class BaseAIProvider(ABC):
     def __init__(self, api_key: str, model_name: str):
         self.api_key = api_key
         self.model_name = model_name
-        self.client = httpx.AsyncClient(timeout=30.0)
+        self._client = None
+    
+    @property
+    def client(self):
+        """HTTP client; defaults to the shared pooled client (see http_transport)"""
+        return self._client if self._client is not None else get_async_client()
+    
+    @client.setter
+    def client(self, value):
+        self._client = value
     
     @abstractmethod
     async def generate_response(self, prompt: str, **kwargs) -> AIProviderResponse:
@@ -47,8 +57,8 @@ class BaseAIProvider(ABC):
         pass
     
     async def close(self):
-        """Clean up resources"""
-        await self.client.aclose()
+        """Clean up resources (the shared transport is closed on shutdown)"""
+        pass
 
 class AIProviderManager:
     """Manages all AI providers and their configurations"""
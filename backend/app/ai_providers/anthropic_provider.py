@@ -5,6 +5,7 @@ Anthropic (Claude) Provider Implementation
 import time
 from typing import Dict, Any
 from anthropic import AsyncAnthropic
+from http_transport import get_async_client
 from . import BaseAIProvider, AIProviderResponse, AIProviderError
 
 class AnthropicProvider(BaseAIProvider):
@@ -12,7 +13,7 @@ class AnthropicProvider(BaseAIProvider):
     
     def __init__(self, api_key: str, model_name: str = "claude-3-5-sonnet-20241022"):
         super().__init__(api_key, model_name)
-        self.client = AsyncAnthropic(api_key=api_key)
+        self.client = AsyncAnthropic(api_key=api_key, http_client=get_async_client())
         self.cost_per_input_token = 0.015 / 1000  # $0.015 per 1K tokens
         self.cost_per_output_token = 0.075 / 1000  # $0.075 per 1K tokens
     
@@ -84,5 +85,5 @@ class AnthropicProvider(BaseAIProvider):
             return False
     
     async def close(self):
-        """Close Anthropic client"""
-        await self.client.close()
+        """Nothing to close: the HTTP connections belong to the shared transport"""
+        pass
@@ -11,6 +11,11 @@ from datetime import datetime
 
 from . import AIProviderResponse, AIProviderError
 from .openrouter_provider import OpenRouterProvider
+from response_cache import response_cache, make_cache_key
+from circuit_breaker import circuit_breakers, CircuitOpenError
+from concurrency_limiter import concurrency_limiters
+from token_bucket import rate_limiters, RateLimitExceeded
+from token_accounting import context_length, size_max_tokens, usage_from_response
 
 class EnhancedProviderManager:
     """
@@ -72,11 +77,19 @@ class EnhancedProviderManager:
         """
         Generate response using the specified model
         Routes to appropriate provider based on model name
+        
+        Identical (model, prompt, parameters) requests are served from the
+        response cache; pass use_cache=False to bypass it.
+        
+        Models whose circuit breaker is open are not called; the simulated
+        fallback is returned immediately instead of waiting for a timeout.
         """
         
         if not self.initialized:
             await self.initialize()
         
+        use_cache = kwargs.pop("use_cache", True)
+        
         try:
             # Route to OpenRouter for our 6 models
             if model_name in ["TNG DeepSeek", "GLM4.5", "GPT-OSS", 
@@ -86,13 +99,48 @@ class EnhancedProviderManager:
                     # Fallback: simulate response if no provider available
                     return await self._simulate_response(model_name, prompt)
                 
-                return await self.providers["openrouter"].generate_response(
-                    model_name, prompt, **kwargs
+                provider = self.providers["openrouter"]
+                model_config = provider.MODEL_CONFIGS.get(model_name, {})
+                if not kwargs.get("max_tokens"):
+                    kwargs["max_tokens"] = size_max_tokens(model_name, prompt, kwargs.get("response_type", "primary"))
+                cache_key = make_cache_key(
+                    model_config.get("id", model_name),
+                    prompt,
+                    temperature=kwargs.get("temperature", 0.7),
+                    max_tokens=kwargs["max_tokens"],
+                    **{k: v for k, v in kwargs.items() if k not in ("temperature", "max_tokens")}
                 )
+                
+                async def compute() -> Dict[str, Any]:
+                    circuit_breakers.check(model_name)
+                    try:
+                        response = await provider.generate_response(model_name, prompt, **kwargs)
+                    except RateLimitExceeded:
+                        # Rejected by the local token bucket before any call went out
+                        circuit_breakers.release(model_name)
+                        raise
+                    except AIProviderError as e:
+                        if e.status_code == 429:
+                            # Quota throttling says nothing about the model's health
+                            circuit_breakers.release(model_name)
+                        else:
+                            circuit_breakers.record_failure(model_name, timeout=e.status_code == 408)
+                        raise
+                    circuit_breakers.record_success(model_name)
+                    return response.model_dump()
+                
+                cached = await response_cache.aget_or_compute(cache_key, compute, bypass=not use_cache)
+                return AIProviderResponse(**cached)
             
             else:
                 raise AIProviderError("ProviderManager", f"Unknown model: {model_name}")
                 
+        except CircuitOpenError as e:
+            logging.warning(f"⚡ Skipping {model_name}: {e}")
+            return await self._simulate_response(model_name, prompt)
+        except RateLimitExceeded as e:
+            logging.warning(f"🪣 Skipping {model_name}: {e}")
+            return await self._simulate_response(model_name, prompt)
         except Exception as e:
             logging.error(f"❌ Failed to generate response with {model_name}: {e}")
             # Return simulated response as fallback
@@ -125,17 +173,19 @@ class EnhancedProviderManager:
         elif "explain" in prompt.lower():
             response_text += "\n\nThis involves several key concepts:\n1. Understanding the context\n2. Analyzing requirements\n3. Providing clear explanations"
         
+        usage = usage_from_response({}, prompt, response_text)
         return AIProviderResponse(
             provider="Simulator",
             model_name=model_name,
             response_text=response_text,
-            tokens_used=len(response_text.split()) * 1.3,  # Rough token estimate
+            tokens_used=usage["total_tokens"],
             response_time_ms=500,
             cost_usd=0.001,  # Simulated cost
             confidence_score=0.85,
             metadata={
                 "simulated": True,
-                "reason": "API provider not available"
+                "reason": "API provider not available",
+                "usage_source": usage["usage_source"]
             }
         )
     
@@ -145,53 +195,76 @@ class EnhancedProviderManager:
         capabilities = {
             "TNG DeepSeek": {
                 "specialties": ["reasoning", "analysis", "problem_solving"],
-                "max_tokens": 4000,
                 "languages": ["english", "chinese"],
                 "strengths": ["logical reasoning", "mathematical problems"],
                 "cost_tier": "medium"
             },
             "GLM4.5": {
                 "specialties": ["general", "conversation", "analysis"],
-                "max_tokens": 4000,
                 "languages": ["english", "chinese"],
                 "strengths": ["comprehensive answers", "multi-turn chat"],
                 "cost_tier": "medium"
             },
             "GPT-OSS": {
                 "specialties": ["general", "creative", "coding"],
-                "max_tokens": 4000,
                 "languages": ["english", "multilingual"],
                 "strengths": ["versatility", "code generation"],
                 "cost_tier": "low"
             },
             "MoonshotAI Kimi": {
                 "specialties": ["creative", "writing", "analysis"],
-                "max_tokens": 32000,
                 "languages": ["english", "chinese"],
                 "strengths": ["long context", "creative writing"],
                 "cost_tier": "medium"
             },
             "Llama 4 Maverick": {
                 "specialties": ["coding", "reasoning", "general"],
-                "max_tokens": 4000,
                 "languages": ["english", "multilingual"],
                 "strengths": ["open source", "reliable performance"],
                 "cost_tier": "low"
             },
             "Qwen3": {
                 "specialties": ["coding", "technical", "analysis"],
-                "max_tokens": 4000,
                 "languages": ["english", "chinese"],
                 "strengths": ["code generation", "technical accuracy"],
                 "cost_tier": "medium"
             }
         }
         
-        return capabilities.get(model_name, {})
+        if model_name not in capabilities:
+            return {}
+        return {
+            **capabilities[model_name],
+            "context_length": context_length(model_name),
+            # Largest completion budget size_max_tokens reserves for this model
+            "max_tokens": size_max_tokens(model_name, "", intent="code_request")
+        }
+    
+    def is_model_available(self, model_name: str) -> bool:
+        """Circuit not open and a request token obtainable within the allowed local wait"""
+        provider = self.providers.get("openrouter")
+        api_key = provider.api_key if provider else None
+        return (circuit_breakers.is_available(model_name)
+                and rate_limiters.pick([model_name], {model_name: api_key}) is not None)
     
     def get_available_models(self) -> List[str]:
-        """Get list of all available models"""
-        return ["TNG DeepSeek", "GLM4.5", "GPT-OSS", "MoonshotAI Kimi", "Llama 4 Maverick", "Qwen3"]
+        """Get list of available models (circuit not open, request budget not exhausted)"""
+        return [
+            model for model in ["TNG DeepSeek", "GLM4.5", "GPT-OSS", "MoonshotAI Kimi", "Llama 4 Maverick", "Qwen3"]
+            if self.is_model_available(model)
+        ]
+    
+    def get_circuit_status(self) -> Dict[str, Dict[str, Any]]:
+        """Circuit breaker state per model"""
+        return circuit_breakers.get_status()
+    
+    def get_concurrency_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Current adaptive concurrency limit and queue depth per model/key"""
+        return concurrency_limiters.get_stats()
+    
+    def get_rate_limit_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Token bucket state (rate, tokens left, waits) per model/key"""
+        return rate_limiters.get_stats()
     
     async def batch_generate(self, 
                             requests: List[Dict[str, Any]]) -> List[AIProviderResponse]:
@@ -5,6 +5,7 @@ OpenAI Provider Implementation
 import time
 from typing import Dict, Any
 from openai import AsyncOpenAI
+from http_transport import get_async_client
 from . import BaseAIProvider, AIProviderResponse, AIProviderError
 
 class OpenAIProvider(BaseAIProvider):
@@ -12,7 +13,7 @@ class OpenAIProvider(BaseAIProvider):
     
     def __init__(self, api_key: str, model_name: str = "gpt-4-turbo"):
         super().__init__(api_key, model_name)
-        self.client = AsyncOpenAI(api_key=api_key)
+        self.client = AsyncOpenAI(api_key=api_key, http_client=get_async_client())
         self.cost_per_input_token = 0.01 / 1000  # $0.01 per 1K tokens
         self.cost_per_output_token = 0.03 / 1000  # $0.03 per 1K tokens
     
@@ -85,5 +86,5 @@ class OpenAIProvider(BaseAIProvider):
             return False
     
     async def close(self):
-        """Close OpenAI client"""
-        await self.client.close()
+        """Nothing to close: the HTTP connections belong to the shared transport"""
+        pass
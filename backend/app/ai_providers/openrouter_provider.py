@@ -5,10 +5,14 @@ Integrates with OpenRouter.ai for multiple AI models
 
 import asyncio
 import httpx
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
 from datetime import datetime
 import logging
 
+from concurrency_limiter import concurrency_limiters
+from http_transport import openrouter_base_url
+from token_accounting import size_max_tokens, usage_from_response
+from token_bucket import rate_limiters, RateLimitExceeded
 from . import AIProviderResponse, AIProviderError, BaseAIProvider
 
 class OpenRouterProvider(BaseAIProvider):
@@ -18,50 +22,41 @@ class OpenRouterProvider(BaseAIProvider):
     MODEL_CONFIGS = {
         "TNG DeepSeek": {
             "id": "deepseek/deepseek-r1",
-            "max_tokens": 4000,
             "cost_per_1k_tokens": 0.002
         },
         "GLM4.5": {
             "id": "zhipuai/glm-4-plus",
-            "max_tokens": 4000,
             "cost_per_1k_tokens": 0.003
         },
         "GPT-OSS": {
             "id": "openai/gpt-4o-mini",
-            "max_tokens": 4000,
             "cost_per_1k_tokens": 0.001
         },
         "MoonshotAI Kimi": {
             "id": "moonshot/moonshot-v1-32k",
-            "max_tokens": 4000,
             "cost_per_1k_tokens": 0.002
         },
         "Llama 4 Maverick": {
             "id": "meta-llama/llama-3.2-90b-vision-instruct",
-            "max_tokens": 4000,
             "cost_per_1k_tokens": 0.0015
         },
         "Qwen3": {
             "id": "qwen/qwen-2.5-coder-32b-instruct",
-            "max_tokens": 4000,
             "cost_per_1k_tokens": 0.002
         }
     }
     
     def __init__(self, api_key: str):
         """Initialize OpenRouter provider"""
-        super().__init__("OpenRouter")
-        self.api_key = api_key
-        self.base_url = "https://openrouter.ai/api/v1"
-        self.client = httpx.AsyncClient(
-            timeout=30.0,
-            headers={
-                "Authorization": f"Bearer {api_key}",
-                "Content-Type": "application/json",
-                "HTTP-Referer": "https://orchestratex.app",
-                "X-Title": "OrchestrateX"
-            }
-        )
+        super().__init__(api_key, "OpenRouter")
+        self.provider_name = "OpenRouter"
+        self.base_url = openrouter_base_url()
+        self.headers = {
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/json",
+            "HTTP-Referer": "https://orchestratex.app",
+            "X-Title": "OrchestrateX"
+        }
     
     async def generate_response(self, 
                               model_name: str, 
@@ -77,6 +72,11 @@ class OpenRouterProvider(BaseAIProvider):
         
         model_config = self.MODEL_CONFIGS[model_name]
         
+        # Stay within the model's documented request rate instead of collecting 429s
+        bucket = rate_limiters.get(model_name, self.api_key)
+        if not await bucket.acquire_async(timeout=rate_limiters.max_wait):
+            raise RateLimitExceeded(model_name, bucket.wait_time())
+        
         try:
             start_time = datetime.utcnow()
             
@@ -89,16 +89,25 @@ class OpenRouterProvider(BaseAIProvider):
                         "content": prompt
                     }
                 ],
-                "max_tokens": model_config["max_tokens"],
+                # Budget for this kind of answer, within the model's context length
+                "max_tokens": kwargs.get("max_tokens") or size_max_tokens(
+                    model_name, prompt, kwargs.get("response_type", "primary")
+                ),
                 "temperature": kwargs.get("temperature", 0.7),
                 "top_p": kwargs.get("top_p", 0.9)
             }
             
-            # Make API call
-            response = await self.client.post(
-                f"{self.base_url}/chat/completions",
-                json=payload
-            )
+            # Make API call within the model's adaptive concurrency limit
+            async with concurrency_limiters.get(model_name, self.api_key).slot() as permit:
+                response = await self.client.post(
+                    f"{self.base_url}/chat/completions",
+                    json=payload,
+                    headers=self.headers
+                )
+                permit.record(status_code=response.status_code)
+            bucket.update_from_headers(response.headers)
+            if response.status_code == 429 and "retry-after" not in response.headers:
+                bucket.penalize()
             
             end_time = datetime.utcnow()
             response_time_ms = int((end_time - start_time).total_seconds() * 1000)
@@ -120,7 +129,8 @@ class OpenRouterProvider(BaseAIProvider):
                 )
             
             response_text = data["choices"][0]["message"]["content"]
-            tokens_used = data.get("usage", {}).get("total_tokens", 0)
+            usage = usage_from_response(data, prompt, response_text, model_config["id"])
+            tokens_used = usage["total_tokens"]
             
             # Calculate cost
             cost_usd = (tokens_used / 1000) * model_config["cost_per_1k_tokens"]
@@ -135,15 +145,17 @@ class OpenRouterProvider(BaseAIProvider):
                 metadata={
                     "model_id": model_config["id"],
                     "finish_reason": data["choices"][0].get("finish_reason"),
-                    "prompt_tokens": data.get("usage", {}).get("prompt_tokens", 0),
-                    "completion_tokens": data.get("usage", {}).get("completion_tokens", 0)
+                    "prompt_tokens": usage["input_tokens"],
+                    "completion_tokens": usage["output_tokens"],
+                    "usage_source": usage["usage_source"]
                 }
             )
             
         except httpx.TimeoutException:
             raise AIProviderError(
                 self.provider_name,
-                f"Timeout calling {model_name}"
+                f"Timeout calling {model_name}",
+                408
             )
         except Exception as e:
             if isinstance(e, AIProviderError):
@@ -156,15 +168,16 @@ class OpenRouterProvider(BaseAIProvider):
     async def test_connection(self) -> bool:
         """Test connection to OpenRouter API"""
         try:
-            response = await self.client.get(f"{self.base_url}/models")
+            response = await self.client.get(f"{self.base_url}/models", headers=self.headers)
             return response.status_code == 200
         except:
             return False
     
-    def get_available_models(self) -> List[str]: # pyright: ignore[reportUndefinedVariable]
+    async def health_check(self) -> bool:
+        """Check if OpenRouter is reachable"""
+        return await self.test_connection()
+    
+    def get_available_models(self) -> List[str]:
         """Get list of available models"""
         return list(self.MODEL_CONFIGS.keys())
-    
-    async def close(self):
-        """Close the HTTP client"""
-        await self.client.aclose()
+
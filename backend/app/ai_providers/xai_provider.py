@@ -6,6 +6,7 @@ Mock implementation for demonstration - replace with actual API when available
 import time
 import asyncio
 from typing import Dict, Any
+from token_accounting import usage_from_response
 from . import BaseAIProvider, AIProviderResponse, AIProviderError
 
 class XAIProvider(BaseAIProvider):
@@ -36,9 +37,9 @@ class XAIProvider(BaseAIProvider):
             
             # Calculate mock metrics
             response_time_ms = int((time.time() - start_time) * 1000)
-            estimated_tokens = len(prompt.split()) + len(response_text.split())
-            input_tokens = len(prompt.split()) * 1.3  # Rough token estimation
-            output_tokens = len(response_text.split()) * 1.3
+            usage = usage_from_response({}, prompt, response_text)
+            input_tokens = usage["input_tokens"]
+            output_tokens = usage["output_tokens"]
             
             # Calculate cost
             cost = (input_tokens * self.cost_per_input_token + 
@@ -48,13 +49,13 @@ class XAIProvider(BaseAIProvider):
                 provider="xai",
                 model_name=self.model_name,
                 response_text=response_text,
-                tokens_used=int(estimated_tokens),
+                tokens_used=usage["total_tokens"],
                 response_time_ms=response_time_ms,
                 cost_usd=cost,
                 confidence_score=0.8,
                 metadata={
-                    "input_tokens": int(input_tokens),
-                    "output_tokens": int(output_tokens),
+                    "input_tokens": input_tokens,
+                    "output_tokens": output_tokens,
                     "mock_implementation": True,
                     "note": "Replace with actual X.AI API when available"
                 }
@@ -73,7 +74,4 @@ class XAIProvider(BaseAIProvider):
             return True
         except Exception:
             return False
-    
-    async def close(self):
-        """Close X.AI client"""
-        await self.client.aclose()
+
@@ -12,6 +12,9 @@ from bson import ObjectId
 from ..ai_providers import provider_manager, AIProviderResponse
 from ..core.database import get_database
 from ..models.schemas import Domain
+from pipeline import Pipeline, PipelineError
+from response_scorer import score_responses
+from convergence import ConvergenceDetector, STOP_MAX_ITERATIONS, STOP_QUALITY_THRESHOLD
 
 class PromptAnalyzer:
     """Analyzes prompts to determine domain and complexity"""
@@ -198,24 +201,38 @@ class OrchestrationEngine:
     ) -> Dict[str, Any]:
         """Main orchestration method - processes prompt through multiple AI models"""
         
-        # Create conversation thread
-        thread_id = await self._create_thread(session_id, prompt, max_iterations)
+        # create_thread ─────────────────┬── log_selection ──┐
+        # analyze ── select ─────────────┴── iterate ────────┴── finalize
+        pipeline = Pipeline("orchestrate_prompt")
         
-        try:
+        async def create_thread(ctx):
+            # Create conversation thread
+            return await self._create_thread(session_id, prompt, max_iterations)
+        
+        async def analyze(ctx):
             # Analyze prompt
-            domain, complexity = self.analyzer.analyze_prompt(prompt)
-            
+            return self.analyzer.analyze_prompt(prompt)
+        
+        async def select(ctx):
             # Initial model selection
-            best_model, selection_score, selection_metadata = await self.selector.select_best_model(
-                prompt, domain, complexity
-            )
-            
+            domain, complexity = ctx["analyze"]
+            return await self.selector.select_best_model(prompt, domain, complexity)
+        
+        async def log_selection(ctx):
             # Log model selection
-            await self._log_model_selection(thread_id, 1, best_model, selection_score, selection_metadata)
+            best_model, selection_score, selection_metadata = ctx["select"]
+            await self._log_model_selection(ctx["create_thread"], 1, best_model, selection_score, selection_metadata)
+        
+        async def iterate(ctx):
+            thread_id = ctx["create_thread"]
+            domain, complexity = ctx["analyze"]
+            best_model, _, _ = ctx["select"]
             
             current_response = None
             current_quality = 0.0
             iteration = 1
+            convergence = ConvergenceDetector()
+            stop_reason = STOP_MAX_ITERATIONS
             
             while iteration <= max_iterations:
                 # Generate response from selected model
@@ -233,6 +250,13 @@ class OrchestrationEngine:
                     
                     # Check if quality threshold is met
                     if quality_score >= quality_threshold:
+                        stop_reason = STOP_QUALITY_THRESHOLD
+                        break
+                    
+                    # Stop when responses stop changing or quality stalls
+                    converged = convergence.observe(response.response_text, quality_score)
+                    if converged:
+                        stop_reason = converged
                         break
                     
                     # If not the last iteration, get criticism and select next model
@@ -248,22 +272,44 @@ class OrchestrationEngine:
                 
                 iteration += 1
             
+            # A break leaves iteration on the round that just ran
+            iterations_used = iteration - 1 if stop_reason == STOP_MAX_ITERATIONS else iteration
+            return current_response, current_quality, iterations_used, stop_reason
+        
+        async def finalize(ctx):
             # Update thread with final results
-            await self._finalize_thread(thread_id, current_response, current_quality, iteration - 1)
-            
-            return {
-                "thread_id": thread_id,
-                "final_response": current_response.response_text if current_response else "No response generated",
-                "quality_score": current_quality,
-                "iterations_used": iteration - 1,
-                "domain": domain.value,
-                "complexity": complexity,
-                "success": current_response is not None
-            }
-            
-        except Exception as e:
-            await self._log_error(thread_id, str(e))
+            current_response, current_quality, iterations_used, stop_reason = ctx["iterate"]
+            await self._finalize_thread(
+                ctx["create_thread"], current_response, current_quality, iterations_used, stop_reason
+            )
+        
+        pipeline.add_stage("create_thread", create_thread)
+        pipeline.add_stage("analyze", analyze)
+        pipeline.add_stage("select", select, depends_on=["analyze"])
+        pipeline.add_stage("log_selection", log_selection, depends_on=["create_thread", "select"])
+        pipeline.add_stage("iterate", iterate, depends_on=["create_thread", "select"])
+        pipeline.add_stage("finalize", finalize, depends_on=["iterate", "log_selection"])
+        
+        try:
+            result = await pipeline.run()
+        except PipelineError as e:
+            if "create_thread" in e.results:
+                await self._log_error(e.results["create_thread"], str(e.__cause__ or e))
             raise
+        
+        current_response, current_quality, iterations_used, stop_reason = result["iterate"]
+        domain, complexity = result["analyze"]
+        
+        return {
+            "thread_id": result["create_thread"],
+            "final_response": current_response.response_text if current_response else "No response generated",
+            "quality_score": current_quality,
+            "iterations_used": iterations_used,
+            "stop_reason": stop_reason,
+            "domain": domain.value,
+            "complexity": complexity,
+            "success": current_response is not None
+        }
     
     async def _create_thread(self, session_id: str, prompt: str, max_iterations: int) -> str:
         """Create a new conversation thread"""
@@ -312,21 +358,12 @@ class OrchestrationEngine:
         response: AIProviderResponse, 
         original_prompt: str
     ) -> float:
-        """Evaluate response quality using other AI models"""
+        """Evaluate response quality with the local scorer (no extra model call)"""
         
-        # For now, implement a simple heuristic evaluation
-        # In a full implementation, this would use other AI models for evaluation
-        
-        quality_factors = {
-            "length_appropriate": self._evaluate_length(response.response_text, original_prompt),
-            "coherence": self._evaluate_coherence(response.response_text),
-            "relevance": self._evaluate_relevance(response.response_text, original_prompt),
-            "completeness": self._evaluate_completeness(response.response_text, original_prompt)
-        }
-        
-        # Calculate weighted average
-        weights = {"length_appropriate": 0.2, "coherence": 0.3, "relevance": 0.3, "completeness": 0.2}
-        quality_score = sum(quality_factors[factor] * weights[factor] for factor in quality_factors)
+        # Local batch scorer: hashed TF-IDF relevance plus structural heuristics
+        scores = score_responses(original_prompt, [response.response_text])[0]
+        quality_score = scores.pop("overall_score")
+        quality_factors = scores
         
         # Store evaluation
         evaluation_data = {
@@ -343,49 +380,6 @@ class OrchestrationEngine:
         
         return quality_score
     
-    def _evaluate_length(self, response: str, prompt: str) -> float:
-        """Evaluate if response length is appropriate"""
-        response_words = len(response.split())
-        prompt_words = len(prompt.split())
-        
-        if prompt_words < 20:  # Short prompt
-            return 1.0 if 10 <= response_words <= 200 else 0.5
-        else:  # Long prompt
-            return 1.0 if 50 <= response_words <= 500 else 0.7
-    
-    def _evaluate_coherence(self, response: str) -> float:
-        """Evaluate response coherence (simple heuristic)"""
-        sentences = response.split('.')
-        if len(sentences) < 2:
-            return 0.6
-        
-        # Check for proper sentence structure
-        coherence_score = 0.8
-        if response.count('?') + response.count('!') + response.count('.') < len(sentences) * 0.8:
-            coherence_score -= 0.2
-        
-        return max(coherence_score, 0.3)
-    
-    def _evaluate_relevance(self, response: str, prompt: str) -> float:
-        """Evaluate response relevance to prompt"""
-        prompt_words = set(prompt.lower().split())
-        response_words = set(response.lower().split())
-        
-        # Simple keyword overlap
-        overlap = len(prompt_words.intersection(response_words))
-        relevance = min(overlap / len(prompt_words), 1.0) if prompt_words else 0.5
-        
-        return max(relevance, 0.3)
-    
-    def _evaluate_completeness(self, response: str, prompt: str) -> float:
-        """Evaluate if response addresses the prompt completely"""
-        # Simple heuristic based on response length and structure
-        if "?" in prompt:  # Question
-            return 0.9 if any(indicator in response.lower() for indicator in 
-                            ["because", "since", "due to", "result", "answer"]) else 0.6
-        else:  # Statement or request
-            return 0.8 if len(response.split()) > 20 else 0.6
-    
     async def _get_criticism(
         self, 
         thread_id: str, 
@@ -466,13 +460,15 @@ class OrchestrationEngine:
         thread_id: str, 
         final_response: Optional[AIProviderResponse], 
         quality_score: float, 
-        iterations_used: int
+        iterations_used: int,
+        stop_reason: Optional[str] = None
     ):
         """Finalize thread with results"""
         update_data = {
             "thread_status": "completed" if final_response else "failed",
             "final_quality_score": quality_score,
             "iterations_used": iterations_used,
+            "stop_reason": stop_reason,
             "best_model_id": final_response.model_name if final_response else None,
             "completion_timestamp": datetime.utcnow(),
             "updated_at": datetime.utcnow()
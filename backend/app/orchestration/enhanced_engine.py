@@ -15,6 +15,11 @@ from bson import ObjectId
 from .model_selector import ModelSelector
 from .prompt_analyzer import extract_prompt_features
 from ..ai_providers.enhanced_manager import enhanced_provider_manager
+from pipeline import Pipeline, PipelineError
+from response_scorer import score_responses
+from convergence import (
+    ConvergenceDetector, STOP_ERROR, STOP_MAX_ITERATIONS, STOP_QUALITY_THRESHOLD
+)
 
 class EnhancedOrchestrationEngine:
     """
@@ -48,20 +53,41 @@ class EnhancedOrchestrationEngine:
     def select_best_model(self, prompt: str) -> Tuple[str, Dict[str, float]]:
         """
         Select the best AI model for a given prompt using ML
+        
+        Models whose circuit breaker is open are skipped in favour of the
+        next best available candidate.
         """
         try:
             # Use our trained model selector
             if hasattr(self.model_selector, 'model') and self.model_selector.model is not None:
                 best_model, confidence_scores = self.model_selector.select_best_model(prompt)
                 logging.info(f"🎯 ML Model Selection: {best_model} (confidence: {max(confidence_scores.values()):.3f})")
-                return best_model, confidence_scores
             else:
                 # Fallback to rule-based selection
-                return self._fallback_model_selection(prompt)
+                best_model, confidence_scores = self._fallback_model_selection(prompt)
                 
         except Exception as e:
             logging.error(f"❌ Model selection failed: {e}")
-            return self._fallback_model_selection(prompt)
+            best_model, confidence_scores = self._fallback_model_selection(prompt)
+        
+        return self._route_to_available_model(best_model, confidence_scores), confidence_scores
+    
+    def _route_to_available_model(self, best_model: str, confidence_scores: Dict[str, float]) -> str:
+        """Replace a model with an open circuit or an exhausted request budget by the next best available one"""
+        if enhanced_provider_manager.is_model_available(best_model):
+            return best_model
+        
+        ranked = sorted(confidence_scores, key=confidence_scores.get, reverse=True)
+        candidates = ranked + [m for m in enhanced_provider_manager.get_available_models() if m not in ranked]
+        replacement = next(
+            (m for m in candidates if m != best_model and enhanced_provider_manager.is_model_available(m)), None
+        )
+        if replacement is None:
+            logging.warning(f"⚠️ No other model is available, keeping {best_model}")
+            return best_model
+        
+        logging.info(f"⚡ {best_model} is unavailable (open circuit or rate limit), routing to {replacement}")
+        return replacement
     
     def _fallback_model_selection(self, prompt: str) -> Tuple[str, Dict[str, float]]:
         """Fallback model selection using simple rules"""
@@ -91,13 +117,17 @@ class EnhancedOrchestrationEngine:
         
         thread_id = str(ObjectId())
         
-        try:
-            logging.info(f"🎭 Starting orchestration for session {session_id}")
-            
+        # select ──┬── create_thread ──┬── record_primary ── iterate ── finalize
+        #          └── primary ────────┘
+        pipeline = Pipeline("enhanced_orchestrate_prompt")
+        
+        async def select(ctx):
             # Step 1: Analyze prompt and select best model
-            best_model, confidence_scores = self.select_best_model(prompt)
-            
+            return self.select_best_model(prompt)
+        
+        async def create_thread(ctx):
             # Step 2: Create thread record
+            best_model, confidence_scores = ctx["select"]
             thread_data = {
                 "_id": ObjectId(thread_id),
                 "session_id": session_id,
@@ -113,22 +143,45 @@ class EnhancedOrchestrationEngine:
             }
             
             await self.db.threads.insert_one(thread_data)
-            
-            # Step 3: Generate primary response
-            primary_response = await self._generate_primary_response(
-                best_model, prompt, thread_id
-            )
-            
-            if not primary_response:
+        
+        async def primary(ctx):
+            # Step 3: Generate primary response (concurrently with the thread insert)
+            best_model, _ = ctx["select"]
+            return await self._generate_primary_response(best_model, prompt)
+        
+        async def record_primary(ctx):
+            response_text, iteration_data = ctx["primary"]
+            if not response_text:
                 raise Exception("Failed to generate primary response")
-            
+            if iteration_data:
+                await self._record_iteration(thread_id, iteration_data)
+        
+        async def iterate(ctx):
             # Step 4: Multi-model evaluation and iteration
-            final_response = await self._iterative_improvement(
-                thread_id, prompt, primary_response, max_iterations, quality_threshold
+            best_model, _ = ctx["select"]
+            response_text, _ = ctx["primary"]
+            return await self._iterative_improvement(
+                thread_id, prompt, response_text, max_iterations, quality_threshold, best_model
             )
-            
+        
+        async def finalize(ctx):
             # Step 5: Update thread with final results
-            await self._finalize_thread(thread_id, final_response)
+            final_response, stop_reason = ctx["iterate"]
+            await self._finalize_thread(thread_id, final_response, stop_reason)
+        
+        pipeline.add_stage("select", select)
+        pipeline.add_stage("create_thread", create_thread, depends_on=["select"])
+        pipeline.add_stage("primary", primary, depends_on=["select"])
+        pipeline.add_stage("record_primary", record_primary, depends_on=["create_thread", "primary"])
+        pipeline.add_stage("iterate", iterate, depends_on=["record_primary"])
+        pipeline.add_stage("finalize", finalize, depends_on=["iterate"])
+        
+        try:
+            logging.info(f"🎭 Starting orchestration for session {session_id}")
+            
+            result = await pipeline.run()
+            best_model, confidence_scores = result["select"]
+            final_response, stop_reason = result["iterate"]
             
             return {
                 "thread_id": thread_id,
@@ -136,28 +189,35 @@ class EnhancedOrchestrationEngine:
                 "selected_model": best_model,
                 "confidence_scores": confidence_scores,
                 "final_response": final_response,
+                "stop_reason": stop_reason,
                 "message": "Orchestration completed successfully"
             }
             
         except Exception as e:
-            logging.error(f"❌ Orchestration failed: {e}")
+            error = e.__cause__ if isinstance(e, PipelineError) and e.__cause__ else e
+            logging.error(f"❌ Orchestration failed: {error}")
             
             # Update thread with error status
             if self.db:
                 await self.db.threads.update_one(
                     {"_id": ObjectId(thread_id)},
-                    {"$set": {"status": "failed", "error": str(e)}}
+                    {"$set": {"status": "failed", "error": str(error)}}
                 )
             
             return {
                 "thread_id": thread_id,
                 "status": "failed",
-                "error": str(e),
+                "error": str(error),
                 "message": "Orchestration failed"
             }
     
-    async def _generate_primary_response(self, model: str, prompt: str, thread_id: str) -> Optional[str]:
-        """Generate the primary response using the selected model"""
+    async def _generate_primary_response(self, model: str, prompt: str) -> Tuple[Optional[str], Optional[Dict[str, Any]]]:
+        """
+        Generate the primary response using the selected model
+        
+        Returns (response_text, iteration_data); iteration_data is None
+        when the response had to be simulated.
+        """
         
         try:
             logging.info(f"🤖 Generating primary response with {model}")
@@ -179,34 +239,40 @@ class EnhancedOrchestrationEngine:
                 "metadata": response.metadata
             }
             
-            await self.db.threads.update_one(
-                {"_id": ObjectId(thread_id)},
-                {"$push": {"iterations": iteration_data}}
-            )
-            
-            return response.response_text
+            return response.response_text, iteration_data
             
         except Exception as e:
             logging.error(f"❌ Primary response generation failed: {e}")
             # Fallback to simulation
-            return await self._simulate_model_response(model, prompt)
+            return await self._simulate_model_response(model, prompt), None
+    
+    async def _record_iteration(self, thread_id: str, iteration_data: Dict[str, Any]):
+        """Append an iteration record to the thread"""
+        await self.db.threads.update_one(
+            {"_id": ObjectId(thread_id)},
+            {"$push": {"iterations": iteration_data}}
+        )
     
     async def _iterative_improvement(self, 
                                    thread_id: str,
                                    original_prompt: str,
                                    primary_response: str,
                                    max_iterations: int,
-                                   quality_threshold: float) -> str:
+                                   quality_threshold: float,
+                                   primary_model: str) -> Tuple[str, str]:
         """
         Implement iterative improvement with multiple models
+        
+        Returns (final_response, stop_reason). The loop also stops early when
+        successive responses converge, oscillate or stop improving.
         """
         
         current_response = primary_response
-        current_quality = 0.6  # Starting quality score
+        current_quality = score_responses(original_prompt, [primary_response])[0]["overall_score"]
+        convergence = ConvergenceDetector()
+        convergence.observe(current_response, current_quality)
         
         # Get all available models except the primary one
-        thread_doc = await self.db.threads.find_one({"_id": ObjectId(thread_id)})
-        primary_model = thread_doc.get("selected_model")
         
         all_models = ["TNG DeepSeek", "GLM4.5", "GPT-OSS", "MoonshotAI Kimi", "Llama 4 Maverick", "Qwen3"]
         critic_models = [m for m in all_models if m != primary_model]
@@ -237,8 +303,9 @@ class EnhancedOrchestrationEngine:
                 improved_response = await self._simulate_model_response(critic_model, evaluation_prompt)
                 
                 if improved_response:
-                    # Calculate quality improvement (simplified metric)
-                    new_quality = min(current_quality + 0.1 + (len(improved_response) / len(current_response) * 0.05), 1.0)
+                    # Score the candidate locally instead of assuming each round improves
+                    new_quality = score_responses(original_prompt, [improved_response])[0]["overall_score"]
+                    converged = convergence.observe(improved_response, new_quality)
                     
                     # Record iteration
                     iteration_data = {
@@ -248,14 +315,19 @@ class EnhancedOrchestrationEngine:
                         "prompt": evaluation_prompt,
                         "response": improved_response,
                         "quality_score": new_quality,
+                        "similarity_to_previous": convergence.history[-1].get("similarity_to_previous"),
                         "timestamp": datetime.utcnow(),
                         "cost": 0.01
                     }
                     
-                    await self.db.threads.update_one(
-                        {"_id": ObjectId(thread_id)},
-                        {"$push": {"iterations": iteration_data}}
-                    )
+                    await self._record_iteration(thread_id, iteration_data)
+                    
+                    if converged:
+                        # Keep the better of the two near-identical or stalled answers
+                        if new_quality > current_quality:
+                            current_response, current_quality = improved_response, new_quality
+                        stop_reason = converged
+                        break
                     
                     current_response = improved_response
                     current_quality = new_quality
@@ -266,9 +338,13 @@ class EnhancedOrchestrationEngine:
                 
             except Exception as e:
                 logging.error(f"❌ Iteration {iteration} failed: {e}")
+                stop_reason = STOP_ERROR
                 break
+        else:
+            # The loop condition ended it; a break already set its own stop reason
+            stop_reason = STOP_QUALITY_THRESHOLD if current_quality >= quality_threshold else STOP_MAX_ITERATIONS
         
-        return current_response
+        return current_response, stop_reason
     
     async def _simulate_model_response(self, model: str, prompt: str) -> str:
         """
@@ -290,7 +366,7 @@ class EnhancedOrchestrationEngine:
         
         return responses.get(model, f"[Unknown Model] Response to: {prompt[:50]}...")
     
-    async def _finalize_thread(self, thread_id: str, final_response: str):
+    async def _finalize_thread(self, thread_id: str, final_response: str, stop_reason: Optional[str] = None):
         """Finalize the thread with results"""
         
         try:
@@ -308,6 +384,7 @@ class EnhancedOrchestrationEngine:
                         "status": "completed",
                         "final_response": final_response,
                         "quality_score": final_quality,
+                        "stop_reason": stop_reason,
                         "total_cost": total_cost,
                         "completed_at": datetime.utcnow()
                     }
@@ -14,6 +14,8 @@ import os
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from app.core.database import connect_to_mongo, close_mongo_connection
+from http_transport import close_shared_clients
+from metrics import install_asgi_metrics
 from app.routes import sessions, threads, models, orchestration, analytics, algorithm
 from app.websocket import routes as websocket_routes
 
@@ -55,6 +57,7 @@ async def lifespan(app: FastAPI):
         await provider_manager.close_all()
     except:
         pass
+    await close_shared_clients()
     await close_mongo_connection()
     print("✅ OrchestrateX Backend shutdown complete")
 
@@ -74,6 +77,7 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+install_asgi_metrics(app, "backend")
 
 # Include routers
 app.include_router(sessions.router, prefix="/api/sessions", tags=["sessions"])
@@ -0,0 +1,172 @@
+"""
+Test cases for API key rotation
+"""
+
+import json
+import threading
+
+import pytest
+
+import api_key_rotation
+from api_key_rotation import APIKeyRotationManager, benchmark_contention
+from token_bucket import RateLimiterRegistry
+
+@pytest.fixture
+def env_file(tmp_path, monkeypatch):
+    for provider in ['GLM45', 'GPTOSS', 'LLAMA3', 'KIMI', 'QWEN3', 'FALCON']:
+        monkeypatch.delenv(f'PROVIDER_{provider}_API_KEY', raising=False)
+    path = tmp_path / "orche.env"
+    path.write_text(
+        "PROVIDER_GLM45_API_KEY=sk-key-0-aaaaaaaaaaaaaaaaaaaa\n"
+        "PROVIDER_GLM45_BACKUP_KEYS=sk-key-1-bbbbbbbbbbbbbbbbbbbb,sk-key-2-cccccccccccccccccccc\n"
+        "PROVIDER_GLM45_MODEL=z-ai/glm-4.5-air:free\n"
+    )
+    return str(path)
+
+class TestAPIKeyRotation:
+
+    def test_rotates_on_rate_limit_and_recovers_on_monotonic_clock(self, env_file, monkeypatch):
+        clock = [1000.0]
+        monkeypatch.setattr(api_key_rotation.time, "monotonic", lambda: clock[0])
+        manager = APIKeyRotationManager(env_file=env_file, scheduler="sticky")
+
+        assert manager.get_current_api_key("GLM45").startswith("sk-key-0")
+        assert manager.handle_rate_limit_error("GLM45") is True
+        assert manager.get_current_api_key("GLM45").startswith("sk-key-1")
+        assert manager.handle_rate_limit_error("GLM45") and manager.handle_rate_limit_error("GLM45") is False
+
+        status = manager.get_provider_status("GLM45")
+        assert [k["rate_limited"] for k in status["keys_status"]] == [True, True, True]
+        assert status["keys_status"][0]["last_limited"] is not None
+
+        clock[0] += manager.rate_limit_recovery_time.total_seconds() + 1
+        assert manager.get_current_api_key("GLM45").startswith("sk-key-")
+        assert not any(k["rate_limited"] for k in manager.get_provider_status("GLM45")["keys_status"])
+
+    def test_history_is_a_ring_buffer_that_spills_to_disk(self, env_file, tmp_path):
+        spill = tmp_path / "rotations.jsonl"
+        manager = APIKeyRotationManager(env_file=env_file, history_size=4, history_spill_path=str(spill))
+        for _ in range(5):
+            manager.handle_rate_limit_error("GLM45")
+            manager.reset_provider_limits("GLM45")
+
+        assert len(manager.rotation_history) == 4
+        assert len(manager.get_rotation_history(2)) == 2
+        spilled = [json.loads(line) for line in spill.read_text().splitlines()]
+        assert len(spilled) == 6  # 5 rate limits + 5 rotations, 4 kept in memory
+        assert spilled[0]["action"] == "marked_rate_limited"
+
+    def test_keys_added_after_loading_get_state(self, env_file):
+        manager = APIKeyRotationManager(env_file=env_file)
+        # working_api's environment hotfix assigns api_keys directly
+        manager.api_keys["KIMI"] = {'primary_key': "sk-kimi", 'backup_keys': [], 'model_id': None, 'all_keys': ["sk-kimi"]}
+
+        assert manager.get_current_api_key("KIMI") == "sk-kimi"
+        manager.increment_request_count("KIMI")
+        assert manager.get_provider_status("KIMI")["total_requests"] == 1
+        assert manager.get_current_api_key("MISSING") is None
+
+    def test_concurrent_lookups_and_rate_limits_stay_consistent(self, env_file):
+        manager = APIKeyRotationManager(env_file=env_file)
+        keys = set(manager.api_keys["GLM45"]["all_keys"])
+        errors = []
+
+        def worker(n):
+            try:
+                for i in range(300):
+                    assert manager.get_current_api_key("GLM45") in keys
+                    manager.increment_request_count("GLM45")
+                    if n % 16 == 0 and i % 100 == 0:
+                        manager.handle_rate_limit_error("GLM45")
+                        manager.reset_provider_limits("GLM45")
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=worker, args=(n,)) for n in range(64)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert errors == []
+        assert manager.get_provider_status("GLM45")["total_requests"] == 64 * 300
+
+    def test_balanced_scheduler_spreads_requests_by_observed_quota(self, env_file):
+        manager = APIKeyRotationManager(env_file=env_file)
+        manager.rate_limiters = RateLimiterRegistry(default_rate=20)
+        keys = manager.api_keys["GLM45"]["all_keys"]
+        # The server reported a larger quota for the last key
+        manager.rate_limiters.get("GLM45", keys[2]).update_from_headers({"X-RateLimit-Limit": "40"})
+
+        for _ in range(400):
+            manager.increment_request_count("GLM45", manager.get_current_api_key("GLM45"))
+
+        status = manager.get_provider_status("GLM45")
+        assert [k["requests"] for k in status["keys_status"]] == [100, 100, 200]
+        assert [k["weight"] for k in status["keys_status"]] == [1, 1, 2]
+        assert status["keys_status"][2]["quota_rpm"] == 40 and status["scheduler"] == "balanced"
+        assert status["keys_status"][0]["utilization"] == 5.0  # 100 requests in a minute on a 20/min key
+
+        # A rate-limited key leaves the rotation until it recovers
+        assert manager.handle_rate_limit_error("GLM45", api_key=keys[2]) is True
+        assert {manager.get_current_api_key("GLM45") for _ in range(30)} == set(keys[:2])
+
+    def test_balanced_keys_multiply_sustained_throughput(self, env_file):
+        """Each key's server window allows 10 requests: 3 keys serve ~3x before any 429"""
+        def served(scheduler):
+            manager = APIKeyRotationManager(env_file=env_file, scheduler=scheduler)
+            window = {key: 0 for key in manager.api_keys["GLM45"]["all_keys"]}
+            ok = 0
+            for _ in range(30):
+                key = manager.get_current_api_key("GLM45")
+                window[key] += 1
+                if window[key] > 10:
+                    manager.handle_rate_limit_error("GLM45", api_key=key)
+                else:
+                    ok += 1
+            return ok
+
+        assert served("balanced") == 30
+        assert served("sticky") < 30  # Each key is burned to a 429 before the next is used
+
+    def test_rate_limited_key_resumes_at_server_reset(self, env_file, monkeypatch):
+        clock = [1000.0]
+        monkeypatch.setattr(api_key_rotation.time, "monotonic", lambda: clock[0])
+        manager = APIKeyRotationManager(env_file=env_file, scheduler="sticky")
+        keys = manager.api_keys["GLM45"]["all_keys"]
+
+        assert manager.handle_rate_limit_error("GLM45", {"headers": {"Retry-After": "30"}}, keys[0])
+        assert manager.get_provider_status("GLM45")["keys_status"][0]["resumes_in_seconds"] == 30.0
+        assert manager.rotation_history[0]["cooldown_source"] == "retry-after"
+
+        # Back in service after 30s, not the 15-minute fallback
+        clock[0] += 31
+        manager.handle_rate_limit_error("GLM45", {"headers": {"x-ratelimit-reset": "5s"}}, keys[1])
+        assert manager.get_current_api_key("GLM45") == keys[2]
+        manager.handle_rate_limit_error("GLM45", {"headers": {}}, keys[2])
+        assert manager.get_current_api_key("GLM45") == keys[0]
+        assert manager.rotation_history[-2]["cooldown_seconds"] == manager.rate_limit_recovery_time.total_seconds()
+
+    def test_balanced_scheduler_skips_keys_with_used_up_quota(self, env_file):
+        manager = APIKeyRotationManager(env_file=env_file)
+        manager.rate_limiters = RateLimiterRegistry(default_rate=60)
+        keys = manager.api_keys["GLM45"]["all_keys"]
+        assert {manager.get_current_api_key("GLM45") for _ in range(30)} == set(keys)
+
+        # The server says key 0 has nothing left until its reset: it leaves the rotation before any 429
+        manager.rate_limiters.get("GLM45", keys[0]).update_from_headers(
+            {"X-RateLimit-Remaining": "0", "X-RateLimit-Reset": "60s"})
+        manager.refresh_schedule("GLM45")
+        assert {manager.get_current_api_key("GLM45") for _ in range(30)} == set(keys[1:])
+
+        # A key whose quota is running low gets a smaller share
+        manager.rate_limiters.get("GLM45", keys[1]).update_from_headers(
+            {"X-RateLimit-Remaining": "5", "X-RateLimit-Reset": "60s"})
+        manager.refresh_schedule("GLM45")
+        picks = [manager.get_current_api_key("GLM45") for _ in range(60)]
+        assert picks.count(keys[2]) > 5 * picks.count(keys[1]) > 0
+
+    def test_contention_benchmark_counts_every_call(self):
+        result = benchmark_contention(threads=64, calls_per_thread=100)
+        assert result["calls"] == result["requests_counted"] == 6400
+        assert result["calls_per_second"] > 0 and result["p99_us"] >= result["p50_us"]
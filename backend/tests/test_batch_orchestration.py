@@ -0,0 +1,116 @@
+"""
+Test cases for batch orchestration (MultiModelOrchestrator.orchestrate_many)
+"""
+
+import asyncio
+import json
+import threading
+
+import pytest
+
+from advanced_client import ModelResponse, MultiModelOrchestrator
+
+@pytest.fixture
+def orchestrator():
+    """Orchestrator without API keys whose simulated models record their concurrency"""
+    orchestrator = MultiModelOrchestrator(min_successful_critiques=0)
+    orchestrator.key_manager.api_keys = {}
+    orchestrator.in_flight = {}
+    orchestrator.peak = {}
+    orchestrator.fail_prompts = set()
+
+    async def select(prompt):
+        return "GLM4.5", {"GLM4.5": 0.9}
+
+    async def simulate(model_name, prompt, is_critique=False):
+        in_flight = orchestrator.in_flight
+        in_flight[model_name] = in_flight.get(model_name, 0) + 1
+        orchestrator.peak[model_name] = max(orchestrator.peak.get(model_name, 0), in_flight[model_name])
+        # Later prompts finish first
+        await asyncio.sleep(0.001 * (50 - int(prompt.split()[-1])) if not is_critique else 0.001)
+        in_flight[model_name] -= 1
+        failed = not is_critique and prompt in orchestrator.fail_prompts
+        return ModelResponse(model_name=model_name, response_text="" if failed else f"answer to {prompt}",
+                             response_type="critique" if is_critique else "primary", tokens_used=5,
+                             latency_ms=1, cost_usd=0.001, confidence_score=0.9, success=not failed)
+
+    orchestrator._call_model_selector_api = select
+    orchestrator._simulate_model_response = simulate
+    return orchestrator
+
+PROMPTS = [f"question number {i}" for i in range(50)]
+
+async def collect(generator, stop_after=None):
+    results = []
+    async for index, result in generator:
+        results.append((index, result))
+        if stop_after and len(results) == stop_after:
+            break
+    return results
+
+class TestOrchestrateMany:
+
+    def test_yields_every_prompt_as_it_completes(self, orchestrator):
+        results = asyncio.run(collect(orchestrator.orchestrate_many(PROMPTS, concurrency=10, per_model_limit=3)))
+
+        indices = [index for index, _ in results]
+        assert sorted(indices) == list(range(50))
+        assert indices != sorted(indices)  # Completion order, not input order
+        assert all(result.original_prompt == PROMPTS[index] for index, result in results)
+        assert all(result.success and len(result.critique_responses) == 5 for _, result in results)
+
+    def test_global_and_per_model_limits_hold(self, orchestrator):
+        asyncio.run(collect(orchestrator.orchestrate_many(PROMPTS, concurrency=10, per_model_limit=3)))
+        assert orchestrator.peak["GLM4.5"] == 3  # The primary of 10 prompts in flight, 3 at a time
+        assert max(orchestrator.peak.values()) <= 3
+
+        orchestrator.peak.clear()
+        asyncio.run(collect(orchestrator.orchestrate_many(PROMPTS, concurrency=4,
+                                                          per_model_limit={"GLM4.5": 2})))
+        assert orchestrator.peak["GLM4.5"] == 2
+        assert orchestrator.peak["Qwen3"] <= 4  # Bounded by the prompts in progress
+
+    def test_checkpoint_resumes_where_the_run_stopped(self, orchestrator, tmp_path):
+        checkpoint = tmp_path / "run.jsonl"
+        orchestrator.fail_prompts = {PROMPTS[0]}
+        first = asyncio.run(collect(orchestrator.orchestrate_many(PROMPTS, concurrency=5,
+                                                                  checkpoint_path=str(checkpoint)), stop_after=20))
+        recorded = [json.loads(line) for line in checkpoint.read_text().splitlines()]
+        assert len(recorded) == sum(1 for _, result in first if result.success)
+        # An interrupted write leaves a torn line behind
+        with open(checkpoint, "a", encoding="utf-8") as f:
+            f.write('{"index": 4')
+
+        orchestrator.fail_prompts = set()
+        second = asyncio.run(collect(orchestrator.orchestrate_many(PROMPTS, concurrency=5,
+                                                                   checkpoint_path=str(checkpoint))))
+        done_first = {record["index"] for record in recorded}
+        assert {index for index, _ in second} == set(range(50)) - done_first
+        assert 0 in {index for index, _ in second}  # Failed prompts are not recorded, so they rerun
+
+        records = [json.loads(line) for line in checkpoint.read_text().splitlines() if line.endswith("}")]
+        assert sorted(record["index"] for record in records if "result" in record) == list(range(50))
+
+        # A different prompt list does not match the recorded prompts
+        third = asyncio.run(collect(orchestrator.orchestrate_many([p + "?" for p in PROMPTS[:3]],
+                                                                  checkpoint_path=str(checkpoint))))
+        assert len(third) == 3
+
+    def test_stats_stay_consistent_under_concurrency(self, orchestrator):
+        orchestrator.fail_prompts = {PROMPTS[1]}
+        asyncio.run(collect(orchestrator.orchestrate_many(PROMPTS, concurrency=25)))
+
+        # Orchestrations from other threads' event loops update the same stats
+        def run_in_thread():
+            asyncio.run(orchestrator.orchestrate_with_critiques("question number 7"))
+
+        threads = [threading.Thread(target=run_in_thread) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        stats = orchestrator.get_stats()
+        assert stats["total_orchestrations"] == 58
+        assert stats["successful_orchestrations"] + stats["failed_orchestrations"] == 58
+        assert stats["failed_orchestrations"] == 1
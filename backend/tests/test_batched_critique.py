@@ -0,0 +1,57 @@
+"""
+Test cases for batched critique prompting and parsing
+"""
+
+from batched_critique import build_batched_critique_prompt, parse_batched_critiques
+
+TARGETS = ["GLM-4.5", "GPT-OSS", "Kimi-K2"]
+
+class TestBatchedCritiqueParser:
+
+    def test_prompt_lists_every_target(self):
+        """The prompt includes each response and the exact target names"""
+        prompt = build_batched_critique_prompt(
+            "Qwen3-Coder", "What is 2+2?",
+            [{"model_name": name, "response_text": f"answer from {name}"} for name in TARGETS]
+        )
+        for name in TARGETS:
+            assert f"=== RESPONSE FROM {name} ===" in prompt
+            assert f'"{name}"' in prompt
+
+    def test_clean_json(self):
+        """Well-formed JSON is split into per-target critiques"""
+        text = '[{"target": "GLM-4.5", "critique": "Good", "score": 0.9},' \
+               ' {"target": "GPT-OSS", "critique": "Too long", "score": 7},' \
+               ' {"target": "Kimi-K2", "critique": "Wrong", "score": "bad"}]'
+        result = parse_batched_critiques(text, TARGETS)
+        assert result["GLM-4.5"] == {"critique_text": "Good", "score": 0.9}
+        assert result["GPT-OSS"]["score"] == 0.7
+        assert result["Kimi-K2"]["score"] is None
+
+    def test_fenced_json_with_sloppy_names(self):
+        """Code fences, prose and name variants are tolerated"""
+        text = 'Sure! Here you go:\n```json\n[{"target": "glm 4.5", "critique": "Fine"},' \
+               ' {"model": "gpt-oss", "feedback": "Add examples"}]\n```\nHope this helps.'
+        result = parse_batched_critiques(text, TARGETS)
+        assert result["GLM-4.5"]["critique_text"] == "Fine"
+        assert result["GPT-OSS"]["critique_text"] == "Add examples"
+        assert "Kimi-K2" not in result
+
+    def test_truncated_json_recovers_complete_objects(self):
+        """Objects before a truncation point are still recovered"""
+        text = '[{"target": "GLM-4.5", "critique": "Solid"}, {"target": "GPT-OSS", "critique": "Mis'
+        result = parse_batched_critiques(text, TARGETS)
+        assert list(result) == ["GLM-4.5"]
+
+    def test_plain_text_sections(self):
+        """Plain-text output with model headings is split on the headings"""
+        text = "**GLM-4.5**: Clear and correct.\n\n**Kimi-K2**: Creative but\nmisses the question."
+        result = parse_batched_critiques(text, TARGETS)
+        assert result["GLM-4.5"]["critique_text"] == "Clear and correct."
+        assert "misses the question" in result["Kimi-K2"]["critique_text"]
+        assert "GPT-OSS" not in result
+
+    def test_garbage_returns_nothing(self):
+        """Unparseable output yields no critiques rather than raising"""
+        assert parse_batched_critiques("I cannot help with that.", TARGETS) == {}
+        assert parse_batched_critiques("", TARGETS) == {}
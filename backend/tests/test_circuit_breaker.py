@@ -0,0 +1,205 @@
+"""
+Test cases for per-model circuit breakers
+"""
+
+import asyncio
+import time
+
+import httpx
+
+from circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitBreakerRegistry, circuit_breakers
+import advanced_client
+from advanced_client import MultiModelOrchestrator
+
+class TestCircuitBreaker:
+
+    def test_error_rate_opens_circuit(self):
+        """The circuit opens once the failure rate crosses the threshold"""
+        breaker = CircuitBreaker("m", failure_rate_threshold=0.5, min_calls=4)
+        breaker.record_success()
+        breaker.record_failure()
+        breaker.record_success()
+        assert breaker.state == CLOSED
+        breaker.record_failure()
+        assert breaker.state == OPEN
+        assert not breaker.allow_request()
+
+    def test_consecutive_timeouts_open_circuit(self):
+        """Repeated timeouts open the circuit before min_calls is reached"""
+        breaker = CircuitBreaker("m", timeout_threshold=2)
+        breaker.record_failure(timeout=True)
+        assert breaker.state == CLOSED
+        breaker.record_failure(timeout=True)
+        assert breaker.state == OPEN
+
+    def test_half_open_probe_success_closes(self):
+        """After the cool-down one probe is allowed and a success closes the circuit"""
+        breaker = CircuitBreaker("m", timeout_threshold=1, open_seconds=0.05)
+        breaker.record_failure(timeout=True)
+        assert not breaker.is_available()
+
+        time.sleep(0.06)
+        assert breaker.allow_request()
+        assert breaker.state == HALF_OPEN
+        assert not breaker.allow_request()  # Only one probe at a time
+
+        breaker.record_success()
+        assert breaker.state == CLOSED
+        assert breaker.allow_request()
+
+    def test_late_success_does_not_close_an_open_circuit(self):
+        """A call that started before the circuit opened cannot skip the probe"""
+        breaker = CircuitBreaker("m", timeout_threshold=1, open_seconds=60)
+        breaker.record_failure(timeout=True)
+        breaker.record_success()
+        assert breaker.state == OPEN and not breaker.allow_request()
+
+    def test_half_open_probe_failure_backs_off(self):
+        """A failed probe re-opens the circuit with a longer cool-down"""
+        breaker = CircuitBreaker("m", timeout_threshold=1, open_seconds=0.05)
+        breaker.record_failure(timeout=True)
+        time.sleep(0.06)
+        assert breaker.allow_request()
+        breaker.record_failure()
+
+        assert breaker.state == OPEN
+        assert breaker.open_seconds == 0.1
+        assert breaker.get_status()["times_opened"] == 2
+
+    def test_release_frees_the_probe_without_an_outcome(self):
+        """A probe that never reached the model (or was throttled) can be given back"""
+        breaker = CircuitBreaker("m", timeout_threshold=1, open_seconds=0.05)
+        breaker.record_failure(timeout=True)
+        time.sleep(0.06)
+        assert breaker.allow_request()
+        assert not breaker.is_available()
+
+        breaker.release()
+        assert breaker.state == HALF_OPEN and breaker.is_available()
+        assert breaker.get_status()["times_opened"] == 1
+
+class TestCircuitBreakerRegistry:
+
+    def test_routing_skips_open_circuits(self):
+        """available() and pick() leave out models whose circuit is open"""
+        registry = CircuitBreakerRegistry(timeout_threshold=1)
+        registry.record_failure("GPT-OSS", timeout=True)
+
+        assert registry.available(["GPT-OSS", "GLM4.5", "Qwen3"]) == ["GLM4.5", "Qwen3"]
+        assert registry.pick(["GPT-OSS", "Qwen3"]) == "Qwen3"
+        assert registry.get_status()["GPT-OSS"]["state"] == OPEN
+
+        registry.reset()
+        assert registry.pick(["GPT-OSS"]) == "GPT-OSS"
+
+class TestOrchestratorAccounting:
+
+    def make_orchestrator(self, status_code):
+        orchestrator = MultiModelOrchestrator()
+        orchestrator.key_manager.get_model_key = lambda model_name: "test-key"
+
+        class Session:
+            async def post(self, url, **kwargs):
+                return httpx.Response(status_code, text="slow down", request=httpx.Request("POST", url))
+
+        orchestrator.session = Session()
+        return orchestrator
+
+    def test_429_does_not_trip_the_breaker(self, monkeypatch):
+        """Quota throttling is not counted as a model failure"""
+        class Bucket:
+            async def acquire_async(self, timeout=None):
+                return True
+
+            def update_from_headers(self, headers):
+                pass
+
+            def penalize(self):
+                pass
+
+        monkeypatch.setattr(advanced_client.rate_limiters, "get", lambda model_name, api_key: Bucket())
+        circuit_breakers.reset()
+        try:
+            orchestrator = self.make_orchestrator(429)
+            for _ in range(6):
+                response = asyncio.run(orchestrator._request_model("GLM4.5", "hi", False, None, 0.7, 16))
+                assert not response.success and response.metadata["rate_limited"]
+            assert circuit_breakers.get_status()["GLM4.5"]["state"] == CLOSED
+            assert circuit_breakers.get_status()["GLM4.5"]["calls_in_window"] == 0
+        finally:
+            circuit_breakers.reset()
+
+    def test_local_rate_limit_releases_the_probe(self, monkeypatch):
+        """A half-open probe rejected by the local token bucket is given back"""
+        class Empty:
+            async def acquire_async(self, timeout=None):
+                return False
+
+        monkeypatch.setattr(advanced_client.rate_limiters, "get", lambda model_name, api_key: Empty())
+        circuit_breakers.reset()
+        breaker = circuit_breakers.get("GLM4.5")
+        try:
+            breaker.state = HALF_OPEN
+            response = asyncio.run(self.make_orchestrator(200)._request_model("GLM4.5", "hi", False, None, 0.7, 16))
+            assert response.metadata["rate_limited_locally"]
+            assert breaker.state == HALF_OPEN and breaker.is_available()
+        finally:
+            circuit_breakers.reset()
+
+    def test_each_call_is_recorded_once(self, monkeypatch):
+        """A failed response is recorded when it arrives, a call without one as a timeout or error"""
+        class Bucket:
+            async def acquire_async(self, timeout=None):
+                return True
+
+            def update_from_headers(self, headers):
+                pass
+
+        class TimingOut:
+            async def post(self, url, **kwargs):
+                raise httpx.ReadTimeout("read timed out")
+
+        recorded = []
+        monkeypatch.setattr(advanced_client.rate_limiters, "get", lambda model_name, api_key: Bucket())
+        monkeypatch.setattr(advanced_client, "record_model_call",
+                            lambda model, outcome, seconds=None: recorded.append(outcome))
+        circuit_breakers.reset()
+        try:
+            asyncio.run(self.make_orchestrator(500)._request_model("GLM4.5", "hi", False, None, 0.7, 16))
+            orchestrator = self.make_orchestrator(200)
+            orchestrator.session = TimingOut()
+            asyncio.run(orchestrator._request_model("GLM4.5", "hi", False, None, 0.7, 16))
+            assert recorded == ["server_error", "timeout"]
+        finally:
+            circuit_breakers.reset()
+
+    def test_cancelled_call_releases_the_probe(self, monkeypatch):
+        """A critic cancelled at quorum gives its half-open probe back"""
+        class Bucket:
+            async def acquire_async(self, timeout=None):
+                return True
+
+        class Hanging:
+            async def post(self, url, **kwargs):
+                await asyncio.sleep(10)
+
+        monkeypatch.setattr(advanced_client.rate_limiters, "get", lambda model_name, api_key: Bucket())
+        circuit_breakers.reset()
+        breaker = circuit_breakers.get("GLM4.5")
+        orchestrator = self.make_orchestrator(200)
+        orchestrator.session = Hanging()
+
+        async def run():
+            task = asyncio.create_task(orchestrator._request_model("GLM4.5", "hi", False, None, 0.7, 16))
+            await asyncio.sleep(0.05)
+            assert not breaker.is_available()  # The probe is out
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+        try:
+            breaker.state = HALF_OPEN
+            breaker.half_open_max_calls = 1
+            asyncio.run(run())
+            assert breaker.state == HALF_OPEN and breaker.is_available()
+        finally:
+            circuit_breakers.reset()
@@ -0,0 +1,92 @@
+"""
+Test cases for the adaptive (AIMD) concurrency limiter
+"""
+
+import asyncio
+import threading
+import time
+
+from concurrency_limiter import AIMDLimiter, ConcurrencyLimiterRegistry
+
+class TestAIMDLimiter:
+
+    def test_limit_converges_to_endpoint_capacity(self):
+        """Against an endpoint that 429s above 6 concurrent calls the limit settles near 6"""
+        limiter = AIMDLimiter("sim", initial_limit=2, decrease_cooldown=0.02)
+        active = [0]
+        peak = [0]
+
+        async def call():
+            async with limiter.slot() as permit:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+                status = 429 if active[0] > 6 else 200
+                await asyncio.sleep(0.005)
+                active[0] -= 1
+                permit.record(status_code=status)
+
+        async def run():
+            await asyncio.gather(*[call() for _ in range(400)])
+
+        asyncio.run(run())
+        stats = limiter.get_stats()
+        assert 3 <= stats["limit"] <= 9
+        assert stats["increases"] > 0 and stats["decreases"] > 0
+        assert peak[0] <= limiter.max_limit
+        assert stats["in_flight"] == 0 and stats["queue_depth"] == 0
+
+    def test_rate_limit_cuts_multiplicatively(self):
+        """A 429 halves the limit"""
+        limiter = AIMDLimiter("m", initial_limit=8)
+        permit = limiter.acquire()
+        permit.record(status_code=429)
+        limiter.release(permit)
+        assert limiter.limit == 4
+
+    def test_threads_respect_limit_and_queue(self):
+        """Blocked threads queue up and never exceed the limit"""
+        limiter = AIMDLimiter("m", initial_limit=2, max_limit=2)
+        active = [0]
+        peak = [0]
+        lock = threading.Lock()
+
+        def work():
+            with limiter.slot_sync():
+                with lock:
+                    active[0] += 1
+                    peak[0] = max(peak[0], active[0])
+                time.sleep(0.02)
+                with lock:
+                    active[0] -= 1
+
+        threads = [threading.Thread(target=work) for _ in range(6)]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.01)
+        assert limiter.queue_depth > 0
+        for thread in threads:
+            thread.join()
+
+        assert peak[0] == 2
+        assert limiter.get_stats()["completed"] == 6
+
+    def test_errors_inside_slot_are_recorded(self):
+        """Exceptions count as errors and still release the permit"""
+        limiter = AIMDLimiter("m", initial_limit=4)
+        try:
+            with limiter.slot_sync():
+                raise TimeoutError("slow")
+        except TimeoutError:
+            pass
+        stats = limiter.get_stats()
+        assert stats["errors"] == 1 and stats["in_flight"] == 0
+        assert stats["limit"] == 2
+
+class TestConcurrencyLimiterRegistry:
+
+    def test_limiters_are_per_model_and_key(self):
+        """Each (model, key) pair gets its own limiter and keys are not exposed"""
+        registry = ConcurrencyLimiterRegistry()
+        assert registry.get("GPT-OSS", "key-a") is registry.get("GPT-OSS", "key-a")
+        assert registry.get("GPT-OSS", "key-a") is not registry.get("GPT-OSS", "key-b")
+        assert not any("key-a" in name for name in registry.get_stats())
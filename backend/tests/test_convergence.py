@@ -0,0 +1,97 @@
+"""
+Test cases for refinement loop convergence detection
+"""
+
+import asyncio
+import os
+
+import pytest
+
+from convergence import (
+    ConvergenceDetector, STOP_CONVERGED, STOP_NO_IMPROVEMENT, STOP_OSCILLATING, STOP_QUALITY_THRESHOLD,
+    text_similarity
+)
+
+ANSWER = ("Python decorators wrap a function to add behaviour such as logging or caching "
+          "without changing the function body. They are applied with the @ syntax.")
+REPHRASED = ANSWER.replace("logging", "timing")
+OTHER = ("Java annotations attach metadata to classes and methods that tools and frameworks "
+         "read at compile time or through reflection at runtime.")
+THIRD = ("Rust macros generate code at compile time from token streams and are invoked "
+         "with an exclamation mark after the macro name.")
+
+class TestTextSimilarity:
+
+    def test_similarity_bounds(self):
+        """Identical texts score 1.0, unrelated texts close to 0.0"""
+        assert text_similarity(ANSWER, ANSWER) == 1.0
+        assert text_similarity(ANSWER, REPHRASED) > 0.8
+        assert text_similarity(ANSWER, OTHER) < 0.2
+
+class TestConvergenceDetector:
+
+    def test_near_identical_response_converges(self):
+        """A round that only tweaks a word stops the loop"""
+        detector = ConvergenceDetector()
+        assert detector.observe(ANSWER, 0.5) is None
+        assert detector.observe(REPHRASED, 0.6) == STOP_CONVERGED
+        assert detector.to_dict()["stop_reason"] == STOP_CONVERGED
+
+    def test_returning_to_earlier_answer_oscillates(self):
+        """Going back to an answer seen two rounds ago is detected"""
+        detector = ConvergenceDetector()
+        detector.observe(ANSWER, 0.5)
+        detector.observe(OTHER, 0.6)
+        assert detector.observe(REPHRASED, 0.7) == STOP_OSCILLATING
+
+    def test_quality_stall_stops_after_patience(self):
+        """Rounds below the improvement epsilon stop the loop after `patience` rounds"""
+        detector = ConvergenceDetector(min_improvement=0.05, patience=2)
+        assert detector.observe(ANSWER, 0.50) is None
+        assert detector.observe(OTHER, 0.52) is None
+        assert detector.observe(THIRD, 0.53) == STOP_NO_IMPROVEMENT
+
+    def test_real_improvements_continue(self):
+        """Different answers with rising quality keep the loop going"""
+        detector = ConvergenceDetector()
+        assert detector.observe(ANSWER, 0.4) is None
+        assert detector.observe(OTHER, 0.6) is None
+        assert detector.observe(THIRD) is None
+        assert len(detector.history) == 3
+
+class TestIterativeImprovement:
+
+    def run_loop(self, monkeypatch, responses, qualities, quality_threshold=0.8):
+        pytest.importorskip("pandas")  # The engine imports the trained model selector
+        # model_selector imports prompt_analyzer as a top-level module
+        monkeypatch.syspath_prepend(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                                 "app", "orchestration"))
+        from app.orchestration import enhanced_engine
+
+        scores = iter(qualities)
+        monkeypatch.setattr(enhanced_engine, "score_responses",
+                            lambda prompt, texts: [{"overall_score": next(scores)}])
+        engine = enhanced_engine.EnhancedOrchestrationEngine.__new__(enhanced_engine.EnhancedOrchestrationEngine)
+        replies = iter(responses)
+
+        async def simulate(model, prompt):
+            return next(replies)
+
+        async def record(thread_id, iteration_data):
+            pass
+
+        engine._simulate_model_response = simulate
+        engine._record_iteration = record
+        return asyncio.run(engine._iterative_improvement("thread", "prompt", ANSWER, max_iterations=5,
+                                                         quality_threshold=quality_threshold,
+                                                         primary_model="GLM4.5"))
+
+    def test_convergence_reason_is_kept_above_the_threshold(self, monkeypatch):
+        """A converged round that also crosses the threshold reports convergence"""
+        response, stop_reason = self.run_loop(monkeypatch, [REPHRASED], [0.5, 0.9])
+        assert (response, stop_reason) == (REPHRASED, STOP_CONVERGED)
+
+    def test_threshold_reason_when_the_loop_condition_ends_it(self, monkeypatch):
+        """Reaching the threshold with a new answer reports the threshold"""
+        response, stop_reason = self.run_loop(monkeypatch, [OTHER], [0.5, 0.9])
+        assert (response, stop_reason) == (OTHER, STOP_QUALITY_THRESHOLD)
@@ -0,0 +1,95 @@
+"""
+Test cases for critique input compression
+"""
+
+import asyncio
+import re
+
+import working_api
+from critique_compression import CritiqueCompressor, GAP_MARKER, compress_for_critique, focus_profile
+from token_accounting import estimate_tokens
+
+FILLER = " ".join(f"Detail number {i} adds context about caching layers and their eviction rules." for i in range(40))
+
+LONG_ANSWER = f"""Use an LRU cache to keep recent results in memory.
+
+## Design
+
+{FILLER}
+
+```python
+from collections import OrderedDict
+
+class LRUCache:
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.items = OrderedDict()
+{chr(10).join(f"    # step {i}: bookkeeping for the eviction policy" for i in range(30))}
+    def get(self, key):
+        return self.items.get(key)
+```
+
+- First, pick a capacity.
+- Finally, measure the hit rate.
+
+Alternatively, you could use Redis instead of an in-process cache."""
+
+class TestCritiqueCompressor:
+
+    def test_short_responses_pass_through(self):
+        text = "Paris is the capital of France."
+        assert compress_for_critique(text, "clarity and structure") == text
+
+    def test_views_fit_the_focus_budget(self):
+        compressor = CritiqueCompressor(LONG_ANSWER, "How do I build an LRU cache?")
+        for focus in ["clarity and structure", "technical accuracy and logical reasoning",
+                      "completeness and missing information", "coding", None]:
+            view = compressor.view(focus)
+            assert estimate_tokens(view) <= focus_profile(focus).budget < compressor.original_tokens
+            assert view.startswith("Use an LRU cache")  # The opening answer survives
+            assert GAP_MARKER in view
+        assert compressor.stats()["original_tokens"] == compressor.original_tokens
+
+    def test_code_blocks_are_truncated_whole(self):
+        view = CritiqueCompressor(LONG_ANSWER).view("technical accuracy", budget=200)
+
+        assert view.count("```") == 2  # Fence opened and closed
+        assert "class LRUCache:" in view
+        assert "    def get(self, key):" in view  # Later definitions are kept
+        assert re.search(r"\.\.\. \(\d+ more lines\)", view)
+        # A response cut off inside a fence still renders a closed block
+        assert CritiqueCompressor("```python\n" + "x = 1\n" * 400).view(budget=50).endswith("```")
+
+    def test_focus_changes_what_is_kept(self):
+        compressor = CritiqueCompressor(LONG_ANSWER)
+        assert "## Design" in compressor.view("clarity and structure")
+        assert "Alternatively" in compressor.view("creativity and alternative perspectives")
+        assert focus_profile("reasoning").name == "accuracy"
+        assert focus_profile("coding").name == "practical"
+        assert focus_profile("overall quality").name == "overall"
+
+    def test_chat_critics_receive_compact_views(self, monkeypatch):
+        critique_prompts = []
+
+        async def fake_call(provider, model_id, prompt, use_cache=True, **kwargs):
+            if 'JSON array' in prompt:
+                critique_prompts.append(prompt)
+                names = re.findall(r'=== RESPONSE FROM (.+?) ===', prompt)
+                text = "[" + ",".join(f'{{"target": "{name}", "critique": "ok", "score": 0.8}}' for name in names) + "]"
+            else:
+                text = LONG_ANSWER
+            return {'success': True, 'response': text, 'metadata': {'total_tokens': 10, 'cost_usd': 0.0}}
+
+        monkeypatch.setattr(working_api, "acall_model_with_rotation", fake_call)
+        compact = asyncio.run(working_api.run_chat("How do I build an LRU cache?", use_cache=False))
+        compact_prompt_tokens = sum(estimate_tokens(p) for p in critique_prompts)
+
+        critique_prompts.clear()
+        full = asyncio.run(working_api.run_chat("How do I build an LRU cache?", use_cache=False,
+                                                compress_critique_input=False))
+        full_prompt_tokens = sum(estimate_tokens(p) for p in critique_prompts)
+
+        tokens = compact["metadata"]["critique_input_tokens"]
+        assert tokens["sent"] < tokens["original"] / 2
+        assert full["metadata"]["critique_input_tokens"]["sent"] == tokens["original"]
+        assert compact_prompt_tokens < full_prompt_tokens / 2
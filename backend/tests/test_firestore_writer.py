@@ -0,0 +1,158 @@
+"""
+Test cases for the batched, journaled Firestore writer
+"""
+
+import time
+from datetime import datetime
+
+from firestore_writer import FirestoreBatchWriter, WriteJournal
+
+class FakeBatch:
+    def __init__(self, client):
+        self.client = client
+        self.writes = []
+
+    def set(self, ref, data):
+        self.writes.append((ref, data))
+
+    def commit(self):
+        if self.client.down:
+            raise ConnectionError("Firestore unreachable")
+        time.sleep(self.client.latency)
+        self.client.commits.append(self.writes)
+
+class FakeCollection:
+    def __init__(self, name):
+        self.name = name
+
+    def document(self, doc_id):
+        return (self.name, doc_id)
+
+class FakeFirestore:
+    def __init__(self, down=False, latency=0.0):
+        self.down = down
+        self.latency = latency
+        self.commits = []
+
+    def batch(self):
+        return FakeBatch(self)
+
+    def collection(self, name):
+        return FakeCollection(name)
+
+    def documents(self):
+        return {ref: data for writes in self.commits for ref, data in writes}
+
+class TestFirestoreBatchWriter:
+
+    def test_chat_records_go_out_in_one_batch(self, tmp_path):
+        client = FakeFirestore()
+        writer = FirestoreBatchWriter(lambda: client, journal_path=str(tmp_path / "journal.jsonl"), flush_interval=5)
+        ids = [writer.enqueue("model_critiques", {"n": i, "timestamp": datetime.now()}) for i in range(38)]
+
+        assert writer.flush(timeout=2)
+        assert len(client.commits) == 1 and len(client.commits[0]) == 38
+        assert set(doc_id for _, doc_id in client.documents()) == set(ids)
+        assert (tmp_path / "journal.jsonl").read_text() == ""
+        writer.close()
+
+    def test_batches_are_capped_at_batch_size(self, tmp_path):
+        client = FakeFirestore()
+        writer = FirestoreBatchWriter(lambda: client, journal_path=str(tmp_path / "journal.jsonl"),
+                                      max_batch_size=500, flush_interval=5)
+        for i in range(1200):
+            writer.enqueue("model_outputs", {"n": i})
+
+        assert writer.flush(timeout=5)
+        assert sorted(len(batch) for batch in client.commits) == [200, 500, 500]
+        writer.close()
+
+    def test_outage_is_journaled_and_replayed(self, tmp_path):
+        journal = str(tmp_path / "journal.jsonl")
+        down = FakeFirestore(down=True)
+        writer = FirestoreBatchWriter(lambda: down, journal_path=journal, flush_interval=0.05)
+        ids = [writer.enqueue("user_prompts", {"n": i, "timestamp": datetime(2025, 1, 1)}) for i in range(3)]
+        assert not writer.flush(timeout=1)
+        writer.close()
+        assert writer.get_stats()["failed_batches"] >= 1
+
+        # Next process start: Firestore is back
+        client = FakeFirestore()
+        writer = FirestoreBatchWriter(lambda: client, journal_path=journal, flush_interval=0.05)
+        writer.start()
+        assert writer.flush(timeout=2)
+        documents = client.documents()
+        assert sorted(doc_id for _, doc_id in documents) == sorted(ids)
+        assert all(data["timestamp"] == datetime(2025, 1, 1) for data in documents.values())
+        assert writer.get_stats()["replayed"] == 3
+        writer.close()
+
+    def test_enqueue_does_not_wait_for_firestore(self, tmp_path):
+        client = FakeFirestore(latency=0.5)
+        writer = FirestoreBatchWriter(lambda: client, journal_path=str(tmp_path / "journal.jsonl"), flush_interval=0)
+        started = time.perf_counter()
+        for i in range(100):
+            writer.enqueue("model_critiques", {"n": i})
+        assert time.perf_counter() - started < 0.3
+        assert writer.flush(timeout=5)
+        assert sum(len(batch) for batch in client.commits) == 100
+        writer.close()
+
+    def test_committed_prefix_is_cut_off_while_records_are_pending(self, tmp_path):
+        path = tmp_path / "journal.jsonl"
+        client = FakeFirestore(latency=0.02)
+        writer = FirestoreBatchWriter(lambda: client, journal_path=str(path), max_batch_size=50, flush_interval=0)
+        writer.journal.compact_bytes = 1024
+        for i in range(1000):
+            writer.enqueue("model_outputs", {"n": i, "text": "x" * 40})
+        full_size = path.stat().st_size
+
+        deadline = time.monotonic() + 5
+        while writer.get_stats()["committed"] < 800 and time.monotonic() < deadline:
+            time.sleep(0.005)
+        assert writer.get_stats()["pending"] > 0
+        assert path.stat().st_size < full_size / 2
+        assert writer.flush(timeout=5)
+        assert sorted(data["n"] for data in client.documents().values()) == list(range(1000))
+        assert path.read_text() == ""
+        writer.close()
+
+    def test_queue_is_bounded_during_an_outage(self, tmp_path):
+        client = FakeFirestore(down=True)
+        writer = FirestoreBatchWriter(lambda: client, journal_path=str(tmp_path / "journal.jsonl"),
+                                      max_batch_size=10, flush_interval=0.01, max_retry_interval=0.05,
+                                      max_pending=20)
+        for i in range(100):
+            writer.enqueue("user_prompts", {"n": i})
+        stats = writer.get_stats()
+        assert stats["in_memory"] <= 20 and stats["pending"] == 100 and stats["spilled"] == 80
+
+        client.down = False
+        assert writer.flush(timeout=5)
+        assert [data["n"] for writes in client.commits for _, data in writes] == list(range(100))
+        assert writer.get_stats()["pending"] == 0
+        writer.close()
+
+class TestWriteJournal:
+
+    def test_compaction_keeps_logical_offsets(self, tmp_path):
+        journal = WriteJournal(str(tmp_path / "journal.jsonl"), compact_bytes=0)
+        ends = [journal.append({"n": i})[1] for i in range(10)]
+        journal.compact(ends[5])  # Records 0-5 committed: more than the rest, so the file is rewritten
+
+        assert journal.count() == 4 and journal.start == ends[5]
+        journal.append({"n": 10})
+        records, next_offset = journal.read(ends[7], limit=2)
+        assert [record["n"] for _, record in records] == [8, 9] and next_offset == ends[9]
+        assert [record["n"] for record in journal.load()] == [6, 7, 8, 9, 10]
+        journal.compact(journal.end)
+        assert journal.count() == 0
+        journal.close()
+
+    def test_torn_last_line_is_dropped(self, tmp_path):
+        path = tmp_path / "journal.jsonl"
+        path.write_text('{"n": 1}\n{"n": 2')
+        journal = WriteJournal(str(path))
+        journal.append({"n": 3})
+        assert [record["n"] for record in journal.load()] == [1, 3]
+        journal.close()
@@ -0,0 +1,83 @@
+"""
+Test cases for the shared pooled HTTP transport
+"""
+
+import asyncio
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+import pytest
+
+from http_transport import AsyncPooledTransport, PooledTransport, TransportConfig, TransportMetrics
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-alive
+    in_flight = 0
+    max_in_flight = 0
+    lock = threading.Lock()
+
+    def do_POST(self):
+        with _Handler.lock:
+            _Handler.in_flight += 1
+            _Handler.max_in_flight = max(_Handler.max_in_flight, _Handler.in_flight)
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        time.sleep(0.05)
+        body = b'{"ok": true}'
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        with _Handler.lock:
+            _Handler.in_flight -= 1
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def server_url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    _Handler.max_in_flight = 0
+    yield f"http://127.0.0.1:{server.server_port}/chat"
+    server.shutdown()
+
+class TestPooledTransport:
+
+    def test_sync_connections_are_reused(self, server_url):
+        """Sequential calls share one keep-alive connection"""
+        metrics = TransportMetrics()
+        with httpx.Client(transport=PooledTransport(TransportConfig(http2=False), metrics)) as client:
+            for _ in range(4):
+                assert client.post(server_url, json={}).json() == {"ok": True}
+
+        stats = metrics.get_stats()
+        assert stats["requests"] == 4
+        assert stats["new_connections"] == 1
+        assert stats["reuse_rate"] == 0.75
+
+    def test_async_per_host_limit(self, server_url):
+        """No more than the per-host limit of requests are in flight at once"""
+        config = TransportConfig(http2=False, per_host_limits={"127.0.0.1": 2})
+        metrics = TransportMetrics()
+
+        async def run():
+            async with httpx.AsyncClient(transport=AsyncPooledTransport(config, metrics)) as client:
+                responses = await asyncio.gather(*[client.post(server_url, json={}) for _ in range(6)])
+                return [response.status_code for response in responses]
+
+        assert asyncio.run(run()) == [200] * 6
+        assert _Handler.max_in_flight <= 2
+        assert metrics.get_stats()["new_connections"] <= 2
+
+    def test_errors_are_counted_and_release_slot(self):
+        """A failed connection is recorded and does not leak the host slot"""
+        config = TransportConfig(http2=False, max_per_host=1)
+        metrics = TransportMetrics()
+        with httpx.Client(transport=PooledTransport(config, metrics), timeout=1) as client:
+            for _ in range(2):
+                with pytest.raises(httpx.HTTPError):
+                    client.post("http://127.0.0.1:9/unreachable", json={})
+
+        assert metrics.get_stats()["errors"] == 2
@@ -0,0 +1,83 @@
+"""
+Test cases for the offline load-testing harness
+"""
+
+import asyncio
+import json
+
+import httpx
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+from load_harness import LoadGenerator, compare, load_prompts, percentile, save_result
+
+def _app(fail_every=0, delay=0.01):
+    app = FastAPI()
+    calls = {"n": 0}
+
+    @app.post("/chat")
+    async def chat(request: Request):
+        body = await request.json()
+        calls["n"] += 1
+        n = calls["n"]
+        await asyncio.sleep(delay)
+        if fail_every and n % fail_every == 0:
+            return JSONResponse({"error": "boom"}, status_code=500)
+        return {"success": True, "echo": body["message"],
+                "metadata": {"stage_timings_ms": {"primary": 8.0, "critique": 2.0}}}
+
+    @app.post("/batch")
+    async def batch(request: Request):
+        body = await request.json()
+        return JSONResponse({"count": len(body["prompts"])}, headers={"Server-Timing": "predict;dur=3.5"})
+
+    return app
+
+def _generator(app, **kwargs):
+    client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test")
+    return LoadGenerator("http://test", client=client, **kwargs)
+
+class TestLoadHarness:
+
+    def test_closed_loop_reports_errors_and_stages(self):
+        summary = asyncio.run(_generator(_app(fail_every=4)).closed_loop(concurrency=4, total_requests=20))
+
+        assert summary["requests"] == 20
+        assert summary["status_codes"] == {"200": 15, "500": 5}
+        assert summary["error_rate"] == 0.25
+        assert summary["errors"] == {"HTTP 500": 5}
+        assert summary["stages"]["primary"]["p50"] == 8.0
+        assert summary["latency_ms"]["p50"] >= 10
+
+    def test_open_loop_follows_arrival_rate(self):
+        summary = asyncio.run(_generator(_app(), seed=1).open_loop(rate=100, duration=1.0))
+
+        assert 70 <= summary["requests"] <= 130
+        assert summary["error_rate"] == 0.0 and summary["dropped"] == 0
+
+    def test_batch_bodies_and_server_timing(self):
+        summary = asyncio.run(_generator(_app(), scenario="batch", batch_size=5).closed_loop(1, total_requests=2))
+        assert summary["stages"] == {"predict": {"p50": 3.5, "p95": 3.5, "p99": 3.5, "mean": 3.5, "max": 3.5}}
+
+    def test_prompt_files_and_percentiles(self, tmp_path):
+        path = tmp_path / "mix.jsonl"
+        path.write_text("\n".join(json.dumps(item) for item in [
+            {"request_id": "r1", "title": "Speed up", "body": "Make it fast"},
+            {"prompt": "plain prompt"}
+        ]))
+        assert load_prompts(str(path)) == ["Speed up\n\nMake it fast", "plain prompt"]
+        assert percentile([1, 2, 3, 4], 50) == 2.5
+        assert percentile(list(range(101)), 99) == 99
+
+    def test_saved_results_compare_for_regressions(self, tmp_path):
+        summary = asyncio.run(_generator(_app()).closed_loop(concurrency=2, total_requests=6))
+        config = {"target": "test", "scenario": "chat", "mode": "closed"}
+        baseline = json.loads(open(save_result(summary, config, output_dir=str(tmp_path))).read())
+
+        assert compare(baseline, baseline) == []
+        slower = json.loads(json.dumps(baseline))
+        slower["summary"]["latency_ms"]["p95"] *= 2
+        slower["summary"]["error_rate"] = 0.5
+        regressions = compare(baseline, slower)
+        assert any(r.startswith("latency p95") for r in regressions)
+        assert any(r.startswith("error rate") for r in regressions)
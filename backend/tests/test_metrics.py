@@ -0,0 +1,126 @@
+"""
+Test cases for metrics and the Prometheus exporter
+"""
+
+import asyncio
+import random
+import re
+import threading
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from flask import Flask
+
+from metrics import (
+    MetricsRegistry, PIPELINE_SECONDS, STAGE_SECONDS, benchmark_recording, bucket_index, bucket_range,
+    install_asgi_metrics, install_flask_metrics, metrics
+)
+from pipeline import Pipeline
+
+class TestHistogram:
+
+    def test_buckets_are_contiguous_with_bounded_error(self):
+        previous_high = 0
+        for index in range(bucket_index(3_600_000_000) + 1):
+            low, high = bucket_range(index)
+            assert low == previous_high and high > low
+            assert (high - low) / max(low, 1) <= 1 / 16 or low < 16
+            previous_high = high
+        for micros in [0, 1, 15, 16, 17, 31, 32, 1000, 123_456, 3_599_999_999]:
+            low, high = bucket_range(bucket_index(micros))
+            assert low <= micros < high
+
+    def test_quantiles_are_within_a_bucket(self):
+        histogram = MetricsRegistry().histogram("latency_seconds", "Latency", ["model"]).labels("GLM4.5")
+        values = [random.uniform(0.001, 2.0) for _ in range(20000)]
+        for value in values:
+            histogram.observe(value)
+
+        values.sort()
+        for q in (0.5, 0.9, 0.99):
+            exact = values[int(q * len(values)) - 1]
+            assert abs(histogram.quantile(q) - exact) / exact < 0.07
+        summary = histogram.summary()
+        assert summary["count"] == 20000 and abs(summary["sum_seconds"] - sum(values)) < 1e-3
+
+    def test_concurrent_recording_loses_nothing(self):
+        registry = MetricsRegistry()
+        histogram = registry.histogram("latency_seconds", "Latency", ["model"])
+        counter = registry.counter("calls_total", "Calls", ["model"])
+
+        def worker():
+            for i in range(5000):
+                histogram.labels("GLM4.5").observe(i / 10000)
+                counter.labels("GLM4.5").inc()
+
+        # More threads than stay alive: finished threads' shards are folded in
+        for _ in range(4):
+            threads = [threading.Thread(target=worker) for _ in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        assert histogram.labels("GLM4.5").summary()["count"] == 32 * 5000
+        assert counter.labels("GLM4.5").value == 32 * 5000
+        assert len(histogram.labels("GLM4.5")._shards) <= 9
+
+    def test_recording_costs_microseconds(self):
+        assert benchmark_recording(threads=4, observations=20000)["ns_per_observation"] < 20000
+
+class TestExporter:
+
+    def test_prometheus_text_format(self):
+        registry = MetricsRegistry()
+        registry.counter("calls_total", "Calls", ["model"]).labels('we"ird\nname').inc(3)
+        histogram = registry.histogram("latency_seconds", "Latency", ["model"], buckets=(0.01, 0.1, 1.0))
+        for value in (0.005, 0.05, 0.05, 0.5, 5.0):
+            histogram.labels("GLM4.5").observe(value)
+
+        text = registry.render()
+        assert "# TYPE calls_total counter" in text
+        assert 'calls_total{model="we\\"ird\\nname"} 3' in text
+        assert "# TYPE latency_seconds histogram" in text
+        buckets = re.findall(r'latency_seconds_bucket\{model="GLM4.5",le="([^"]+)"\} (\d+)', text)
+        assert buckets == [("0.01", "1"), ("0.1", "3"), ("1.0", "4"), ("+Inf", "5")]
+        assert 'latency_seconds_count{model="GLM4.5"} 5' in text
+        assert re.search(r'latency_seconds_sum\{model="GLM4.5"\} 5\.6', text)
+
+    def test_pipeline_stages_are_recorded(self):
+        pipeline = Pipeline("metrics_test")
+        pipeline.add_stage("select", lambda ctx: "GLM4.5")
+        pipeline.add_stage("primary:GLM4.5", lambda ctx: "answer", depends_on=["select"])
+        pipeline.add_stage("store_outputs", lambda ctx: None, depends_on=["primary:GLM4.5"])
+        asyncio.run(pipeline.run())
+
+        assert STAGE_SECONDS.labels("metrics_test", "primary", "GLM4.5", "success").summary()["count"] == 1
+        assert STAGE_SECONDS.labels("metrics_test", "persist", "", "success").summary()["count"] == 1
+        assert PIPELINE_SECONDS.labels("metrics_test", "success").summary()["count"] == 1
+
+    def test_flask_and_fastapi_serve_metrics(self):
+        flask_app = Flask("metrics_flask")
+        flask_app.add_url_rule("/ping/<name>", "ping", lambda name: "pong")
+        install_flask_metrics(flask_app, "flask_test")
+        client = flask_app.test_client()
+        client.get("/ping/a")
+        client.get("/ping/b")
+        response = client.get("/metrics")
+        assert response.status_code == 200 and response.mimetype == "text/plain"
+        assert ('orchestratex_http_request_seconds_count{app="flask_test",route="/ping/<name>",'
+                'method="GET",status="200"} 2') in response.get_data(as_text=True)
+
+        fastapi_app = FastAPI()
+
+        @fastapi_app.get("/items/{item_id}")
+        async def item(item_id: int):
+            return {"item": item_id}
+
+        install_asgi_metrics(fastapi_app, "fastapi_test")
+        with TestClient(fastapi_app) as fastapi_client:
+            fastapi_client.get("/items/1")
+            fastapi_client.get("/missing")
+            text = fastapi_client.get("/metrics").text
+        assert ('orchestratex_http_request_seconds_count{app="fastapi_test",route="/items/{item_id}",'
+                'method="GET",status="200"} 1') in text
+        assert 'route="unmatched",method="GET",status="404"' in text
+        assert metrics.get_stats()["orchestratex_http_request_seconds"]
@@ -0,0 +1,107 @@
+"""
+Test cases for the local mock OpenRouter server
+"""
+
+import asyncio
+import json
+import time
+
+import httpx
+
+import rate_limit_handler
+from mock_openrouter import MockOpenRouter, MockOpenRouterServer, ModelProfile
+from token_bucket import TokenBucket
+
+HEADERS = {"Authorization": "Bearer test-key"}
+
+def _outcome(response):
+    body = response.json()
+    body.pop("created", None)  # Wall-clock timestamp
+    return response.status_code, json.dumps(body)
+
+def _chat(base_url, model="m", prompt="hello", **extra):
+    payload = {"model": model, "messages": [{"role": "user", "content": prompt}], **extra}
+    return httpx.post(f"{base_url}/chat/completions", json=payload, headers=HEADERS, timeout=10)
+
+class TestMockOpenRouter:
+
+    def test_same_seed_replays_identical_responses(self):
+        mock = MockOpenRouter({"*": ModelProfile(latency_ms=5, tokens_per_second=0, error_rate_5xx=0.3)}, seed=3)
+        with MockOpenRouterServer(mock) as server:
+            first = [_outcome(_chat(server.base_url)) for _ in range(10)]
+            mock.reset()
+            second = [_outcome(_chat(server.base_url)) for _ in range(10)]
+
+        assert first == second
+        assert {status for status, _ in first} - {200} <= {500, 502, 503}
+        assert len({text for status, text in first if status == 200}) > 1  # Repeats differ from each other
+
+    def test_response_has_usage_and_respects_max_tokens(self):
+        mock = MockOpenRouter({"*": ModelProfile(latency_ms=5, tokens_per_second=0, output_tokens=50)})
+        with MockOpenRouterServer(mock) as server:
+            data = _chat(server.base_url, max_tokens=10).json()
+            assert _chat(server.base_url).status_code == 200
+            unauthorized = httpx.post(f"{server.base_url}/chat/completions", json={"model": "m"})
+
+        assert data["choices"][0]["finish_reason"] == "length"
+        assert len(data["choices"][0]["message"]["content"].split()) == 10
+        assert data["usage"]["completion_tokens"] == 10
+        assert data["usage"]["total_tokens"] == data["usage"]["prompt_tokens"] + 10
+        assert unauthorized.status_code == 401
+        assert mock.get_stats()["status_codes"] == {"200": 2}  # Rejected auth never reaches the simulation
+
+    def test_streaming_paces_tokens_and_ends_with_usage(self):
+        mock = MockOpenRouter({"*": ModelProfile(latency_ms=50, latency_sigma=0, tokens_per_second=100,
+                                                 output_tokens=20)})
+        with MockOpenRouterServer(mock) as server:
+            started = time.perf_counter()
+            events, first_token_at = [], None
+            with httpx.stream("POST", f"{server.base_url}/chat/completions", headers=HEADERS, timeout=10,
+                              json={"model": "m", "stream": True, "messages": [{"role": "user", "content": "hi"}]}) as r:
+                assert r.headers["content-type"].startswith("text/event-stream")
+                for line in r.iter_lines():
+                    if line.startswith("data: "):
+                        events.append(line[6:])
+                        first_token_at = first_token_at or time.perf_counter() - started
+            elapsed = time.perf_counter() - started
+
+        assert events[-1] == "[DONE]"
+        chunks = [json.loads(e) for e in events[:-1]]
+        content = "".join(c["choices"][0]["delta"].get("content", "") for c in chunks)
+        assert len(content.split()) == chunks[-1]["usage"]["completion_tokens"]
+        assert chunks[-1]["choices"][0]["finish_reason"] == "stop"
+        assert 0.05 <= first_token_at < elapsed
+        assert elapsed >= 0.05 + (len(content.split()) - 1) * 0.01
+
+    def test_request_window_sends_ratelimit_headers_and_429(self):
+        mock = MockOpenRouter({"limited/*": ModelProfile(latency_ms=1, tokens_per_second=0, requests_per_window=2,
+                                                         window_seconds=30),
+                               "*": ModelProfile(latency_ms=1, tokens_per_second=0)})
+        with MockOpenRouterServer(mock) as server:
+            responses = [_chat(server.base_url, model="limited/a") for _ in range(3)]
+            other_model = _chat(server.base_url, model="other")
+
+        assert [r.status_code for r in responses] == [200, 200, 429]
+        assert [r.headers["x-ratelimit-remaining"] for r in responses] == ["1", "0", "0"]
+        assert 29 <= int(responses[2].headers["retry-after"]) <= 30
+        assert "x-ratelimit-limit" not in other_model.headers
+
+        # The client-side token bucket understands the headers
+        bucket = TokenBucket("limited/a", rate_per_min=60)
+        bucket.update_from_headers(responses[2].headers)
+        assert bucket.wait_time() > 28
+
+    def test_client_runs_against_mock_by_base_url(self, monkeypatch):
+        mock = MockOpenRouter({"*": ModelProfile(latency_ms=5, tokens_per_second=0, output_tokens=8)})
+        with MockOpenRouterServer(mock) as server:
+            monkeypatch.setenv("OPENROUTER_BASE_URL", server.base_url)
+            monkeypatch.setattr(rate_limit_handler, "get_api_key", lambda provider: "test-key")
+            monkeypatch.setattr(rate_limit_handler, "increment_usage", lambda provider, api_key=None: None)
+            client = rate_limit_handler.RateLimitAwareAPIClient()
+
+            result = asyncio.run(client.acall_openrouter_api("MOCKPROV", "mock/model", "hi"))
+
+        assert client.base_url == f"{server.base_url}/chat/completions"
+        assert result["success"]
+        assert len(result["response"].split()) == mock.get_stats()["completion_tokens"]
+        assert mock.get_stats()["models"] == {"mock/model": 1}
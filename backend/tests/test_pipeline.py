@@ -0,0 +1,146 @@
+"""
+Test cases for the DAG pipeline executor
+"""
+
+import asyncio
+import time
+
+import pytest
+
+from pipeline import Pipeline, PipelineError
+
+def _sleeper(name, delay, log=None):
+    async def stage(ctx):
+        if log is not None:
+            log.append(name)
+        await asyncio.sleep(delay)
+        return name
+    return stage
+
+class TestPipeline:
+
+    def test_independent_stages_run_concurrently(self):
+        """Three 0.1s stages without dependencies finish in about 0.1s"""
+        pipeline = Pipeline("concurrent")
+        for name in ("a", "b", "c"):
+            pipeline.add_stage(name, _sleeper(name, 0.1))
+
+        started = time.perf_counter()
+        result = pipeline.run_sync()
+        elapsed = time.perf_counter() - started
+
+        assert result.results == {"a": "a", "b": "b", "c": "c"}
+        assert elapsed < 0.25
+
+    def test_dependencies_see_upstream_results(self):
+        """A stage starts after its dependencies and receives their results"""
+        pipeline = Pipeline("ordered")
+        pipeline.add_stage("first", lambda ctx: ctx["seed"] + 1)
+        pipeline.add_stage("second", lambda ctx: ctx["first"] * 10, depends_on=["first"])
+
+        result = pipeline.run_sync({"seed": 1})
+
+        assert result["second"] == 20
+        assert result.timings["second"].start_ms >= result.timings["first"].end_ms
+
+    def test_retry_then_success(self):
+        """A failing stage is retried with the configured attempts"""
+        attempts = []
+
+        def flaky(ctx):
+            attempts.append(1)
+            if len(attempts) < 3:
+                raise RuntimeError("transient")
+            return "ok"
+
+        pipeline = Pipeline("retry").add_stage("flaky", flaky, retries=2, retry_delay=0.01)
+        result = pipeline.run_sync()
+
+        assert result["flaky"] == "ok"
+        assert result.timings["flaky"].attempts == 3
+
+    def test_timed_out_sync_stage_is_not_retried(self):
+        """The thread of a timed-out sync stage keeps running, so no second copy is started"""
+        calls = []
+
+        def slow_write(ctx):
+            calls.append(1)
+            time.sleep(0.2)
+
+        pipeline = Pipeline("sync_timeout").add_stage("write", slow_write, timeout=0.05, retries=2,
+                                                      retry_delay=0.01, required=False)
+        result = pipeline.run_sync()
+
+        assert result["write"] is None
+        assert result.timings["write"].attempts == 1 and len(calls) == 1
+
+    def test_timeout_on_optional_stage_yields_none(self):
+        """An optional stage that times out does not abort the pipeline"""
+        pipeline = Pipeline("optional")
+        pipeline.add_stage("slow", _sleeper("slow", 1.0), timeout=0.05, required=False)
+        pipeline.add_stage("fast", _sleeper("fast", 0.01))
+
+        result = pipeline.run_sync()
+
+        assert result["slow"] is None
+        assert result["fast"] == "fast"
+        assert result.timings["slow"].status == "failed"
+
+    def test_required_failure_cancels_pending_and_keeps_partial_results(self):
+        """A required stage failure raises PipelineError with completed results"""
+        log = []
+
+        def boom(ctx):
+            raise ValueError("boom")
+
+        pipeline = Pipeline("failing")
+        pipeline.add_stage("ok", _sleeper("ok", 0))
+        pipeline.add_stage("boom", boom, depends_on=["ok"])
+        pipeline.add_stage("after", _sleeper("after", 0, log), depends_on=["boom"])
+
+        with pytest.raises(PipelineError) as exc_info:
+            pipeline.run_sync()
+
+        assert exc_info.value.stage == "boom"
+        assert exc_info.value.results == {"ok": "ok"}
+        assert isinstance(exc_info.value.__cause__, ValueError)
+        assert log == []
+
+    def test_invalid_graphs_are_rejected(self):
+        """Unknown dependencies and cycles fail validation"""
+        unknown = Pipeline("unknown").add_stage("a", _sleeper("a", 0), depends_on=["missing"])
+        with pytest.raises(PipelineError):
+            unknown.validate()
+
+        cyclic = Pipeline("cyclic")
+        cyclic.add_stage("a", _sleeper("a", 0), depends_on=["b"])
+        cyclic.add_stage("b", _sleeper("b", 0), depends_on=["a"])
+        with pytest.raises(PipelineError):
+            cyclic.validate()
+
+    def test_critical_path_follows_slowest_branch(self):
+        """The critical path goes through the slower of two parallel branches"""
+        pipeline = Pipeline("critical")
+        pipeline.add_stage("fast", _sleeper("fast", 0.01))
+        pipeline.add_stage("slow", _sleeper("slow", 0.08))
+        pipeline.add_stage("join", _sleeper("join", 0), depends_on=["fast", "slow"])
+
+        result = pipeline.run_sync()
+
+        assert result.critical_path == ["slow", "join"]
+        assert result.timing_summary()["critical_path"] == ["slow", "join"]
+
+    def test_run_sync_shares_one_loop_and_http_client(self):
+        """Repeated run_sync calls reuse the background loop's pooled client instead of leaking one per call"""
+        from http_transport import _async_clients, get_async_client
+
+        async def client(ctx):
+            return get_async_client()
+
+        clients = set()
+        for _ in range(3):
+            pipeline = Pipeline("reuse")
+            pipeline.add_stage("client", client)
+            clients.add(id(pipeline.run_sync().results["client"]))
+        assert len(clients) == 1
+        assert not any(loop is not None and loop.is_closed() for loop in _async_clients)
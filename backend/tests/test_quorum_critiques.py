@@ -0,0 +1,109 @@
+"""
+Test cases for quorum-based critique completion
+"""
+
+import asyncio
+import time
+
+import pytest
+
+from advanced_client import ModelResponse, MultiModelOrchestrator
+
+# Seconds each simulated critic takes, and how many of its first attempts fail
+LATENCY = {"TNG DeepSeek": 0.02, "GPT-OSS": 0.02, "MoonshotAI Kimi": 0.05, "Llama 4 Maverick": 1.0, "Qwen3": 1.0}
+
+def make_orchestrator(failures=None, **kwargs):
+    orchestrator = MultiModelOrchestrator(min_successful_critiques=3, critique_mode="quorum",
+                                          critique_retry_delay=0.01, **kwargs)
+    orchestrator.key_manager.api_keys = {}
+    orchestrator.calls = []
+    orchestrator.cancelled = []
+    failures = dict(failures or {})
+
+    async def select(prompt):
+        return "GLM4.5", {"GLM4.5": 0.9}
+
+    async def simulate(model_name, prompt, is_critique=False):
+        orchestrator.calls.append((model_name, time.perf_counter()))
+        try:
+            await asyncio.sleep(LATENCY.get(model_name, 0.01) if is_critique else 0.01)
+        except asyncio.CancelledError:
+            orchestrator.cancelled.append(model_name)
+            raise
+        failed = is_critique and failures.get(model_name, 0) > 0
+        if failed:
+            failures[model_name] -= 1
+        return ModelResponse(model_name=model_name, response_text="" if failed else f"{model_name} says ok",
+                             response_type="critique" if is_critique else "primary", tokens_used=5,
+                             latency_ms=1, cost_usd=0.0, confidence_score=0.9, success=not failed)
+
+    orchestrator._call_model_selector_api = select
+    orchestrator._simulate_model_response = simulate
+    return orchestrator
+
+class TestQuorumCritiques:
+
+    def test_returns_at_quorum_and_cancels_slow_critics(self):
+        orchestrator = make_orchestrator()
+        started = time.perf_counter()
+        result = asyncio.run(orchestrator.orchestrate_with_critiques("Explain caching"))
+
+        assert time.perf_counter() - started < 0.5  # Not waiting for the 1s critics
+        assert result.success
+        assert [c.model_name for c in result.critique_responses] == ["TNG DeepSeek", "GPT-OSS", "MoonshotAI Kimi"]
+        assert sorted(orchestrator.cancelled) == ["Llama 4 Maverick", "Qwen3"]
+
+    def test_cancelled_critics_are_unwound_before_returning(self):
+        orchestrator = make_orchestrator()
+        semaphore = asyncio.Semaphore(5)
+        critics = list(LATENCY)
+
+        async def run():
+            responses = await orchestrator._quorum_critiques("Explain caching", critics, {}, semaphore)
+            # Nothing of the round is left running once it returned
+            return responses, list(orchestrator.cancelled), semaphore._value
+
+        responses, cancelled, free_slots = asyncio.run(run())
+        assert len(responses) == 3
+        assert sorted(cancelled) == ["Llama 4 Maverick", "Qwen3"] and free_slots == 5
+
+    def test_failed_critic_retries_on_its_own(self):
+        orchestrator = make_orchestrator(failures={"TNG DeepSeek": 2})
+        result = asyncio.run(orchestrator.orchestrate_with_critiques("Explain caching"))
+
+        deepseek = next(c for c in result.critique_responses if c.model_name == "TNG DeepSeek")
+        assert deepseek.success and deepseek.metadata["attempts"] == 3
+        # Its retries started while the other critics were still running, not in a second round
+        deepseek_calls = [t for model, t in orchestrator.calls if model == "TNG DeepSeek"]
+        kimi_call = next(t for model, t in orchestrator.calls if model == "MoonshotAI Kimi")
+        assert deepseek_calls[1] < kimi_call + LATENCY["MoonshotAI Kimi"]
+
+    def test_deadline_bounds_the_round(self):
+        orchestrator = make_orchestrator(failures={m: 100 for m in LATENCY}, critique_deadline=0.3)
+        started = time.perf_counter()
+        result = asyncio.run(orchestrator.orchestrate_with_critiques("Explain caching"))
+
+        assert time.perf_counter() - started < 0.6
+        assert not result.success and all(not c.success for c in result.critique_responses)
+
+    def test_late_critiques_finish_in_the_background(self):
+        late = []
+
+        async def persist(prompt, response):
+            late.append((prompt, response.model_name, response.success))
+
+        async def run():
+            async with make_orchestrator(late_critiques="background", on_late_critique=persist) as orchestrator:
+                result = await orchestrator.orchestrate_with_critiques("Explain caching")
+                assert late == [] and len(result.critique_responses) == 3
+            return orchestrator
+
+        orchestrator = asyncio.run(run())  # Leaving the context waits for them
+        assert sorted(late) == [("Explain caching", "Llama 4 Maverick", True), ("Explain caching", "Qwen3", True)]
+        assert orchestrator.cancelled == []
+
+    def test_unknown_modes_are_rejected(self):
+        with pytest.raises(ValueError):
+            MultiModelOrchestrator(critique_mode="fastest")
+        with pytest.raises(ValueError):
+            MultiModelOrchestrator(late_critiques="drop")
@@ -0,0 +1,104 @@
+"""
+Test cases for the async rate-limit-aware OpenRouter client
+"""
+
+import asyncio
+import threading
+import time
+
+import httpx
+
+import rate_limit_handler
+from concurrency_limiter import concurrency_limiters
+from response_cache import response_cache
+
+def _ok(text="hello"):
+    return httpx.Response(200, json={"choices": [{"message": {"content": text}}]})
+
+def _install(monkeypatch, handler):
+    """Route the client through a mock transport with a fixed key"""
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(rate_limit_handler, "get_async_client", lambda: client)
+    monkeypatch.setattr(rate_limit_handler, "get_api_key", lambda provider: "test-key")
+    monkeypatch.setattr(rate_limit_handler, "increment_usage", lambda provider, api_key=None: None)
+    monkeypatch.setattr(rate_limit_handler, "handle_rate_limit", lambda provider, info=None, api_key=None: False)
+
+class TestAsyncRateLimitClient:
+
+    def test_retry_after_is_honored_without_blocking(self, monkeypatch):
+        calls = []
+
+        async def handler(request):
+            calls.append(time.perf_counter())
+            if len(calls) == 1:
+                return httpx.Response(429, headers={"retry-after": "0.2"}, json={"error": {"message": "rate limit"}})
+            return _ok()
+
+        _install(monkeypatch, handler)
+
+        async def run():
+            ticks = []
+
+            async def ticker():
+                # Keeps running while the client backs off: the loop is not blocked
+                while len(ticks) < 5:
+                    ticks.append(time.perf_counter())
+                    await asyncio.sleep(0.02)
+
+            result, _ = await asyncio.gather(
+                rate_limit_handler.api_client.acall_openrouter_api("RETRYPROV", "m", "hi"),
+                ticker()
+            )
+            return result, ticks
+
+        result, ticks = asyncio.run(run())
+        assert result["success"] and result["metadata"]["attempt"] == 2
+        assert calls[1] - calls[0] >= 0.2
+        assert len(ticks) == 5
+
+    def test_sync_wrapper_coalesces_identical_calls_from_threads(self, monkeypatch):
+        calls = []
+
+        async def handler(request):
+            calls.append(1)
+            await asyncio.sleep(0.1)
+            return _ok("shared")
+
+        _install(monkeypatch, handler)
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(
+                rate_limit_handler.call_model_with_rotation("SYNCPROV", "m", "same prompt for every thread")
+            ))
+            for _ in range(4)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        response_cache.clear()
+
+        assert len(calls) == 1
+        assert [r["response"] for r in results] == ["shared"] * 4
+
+    def test_cancellation_releases_the_request_slot(self, monkeypatch):
+        async def handler(request):
+            await asyncio.sleep(5)
+            return _ok()
+
+        _install(monkeypatch, handler)
+
+        async def run():
+            task = asyncio.create_task(
+                rate_limit_handler.api_client.acall_openrouter_api("CANCELPROV", "m", "hi")
+            )
+            await asyncio.sleep(0.05)
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                return True
+            return False
+
+        assert asyncio.run(run())
+        assert concurrency_limiters.get("CANCELPROV", "test-key").get_stats()["in_flight"] == 0
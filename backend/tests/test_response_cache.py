@@ -0,0 +1,143 @@
+"""
+Test cases for the shared response cache
+"""
+
+import asyncio
+import threading
+import time
+
+from response_cache import ResponseCache, SQLiteTier, make_cache_key
+
+class TestCacheKey:
+
+    def test_whitespace_is_normalized(self):
+        """Prompts differing only in whitespace share a key"""
+        assert make_cache_key("m", "hello   world\n") == make_cache_key("m", " hello world")
+
+    def test_params_are_part_of_key(self):
+        """Model, temperature and max_tokens all change the key"""
+        base = make_cache_key("m", "p", 0.7, 2000)
+        assert base != make_cache_key("other", "p", 0.7, 2000)
+        assert base != make_cache_key("m", "p", 0.8, 2000)
+        assert base != make_cache_key("m", "p", 0.7, 100)
+
+    def test_other_request_params_are_part_of_key(self):
+        """Requests differing in any other parameter never share an entry"""
+        base = make_cache_key("m", "p", 0.7, 2000)
+        assert make_cache_key("m", "p", 0.7, 2000, top_p=0.9) not in (base, make_cache_key("m", "p", 0.7, 2000, top_p=0.5))
+        assert make_cache_key("m", "p", 0.7, 2000, stop=["\n"], top_p=0.9) == \
+            make_cache_key("m", "p", 0.7, 2000, top_p=0.9, stop=["\n"])
+
+class TestResponseCache:
+
+    def test_computes_once_then_hits(self):
+        """Second identical request is served from memory"""
+        cache = ResponseCache()
+        calls = []
+        compute = lambda: calls.append(1) or {"success": True}
+
+        assert cache.get_or_compute("k", compute) == {"success": True}
+        assert cache.get_or_compute("k", compute) == {"success": True}
+        assert len(calls) == 1
+        assert cache.get_stats()["hits"] == 1
+
+    def test_bypass_and_should_cache(self):
+        """Bypassed calls and rejected values are never stored"""
+        cache = ResponseCache()
+        cache.get_or_compute("k", lambda: {"success": True}, bypass=True)
+        cache.get_or_compute("f", lambda: {"success": False}, should_cache=lambda r: r["success"])
+        assert cache.get("k") is None
+        assert cache.get("f") is None
+
+    def test_lru_eviction_and_ttl(self):
+        """Oldest entries are evicted and expired entries are dropped"""
+        cache = ResponseCache(max_entries=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.set("c", 3)
+        assert cache.get("a") is None
+        cache.set("d", 4, ttl_seconds=-1)
+        assert cache.get("d") is None
+
+    def test_threads_are_coalesced(self):
+        """Concurrent identical sync requests make one upstream call"""
+        cache = ResponseCache()
+        calls = []
+
+        def compute():
+            calls.append(1)
+            time.sleep(0.05)
+            return "value"
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(cache.get_or_compute("k", compute)))
+                   for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert results == ["value"] * 8
+        assert len(calls) == 1
+
+    def test_stats_are_exact_under_concurrency(self):
+        """Counters updated from many threads lose no increments"""
+        cache = ResponseCache()
+        cache.set("k", {"success": True})
+
+        def worker():
+            for _ in range(2000):
+                cache.get_or_compute("k", lambda: {"success": True})
+                cache.get_or_compute("k", lambda: {"success": True}, bypass=True)
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        stats = cache.get_stats()
+        assert stats["hits"] == 16000 and stats["bypassed"] == 16000
+
+    def test_async_requests_are_coalesced(self):
+        """Concurrent identical async requests make one upstream call"""
+        cache = ResponseCache()
+        calls = []
+
+        async def compute():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return {"text": "value"}
+
+        async def run():
+            return await asyncio.gather(*[cache.aget_or_compute("k", compute) for _ in range(8)])
+
+        results = asyncio.run(run())
+        assert all(r == {"text": "value"} for r in results)
+        assert len(calls) == 1
+
+    def test_requests_on_another_event_loop_are_not_joined(self):
+        """A second loop (e.g. the background loop next to uvicorn's) makes its own call"""
+        cache = ResponseCache()
+        started = threading.Event()
+
+        async def compute():
+            started.set()
+            await asyncio.sleep(0.1)
+            return {"text": "value"}
+
+        results = []
+        leader = threading.Thread(target=lambda: results.append(asyncio.run(cache.aget_or_compute("k", compute))))
+        leader.start()
+        started.wait(1)
+        results.append(asyncio.run(cache.aget_or_compute("k", compute)))
+        leader.join()
+        assert results == [{"text": "value"}, {"text": "value"}]
+
+    def test_sqlite_tier_survives_restart(self, tmp_path):
+        """Values written to the SQLite tier are visible to a new cache instance"""
+        db_path = str(tmp_path / "cache.db")
+        ResponseCache(persistent_tier=SQLiteTier(db_path)).set("k", {"success": True})
+
+        fresh = ResponseCache(persistent_tier=SQLiteTier(db_path))
+        assert fresh.get("k") == {"success": True}
+        assert fresh.get_stats()["persistent_hits"] == 1
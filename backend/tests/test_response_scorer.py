@@ -0,0 +1,46 @@
+"""
+Test cases for the local response quality scorer
+"""
+
+import time
+
+from response_scorer import QUALITY_WEIGHTS, rank_responses, score_responses
+
+PROMPT = "How do Python decorators work and why would I use them?"
+
+ON_TOPIC = ("Python decorators are functions that take a function and return a new one. "
+            "You use them for logging, caching and access control because they keep code DRY. ") * 3
+OFF_TOPIC = "The weather is sunny today. I had pizza for lunch and went for a walk in the park afterwards."
+
+class TestResponseScorer:
+
+    def test_relevant_response_ranks_first(self):
+        """An on-topic answer outranks an off-topic one and an empty one"""
+        assert rank_responses(PROMPT, [OFF_TOPIC, "", ON_TOPIC]) == [2, 0, 1]
+
+    def test_factors_and_weights(self):
+        """Overall score is the weighted sum of the four quality factors"""
+        score = score_responses(PROMPT, [ON_TOPIC])[0]
+        expected = sum(score[name] * weight for name, weight in QUALITY_WEIGHTS.items())
+        assert abs(score["overall_score"] - expected) < 1e-3
+        assert 0.3 <= score["relevance"] <= 1.0
+
+    def test_empty_inputs(self):
+        """No candidates gives no scores; empty candidates score zero"""
+        assert score_responses(PROMPT, []) == []
+        assert score_responses(PROMPT, [""])[0]["overall_score"] == 0.0
+
+    def test_scores_are_deterministic(self):
+        """Scoring the same batch twice gives identical results"""
+        batch = [ON_TOPIC, OFF_TOPIC]
+        assert score_responses(PROMPT, batch) == score_responses(PROMPT, batch)
+
+    def test_batch_is_fast(self):
+        """Six typical responses are scored well within a few milliseconds"""
+        batch = [ON_TOPIC, OFF_TOPIC] * 3
+        score_responses(PROMPT, batch)
+        started = time.perf_counter()
+        for _ in range(20):
+            score_responses(PROMPT, batch)
+        per_response_ms = (time.perf_counter() - started) * 1000 / (20 * len(batch))
+        assert per_response_ms < 1.0
@@ -0,0 +1,113 @@
+"""
+Test cases for the orchestration result store
+"""
+
+import asyncio
+
+import pytest
+
+from advanced_client import ModelResponse, MultiModelOrchestrator, OrchestrationResult
+from result_store import JSONLResultStore, SQLiteResultStore, open_result_store, prompt_hash
+
+def make_result(i, model="GLM4.5", success=True, day=1):
+    primary = ModelResponse(model_name=model, response_text=f"answer {i}", response_type="primary",
+                            tokens_used=10, latency_ms=5, cost_usd=0.0, confidence_score=1.0, success=success)
+    return OrchestrationResult(original_prompt=f"prompt {i % 10}", selected_model=model,
+                               model_confidence_scores={model: 0.9}, primary_response=primary,
+                               critique_responses=[], total_latency_ms=5, total_cost_usd=0.0,
+                               success=success, timestamp=f"2026-01-{day:02d}T00:00:{i % 60:02d}")
+
+@pytest.fixture(params=["sqlite", "jsonl"])
+def store_path(request, tmp_path):
+    return str(tmp_path / ("results.db" if request.param == "sqlite" else "results.jsonl"))
+
+class TestResultStore:
+
+    def test_appends_are_batched(self, store_path):
+        store = open_result_store(store_path, batch_size=50, flush_interval=60)
+        for i in range(120):
+            store.append(make_result(i))
+        assert store.get_stats()["batches"] == 2 and store.get_stats()["pending"] == 20
+
+        assert store.count() == 120  # Queries see queued results too
+        store.close()
+        assert open_result_store(store_path).count() == 120
+
+    def test_query_filters_on_indexed_fields(self, store_path):
+        with open_result_store(store_path) as store:
+            for i in range(30):
+                store.append(make_result(i, model="Qwen3" if i % 3 == 0 else "GLM4.5",
+                                         success=i % 5 != 0, day=1 + i // 10))
+
+            assert store.count(selected_model="Qwen3") == 10
+            assert store.count(success=False) == 6
+            assert store.count(prompt="prompt   3") == 3  # Whitespace-normalized
+            assert store.count(since="2026-01-02", until="2026-01-03") == 10
+            assert store.count(selected_model="GLM4.5", success=False, since="2026-01-02") == 3
+
+            newest = list(store.query(limit=2, newest_first=True))
+            assert [r["primary_response"]["response_text"] for r in newest] == ["answer 29", "answer 28"]
+            assert store.summary()["Qwen3"] == {"results": 10, "successful": 8, "success_rate": 0.8}
+
+    def test_query_streams_while_writing(self, store_path):
+        with open_result_store(store_path, batch_size=10) as store:
+            for i in range(100):
+                store.append(make_result(i))
+            seen = 0
+            for record in store.query():
+                if seen == 0:
+                    store.append(make_result(999))  # Appending mid-stream is fine
+                seen += 1
+            assert seen >= 100 and store.count() == 101
+
+    def test_compaction_keeps_latest_per_prompt_and_model(self, store_path):
+        with open_result_store(store_path) as store:
+            for i in range(40):
+                store.append(make_result(i, day=1 + i // 20))
+            store.append(make_result(100, model="Qwen3"))
+
+            assert store.compact() == 30  # 10 prompts x GLM4.5 + 1 Qwen3 remain
+            assert store.count() == 11
+            assert {r["primary_response"]["response_text"] for r in store.query(prompt="prompt 0")} == {"answer 30", "answer 100"}
+
+            assert store.compact(before="2026-01-02") == 1  # The day-1 Qwen3 result
+            store.append(make_result(7, day=3))
+            assert store.count() == 11
+        assert open_result_store(store_path).count() == 11
+
+    def test_jsonl_store_recovers_from_torn_write(self, tmp_path):
+        path = tmp_path / "results.jsonl"
+        with JSONLResultStore(str(path)) as store:
+            store.extend([make_result(i) for i in range(5)])
+        with open(path, "ab") as f:
+            f.write(b'{"prompt": "cut off')
+
+        with JSONLResultStore(str(path)) as store:
+            assert store.count() == 5
+            store.append(make_result(5))
+        assert JSONLResultStore(str(path)).count() == 6
+
+    def test_orchestrator_persists_to_the_store(self, tmp_path):
+        store = SQLiteResultStore(str(tmp_path / "results.db"))
+        orchestrator = MultiModelOrchestrator(result_store=store, min_successful_critiques=0)
+        orchestrator.key_manager.api_keys = {}
+
+        async def select(prompt):
+            return "GLM4.5", {"GLM4.5": 0.9}
+
+        async def simulate(model_name, prompt, is_critique=False):
+            return ModelResponse(model_name=model_name, response_text="ok", response_type="primary",
+                                 tokens_used=1, latency_ms=1, cost_usd=0.0, confidence_score=1.0, success=True)
+
+        orchestrator._call_model_selector_api = select
+        orchestrator._simulate_model_response = simulate
+
+        async def run():
+            async for _ in orchestrator.orchestrate_many([f"q{i}" for i in range(25)], concurrency=5):
+                pass
+
+        asyncio.run(run())
+        orchestrator.save_result(make_result(1))
+        assert store.count() == 26
+        assert store.count(prompt="q3", selected_model="GLM4.5", success=True) == 1
+        assert prompt_hash("q3") == prompt_hash(" q3 ")
@@ -0,0 +1,239 @@
+"""
+Test cases for rotation state shared across instances
+"""
+
+import os
+import socketserver
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+from api_key_rotation import APIKeyRotationManager
+from shared_key_state import (
+    MARK_LIMITED_SCRIPT, MemoryStateBackend, RedisStateBackend, RespClient, RespError, SQLiteStateBackend, key_id
+)
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+class _RespHandler(socketserver.StreamRequestHandler):
+    """Just enough of a Redis server for the state backend"""
+
+    def _read_command(self):
+        header = self.rfile.readline()
+        if not header:
+            return None
+        args = []
+        for _ in range(int(header[1:])):
+            size = int(self.rfile.readline()[1:])
+            args.append(self.rfile.read(size + 2)[:-2].decode())
+        return args
+
+    def _reply(self, value):
+        if isinstance(value, int):
+            return b":%d\r\n" % value
+        if value is None:
+            return b"$-1\r\n"
+        if isinstance(value, list):
+            return b"*%d\r\n" % len(value) + b"".join(self._reply(item) for item in value)
+        data = str(value).encode()
+        return b"$%d\r\n%s\r\n" % (len(data), data)
+
+    def handle(self):
+        data = self.server.data
+        while True:
+            command = self._read_command()
+            if command is None:
+                return
+            name, args = command[0].upper(), command[1:]
+            with self.server.lock:
+                if name == "PING":
+                    out = b"+PONG\r\n"
+                elif name == "GET":
+                    out = self._reply(data.get(args[0]))
+                elif name == "INCR" and isinstance(data.get(args[0]), dict):
+                    out = b"-WRONGTYPE Operation against a key holding the wrong kind of value\r\n"
+                elif name == "INCR":
+                    data[args[0]] = str(int(data.get(args[0], 0)) + 1)
+                    out = self._reply(int(data[args[0]]))
+                elif name == "EVAL" and args[0] == MARK_LIMITED_SCRIPT:
+                    table, field, until = data.setdefault(args[2], {}), args[4], args[5]
+                    if field not in table or float(table[field]) < float(until):
+                        table[field] = until
+                    data[args[3]] = str(int(data.get(args[3], 0)) + 1)
+                    out = self._reply(int(data[args[3]]))
+                elif name == "HSET":
+                    data.setdefault(args[0], {})[args[1]] = args[2]
+                    out = self._reply(1)
+                elif name == "HDEL":
+                    out = self._reply(sum(1 for field in args[1:] if data.get(args[0], {}).pop(field, None) is not None))
+                elif name == "HINCRBY":
+                    table = data.setdefault(args[0], {})
+                    table[args[1]] = str(int(table.get(args[1], 0)) + int(args[2]))
+                    out = self._reply(int(table[args[1]]))
+                elif name == "HGETALL":
+                    out = self._reply([item for pair in data.get(args[0], {}).items() for item in pair])
+                else:
+                    out = b"-ERR unknown command\r\n"
+            self.wfile.write(out)
+
+@pytest.fixture
+def resp_server():
+    server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), _RespHandler)
+    server.daemon_threads = True
+    server.data, server.lock = {}, threading.Lock()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"redis://127.0.0.1:{server.server_address[1]}/0"
+    server.shutdown()
+    server.server_close()
+
+@pytest.fixture
+def env_file(tmp_path, monkeypatch):
+    for provider in ['GLM45', 'GPTOSS', 'LLAMA3', 'KIMI', 'QWEN3', 'FALCON']:
+        monkeypatch.delenv(f'PROVIDER_{provider}_API_KEY', raising=False)
+    path = tmp_path / "orche.env"
+    path.write_text(
+        "PROVIDER_GLM45_API_KEY=sk-key-0-aaaaaaaaaaaaaaaaaaaa\n"
+        "PROVIDER_GLM45_BACKUP_KEYS=sk-key-1-bbbbbbbbbbbbbbbbbbbb,sk-key-2-cccccccccccccccccccc\n"
+    )
+    return str(path)
+
+def _replicas(env_file, make_backend, count=2):
+    return [APIKeyRotationManager(env_file=env_file, shared_state=make_backend(), state_poll_seconds=0.01)
+            for _ in range(count)]
+
+def _wait_for(condition, timeout=2.0):
+    started = time.perf_counter()
+    while not condition():
+        if time.perf_counter() - started > timeout:
+            raise AssertionError("condition not met in time")
+        time.sleep(0.002)
+    return time.perf_counter() - started
+
+class TestSharedKeyState:
+
+    @pytest.mark.parametrize("kind", ["sqlite", "redis"])
+    def test_rate_limit_seen_by_one_replica_reaches_all(self, kind, env_file, tmp_path, resp_server):
+        make_backend = {
+            "sqlite": lambda: SQLiteStateBackend(str(tmp_path / "key_state.db")),
+            "redis": lambda: RedisStateBackend(resp_server)
+        }[kind]
+        first, second = _replicas(env_file, make_backend)
+        try:
+            throttled = first.api_keys["GLM45"]["all_keys"][0]
+            first.handle_rate_limit_error("GLM45", api_key=throttled)
+
+            elapsed = _wait_for(lambda: second.get_provider_status("GLM45")["keys_status"][0]["rate_limited"])
+            assert elapsed < 0.5
+            assert throttled not in {second.get_current_api_key("GLM45") for _ in range(20)}
+
+            # Clearing on one replica puts the key back everywhere
+            second.reset_provider_limits("GLM45")
+            _wait_for(lambda: not first.get_provider_status("GLM45")["keys_status"][0]["rate_limited"])
+        finally:
+            first.close()
+            second.close()
+
+    def test_usage_is_counted_across_replicas(self, env_file, resp_server):
+        first, second = _replicas(env_file, lambda: RedisStateBackend(resp_server))
+        try:
+            key = first.api_keys["GLM45"]["all_keys"][1]
+            for manager in (first, second, second):
+                manager.increment_request_count("GLM45", key)
+
+            # Increments are published in the background, one per key and poll
+            _wait_for(lambda: first.get_provider_status("GLM45")["keys_status"][1]["requests_all_instances"] == 3)
+            status = first.get_provider_status("GLM45")
+            assert status["keys_status"][1]["requests"] == 1
+            assert status["shared_state"] == "RedisStateBackend"
+        finally:
+            first.close()
+            second.close()
+
+    def test_callers_do_not_wait_for_the_backend(self, env_file):
+        class SlowBackend(MemoryStateBackend):
+            calls = 0
+
+            def incr_usage(self, provider, key, amount=1):
+                SlowBackend.calls += 1
+                time.sleep(0.2)
+                super().incr_usage(provider, key, amount)
+
+            def mark_limited(self, provider, key, until):
+                time.sleep(0.2)
+                super().mark_limited(provider, key, until)
+
+        backend = SlowBackend()
+        manager = APIKeyRotationManager(env_file=env_file, shared_state=backend, state_poll_seconds=0.01)
+        try:
+            key = manager.api_keys["GLM45"]["all_keys"][0]
+            started = time.perf_counter()
+            for _ in range(50):
+                manager.increment_request_count("GLM45", key)
+            manager.handle_rate_limit_error("GLM45", api_key=key)
+            assert time.perf_counter() - started < 0.1
+
+            _wait_for(lambda: backend.usage("GLM45").get(key_id(key)) == 50 and backend.cooldowns("GLM45"))
+            assert SlowBackend.calls < 50
+        finally:
+            manager.close()
+
+    def test_unpublished_local_cooldown_survives_a_sync(self, env_file):
+        backend = MemoryStateBackend()
+        manager = APIKeyRotationManager(env_file=env_file, shared_state=backend, state_poll_seconds=60)
+        try:
+            key = manager.api_keys["GLM45"]["all_keys"][0]
+            manager.handle_rate_limit_error("GLM45", api_key=key)
+            manager.sync_shared_state()  # The shared state does not know the cooldown yet
+            assert manager.get_provider_status("GLM45")["keys_status"][0]["rate_limited"]
+
+            # Once published, a clear from another instance applies
+            manager.publish_pending()
+            backend.clear("GLM45", [key_id(key)])
+            manager.sync_shared_state()
+            assert not manager.get_provider_status("GLM45")["keys_status"][0]["rate_limited"]
+        finally:
+            manager.close()
+
+    def test_sqlite_state_is_shared_between_processes(self, tmp_path):
+        path = str(tmp_path / "key_state.db")
+        backend = SQLiteStateBackend(path)
+        version = backend.version()
+        subprocess.run([sys.executable, "-c", (
+            "import sys, time; from shared_key_state import SQLiteStateBackend, key_id; "
+            f"b = SQLiteStateBackend({path!r}); b.mark_limited('GLM45', key_id('sk-x'), time.time() + 60); "
+            "b.incr_usage('GLM45', key_id('sk-x'), 5)"
+        )], check=True, cwd=ROOT)
+
+        assert backend.version() > version
+        assert set(backend.cooldowns("GLM45")) == {key_id("sk-x")}
+        assert backend.usage("GLM45") == {key_id("sk-x"): 5}
+
+    @pytest.mark.parametrize("kind", ["sqlite", "redis"])
+    def test_later_cooldown_wins(self, kind, tmp_path, resp_server):
+        backend = SQLiteStateBackend(str(tmp_path / "key_state.db")) if kind == "sqlite" \
+            else RedisStateBackend(resp_server)
+        later = time.time() + 60
+        backend.mark_limited("GLM45", "k", later)
+        version = backend.version()
+        backend.mark_limited("GLM45", "k", later - 30)  # Another replica's shorter cooldown
+        assert backend.cooldowns("GLM45") == {"k": later}
+        assert backend.version() > version
+
+    def test_error_reply_keeps_the_pipeline_in_step(self, resp_server):
+        client = RespClient(resp_server)
+        client.execute("HSET", "hash", "field", "1")
+        client.execute("INCR", "n")
+        with pytest.raises(RespError, match="WRONGTYPE"):
+            client.pipeline(["INCR", "hash"], ["INCR", "n"])
+        assert client.execute("GET", "n") == "2"
+        client.close()
+
+    def test_resp_client_pipelines_and_reconnects(self, resp_server):
+        client = RespClient(resp_server)
+        assert client.pipeline(["INCR", "n"], ["INCR", "n"], ["GET", "n"]) == [1, 2, "2"]
+        client._sock.close()  # Dropped connection: the next command reconnects
+        assert client.execute("PING") == "PONG"
+        client.close()
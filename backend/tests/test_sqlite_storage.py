@@ -0,0 +1,128 @@
+"""
+Test cases for the pooled, batched SQLite storage used by the Model APIs
+"""
+
+import json
+import sqlite3
+import threading
+
+import pytest
+
+from sqlite_storage import SQLiteStorage, benchmark_inserts, get_storage
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS conversations (
+        conversation_id TEXT PRIMARY KEY,
+        user_id TEXT,
+        prompt TEXT NOT NULL
+    )
+"""
+INSERT = "INSERT INTO conversations (conversation_id, user_id, prompt) VALUES (?, ?, ?)"
+
+@pytest.fixture
+def storage(tmp_path):
+    storage = SQLiteStorage(str(tmp_path / "conversations.db"))
+    storage.executescript(SCHEMA)
+    yield storage
+    storage.close()
+
+class TestSQLiteStorage:
+
+    def test_database_is_in_wal_mode(self, storage):
+        conn = sqlite3.connect(storage.db_path)
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        conn.close()
+
+    def test_concurrent_writes_are_batched(self, storage):
+        def worker(t):
+            for i in range(250):
+                storage.write(INSERT, (f"conv_{t}_{i}", f"user_{t}", "hello"))
+
+        threads = [threading.Thread(target=worker, args=(t,)) for t in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        storage.flush()
+
+        stats = storage.get_stats()
+        assert stats["writes"] == 2000 and stats["failed_writes"] == 0
+        assert stats["batches"] < 2000 and stats["largest_batch"] > 1
+        assert storage.read("SELECT COUNT(*) AS n FROM conversations") == [{"n": 2000}]
+
+    def test_failed_write_does_not_drop_its_batch(self, storage):
+        storage.write(INSERT, ("conv_1", "user_1", "first"))
+        storage.write(INSERT, ("conv_1", "user_1", "duplicate"))
+        storage.write(INSERT, ("conv_2", "user_1", "second"))
+        storage.flush()
+
+        rows = storage.read("SELECT conversation_id, prompt FROM conversations ORDER BY conversation_id")
+        assert rows == [{"conversation_id": "conv_1", "prompt": "first"},
+                        {"conversation_id": "conv_2", "prompt": "second"}]
+        assert storage.get_stats()["failed_writes"] == 1
+        with pytest.raises(sqlite3.IntegrityError):
+            storage.write(INSERT, ("conv_2", "user_1", "again"), wait=True)
+        assert storage.write("UPDATE conversations SET prompt = ? WHERE user_id = ?", ("edited", "user_1"),
+                             wait=True) == 2
+
+    def test_unbindable_values_do_not_stop_the_writer(self, storage):
+        lone_surrogate = json.loads('"\\ud800"')
+        storage.write(INSERT, ("conv_1", "user_1", lone_surrogate))
+        storage.write(INSERT, ("conv_2", "user_1", "fine"))
+        with pytest.raises(OverflowError):
+            storage.write("UPDATE conversations SET user_id = ?", (2 ** 70,), wait=True)
+
+        assert storage.write(INSERT, ("conv_3", "user_1", "after"), wait=True) == 1
+        assert storage._writer.is_alive()
+        assert storage.get_stats()["failed_writes"] == 2
+        assert [row["conversation_id"] for row in storage.read("SELECT conversation_id FROM conversations")] \
+            == ["conv_2", "conv_3"]
+
+    def test_reads_share_a_bounded_read_only_pool(self, tmp_path):
+        storage = SQLiteStorage(str(tmp_path / "pool.db"), read_pool_size=2)
+        storage.executescript(SCHEMA)
+        storage.write_many(INSERT, [(f"conv_{i}", "user", "hello") for i in range(10)], wait=True)
+
+        errors = []
+
+        def reader():
+            try:
+                for _ in range(50):
+                    assert len(storage.read("SELECT * FROM conversations WHERE user_id = ?", ("user",))) == 10
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=reader) for _ in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert not errors and storage.get_stats()["read_connections"] <= 2
+
+        with storage.reader() as conn:
+            with pytest.raises(sqlite3.OperationalError):
+                conn.execute("DELETE FROM conversations")
+        storage.close()
+
+    def test_close_commits_queued_writes(self, tmp_path):
+        path = str(tmp_path / "shared.db")
+        storage = get_storage(path)
+        assert get_storage(path) is storage  # One writer per database file
+        storage.executescript(SCHEMA)
+        for i in range(100):
+            storage.write(INSERT, (f"conv_{i}", "user", "hello"))
+        storage.close()
+        with pytest.raises(RuntimeError):
+            storage.write(INSERT, ("late", "user", "hello"))
+
+        conn = sqlite3.connect(path)
+        assert conn.execute("SELECT COUNT(*) FROM conversations").fetchone()[0] == 100
+        conn.close()
+        assert get_storage(path) is not storage
+        get_storage(path).close()
+
+    def test_benchmark_reports_both_modes(self, tmp_path):
+        result = benchmark_inserts(inserts=200, threads=4, directory=str(tmp_path))
+        assert result["inserts"] == 200
+        assert result["per_request_inserts_per_second"] > 0 and result["storage_inserts_per_second"] > 0
+        assert result["storage_waited_inserts_per_second"] > 0
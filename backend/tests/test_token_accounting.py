@@ -0,0 +1,101 @@
+"""
+Test cases for token accounting and max_tokens sizing
+"""
+
+import asyncio
+import json
+
+import httpx
+
+import rate_limit_handler
+from app.ai_providers.enhanced_manager import EnhancedProviderManager
+from app.ai_providers.openrouter_provider import OpenRouterProvider
+from token_accounting import (
+    context_length, detect_intent, estimate_tokens, size_max_tokens, usage_from_response
+)
+
+class TestUsage:
+
+    def test_reported_usage_wins_over_estimate(self):
+        data = {"usage": {"prompt_tokens": 12, "completion_tokens": 30, "total_tokens": 42, "cost": 0.0021}}
+        usage = usage_from_response(data, "prompt", "completion", "openai/gpt-4o")
+        assert usage == {"input_tokens": 12, "output_tokens": 30, "total_tokens": 42,
+                         "cost_usd": 0.0021, "usage_source": "reported"}
+
+        free = usage_from_response({"usage": {"prompt_tokens": 5, "completion_tokens": 5}}, "p", "c", "z-ai/glm-4.5-air:free")
+        assert free["total_tokens"] == 10 and free["cost_usd"] == 0.0
+
+    def test_estimate_when_usage_is_missing(self):
+        usage = usage_from_response({}, "Hello there, world!", "Fine, thanks.", "some/model")
+        assert usage["usage_source"] == "estimated"
+        assert usage["input_tokens"] == estimate_tokens("Hello there, world!") == 5
+        assert usage["cost_usd"] > 0
+        assert estimate_tokens("internationalization") > 1  # Long words are several tokens
+
+class TestMaxTokensSizing:
+
+    def test_budget_follows_intent_and_response_type(self):
+        question = "What is the capital of France?"
+        code = "Write a Python function to parse CSV files"
+        assert detect_intent(question) == "question"
+        assert detect_intent(code) == "code_request"
+        assert size_max_tokens("GLM-4.5", code) > size_max_tokens("GLM-4.5", question)
+        assert size_max_tokens("GLM-4.5", question, "critique") < size_max_tokens("GLM-4.5", question)
+        assert size_max_tokens("GLM-4.5", question, "short_critique") <= 100
+        assert (size_max_tokens("GLM-4.5", "x", "batched_critique", targets=5)
+                > size_max_tokens("GLM-4.5", "x", "batched_critique", targets=1))
+
+    def test_reasoning_models_context_and_caps(self):
+        question = "What is the capital of France?"
+        # The R1T2 reasoning model gets headroom for its hidden reasoning tokens
+        assert size_max_tokens("FALCON", question) == 2 * size_max_tokens("GLM45", question)
+        # Never more than the context length leaves after the prompt
+        assert context_length("GPT-OSS") == 8000
+        long_prompt = "word " * 7500
+        assert size_max_tokens("GPT-OSS", long_prompt) <= 8000 - estimate_tokens(long_prompt)
+        assert size_max_tokens("GLM-4.5", question, cap=100) == 100
+
+    def test_client_sends_sized_budget_and_reports_real_usage(self, monkeypatch):
+        sent = []
+
+        async def handler(request):
+            sent.append(json.loads(request.content))
+            return httpx.Response(200, json={
+                "choices": [{"message": {"content": "Paris."}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": 14, "completion_tokens": 3, "total_tokens": 17}
+            })
+
+        client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        monkeypatch.setattr(rate_limit_handler, "get_async_client", lambda: client)
+        monkeypatch.setattr(rate_limit_handler, "get_api_key", lambda provider: "test-key")
+        monkeypatch.setattr(rate_limit_handler, "increment_usage", lambda provider, api_key=None: None)
+
+        result = asyncio.run(rate_limit_handler.acall_model_with_rotation(
+            "GLM45", "z-ai/glm-4.5-air:free", "What is the capital of France?", use_cache=False
+        ))
+
+        assert sent[0]["max_tokens"] == size_max_tokens("GLM45", "What is the capital of France?")
+        assert result["metadata"]["total_tokens"] == 17
+        assert result["metadata"]["usage_source"] == "reported"
+        assert result["metadata"]["cost_usd"] == 0.0
+
+    def test_backend_provider_sizes_budget_and_reports_real_usage(self):
+        sent = []
+
+        async def handler(request):
+            sent.append(json.loads(request.content))
+            return httpx.Response(200, json={
+                "choices": [{"message": {"content": "Too vague."}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": 20, "completion_tokens": 4, "total_tokens": 24}
+            })
+
+        provider = OpenRouterProvider("test-key")
+        provider.client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        prompt = "Critique this answer: Paris is in France."
+        response = asyncio.run(provider.generate_response("GLM4.5", prompt, response_type="critique"))
+
+        assert sent[0]["max_tokens"] == size_max_tokens("GLM4.5", prompt, "critique")
+        assert response.tokens_used == 24 and response.metadata["usage_source"] == "reported"
+
+        simulated = asyncio.run(EnhancedProviderManager()._simulate_response("GLM4.5", prompt))
+        assert simulated.tokens_used == estimate_tokens(prompt) + estimate_tokens(simulated.response_text)
@@ -0,0 +1,112 @@
+"""
+Test cases for the client-side token-bucket rate limiter
+"""
+
+import asyncio
+import time
+
+from token_bucket import (
+    TokenBucket, RateLimiterRegistry, load_model_rate_limits, normalize_model_name, parse_reset
+)
+
+class TestTokenBucket:
+
+    def test_burst_is_capped_then_spread_at_refill_rate(self):
+        """A 36-call burst at 600/min with 0.5s of burst takes the capacity, then waits"""
+        bucket = TokenBucket("m", rate_per_min=600, burst_seconds=0.5)  # 10 req/s, capacity 5
+        assert all(bucket.try_acquire() for _ in range(5))
+        assert not bucket.try_acquire()
+
+        waits = [bucket.reserve() for _ in range(4)]
+        assert waits == sorted(waits)
+        assert abs(waits[-1] - 0.4) < 0.05  # Reservations queue up 0.1s apart
+
+    def test_acquire_times_out_without_reserving(self):
+        bucket = TokenBucket("m", rate_per_min=60, burst_seconds=1)
+        assert bucket.acquire(timeout=0)
+        assert not bucket.acquire(timeout=0.1)
+        assert bucket.get_stats()["rejected"] == 1
+        assert bucket.get_stats()["acquired"] == 1
+
+    def test_async_acquire_waits_for_refill(self):
+        bucket = TokenBucket("m", rate_per_min=1200, burst_seconds=0.05)  # 20 req/s, capacity 1
+
+        async def run():
+            started = time.perf_counter()
+            results = await asyncio.gather(*[bucket.acquire_async(timeout=1) for _ in range(3)])
+            return results, time.perf_counter() - started
+
+        results, elapsed = asyncio.run(run())
+        assert results == [True, True, True]
+        assert elapsed >= 0.09
+
+    def test_headers_correct_rate_and_block_until_reset(self):
+        bucket = TokenBucket("m", rate_per_min=60)
+        bucket.update_from_headers({
+            "X-RateLimit-Limit": "20",
+            "X-RateLimit-Remaining": "0",
+            "X-RateLimit-Reset": str(int((time.time() + 5) * 1000))  # Epoch ms
+        })
+        assert bucket.rate_per_min == 20
+        assert 4 < bucket.wait_time() <= 5.1
+
+        bucket = TokenBucket("m", rate_per_min=60)
+        bucket.update_from_headers({"retry-after": "3"})
+        assert 2.9 < bucket.wait_time() <= 3
+
+    def test_low_remaining_quota_is_paced_then_blocked_until_reset(self):
+        bucket = TokenBucket("m", rate_per_min=600)  # Locally 10 req/s
+        bucket.update_from_headers({"X-RateLimit-Remaining": "4", "X-RateLimit-Reset": "10s"})
+        assert 23.9 < bucket.effective_rate() < 24.1  # 4 requests left for 10 seconds
+
+        waits = [bucket.reserve() for _ in range(4)]
+        assert waits[0] == 0
+        assert 2.4 < waits[1] <= 2.5  # Spread over the window instead of 0.1s apart
+        assert waits == sorted(waits)
+        assert bucket.get_stats()["paced"] == 4
+
+        # Last request of the window taken: nothing more until the reset
+        assert 9.9 < bucket.blocked_for() <= 10
+        assert bucket.effective_rate() == 0.0
+        assert bucket.get_stats()["window_remaining"] == 0
+
+    def test_plenty_of_remaining_quota_is_not_paced(self):
+        bucket = TokenBucket("m", rate_per_min=60)
+        bucket.update_from_headers({"X-RateLimit-Remaining": "50", "X-RateLimit-Reset": "10s"})
+        assert bucket.reserve() == 0
+        assert bucket.get_stats()["paced"] == 0 and bucket.effective_rate() == 60
+
+    def test_penalize_blocks_for_one_interval(self):
+        bucket = TokenBucket("m", rate_per_min=30)
+        bucket.penalize()
+        assert 1.9 < bucket.wait_time() <= 2.0
+
+class TestRateLimiterRegistry:
+
+    def test_rates_come_from_model_table_under_every_alias(self):
+        registry = RateLimiterRegistry(load_model_rate_limits(), default_rate=20)
+        for names, rate in [(["GLM45", "GLM4.5", "GLM-4.5"], 60),
+                            (["GPTOSS", "GPT-OSS"], 30),
+                            (["LLAMA3", "Llama 4 Maverick", "Llama-4-Maverick"], 45),
+                            (["KIMI", "MoonshotAI Kimi", "Kimi-K2"], 40),
+                            (["QWEN3", "Qwen3", "Qwen3-Coder"], 50),
+                            (["FALCON", "TNG DeepSeek", "TNG-DeepSeek-R1T2"], 35)]:
+            assert {registry.rate_for(name) for name in names} == {rate}
+        assert registry.rate_for("unknown-model") == 20
+        assert normalize_model_name("GLM-4.5") == normalize_model_name("GLM4.5")
+
+    def test_best_key_and_pick_route_around_empty_buckets(self):
+        registry = RateLimiterRegistry({"a": 60.0, "b": 60.0}, burst_seconds=1, max_wait=0.5)
+        assert registry.get("a", "key-1").try_acquire()
+        key, wait = registry.best_key("a", ["key-1", "key-2"])
+        assert key == "key-2" and wait == 0.0
+
+        registry.get("a", "key-2").penalize(retry_after=10)
+        assert registry.pick(["a", "b"], {"a": "key-2", "b": "key-2"}) == "b"
+        assert registry.pick(["a"], {"a": "key-2"}) is None
+
+    def test_parse_reset_formats(self):
+        assert parse_reset("1m30s") == 90
+        assert parse_reset("250ms") == 0.25
+        assert parse_reset("12") == 12
+        assert parse_reset("soon") is None
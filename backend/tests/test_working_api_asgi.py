@@ -0,0 +1,76 @@
+"""
+Test cases for the ASGI serving mode of the working API
+"""
+
+import asyncio
+import json
+import re
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+import working_api
+import working_api_asgi
+
+MODEL_DELAY = 0.2
+
+@pytest.fixture
+def fake_models(monkeypatch):
+    """Replace OpenRouter with a model that answers after MODEL_DELAY seconds"""
+    calls = []
+
+    async def fake_call(provider, model_id, prompt, use_cache=True, **kwargs):
+        calls.append(provider)
+        await asyncio.sleep(MODEL_DELAY)
+        if 'JSON array' in prompt:
+            names = re.findall(r'=== RESPONSE FROM (.+?) ===', prompt)
+            text = json.dumps([{"target": name, "critique": f"ok {name}", "score": 0.8} for name in names])
+        else:
+            text = f"Answer from {provider} because it is the result."
+        return {'success': True, 'response': text, 'metadata': {'total_tokens': 10, 'cost_usd': 0.0}}
+
+    monkeypatch.setattr(working_api, "acall_model_with_rotation", fake_call)
+    return calls
+
+def _without_timings(payload):
+    payload = json.loads(json.dumps(payload))
+    payload["metadata"].pop("session_id")
+    payload["metadata"].pop("processing_time_seconds")
+    payload["metadata"].pop("stage_timings_ms")
+    payload["primary_response"].pop("latency_ms")
+    for critique in payload["critiques"]:
+        critique.pop("latency_ms")
+    return payload
+
+class TestAsgiServingMode:
+
+    def test_chat_latency_is_max_primary_plus_max_critique(self, fake_models):
+        client = TestClient(working_api_asgi.app)
+        started = time.perf_counter()
+        response = client.post('/chat', json={'message': 'Why is the sky blue?', 'bypass_cache': True})
+        elapsed = time.perf_counter() - started
+
+        assert response.status_code == 200
+        assert len(fake_models) == 12  # 6 primaries + 6 batched critics
+        assert elapsed < 4 * MODEL_DELAY  # Sequential would be 12 x MODEL_DELAY
+
+    def test_response_contract_matches_flask(self, fake_models):
+        asgi = TestClient(working_api_asgi.app).post('/chat', json={'message': 'hello', 'bypass_cache': True})
+        flask = working_api.app.test_client().post('/chat', json={'message': 'hello', 'bypass_cache': True})
+        assert asgi.status_code == flask.status_code == 200
+        assert _without_timings(asgi.json()) == _without_timings(flask.json)
+
+    def test_errors_match_flask(self):
+        asgi = TestClient(working_api_asgi.app).post('/chat', json={'message': ''})
+        flask = working_api.app.test_client().post('/chat', json={'message': ''})
+        assert asgi.status_code == flask.status_code == 400
+        assert asgi.content == flask.get_data()
+
+    def test_unknown_critique_mode_is_rejected(self, fake_models):
+        body = {'message': 'hello', 'critique_mode': 'pairwize'}
+        asgi = TestClient(working_api_asgi.app).post('/chat', json=body)
+        flask = working_api.app.test_client().post('/chat', json=body)
+        assert asgi.status_code == flask.status_code == 400
+        assert asgi.content == flask.get_data() and b'pairwize' in asgi.content
+        assert not fake_models
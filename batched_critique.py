@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Batched Critique Prompting for OrchestrateX
+One critique call per critic model instead of one per (critic, target) pair
+
+The critic receives every other model's response in a single structured
+prompt and answers with a JSON list of per-target critiques. The parser
+tolerates malformed output (code fences, trailing prose, broken JSON,
+plain-text sections) and reports which targets it could not recover.
+"""
+
+import re
+import json
+import logging
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+def build_batched_critique_prompt(critic_name: str, user_prompt: str, targets: List[Dict[str, str]]) -> str:
+    """
+    Build a single critique prompt covering several target responses
+
+    Args:
+        critic_name: Name of the critiquing model
+        user_prompt: The user's original question
+        targets: List of {"model_name": ..., "response_text": ...} dicts
+
+    Returns:
+        Prompt asking for a JSON array with one entry per target
+    """
+    sections = []
+    for target in targets:
+        sections.append(f"=== RESPONSE FROM {target['model_name']} ===\n{target['response_text']}")
+
+    target_names = ", ".join(f'"{target["model_name"]}"' for target in targets)
+
+    return f"""You are {critic_name}. Provide a constructive critique of each AI response below to the user's question.
+
+User's original question: "{user_prompt}"
+
+{chr(10).join(sections)}
+
+For EACH response, say what could be improved, what was done well, and suggest alternative approaches. Keep each critique concise and helpful.
+
+Reply with ONLY a JSON array, one object per response, in this exact format:
+[{{"target": "<model name>", "critique": "<your critique>", "score": <quality from 0.0 to 1.0>}}]
+
+The "target" values must be exactly: {target_names}"""
+
+def _strip_code_fences(text: str) -> str:
+    fenced = re.search(r"```(?:json)?\s*(.*?)```", text, re.DOTALL)
+    return fenced.group(1) if fenced else text
+
+def _match_target(name: str, target_names: List[str]) -> Optional[str]:
+    """Map a (possibly sloppy) target name from model output to a known name"""
+    normalized = re.sub(r"[^a-z0-9]", "", str(name).lower())
+    if not normalized:
+        return None
+    for target in target_names:
+        if re.sub(r"[^a-z0-9]", "", target.lower()) == normalized:
+            return target
+    for target in target_names:
+        candidate = re.sub(r"[^a-z0-9]", "", target.lower())
+        if len(normalized) >= 3 and (candidate in normalized or normalized in candidate):
+            return target
+    return None
+
+def _coerce_score(value) -> Optional[float]:
+    try:
+        score = float(value)
+    except (TypeError, ValueError):
+        return None
+    if score > 1.0:
+        # Some models answer on a 0-10 or 0-100 scale
+        score = score / 10.0 if score <= 10.0 else score / 100.0
+    return max(0.0, min(score, 1.0))
+
+def _parse_json_items(text: str) -> List[Dict]:
+    """Extract critique objects from JSON, falling back to object-by-object recovery"""
+    body = _strip_code_fences(text)
+
+    start, end = body.find("["), body.rfind("]")
+    if start != -1 and end > start:
+        try:
+            items = json.loads(body[start:end + 1])
+            if isinstance(items, list):
+                return [item for item in items if isinstance(item, dict)]
+        except json.JSONDecodeError:
+            pass
+
+    # Recover individual objects from truncated or otherwise broken arrays
+    items = []
+    for match in re.finditer(r"\{[^{}]*\}", body, re.DOTALL):
+        try:
+            item = json.loads(match.group(0))
+        except json.JSONDecodeError:
+            continue
+        if isinstance(item, dict):
+            items.append(item)
+    return items
+
+def _parse_text_sections(text: str, target_names: List[str]) -> Dict[str, str]:
+    """Fallback: split plain-text output on lines that name a target model"""
+    sections: Dict[str, List[str]] = {}
+    current = None
+    for line in text.splitlines():
+        header = re.match(r"^\s*(?:#+|\*\*|\d+[.)])?\s*([^:*#]{2,60}?)\s*(?:\*\*)?\s*(?::|\s[-–—]\s)\s*(.*)$", line)
+        matched = _match_target(header.group(1), target_names) if header else None
+        if matched:
+            current = matched
+            sections.setdefault(current, [])
+            if header.group(2):
+                sections[current].append(header.group(2))
+        elif current:
+            sections[current].append(line)
+    return {name: "\n".join(lines).strip() for name, lines in sections.items() if "".join(lines).strip()}
+
+def parse_batched_critiques(text: str, target_names: List[str]) -> Dict[str, Dict]:
+    """
+    Split a batched critique response back into per-target critiques
+
+    Args:
+        text: Raw model output
+        target_names: Names of the models that were critiqued
+
+    Returns:
+        Dict mapping target model name to {"critique_text": str, "score": Optional[float]}.
+        Targets that could not be recovered are absent from the result.
+    """
+    critiques: Dict[str, Dict] = {}
+
+    for item in _parse_json_items(text or ""):
+        target = _match_target(item.get("target") or item.get("model") or "", target_names)
+        critique_text = item.get("critique") or item.get("critique_text") or item.get("feedback")
+        if target and critique_text and target not in critiques:
+            critiques[target] = {
+                "critique_text": str(critique_text).strip(),
+                "score": _coerce_score(item.get("score"))
+            }
+
+    missing = [name for name in target_names if name not in critiques]
+    if missing:
+        for target, critique_text in _parse_text_sections(text or "", missing).items():
+            critiques[target] = {"critique_text": critique_text, "score": None}
+
+    if len(critiques) < len(target_names):
+        logger.warning(f"⚠️ Batched critique parsed {len(critiques)}/{len(target_names)} targets")
+
+    return critiques
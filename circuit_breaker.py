@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""
+Per-Model Circuit Breakers for OrchestrateX
+Stops routing traffic to models that are currently failing
+
+Each model gets a breaker with three states:
+1. closed    - traffic flows; outcomes are tracked in a rolling window
+2. open      - the model is treated as unavailable and callers move on to the
+               next candidate instantly instead of burning a timeout
+3. half_open - after a cool-down a limited number of probe calls are let
+               through; a success closes the circuit, a failure re-opens it
+               with a longer cool-down
+
+A circuit opens when the error rate over the rolling window crosses the
+threshold, or after several consecutive timeouts.
+
+Usage:
+    if circuit_breakers.allow_request(model):
+        try:
+            result = call(model)
+            circuit_breakers.record_success(model)
+        except TimeoutError:
+            circuit_breakers.record_failure(model, timeout=True)
+        except RateLimited:
+            circuit_breakers.release(model)   # Throttling is not a model failure
+    candidates = circuit_breakers.available(["GPT-OSS", "GLM4.5"])
+"""
+
+import os
+import time
+import logging
+import threading
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+class CircuitOpenError(Exception):
+    """Raised when a call is refused because the model's circuit is open"""
+    def __init__(self, name: str, retry_in: float):
+        self.name = name
+        self.retry_in = retry_in
+        super().__init__(f"Circuit for {name} is open (retry in {retry_in:.0f}s)")
+
+class CircuitBreaker:
+    """Circuit breaker for a single model"""
+
+    def __init__(self, name: str, failure_rate_threshold: float = 0.5, window_size: int = 10,
+                 window_seconds: float = 120.0, min_calls: int = 4, timeout_threshold: int = 2,
+                 open_seconds: float = 30.0, max_open_seconds: float = 300.0, half_open_max_calls: int = 1):
+        self.name = name
+        self.failure_rate_threshold = failure_rate_threshold
+        self.window_size = window_size
+        self.window_seconds = window_seconds
+        self.min_calls = min_calls
+        self.timeout_threshold = timeout_threshold
+        self.base_open_seconds = open_seconds
+        self.max_open_seconds = max_open_seconds
+        self.half_open_max_calls = half_open_max_calls
+
+        self.state = CLOSED
+        self.open_seconds = open_seconds
+        self.opened_at = 0.0
+        self.consecutive_timeouts = 0
+        self.times_opened = 0
+        self._outcomes: Deque[Tuple[float, bool]] = deque(maxlen=window_size)
+        self._probes_in_flight = 0
+        self._probe_started_at = 0.0
+        self._lock = threading.Lock()
+
+    def _window(self, now: float) -> List[bool]:
+        return [success for timestamp, success in self._outcomes if now - timestamp <= self.window_seconds]
+
+    def _maybe_half_open(self, now: float):
+        if self.state == OPEN and now - self.opened_at >= self.open_seconds:
+            self.state = HALF_OPEN
+            self._probes_in_flight = 0
+            logger.info(f"🟡 Circuit for {self.name} half-open: probing")
+        elif self.state == HALF_OPEN and self._probes_in_flight and now - self._probe_started_at >= self.open_seconds:
+            # A probe that never reported back (e.g. cancelled) must not block the model forever
+            self._probes_in_flight = 0
+
+    def _open(self, now: float, reason: str):
+        if self.state == HALF_OPEN:
+            # Failed probe: back off further before the next one
+            self.open_seconds = min(self.open_seconds * 2, self.max_open_seconds)
+        self.state = OPEN
+        self.opened_at = now
+        self.times_opened += 1
+        self._probes_in_flight = 0
+        logger.warning(f"🔴 Circuit for {self.name} opened for {self.open_seconds:.0f}s: {reason}")
+
+    def is_available(self) -> bool:
+        """True if a call would currently be allowed (does not reserve a probe slot)"""
+        with self._lock:
+            now = time.time()
+            self._maybe_half_open(now)
+            if self.state == CLOSED:
+                return True
+            if self.state == HALF_OPEN:
+                return self._probes_in_flight < self.half_open_max_calls
+            return False
+
+    def allow_request(self) -> bool:
+        """Decide whether a call may go out; half-open probes reserve a slot"""
+        with self._lock:
+            now = time.time()
+            self._maybe_half_open(now)
+            if self.state == CLOSED:
+                return True
+            if self.state == HALF_OPEN and self._probes_in_flight < self.half_open_max_calls:
+                self._probes_in_flight += 1
+                self._probe_started_at = now
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            now = time.time()
+            if self.state == OPEN:
+                return  # A late call that started before the circuit opened; only a probe may close it
+            self.consecutive_timeouts = 0
+            if self.state == HALF_OPEN:
+                self.state = CLOSED
+                self.open_seconds = self.base_open_seconds
+                self._outcomes.clear()
+                logger.info(f"🟢 Circuit for {self.name} closed: model recovered")
+            self._outcomes.append((now, True))
+
+    def release(self):
+        """
+        The reserved call ended without saying anything about the model's
+        health (rejected locally, throttled with a 429, or cancelled): free its half-open
+        probe slot without recording an outcome
+        """
+        with self._lock:
+            if self.state == HALF_OPEN and self._probes_in_flight:
+                self._probes_in_flight -= 1
+
+    def record_failure(self, timeout: bool = False):
+        with self._lock:
+            now = time.time()
+            self._outcomes.append((now, False))
+            self.consecutive_timeouts = self.consecutive_timeouts + 1 if timeout else 0
+
+            if self.state == HALF_OPEN:
+                self._open(now, "probe failed")
+                return
+            if self.state == OPEN:
+                return
+
+            if timeout and self.consecutive_timeouts >= self.timeout_threshold:
+                self._open(now, f"{self.consecutive_timeouts} consecutive timeouts")
+                return
+
+            window = self._window(now)
+            if len(window) >= self.min_calls:
+                failure_rate = window.count(False) / len(window)
+                if failure_rate >= self.failure_rate_threshold:
+                    self._open(now, f"error rate {failure_rate:.0%} over {len(window)} calls")
+
+    def reset(self):
+        with self._lock:
+            self.state = CLOSED
+            self.open_seconds = self.base_open_seconds
+            self.consecutive_timeouts = 0
+            self._outcomes.clear()
+            self._probes_in_flight = 0
+
+    def get_status(self) -> Dict[str, Any]:
+        with self._lock:
+            now = time.time()
+            self._maybe_half_open(now)
+            window = self._window(now)
+            return {
+                "state": self.state,
+                "failure_rate": window.count(False) / len(window) if window else 0.0,
+                "calls_in_window": len(window),
+                "consecutive_timeouts": self.consecutive_timeouts,
+                "times_opened": self.times_opened,
+                "retry_in_seconds": max(0.0, self.opened_at + self.open_seconds - now) if self.state == OPEN else 0.0
+            }
+
+class CircuitBreakerRegistry:
+    """
+    Breakers for all models, created on first use with shared settings
+    """
+
+    def __init__(self, **breaker_settings):
+        self.breaker_settings = breaker_settings
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+
+    def get(self, name: str) -> CircuitBreaker:
+        with self._lock:
+            if name not in self._breakers:
+                self._breakers[name] = CircuitBreaker(name, **self.breaker_settings)
+            return self._breakers[name]
+
+    def allow_request(self, name: str) -> bool:
+        return self.get(name).allow_request()
+
+    def is_available(self, name: str) -> bool:
+        return self.get(name).is_available()
+
+    def record_success(self, name: str):
+        self.get(name).record_success()
+
+    def record_failure(self, name: str, timeout: bool = False):
+        self.get(name).record_failure(timeout=timeout)
+
+    def release(self, name: str):
+        self.get(name).release()
+
+    def available(self, candidates: List[str]) -> List[str]:
+        """Candidates whose circuit is not open, in their original order"""
+        return [name for name in candidates if self.is_available(name)]
+
+    def pick(self, candidates: List[str]) -> Optional[str]:
+        """First available candidate, or None if every circuit is open"""
+        available = self.available(candidates)
+        return available[0] if available else None
+
+    def check(self, name: str):
+        """Reserve a call for name or raise CircuitOpenError"""
+        breaker = self.get(name)
+        if not breaker.allow_request():
+            raise CircuitOpenError(name, breaker.get_status()["retry_in_seconds"])
+
+    def reset(self):
+        with self._lock:
+            breakers = list(self._breakers.values())
+        for breaker in breakers:
+            breaker.reset()
+
+    def get_status(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            breakers = dict(self._breakers)
+        return {name: breaker.get_status() for name, breaker in breakers.items()}
+
+def build_registry_from_env() -> CircuitBreakerRegistry:
+    """
+    Create the registry from environment variables
+
+    CIRCUIT_FAILURE_RATE: error rate that opens a circuit (default 0.5)
+    CIRCUIT_WINDOW_SIZE: number of recent calls considered (default 10)
+    CIRCUIT_MIN_CALLS: calls needed before the error rate counts (default 4)
+    CIRCUIT_TIMEOUT_THRESHOLD: consecutive timeouts that open a circuit (default 2)
+    CIRCUIT_OPEN_SECONDS: initial cool-down before probing (default 30)
+    """
+    return CircuitBreakerRegistry(
+        failure_rate_threshold=float(os.environ.get("CIRCUIT_FAILURE_RATE", 0.5)),
+        window_size=int(os.environ.get("CIRCUIT_WINDOW_SIZE", 10)),
+        min_calls=int(os.environ.get("CIRCUIT_MIN_CALLS", 4)),
+        timeout_threshold=int(os.environ.get("CIRCUIT_TIMEOUT_THRESHOLD", 2)),
+        open_seconds=float(os.environ.get("CIRCUIT_OPEN_SECONDS", 30))
+    )
+
+# Global instance
+circuit_breakers = build_registry_from_env()
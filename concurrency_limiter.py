@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+"""
+Adaptive Concurrency Limiter for OrchestrateX
+AIMD (additive increase, multiplicative decrease) in-flight limits per model and API key
+
+Instead of a guessed constant, each (model, API key) pair discovers how many
+concurrent requests its endpoint really sustains:
+1. While latency and error rate are healthy and the limit is actually being
+   used, the limit grows by about one permit per round trip
+2. On a 429, a timeout burst or a latency spike (vs. the baseline latency)
+   the limit is cut multiplicatively, at most once per cool-down
+
+Works from both coroutines and threads; waiters are served in FIFO order.
+
+Usage:
+    limiter = concurrency_limiters.get("GPT-OSS", api_key)
+    async with limiter.slot() as permit:
+        response = await client.post(...)
+        permit.record(status_code=response.status_code)
+
+    with limiter.slot_sync() as permit:       # from threads
+        ...
+"""
+
+import os
+import time
+import asyncio
+import hashlib
+import logging
+import threading
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, Deque, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+SUCCESS = "success"
+RATE_LIMITED = "rate_limited"
+TIMEOUT = "timeout"
+ERROR = "error"
+CANCELLED = "cancelled"
+
+def _failure_outcome(error: BaseException) -> str:
+    return TIMEOUT if "timeout" in type(error).__name__.lower() else ERROR
+
+class _SyncWaiter:
+    def __init__(self):
+        self.event = threading.Event()
+
+    def wake(self):
+        self.event.set()
+
+class _AsyncWaiter:
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+        self.future = loop.create_future()
+
+    def wake(self):
+        def resolve():
+            if not self.future.done():
+                self.future.set_result(True)
+        self.loop.call_soon_threadsafe(resolve)
+
+class Permit:
+    """One in-flight request; call record() with the outcome"""
+
+    def __init__(self, limiter: "AIMDLimiter"):
+        self.limiter = limiter
+        self.started_at = time.perf_counter()
+        self.outcome: Optional[str] = None
+
+    def record(self, status_code: Optional[int] = None, outcome: Optional[str] = None):
+        """Record the request outcome from an HTTP status code or an explicit outcome"""
+        if outcome is None:
+            if status_code == 429:
+                outcome = RATE_LIMITED
+            elif status_code is not None and status_code >= 500:
+                outcome = ERROR
+            else:
+                outcome = SUCCESS
+        self.outcome = outcome
+
+class AIMDLimiter:
+    """Adaptive concurrency limit for one model / API key pair"""
+
+    def __init__(self, name: str, initial_limit: int = 4, min_limit: int = 1, max_limit: int = 32,
+                 decrease_factor: float = 0.5, latency_tolerance: float = 2.5,
+                 error_rate_threshold: float = 0.3, decrease_cooldown: float = 2.0):
+        self.name = name
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.decrease_factor = decrease_factor
+        self.latency_tolerance = latency_tolerance
+        self.error_rate_threshold = error_rate_threshold
+        self.decrease_cooldown = decrease_cooldown
+
+        self._limit = float(initial_limit)
+        self.in_flight = 0
+        self.baseline_latency: Optional[float] = None  # Slow-moving EWMA of healthy latency
+        self.error_rate = 0.0  # EWMA over recent outcomes
+        self.stats = {"completed": 0, "increases": 0, "decreases": 0, "rate_limited": 0, "errors": 0}
+
+        self._last_decrease = 0.0
+        self._waiters: Deque[Any] = deque()
+        self._lock = threading.Lock()
+
+    @property
+    def limit(self) -> int:
+        return max(self.min_limit, int(self._limit))
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._waiters)
+
+    def _try_acquire(self) -> bool:
+        if self.in_flight < self.limit and not self._waiters:
+            self.in_flight += 1
+            return True
+        return False
+
+    def _wake_waiters(self):
+        """Hand free permits to queued waiters (caller holds the lock)"""
+        while self._waiters and self.in_flight < self.limit:
+            self.in_flight += 1
+            self._waiters.popleft().wake()
+
+    def acquire(self) -> Permit:
+        """Block the calling thread until a permit is available"""
+        with self._lock:
+            if self._try_acquire():
+                return Permit(self)
+            waiter = _SyncWaiter()
+            self._waiters.append(waiter)
+        waiter.event.wait()
+        return Permit(self)
+
+    async def acquire_async(self) -> Permit:
+        """Wait (without blocking the event loop) until a permit is available"""
+        with self._lock:
+            if self._try_acquire():
+                return Permit(self)
+            waiter = _AsyncWaiter(asyncio.get_running_loop())
+            self._waiters.append(waiter)
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            with self._lock:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+                else:
+                    # The permit was already handed to us: give it back
+                    self.in_flight -= 1
+                    self._wake_waiters()
+            raise
+        return Permit(self)
+
+    def release(self, permit: Permit):
+        """Return a permit and adapt the limit to its outcome"""
+        latency = time.perf_counter() - permit.started_at
+        outcome = permit.outcome or SUCCESS
+
+        with self._lock:
+            saturated = self.in_flight >= self.limit or bool(self._waiters)
+            self.in_flight -= 1
+            if outcome == CANCELLED:
+                # Says nothing about the endpoint's capacity
+                self._wake_waiters()
+                return
+            self.stats["completed"] += 1
+            self.error_rate = 0.9 * self.error_rate + 0.1 * (outcome != SUCCESS)
+
+            if outcome == RATE_LIMITED:
+                self.stats["rate_limited"] += 1
+                self._decrease("429 rate limit")
+            elif outcome in (ERROR, TIMEOUT):
+                self.stats["errors"] += 1
+                if outcome == TIMEOUT or self.error_rate > self.error_rate_threshold:
+                    self._decrease(f"{outcome} (error rate {self.error_rate:.0%})")
+            elif self.baseline_latency is not None and latency > self.latency_tolerance * self.baseline_latency:
+                self._decrease(f"latency spike {latency:.2f}s vs {self.baseline_latency:.2f}s baseline")
+            else:
+                self.baseline_latency = latency if self.baseline_latency is None else (
+                    0.95 * self.baseline_latency + 0.05 * latency
+                )
+                if saturated and self._limit < self.max_limit:
+                    # Additive increase: about +1 permit per full window of successes
+                    previous = self.limit
+                    self._limit = min(self.max_limit, self._limit + 1.0 / self._limit)
+                    if self.limit > previous:
+                        self.stats["increases"] += 1
+
+            self._wake_waiters()
+
+    def _decrease(self, reason: str):
+        now = time.monotonic()
+        if now - self._last_decrease < self.decrease_cooldown:
+            return  # One cut per congestion event, not one per in-flight failure
+        self._last_decrease = now
+        previous = self.limit
+        self._limit = max(float(self.min_limit), self._limit * self.decrease_factor)
+        self.stats["decreases"] += 1
+        logger.info(f"📉 {self.name}: concurrency {previous} → {self.limit} ({reason})")
+
+    @asynccontextmanager
+    async def slot(self):
+        """Async context manager around acquire_async/release"""
+        permit = await self.acquire_async()
+        try:
+            yield permit
+        except asyncio.CancelledError:
+            permit.outcome = permit.outcome or CANCELLED
+            raise
+        except Exception as e:
+            permit.outcome = permit.outcome or _failure_outcome(e)
+            raise
+        finally:
+            self.release(permit)
+
+    @contextmanager
+    def slot_sync(self):
+        """Thread counterpart of slot()"""
+        permit = self.acquire()
+        try:
+            yield permit
+        except Exception as e:
+            permit.outcome = permit.outcome or _failure_outcome(e)
+            raise
+        finally:
+            self.release(permit)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "limit": self.limit,
+                "in_flight": self.in_flight,
+                "queue_depth": len(self._waiters),
+                "baseline_latency_ms": round(self.baseline_latency * 1000, 1) if self.baseline_latency else None,
+                "error_rate": round(self.error_rate, 3),
+                **self.stats
+            }
+
+class ConcurrencyLimiterRegistry:
+    """
+    One AIMD limiter per (model, API key), created on first use
+    """
+
+    def __init__(self, **limiter_settings):
+        self.limiter_settings = limiter_settings
+        self._limiters: Dict[str, AIMDLimiter] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key_id(api_key: Optional[str]) -> str:
+        # Never expose the key itself in stats or logs
+        return hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:8] if api_key else "default"
+
+    def get(self, model: str, api_key: Optional[str] = None) -> AIMDLimiter:
+        name = f"{model}:{self._key_id(api_key)}"
+        with self._lock:
+            if name not in self._limiters:
+                self._limiters[name] = AIMDLimiter(name, **self.limiter_settings)
+            return self._limiters[name]
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            limiters = dict(self._limiters)
+        return {name: limiter.get_stats() for name, limiter in limiters.items()}
+
+def build_registry_from_env() -> ConcurrencyLimiterRegistry:
+    """
+    Create the registry from environment variables
+
+    CONCURRENCY_INITIAL_LIMIT: starting in-flight limit per model/key (default 4)
+    CONCURRENCY_MIN_LIMIT / CONCURRENCY_MAX_LIMIT: bounds (default 1 / 32)
+    CONCURRENCY_DECREASE_FACTOR: multiplicative cut on congestion (default 0.5)
+    CONCURRENCY_LATENCY_TOLERANCE: latency / baseline ratio treated as a spike (default 2.5)
+    """
+    return ConcurrencyLimiterRegistry(
+        initial_limit=int(os.environ.get("CONCURRENCY_INITIAL_LIMIT", 4)),
+        min_limit=int(os.environ.get("CONCURRENCY_MIN_LIMIT", 1)),
+        max_limit=int(os.environ.get("CONCURRENCY_MAX_LIMIT", 32)),
+        decrease_factor=float(os.environ.get("CONCURRENCY_DECREASE_FACTOR", 0.5)),
+        latency_tolerance=float(os.environ.get("CONCURRENCY_LATENCY_TOLERANCE", 2.5))
+    )
+
+# Global instance
+concurrency_limiters = build_registry_from_env()
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Convergence Detection for OrchestrateX refinement loops
+Stops iterating once successive responses stop changing in a meaningful way
+
+Successive responses are compared with MinHash signatures of their word
+shingles (an estimate of Jaccard similarity, vectorized with NumPy). A loop
+is stopped when:
+1. converged     - the new response is nearly identical to the previous one
+2. oscillating   - the new response returns to an earlier answer
+3. no_improvement - quality gains stayed below epsilon for `patience` rounds
+
+Usage:
+    detector = ConvergenceDetector()
+    for iteration in ...:
+        stop_reason = detector.observe(response_text, quality_score)
+        if stop_reason:
+            break
+"""
+
+import re
+import zlib
+import logging
+from typing import Any, Dict, List, Optional, Set
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Stop reasons recorded alongside refinement results
+STOP_QUALITY_THRESHOLD = "quality_threshold"
+STOP_MAX_ITERATIONS = "max_iterations"
+STOP_CONVERGED = "converged"
+STOP_OSCILLATING = "oscillating"
+STOP_NO_IMPROVEMENT = "no_improvement"
+STOP_ERROR = "error"
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_WORD_RE = re.compile(r"\w+")
+
+def shingles(text: str, k: int = 2) -> Set[int]:
+    """Hashed k-word shingles of a text (single words for very short texts)"""
+    words = _WORD_RE.findall((text or "").lower())
+    if len(words) < k:
+        grams = words
+    else:
+        grams = [" ".join(words[i:i + k]) for i in range(len(words) - k + 1)]
+    return {zlib.crc32(gram.encode("utf-8")) for gram in grams}
+
+class MinHasher:
+    """MinHash signatures using num_perm universal hash functions"""
+
+    def __init__(self, num_perm: int = 128, seed: int = 42):
+        rng = np.random.RandomState(seed)
+        self.num_perm = num_perm
+        self._a = rng.randint(1, 1 << 31, size=num_perm, dtype=np.int64).astype(np.uint64)
+        self._b = rng.randint(0, 1 << 31, size=num_perm, dtype=np.int64).astype(np.uint64)
+
+    def signature(self, text: str) -> np.ndarray:
+        hashes = np.fromiter(shingles(text), dtype=np.uint64)
+        if hashes.size == 0:
+            return np.full(self.num_perm, np.iinfo(np.uint64).max, dtype=np.uint64)
+        # (a * x + b) mod p for every (permutation, shingle) pair; values stay below 2^63
+        permuted = (np.outer(self._a, hashes) + self._b[:, None]) % np.uint64(_MERSENNE_PRIME)
+        return permuted.min(axis=1)
+
+    @staticmethod
+    def similarity(sig_a: np.ndarray, sig_b: np.ndarray) -> float:
+        """Estimated Jaccard similarity of the texts behind two signatures"""
+        return float(np.mean(sig_a == sig_b))
+
+_default_hasher = MinHasher()
+
+def text_similarity(text_a: str, text_b: str) -> float:
+    """Estimated Jaccard similarity (0.0-1.0) between the shingles of two texts"""
+    return MinHasher.similarity(_default_hasher.signature(text_a), _default_hasher.signature(text_b))
+
+class ConvergenceDetector:
+    """
+    Tracks successive responses of a refinement loop and decides when to stop
+    """
+
+    def __init__(self, similarity_threshold: float = 0.8, min_improvement: float = 0.01,
+                 patience: int = 1, hasher: Optional[MinHasher] = None):
+        self.similarity_threshold = similarity_threshold
+        self.min_improvement = min_improvement
+        self.patience = patience
+        self.hasher = hasher or _default_hasher
+
+        self.history: List[Dict[str, Any]] = []
+        self._signatures: List[np.ndarray] = []
+        self._stalled_rounds = 0
+        self.stop_reason: Optional[str] = None
+
+    def observe(self, text: str, quality: Optional[float] = None) -> Optional[str]:
+        """
+        Record the latest response of the loop
+
+        Args:
+            text: Response produced by this round
+            quality: Quality score of the response, if known
+
+        Returns:
+            Stop reason (converged, oscillating or no_improvement) or None to continue
+        """
+        signature = self.hasher.signature(text)
+        entry: Dict[str, Any] = {"round": len(self.history) + 1, "quality": quality}
+        reason = None
+
+        if self._signatures:
+            similarity = MinHasher.similarity(signature, self._signatures[-1])
+            entry["similarity_to_previous"] = round(similarity, 3)
+
+            if similarity >= self.similarity_threshold:
+                reason = STOP_CONVERGED
+            elif any(MinHasher.similarity(signature, earlier) >= self.similarity_threshold
+                     for earlier in self._signatures[:-1]):
+                reason = STOP_OSCILLATING
+
+            previous_quality = self.history[-1]["quality"]
+            if reason is None and quality is not None and previous_quality is not None:
+                if quality - previous_quality < self.min_improvement:
+                    self._stalled_rounds += 1
+                    if self._stalled_rounds >= self.patience:
+                        reason = STOP_NO_IMPROVEMENT
+                else:
+                    self._stalled_rounds = 0
+
+        self.history.append(entry)
+        self._signatures.append(signature)
+
+        if reason:
+            self.stop_reason = reason
+            logger.info(f"🛑 Refinement stopped after round {entry['round']}: {reason}")
+        return reason
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"stop_reason": self.stop_reason, "rounds": self.history}
@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+"""
+Critique Input Compression for OrchestrateX
+Compact, focus-specific views of a response for the models that critique it
+
+Every critic used to receive the full primary response, so a long answer was
+re-sent to each critic (30 times per chat in working_api). A
+CritiqueCompressor parses and scores a response once, then gives each critic
+an extractive view within a token budget of its focus area:
+
+1. Prose is split into sentences, list items and headings, scored once for
+   centrality, position and overlap with the user's prompt, and picked greedily
+   (in original order) with a bonus for the cues of the critic's focus
+2. Code blocks are never cut mid-fence: each keeps its first lines plus any
+   later definition lines, and notes how many lines were left out
+3. Responses that already fit the budget are passed through unchanged
+
+Usage:
+    compressor = CritiqueCompressor(primary_text, user_prompt)
+    compact = compressor.view("clarity and structure")
+"""
+
+import re
+import logging
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from token_accounting import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CRITIQUE_INPUT_BUDGET = 300  # Tokens of the response a critic sees
+GAP_MARKER = "[...]"
+REDUNDANCY_THRESHOLD = 0.6  # Keyword overlap (Jaccard) above which a sentence counts as a repeat
+
+@dataclass
+class FocusProfile:
+    """How a critic's focus area shapes its compact view"""
+    name: str
+    triggers: Tuple[str, ...]  # Words in the focus text that select this profile
+    cues: Optional[str] = None  # Regex of sentences this focus cares about
+    budget: int = DEFAULT_CRITIQUE_INPUT_BUDGET
+    code_share: float = 0.4  # Part of the budget reserved for code blocks
+    lead_bonus: float = 0.2  # Bonus of a paragraph's first sentence (section coverage)
+    heading_bonus: float = 0.3
+
+FOCUS_PROFILES = [
+    FocusProfile("accuracy", ("accuracy", "technical", "factual", "precision", "correct", "reasoning", "analysis"),
+                 cues=r"\d|\b(because|therefore|thus|since|hence|means|always|never|must|only)\b",
+                 code_share=0.5),
+    FocusProfile("structure", ("clarity", "structure"),
+                 cues=r"^(#|[-*•]|\d+[.)])|\b(first|second|then|next|finally|in summary|overall)\b",
+                 budget=250, code_share=0.25, heading_bonus=0.6),
+    FocusProfile("completeness", ("completeness", "missing", "general"),
+                 budget=400, lead_bonus=0.5),
+    FocusProfile("alternatives", ("creativity", "creative", "alternative"),
+                 cues=r"\b(alternatively|instead|another|could|option|approach|consider|trade-?off)\b",
+                 budget=250, code_share=0.3),
+    FocusProfile("practical", ("practical", "applicability", "real-world", "coding"),
+                 cues=r"\b(example|e\.g\.|for instance|use|run|install|step|deploy|configure)\b",
+                 code_share=0.5)
+]
+DEFAULT_PROFILE = FocusProfile("overall", ())
+
+_FENCE_RE = re.compile(r"^\s*(```|~~~)")
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+(?=[\"'(\[*A-Z0-9])")
+_LINE_UNIT_RE = re.compile(r"^\s*(#{1,6}\s|[-*•]\s|\d+[.)]\s|\|)")
+_DEFINITION_RE = re.compile(r"^\s*(def |async def |class |function |fn |func |public |private |export |interface |"
+                            r"CREATE |SELECT |[\w.]+\s*=\s*(function|\(|async))")
+_WORD_RE = re.compile(r"[a-z][a-z0-9_]+")
+_STOPWORDS = frozenset("""
+a an the and or but if then else of to in on at by for with from as is are was were be been being it its
+this that these those there here you your we our they their he she his her i me my can could should would
+will may might must do does did not no so such than too very just also into about over under more most
+some any each other which what when where who whom how why all both only own same has have had having
+""".split())
+
+def focus_profile(focus: Optional[str]) -> FocusProfile:
+    """Profile of a focus area description (e.g. "clarity and structure" or "coding")"""
+    words = set(re.findall(r"[a-z-]+", (focus or "").lower()))
+    for profile in FOCUS_PROFILES:
+        if words.intersection(profile.triggers):
+            return profile
+    return DEFAULT_PROFILE
+
+def _keywords(text: str) -> List[str]:
+    return [w for w in _WORD_RE.findall(text.lower()) if w not in _STOPWORDS]
+
+@dataclass
+class _Unit:
+    """A sentence, list item, heading or code block of the response"""
+    index: int
+    paragraph: int
+    kind: str  # "sentence", "line", "heading" or "code"
+    text: str
+    tokens: int
+    lead: bool = False
+    score: float = 0.0
+
+class CritiqueCompressor:
+    """
+    Parse and score one response once, then build compact views per critic focus
+    """
+
+    def __init__(self, text: str, user_prompt: str = ""):
+        self.text = (text or "").strip()
+        self.original_tokens = estimate_tokens(self.text)
+        self.units = self._segment(self.text)
+        self._score(set(_keywords(user_prompt)))
+        self._views: Dict[Tuple[str, int], str] = {}
+
+    @staticmethod
+    def _segment(text: str) -> List[_Unit]:
+        units: List[_Unit] = []
+        paragraph = 0
+        prose: List[str] = []
+
+        def add(kind, unit_text, lead=False):
+            units.append(_Unit(len(units), paragraph, kind, unit_text, estimate_tokens(unit_text), lead))
+
+        def flush_prose():
+            if not prose:
+                return
+            lead = True
+            for sentence in _SENTENCE_RE.split(" ".join(prose)):
+                if sentence.strip():
+                    add("sentence", sentence.strip(), lead)
+                    lead = False
+            prose.clear()
+
+        lines = text.splitlines()
+        i = 0
+        while i < len(lines):
+            line = lines[i]
+            if _FENCE_RE.match(line):
+                flush_prose()
+                paragraph += 1
+                block = [line]
+                i += 1
+                while i < len(lines) and not _FENCE_RE.match(lines[i]):
+                    block.append(lines[i])
+                    i += 1
+                # A truncated response may end inside a fence: close it
+                block.append(lines[i] if i < len(lines) else _FENCE_RE.match(line).group(1))
+                add("code", "\n".join(block))
+                paragraph += 1
+            elif not line.strip():
+                flush_prose()
+                paragraph += 1
+            elif _LINE_UNIT_RE.match(line):
+                flush_prose()
+                add("heading" if line.lstrip().startswith("#") else "line", line.rstrip(),
+                    lead=not units or units[-1].paragraph != paragraph)
+            else:
+                prose.append(line.strip())
+            i += 1
+        flush_prose()
+        return units
+
+    def _score(self, prompt_keywords: set):
+        """Base scores: term centrality, position and overlap with the user's prompt"""
+        prose = [unit for unit in self.units if unit.kind != "code"]
+        frequencies = Counter(word for unit in prose for word in set(_keywords(unit.text)))
+        centrality = {}
+        for unit in prose:
+            words = set(_keywords(unit.text))
+            centrality[unit.index] = sum(frequencies[w] for w in words) / (1 + len(words)) ** 0.5
+        top = max(centrality.values(), default=0) or 1.0
+        for position, unit in enumerate(prose):
+            unit.score = 0.6 * centrality[unit.index] / top
+            if position == 0:
+                unit.score += 0.5  # The opening sentence usually states the answer
+            if prompt_keywords:
+                unit.score += 0.5 * len(prompt_keywords.intersection(_keywords(unit.text))) / len(prompt_keywords)
+
+    def view(self, focus: Optional[str] = None, budget: Optional[int] = None) -> str:
+        """Compact view of the response for a critic with this focus area"""
+        profile = focus_profile(focus)
+        budget = budget or profile.budget
+        key = (profile.name, budget)
+        if key not in self._views:
+            if self.original_tokens <= budget:
+                self._views[key] = self.text
+            else:
+                self._views[key] = self._compress(profile, budget)
+        return self._views[key]
+
+    def _compress(self, profile: FocusProfile, budget: int) -> str:
+        code = [unit for unit in self.units if unit.kind == "code"]
+        prose = [unit for unit in self.units if unit.kind != "code"]
+        code_budget = int(budget * profile.code_share) if prose else budget
+        if code:
+            code_budget = min(code_budget, sum(unit.tokens for unit in code))
+        else:
+            code_budget = 0
+        rendered = self._truncate_code(code, code_budget)
+        remaining = budget - sum(estimate_tokens(text) for text in rendered.values())
+
+        cues = re.compile(profile.cues, re.IGNORECASE | re.MULTILINE) if profile.cues else None
+        def score(unit):
+            value = unit.score
+            if unit.lead:
+                value += profile.lead_bonus
+            if unit.kind == "heading":
+                value += profile.heading_bonus
+            if cues and cues.search(unit.text):
+                value += 0.4
+            return value
+
+        chosen: List[_Unit] = []
+        chosen_words: List[set] = []
+        for unit in sorted(prose, key=lambda u: (-score(u), u.index)):
+            cost = unit.tokens + estimate_tokens(GAP_MARKER)  # Room for the marker of a gap next to it
+            words = set(_keywords(unit.text))
+            if any(len(words & other) > REDUNDANCY_THRESHOLD * len(words | other) for other in chosen_words):
+                continue  # Near-repeat of a sentence the critic already sees
+            if cost <= remaining:
+                rendered[unit.index] = unit.text
+                chosen.append(unit)
+                chosen_words.append(words)
+                remaining -= cost
+            elif not chosen and remaining > 8:
+                # Even the best sentence is over budget: keep its start
+                words = unit.text.split()
+                rendered[unit.index] = " ".join(words[:max(1, remaining * 3 // 4)]) + " ..."
+                chosen.append(unit)
+                remaining = 0
+
+        compact = self._render(rendered)
+        while estimate_tokens(compact) > budget and len(chosen) > 1:
+            del rendered[chosen.pop().index]
+            compact = self._render(rendered)
+        return compact
+
+    @staticmethod
+    def _truncate_code(code: List[_Unit], budget: int) -> Dict[int, str]:
+        """Keep each block's fence, first lines and later definitions within its share of the budget"""
+        rendered = {}
+        total = sum(unit.tokens for unit in code) or 1
+        for unit in code:
+            if unit.tokens <= budget * unit.tokens / total:
+                rendered[unit.index] = unit.text
+                continue
+            allowance = max(1, int(budget * unit.tokens / total))
+            lines = unit.text.splitlines()
+            opening, body, closing = lines[0], lines[1:-1], lines[-1]
+            kept, used = [], 0
+            for number, line in enumerate(body):
+                cost = estimate_tokens(line) + 1
+                if used + cost > allowance and kept:
+                    break
+                kept.append(number)
+                used += cost
+            for number, line in enumerate(body):
+                cost = estimate_tokens(line) + 1
+                if number not in kept and _DEFINITION_RE.match(line) and used + cost <= allowance:
+                    kept.append(number)
+                    used += cost
+            kept.sort()
+            out, last = [opening], -1
+            for number in kept:
+                if number != last + 1:
+                    out.append("...")
+                out.append(body[number])
+                last = number
+            if len(kept) < len(body):
+                out.append(f"... ({len(body) - len(kept)} more lines)")
+            out.append(closing)
+            rendered[unit.index] = "\n".join(out)
+        return rendered
+
+    def _render(self, rendered: Dict[int, str]) -> str:
+        """Selected units in original order, marking what was left out"""
+        paragraphs: List[List[_Unit]] = []
+        for unit in self.units:
+            if not paragraphs or paragraphs[-1][0].paragraph != unit.paragraph:
+                paragraphs.append([])
+            paragraphs[-1].append(unit)
+
+        blocks: List[str] = []
+        for units in paragraphs:
+            parts: List[str] = []
+            for unit in units:
+                if unit.index not in rendered:
+                    if not parts or parts[-1] != GAP_MARKER:
+                        parts.append(GAP_MARKER)
+                    continue
+                if parts and unit.kind in ("line", "heading"):
+                    parts.append("\n")
+                parts.append(rendered[unit.index])
+            if parts == [GAP_MARKER]:
+                if not blocks or blocks[-1] != GAP_MARKER:
+                    blocks.append(GAP_MARKER)
+                continue
+            blocks.append(" ".join(parts).replace(" \n ", "\n"))
+        return "\n\n".join(blocks)
+
+    def stats(self) -> Dict[str, int]:
+        """Original size and the size of every view built so far, in estimated tokens"""
+        stats = {"original_tokens": self.original_tokens}
+        for (name, budget), text in self._views.items():
+            stats[f"{name}_tokens"] = estimate_tokens(text)
+        return stats
+
+def compress_for_critique(text: str, focus: Optional[str] = None, user_prompt: str = "",
+                          budget: Optional[int] = None) -> str:
+    """One-off compact view; build a CritiqueCompressor to serve several critics"""
+    return CritiqueCompressor(text, user_prompt).view(focus, budget)
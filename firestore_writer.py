@@ -0,0 +1,414 @@
+#!/usr/bin/env python3
+"""
+Batched Background Writer for OrchestrateX Firestore persistence
+Takes Firestore writes off the request path without losing them
+
+Request handlers only enqueue records; a background thread persists them:
+1. Records are grouped into Firestore batch writes of up to 500 operations,
+   flushed when a batch is full or every flush interval
+2. Every record is first appended to a local on-disk journal (one open file);
+   the committed prefix of the journal is cut off as batches commit
+3. When Firestore is unreachable the records stay journaled and are retried
+   with backoff; journaled records from a previous run are replayed on start
+4. At most max_pending records are held in memory; beyond that new records
+   wait in the journal only and are read back as the queue drains
+
+Document IDs are generated client-side, so replaying a record that was
+already committed (e.g. after a crash) overwrites it instead of duplicating it.
+
+Usage:
+    writer = FirestoreBatchWriter(lambda: firestore.Client())
+    doc_id = writer.enqueue("model_critiques", record)   # returns immediately
+"""
+
+import os
+import json
+import time
+import atexit
+import shutil
+import secrets
+import string
+import logging
+import threading
+from collections import deque
+from datetime import datetime
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+MAX_BATCH_SIZE = 500  # Firestore limit for operations per batch write
+
+_ID_ALPHABET = string.ascii_letters + string.digits
+
+def new_document_id() -> str:
+    """20-character ID in the same format as Firestore auto-generated IDs"""
+    return "".join(secrets.choice(_ID_ALPHABET) for _ in range(20))
+
+def _encode(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {"__datetime__": value.isoformat()}
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def _decode(obj: Dict[str, Any]) -> Any:
+    if set(obj) == {"__datetime__"}:
+        return datetime.fromisoformat(obj["__datetime__"])
+    return obj
+
+class WriteJournal:
+    """
+    Append-only JSON-lines file holding records not yet committed to Firestore
+
+    The file stays open for appends. Offsets are logical: they keep growing
+    across compactions (file position = offset - base), so records queued
+    in memory keep valid offsets when the committed prefix is cut off.
+    """
+
+    def __init__(self, path: str, compact_bytes: int = 1 << 20):
+        self.path = path
+        self.compact_bytes = compact_bytes
+        self._lock = threading.Lock()
+        self._file = None
+        self._base = 0
+        self._end = 0
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+    def _open(self):
+        if self._file is None:
+            self._file = open(self.path, "a+b")
+            self._file.seek(0, os.SEEK_END)
+            size = self._file.tell()
+            self._file.seek(max(0, size - 1))
+            if size and self._file.read(1) != b"\n":
+                # Drop a torn last line so the next record does not run into it
+                self._file.seek(0)
+                size = self._file.read().rfind(b"\n") + 1
+                self._file.truncate(size)
+                logger.warning("⚠️ Dropped a torn line at the end of the Firestore journal")
+            self._end = self._base + size
+        return self._file
+
+    @property
+    def start(self) -> int:
+        """Logical offset of the first record in the file"""
+        with self._lock:
+            self._open()
+            return self._base
+
+    @property
+    def end(self) -> int:
+        """Logical offset just past the last record"""
+        with self._lock:
+            self._open()
+            return self._end
+
+    def append(self, record: Dict[str, Any]) -> Tuple[int, int]:
+        """Write one record (to the OS, without fsync); returns its (start, end) offsets"""
+        line = (json.dumps(record, default=_encode) + "\n").encode("utf-8")
+        with self._lock:
+            f = self._open()
+            f.write(line)
+            f.flush()
+            start = self._end
+            self._end += len(line)
+            return start, self._end
+
+    def read(self, offset: int, limit: Optional[int] = None) -> Tuple[List[Tuple[int, Dict[str, Any]]], int]:
+        """
+        Up to `limit` records from `offset` as (end offset, record) pairs, plus
+        the offset to continue from (corrupt lines are skipped)
+        """
+        records = []
+        with self._lock:
+            self._open()
+            position = offset
+            with open(self.path, "rb") as f:
+                f.seek(offset - self._base)
+                while limit is None or len(records) < limit:
+                    line = f.readline()
+                    if not line.endswith(b"\n"):
+                        break
+                    position += len(line)
+                    try:
+                        records.append((position, json.loads(line, object_hook=_decode)))
+                    except (json.JSONDecodeError, UnicodeDecodeError):
+                        logger.warning("⚠️ Skipping corrupt journal line")
+        return records, position
+
+    def count(self) -> int:
+        """Complete lines in the journal"""
+        with self._lock:
+            self._open()
+            with open(self.path, "rb") as f:
+                return sum(1 for line in f if line.endswith(b"\n"))
+
+    def load(self) -> List[Dict[str, Any]]:
+        """All records in the journal (a torn last line is skipped)"""
+        return [record for _, record in self.read(self.start)[0]]
+
+    def compact(self, committed: int):
+        """
+        Cut off records before the `committed` offset: truncate when nothing
+        else is left, otherwise rewrite the file once the committed prefix is
+        at least compact_bytes and at least as large as the rest (so each byte
+        is copied a bounded number of times)
+        """
+        with self._lock:
+            f = self._open()
+            done, rest = committed - self._base, self._end - committed
+            if done <= 0:
+                return
+            if rest <= 0:
+                f.truncate(0)
+                self._base = self._end
+            elif done >= max(self.compact_bytes, rest):
+                temp_path = self.path + ".tmp"
+                with open(self.path, "rb") as source, open(temp_path, "wb") as target:
+                    source.seek(done)
+                    shutil.copyfileobj(source, target)
+                f.close()
+                os.replace(temp_path, self.path)
+                self._file = open(self.path, "a+b")
+                self._base = committed
+
+    def truncate(self):
+        with self._lock:
+            self._open().truncate(0)
+            self._base = self._end
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+class FirestoreBatchWriter:
+    """
+    Background thread that commits enqueued records in Firestore batch writes
+    """
+
+    def __init__(self, client_factory: Callable[[], Any], journal_path: str = "firestore_journal.jsonl",
+                 max_batch_size: int = MAX_BATCH_SIZE, flush_interval: float = 1.0,
+                 max_retry_interval: float = 60.0, max_pending: int = 10000):
+        """
+        Args:
+            client_factory: Returns a Firestore client, or None/raises while unavailable
+            journal_path: Local journal of records not yet committed
+            max_batch_size: Records per batch write (at most 500)
+            flush_interval: Seconds to wait for more records before a partial batch is written
+            max_retry_interval: Upper bound of the backoff while Firestore is unreachable
+            max_pending: Records held in memory; beyond it (e.g. during an outage)
+                records are only journaled and read back as the queue drains
+        """
+        self.client_factory = client_factory
+        self.journal = WriteJournal(journal_path)
+        self.max_batch_size = min(max_batch_size, MAX_BATCH_SIZE)
+        self.flush_interval = flush_interval
+        self.max_retry_interval = max_retry_interval
+        self.max_pending = max(max_pending, self.max_batch_size)
+
+        self.stats = {"enqueued": 0, "committed": 0, "batches": 0, "failed_batches": 0, "replayed": 0, "spilled": 0}
+        self._client = None
+        self._pending: Deque[Tuple[int, Dict[str, Any]]] = deque()  # (journal end offset, record)
+        self._spilled_from: Optional[int] = None  # Journal offset of the first record not in memory
+        self._spilled = 0
+        self._in_flight = 0
+        self._retry_interval = flush_interval
+        self._retry_at = 0.0
+        self._closed = False
+        self._force = False  # flush() requested: write without waiting for the interval
+        self._thread: Optional[threading.Thread] = None
+        self._cond = threading.Condition()
+        # Held while journaling + queueing, so the queue is always in journal order
+        # (commits then only ever cover a prefix of the journal)
+        self._order_lock = threading.Lock()
+
+    def start(self):
+        """Replay the journal and start the writer thread (idempotent)"""
+        with self._order_lock:
+            with self._cond:
+                if self._thread is not None:
+                    return
+                replayed = self.journal.count()
+                if replayed:
+                    self._spilled_from, self._spilled = self.journal.start, replayed
+                self.stats["replayed"] = replayed
+                self._thread = threading.Thread(target=self._run, name="firestore-writer", daemon=True)
+                self._thread.start()
+        if replayed:
+            logger.info(f"📼 Replaying {replayed} journaled Firestore writes")
+
+    def enqueue(self, collection: str, data: Dict[str, Any]) -> str:
+        """Journal a record for writing and return its document ID without waiting"""
+        if self._thread is None:
+            self.start()
+        record = {"collection": collection, "id": new_document_id(), "data": data}
+        with self._order_lock:
+            start, end = self.journal.append(record)
+            with self._cond:
+                self.stats["enqueued"] += 1
+                if self._spilled_from is None and len(self._pending) < self.max_pending:
+                    self._pending.append((end, record))
+                else:
+                    # Overflow policy: keep memory bounded, the record waits in the journal only
+                    if self._spilled_from is None:
+                        self._spilled_from = start
+                        logger.warning(f"⚠️ Firestore write queue full ({self.max_pending}); "
+                                       f"further records wait in the journal")
+                    self._spilled += 1
+                    self.stats["spilled"] += 1
+                if len(self._pending) in (1, self.max_batch_size):
+                    self._cond.notify_all()
+        return record["id"]
+
+    def _refill(self):
+        """Move journal-only records back into memory as room frees up (writer thread)"""
+        with self._order_lock:
+            with self._cond:
+                offset, room = self._spilled_from, self.max_pending - len(self._pending) - self._in_flight
+            if offset is None or room < self.max_batch_size:
+                return
+            # Bounded chunks: enqueue() waits on the order lock meanwhile
+            records, next_offset = self.journal.read(offset, min(room, 2 * self.max_batch_size))
+            with self._cond:
+                self._pending.extend(records)
+                self._spilled = max(0, self._spilled - len(records))
+                if next_offset >= self.journal.end:
+                    self._spilled_from, self._spilled = None, 0
+                else:
+                    self._spilled_from = next_offset
+                self._cond.notify_all()
+
+    def _get_client(self):
+        if self._client is None:
+            try:
+                self._client = self.client_factory()
+            except Exception as e:
+                logger.debug(f"Firestore unavailable: {e}")
+        return self._client
+
+    def _commit(self, client, records: List[Dict[str, Any]]):
+        batch = client.batch()
+        for record in records:
+            batch.set(client.collection(record["collection"]).document(record["id"]), record["data"])
+        batch.commit()
+
+    def _run(self):
+        while True:
+            self._refill()
+            with self._cond:
+                # Wait for a full batch, the flush interval, a flush() call or shutdown;
+                # while Firestore is down, not before the retry time
+                deadline = time.monotonic() + self.flush_interval
+                while not (self._closed or self._force):
+                    if not self._pending:
+                        if self._spilled_from is not None:
+                            break  # Read the journal-only records back first
+                        # Idle: the interval starts with the next record
+                        self._cond.wait()
+                        deadline = time.monotonic() + self.flush_interval
+                        continue
+                    full = len(self._pending) >= self.max_batch_size or self._spilled_from is not None
+                    wait_for = (self._retry_at if full else max(deadline, self._retry_at)) - time.monotonic()
+                    if wait_for <= 0:
+                        break
+                    self._cond.wait(wait_for)
+                if not self._pending:
+                    if self._spilled_from is not None:
+                        continue
+                    self._force = False
+                    if self._closed:
+                        return
+                    continue
+                batch = [self._pending.popleft() for _ in range(min(self.max_batch_size, len(self._pending)))]
+                self._in_flight = len(batch)
+
+            ok = self._write([record for _, record in batch])
+            if ok:
+                # Everything up to the batch's last record is in Firestore
+                self.journal.compact(batch[-1][0])
+
+            with self._cond:
+                self._in_flight = 0
+                if ok:
+                    self.stats["committed"] += len(batch)
+                    self.stats["batches"] += 1
+                    self._retry_interval = self.flush_interval
+                    self._retry_at = 0.0
+                else:
+                    self._pending.extendleft(reversed(batch))
+                    self.stats["failed_batches"] += 1
+                    self._force = False
+                    self._retry_at = time.monotonic() + self._retry_interval
+                    self._retry_interval = min(self._retry_interval * 2, self.max_retry_interval)
+                    if self._closed:
+                        return  # Records stay journaled for the next start
+                self._cond.notify_all()
+
+    def _write(self, records: List[Dict[str, Any]]) -> bool:
+        client = self._get_client()
+        if client is None:
+            return False
+        try:
+            self._commit(client, records)
+            logger.info(f"✅ Firestore batch write: {len(records)} records")
+            return True
+        except Exception as e:
+            logger.warning(f"⚠️ Firestore batch write failed, keeping {len(records)} records journaled: {e}")
+            self._client = None  # Reconnect on the next attempt
+            return False
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Write everything pending now and wait; False if records are still pending at timeout"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            self._force = True
+            self._retry_at = 0.0
+            self._cond.notify_all()
+            while self._pending or self._in_flight or self._spilled_from is not None:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+                if self._retry_at and self._pending:
+                    return False  # Firestore is down; the records remain journaled
+        return True
+
+    def close(self, timeout: float = 5.0):
+        """Flush what can be written and stop the writer thread"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            if not self._thread.is_alive():
+                self.journal.close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                **self.stats,
+                "pending": len(self._pending) + self._in_flight + self._spilled,
+                "in_memory": len(self._pending) + self._in_flight,
+                "firestore_available": self._client is not None and self._retry_at == 0.0,
+                "journal_path": self.journal.path
+            }
+
+def build_writer_from_env(client_factory: Callable[[], Any]) -> FirestoreBatchWriter:
+    """
+    Create a writer configured from environment variables and flush it at exit
+
+    FIRESTORE_JOURNAL_PATH: local journal file (default firestore_journal.jsonl)
+    FIRESTORE_BATCH_SIZE: records per batch write (default 500)
+    FIRESTORE_FLUSH_INTERVAL: seconds before a partial batch is written (default 1.0)
+    FIRESTORE_MAX_PENDING: records queued in memory before new ones wait in the journal only (default 10000)
+    """
+    writer = FirestoreBatchWriter(
+        client_factory,
+        journal_path=os.environ.get("FIRESTORE_JOURNAL_PATH", "firestore_journal.jsonl"),
+        max_batch_size=int(os.environ.get("FIRESTORE_BATCH_SIZE", MAX_BATCH_SIZE)),
+        flush_interval=float(os.environ.get("FIRESTORE_FLUSH_INTERVAL", 1.0)),
+        max_pending=int(os.environ.get("FIRESTORE_MAX_PENDING", 10000))
+    )
+    atexit.register(writer.close)
+    return writer
@@ -0,0 +1,398 @@
+#!/usr/bin/env python3
+"""
+Shared HTTP Transport for OrchestrateX
+One pooled, keep-alive connection layer for every provider and client
+
+Every outbound call (backend providers, advanced_client, rate_limit_handler)
+goes through shared httpx clients instead of per-instance sessions, so TLS
+handshakes happen once per connection rather than once per call:
+1. Keep-alive pooling with configurable global and per-host limits
+2. HTTP/2 multiplexing (e.g. to openrouter.ai) when the h2 package is installed
+3. Connection-reuse metrics (new connections, TLS handshakes, reuse rate)
+
+Usage:
+    client = get_async_client()   # inside a coroutine
+    response = await client.post(url, json=payload, headers=headers)
+
+    client = get_sync_client()    # from threads / Flask handlers
+    response = client.post(url, json=payload, headers=headers)
+
+    result = run_in_background_loop(coro)   # run a coroutine from sync code
+
+OPENROUTER_BASE_URL points every OpenRouter client at another server, e.g. a
+local mock_openrouter instance for offline performance tests.
+"""
+
+import os
+import asyncio
+import importlib.util
+import logging
+import threading
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+def _http2_available() -> bool:
+    return importlib.util.find_spec("h2") is not None
+
+class TransportConfig:
+    """
+    Pool settings, read from the environment by from_env()
+
+    HTTP_MAX_CONNECTIONS: total connections per client (default 100)
+    HTTP_MAX_KEEPALIVE: idle connections kept open (default 20)
+    HTTP_KEEPALIVE_EXPIRY: seconds an idle connection is kept (default 60)
+    HTTP_MAX_PER_HOST: default in-flight request limit per host (default 20)
+    HTTP_PER_HOST_LIMITS: overrides, e.g. "openrouter.ai=32,localhost=8"
+    HTTP_TIMEOUT: default request timeout in seconds (default 30)
+    HTTP2_ENABLED: "false" to force HTTP/1.1 (default on when h2 is installed)
+    """
+
+    def __init__(self, max_connections: int = 100, max_keepalive_connections: int = 20,
+                 keepalive_expiry: float = 60.0, max_per_host: int = 20,
+                 per_host_limits: Optional[Dict[str, int]] = None, timeout: float = 30.0,
+                 http2: Optional[bool] = None):
+        self.max_connections = max_connections
+        self.max_keepalive_connections = max_keepalive_connections
+        self.keepalive_expiry = keepalive_expiry
+        self.max_per_host = max_per_host
+        self.per_host_limits = per_host_limits or {}
+        self.timeout = timeout
+        self.http2 = _http2_available() if http2 is None else (http2 and _http2_available())
+
+    @classmethod
+    def from_env(cls) -> "TransportConfig":
+        per_host_limits = {}
+        for item in os.environ.get("HTTP_PER_HOST_LIMITS", "").split(","):
+            if "=" in item:
+                host, limit = item.split("=", 1)
+                per_host_limits[host.strip()] = int(limit)
+
+        return cls(
+            max_connections=int(os.environ.get("HTTP_MAX_CONNECTIONS", 100)),
+            max_keepalive_connections=int(os.environ.get("HTTP_MAX_KEEPALIVE", 20)),
+            keepalive_expiry=float(os.environ.get("HTTP_KEEPALIVE_EXPIRY", 60)),
+            max_per_host=int(os.environ.get("HTTP_MAX_PER_HOST", 20)),
+            per_host_limits=per_host_limits,
+            timeout=float(os.environ.get("HTTP_TIMEOUT", 30)),
+            http2=os.environ.get("HTTP2_ENABLED", "true").lower() != "false"
+        )
+
+    def limit_for(self, host: str) -> int:
+        return self.per_host_limits.get(host, self.max_per_host)
+
+    def limits(self) -> httpx.Limits:
+        return httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_keepalive_connections,
+            keepalive_expiry=self.keepalive_expiry
+        )
+
+class TransportMetrics:
+    """Thread-safe request and connection counters, overall and per host"""
+
+    _FIELDS = ("requests", "new_connections", "tls_handshakes", "reused_connections", "http2_requests", "errors")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._hosts: Dict[str, Dict[str, int]] = {}
+
+    def record(self, host: str, new_connection: bool = False, tls_handshake: bool = False,
+               http_version: Optional[str] = None, error: bool = False):
+        with self._lock:
+            counters = self._hosts.setdefault(host, dict.fromkeys(self._FIELDS, 0))
+            counters["requests"] += 1
+            if error:
+                counters["errors"] += 1
+                return
+            counters["new_connections"] += int(new_connection)
+            counters["tls_handshakes"] += int(tls_handshake)
+            counters["reused_connections"] += int(not new_connection)
+            counters["http2_requests"] += int(http_version == "HTTP/2")
+
+    def reset(self):
+        with self._lock:
+            self._hosts.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            hosts = {host: dict(counters) for host, counters in self._hosts.items()}
+        totals = {field: sum(counters[field] for counters in hosts.values()) for field in self._FIELDS}
+        completed = totals["requests"] - totals["errors"]
+        return {
+            **totals,
+            "reuse_rate": totals["reused_connections"] / completed if completed else 0.0,
+            "hosts": hosts
+        }
+
+class _ConnectionTrace:
+    """Collects httpcore trace events for one request"""
+
+    def __init__(self):
+        self.new_connection = False
+        self.tls_handshake = False
+
+    def observe(self, event_name: str):
+        if event_name == "connection.connect_tcp.complete":
+            self.new_connection = True
+        elif event_name == "connection.start_tls.complete":
+            self.tls_handshake = True
+
+def _chain_trace(request: httpx.Request, trace: _ConnectionTrace, is_async: bool):
+    """Install a trace callback on the request, preserving any caller-supplied one"""
+    previous: Optional[Callable] = request.extensions.get("trace")
+
+    if is_async:
+        async def callback(event_name, info):
+            trace.observe(event_name)
+            if previous is not None:
+                await previous(event_name, info)
+    else:
+        def callback(event_name, info):
+            trace.observe(event_name)
+            if previous is not None:
+                previous(event_name, info)
+
+    request.extensions = {**request.extensions, "trace": callback}
+
+class _ReleasingStream(httpx.SyncByteStream):
+    """Response body stream that frees the per-host slot once closed"""
+
+    def __init__(self, stream: httpx.SyncByteStream, release: Callable[[], None]):
+        self._stream = stream
+        self._release = release
+
+    def __iter__(self):
+        yield from self._stream
+
+    def close(self):
+        try:
+            self._stream.close()
+        finally:
+            self._release()
+
+class _AsyncReleasingStream(httpx.AsyncByteStream):
+    """Async counterpart of _ReleasingStream"""
+
+    def __init__(self, stream: httpx.AsyncByteStream, release: Callable[[], None]):
+        self._stream = stream
+        self._release = release
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self):
+        try:
+            await self._stream.aclose()
+        finally:
+            self._release()
+
+def _once(func: Callable[[], None]) -> Callable[[], None]:
+    called = []
+
+    def wrapper():
+        if not called:
+            called.append(True)
+            func()
+    return wrapper
+
+class PooledTransport(httpx.BaseTransport):
+    """Sync pooled transport with per-host concurrency limits and metrics"""
+
+    def __init__(self, config: TransportConfig, metrics: TransportMetrics,
+                 transport: Optional[httpx.BaseTransport] = None):
+        self.config = config
+        self.metrics = metrics
+        self._transport = transport or httpx.HTTPTransport(http2=config.http2, limits=config.limits())
+        self._slots: Dict[str, threading.BoundedSemaphore] = {}
+        self._slots_lock = threading.Lock()
+
+    def _slot(self, host: str) -> threading.BoundedSemaphore:
+        with self._slots_lock:
+            if host not in self._slots:
+                self._slots[host] = threading.BoundedSemaphore(self.config.limit_for(host))
+            return self._slots[host]
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        host = request.url.host
+        slot = self._slot(host)
+        slot.acquire()
+        release = _once(slot.release)
+
+        trace = _ConnectionTrace()
+        _chain_trace(request, trace, is_async=False)
+        try:
+            response = self._transport.handle_request(request)
+        except Exception:
+            release()
+            self.metrics.record(host, error=True)
+            raise
+
+        self.metrics.record(host, trace.new_connection, trace.tls_handshake,
+                            response.extensions.get("http_version", b"").decode() or None)
+        response.stream = _ReleasingStream(response.stream, release)
+        return response
+
+    def close(self):
+        self._transport.close()
+
+class AsyncPooledTransport(httpx.AsyncBaseTransport):
+    """Async pooled transport with per-host concurrency limits and metrics"""
+
+    def __init__(self, config: TransportConfig, metrics: TransportMetrics,
+                 transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.config = config
+        self.metrics = metrics
+        self._transport = transport or httpx.AsyncHTTPTransport(http2=config.http2, limits=config.limits())
+        self._slots: Dict[str, asyncio.Semaphore] = {}
+
+    def _slot(self, host: str) -> asyncio.Semaphore:
+        if host not in self._slots:
+            self._slots[host] = asyncio.Semaphore(self.config.limit_for(host))
+        return self._slots[host]
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        host = request.url.host
+        slot = self._slot(host)
+        await slot.acquire()
+        release = _once(slot.release)
+
+        trace = _ConnectionTrace()
+        _chain_trace(request, trace, is_async=True)
+        try:
+            response = await self._transport.handle_async_request(request)
+        except BaseException:
+            release()
+            self.metrics.record(host, error=True)
+            raise
+
+        self.metrics.record(host, trace.new_connection, trace.tls_handshake,
+                            response.extensions.get("http_version", b"").decode() or None)
+        response.stream = _AsyncReleasingStream(response.stream, release)
+        return response
+
+    async def aclose(self):
+        await self._transport.aclose()
+
+# Shared state: one sync client per process, one async client per event loop
+# (httpx connections cannot be shared across event loops)
+DEFAULT_OPENROUTER_BASE_URL = "https://openrouter.ai/api/v1"
+
+def openrouter_base_url() -> str:
+    """OpenRouter API base URL (OPENROUTER_BASE_URL overrides it)"""
+    return os.environ.get("OPENROUTER_BASE_URL", DEFAULT_OPENROUTER_BASE_URL).rstrip("/")
+
+config = TransportConfig.from_env()
+metrics = TransportMetrics()
+
+_sync_client: Optional[httpx.Client] = None
+_async_clients: Dict[Any, httpx.AsyncClient] = {}
+_clients_lock = threading.Lock()
+
+def get_sync_client() -> httpx.Client:
+    """Shared thread-safe client for synchronous callers"""
+    global _sync_client
+    with _clients_lock:
+        if _sync_client is None or _sync_client.is_closed:
+            _sync_client = httpx.Client(
+                transport=PooledTransport(config, metrics),
+                timeout=config.timeout
+            )
+            logger.info(f"🔌 Shared HTTP client created (http2={config.http2})")
+        return _sync_client
+
+def get_async_client() -> httpx.AsyncClient:
+    """Shared client for the running event loop (a default client outside any loop)"""
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        loop = None
+
+    with _clients_lock:
+        # Drop clients whose event loop has gone away (too late to close them:
+        # sync callers should use run_in_background_loop, not asyncio.run)
+        for stale in [key for key in _async_clients if key is not None and key.is_closed()]:
+            if not _async_clients.pop(stale).is_closed:
+                logger.warning("⚠️ Async HTTP client outlived its event loop; its pooled connections were leaked")
+
+        client = _async_clients.get(loop)
+        if client is None or client.is_closed:
+            client = httpx.AsyncClient(
+                transport=AsyncPooledTransport(config, metrics),
+                timeout=config.timeout
+            )
+            _async_clients[loop] = client
+            logger.info(f"🔌 Shared async HTTP client created (http2={config.http2})")
+        return client
+
+async def close_shared_clients():
+    """Close the shared clients (call on application shutdown)"""
+    global _sync_client
+    with _clients_lock:
+        async_clients = list(_async_clients.values())
+        _async_clients.clear()
+        sync_client, _sync_client = _sync_client, None
+
+    for client in async_clients:
+        try:
+            await client.aclose()
+        except Exception as e:
+            logger.warning(f"⚠️ Failed to close async HTTP client: {e}")
+    if sync_client is not None:
+        sync_client.close()
+
+class BackgroundLoop:
+    """
+    One event loop in a daemon thread that runs coroutines for sync callers
+
+    All threads share it, so they also share one pooled async HTTP client
+    (and e.g. the response cache's in-flight request coalescing) instead of
+    creating a loop, a client and a connection pool per call.
+    """
+
+    def __init__(self):
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def _ensure_running(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None or not self._thread.is_alive():
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(target=self._loop.run_forever, name="async-background-loop", daemon=True)
+                self._thread.start()
+            return self._loop
+
+    def run(self, coro: Awaitable[Any]) -> Any:
+        loop = self._ensure_running()
+        if threading.current_thread() is self._thread:
+            coro.close()
+            raise RuntimeError("run_sync() called from the background event loop; await the coroutine instead")
+
+        future = asyncio.run_coroutine_threadsafe(coro, loop)
+        try:
+            return future.result()
+        except BaseException:
+            # Caller gave up (e.g. worker timeout or KeyboardInterrupt): cancel the coroutine too
+            future.cancel()
+            raise
+
+background_loop = BackgroundLoop()
+
+def run_in_background_loop(coro: Awaitable[Any]) -> Any:
+    """Run a coroutine to completion on the shared background loop, from synchronous code"""
+    return background_loop.run(coro)
+
+def get_transport_stats() -> Dict[str, Any]:
+    """Connection reuse metrics plus the pool configuration"""
+    return {
+        **metrics.get_stats(),
+        "http2_enabled": config.http2,
+        "max_connections": config.max_connections,
+        "max_keepalive_connections": config.max_keepalive_connections,
+        "max_per_host": config.max_per_host,
+        "per_host_limits": config.per_host_limits
+    }
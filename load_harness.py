@@ -0,0 +1,525 @@
+#!/usr/bin/env python3
+"""
+Offline Load-Testing Harness for the OrchestrateX serving endpoints
+Drives /chat, /api/orchestrate/prompt, /predict and /batch and reports latency percentiles
+
+1. Load models: closed loop (N concurrent clients, each sending its next request
+   when the previous one returns) or open loop (Poisson arrivals at a fixed rate;
+   latency is measured from the scheduled send time, so a slow server cannot
+   hide its queueing delay)
+2. Prompt mixes are replayed from .txt (one prompt per line) or .jsonl files
+   ("prompt"/"message" fields, or "title" + "body" as in requests.jsonl)
+3. Reports throughput, p50/p95/p99, error rate, status codes and per-stage
+   latency (from metadata.stage_timings_ms or a Server-Timing header)
+4. Results are saved as JSON tagged with the git revision; --compare flags
+   regressions against a previous result file
+
+With --spawn the harness starts the target app itself, pointed at an in-process
+mock_openrouter server (and a Firestore emulator / Mongo URL if given), so runs
+are offline and repeatable.
+
+Usage:
+    python load_harness.py --spawn asgi --scenario chat --concurrency 16 --duration 30
+    python load_harness.py --spawn flask --scenario chat --rate 5 --duration 30 \\
+        --prompts requests.jsonl --compare load_results/previous.json
+    python load_harness.py --url http://localhost:5000 --scenario predict --concurrency 32
+"""
+
+import os
+import sys
+import json
+import math
+import time
+import random
+import socket
+import asyncio
+import logging
+import argparse
+import tempfile
+import subprocess
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+REPO_ROOT = os.path.dirname(os.path.abspath(__file__))
+RESULT_SCHEMA = 1
+DEFAULT_PROMPTS = [
+    "Explain the difference between a process and a thread",
+    "Write a Python function that merges two sorted lists",
+    "What are the trade-offs of microservices versus a monolith?",
+    "Summarize the causes of the 2008 financial crisis in three sentences",
+    "How do I reduce p99 latency in a web service?",
+    "Translate 'good morning, how are you?' into French and Spanish"
+]
+
+# Endpoint and request body per scenario
+SCENARIOS: Dict[str, Dict[str, Any]] = {
+    "chat": {"path": "/chat", "body": lambda prompts, opts: {
+        "message": prompts[0], **({"bypass_cache": True} if opts.get("bypass_cache") else {})}},
+    "orchestrate": {"path": "/api/orchestrate/prompt", "body": lambda prompts, opts: {
+        "session_id": opts.get("session_id", "load-test"), "prompt": prompts[0], "max_iterations": 1}},
+    "predict": {"path": "/predict", "body": lambda prompts, opts: {"prompt": prompts[0]}},
+    "batch": {"path": "/batch", "body": lambda prompts, opts: {"prompts": prompts}, "batch": True}
+}
+
+# Apps --spawn can start; {port} is filled in
+TARGETS: Dict[str, Dict[str, Any]] = {
+    "flask": {"cmd": [sys.executable, "working_api.py"], "cwd": REPO_ROOT, "health": "/status"},
+    "asgi": {"cmd": [sys.executable, "-m", "uvicorn", "working_api_asgi:app", "--port", "{port}",
+                     "--log-level", "warning"], "cwd": REPO_ROOT, "health": "/status"},
+    "backend": {"cmd": [sys.executable, "-m", "uvicorn", "main:app", "--port", "{port}", "--log-level", "warning"],
+                "cwd": os.path.join(REPO_ROOT, "backend"), "health": "/health"},
+    "selector": {"cmd": [sys.executable, "api_server.py"], "cwd": os.path.join(REPO_ROOT, "Model"),
+                 "health": "/health"}
+}
+
+PROVIDERS = ['GLM45', 'GPTOSS', 'LLAMA3', 'KIMI', 'QWEN3', 'FALCON']
+
+def load_prompts(path: Optional[str]) -> List[str]:
+    """Prompts from a .txt or .jsonl file (the built-in mix if no path)"""
+    if not path:
+        return list(DEFAULT_PROMPTS)
+    prompts = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            if not path.endswith(".jsonl"):
+                prompts.append(line)
+                continue
+            item = json.loads(line)
+            prompt = item.get("prompt") or item.get("message")
+            if not prompt and (item.get("title") or item.get("body")):
+                prompt = "\n\n".join(part for part in (item.get("title"), item.get("body")) if part)
+            if prompt:
+                prompts.append(prompt)
+    if not prompts:
+        raise ValueError(f"No prompts found in {path}")
+    return prompts
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    """Linear-interpolated percentile (q in 0-100)"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * q / 100
+    low, high = math.floor(position), math.ceil(position)
+    return ordered[low] + (ordered[high] - ordered[low]) * (position - low)
+
+def _latency_summary(values: List[float]) -> Dict[str, Optional[float]]:
+    def rounded(value):
+        return None if value is None else round(value, 1)
+    return {
+        "p50": rounded(percentile(values, 50)),
+        "p95": rounded(percentile(values, 95)),
+        "p99": rounded(percentile(values, 99)),
+        "mean": rounded(sum(values) / len(values)) if values else None,
+        "max": rounded(max(values)) if values else None
+    }
+
+def extract_stages(response: httpx.Response) -> Dict[str, float]:
+    """Per-stage durations in ms from the JSON metadata or a Server-Timing header"""
+    stages: Dict[str, float] = {}
+    for entry in response.headers.get("server-timing", "").split(","):
+        name, _, params = entry.strip().partition(";")
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if name and key == "dur":
+                try:
+                    stages[name] = float(value)
+                except ValueError:
+                    pass
+    try:
+        data = response.json()
+    except ValueError:
+        return stages
+    timings = data.get("metadata", {}).get("stage_timings_ms") if isinstance(data, dict) else None
+    if isinstance(timings, dict):
+        stages.update({name: float(ms) for name, ms in timings.items()})
+    return stages
+
+class Sample:
+    """Outcome of one request"""
+
+    def __init__(self, status: int, latency_ms: float, error: Optional[str] = None,
+                 stages: Optional[Dict[str, float]] = None):
+        self.status = status
+        self.latency_ms = latency_ms
+        self.error = error
+        self.stages = stages or {}
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None and 200 <= self.status < 400
+
+def summarize(samples: List[Sample], wall_seconds: float, dropped: int = 0) -> Dict[str, Any]:
+    """Throughput, latency percentiles, errors and stage breakdown of a run"""
+    ok = [s for s in samples if s.ok]
+    status_codes: Dict[str, int] = {}
+    errors: Dict[str, int] = {}
+    stage_values: Dict[str, List[float]] = {}
+    for sample in samples:
+        status_codes[str(sample.status)] = status_codes.get(str(sample.status), 0) + 1
+        if sample.error:
+            errors[sample.error] = errors.get(sample.error, 0) + 1
+        for name, ms in sample.stages.items():
+            stage_values.setdefault(name, []).append(ms)
+
+    return {
+        "requests": len(samples),
+        "successful": len(ok),
+        "dropped": dropped,
+        "duration_seconds": round(wall_seconds, 2),
+        "throughput_rps": round(len(ok) / wall_seconds, 2) if wall_seconds > 0 else 0.0,
+        "error_rate": round(1 - len(ok) / len(samples), 4) if samples else 0.0,
+        "latency_ms": _latency_summary([s.latency_ms for s in ok]),
+        "status_codes": status_codes,
+        "errors": dict(sorted(errors.items(), key=lambda item: -item[1])[:10]),
+        "stages": {name: _latency_summary(values) for name, values in sorted(stage_values.items())}
+    }
+
+class LoadGenerator:
+    """
+    Sends a scenario's requests to a base URL under a closed- or open-loop model
+    """
+
+    def __init__(self, base_url: str, scenario: str = "chat", prompts: Optional[List[str]] = None,
+                 batch_size: int = 10, timeout: float = 120.0, seed: int = 0,
+                 options: Optional[Dict[str, Any]] = None, client: Optional[httpx.AsyncClient] = None):
+        """
+        Args:
+            base_url: Target server, e.g. http://127.0.0.1:8002
+            scenario: Key of SCENARIOS
+            prompts: Prompt mix (the built-in mix if None)
+            batch_size: Prompts per request for the batch scenario
+            timeout: Per-request timeout in seconds
+            seed: Seed for prompt selection and open-loop arrivals
+            options: Scenario options (bypass_cache, session_id)
+            client: HTTP client to use instead of a fresh one (e.g. an ASGI transport in tests)
+        """
+        if scenario not in SCENARIOS:
+            raise ValueError(f"Unknown scenario '{scenario}' (choose from {', '.join(SCENARIOS)})")
+        self.base_url = base_url.rstrip("/")
+        self.scenario = scenario
+        self.prompts = prompts or list(DEFAULT_PROMPTS)
+        self.batch_size = batch_size
+        self.timeout = timeout
+        self.options = options or {}
+        self.client = client
+        self._rng = random.Random(seed)
+
+    def _next_body(self) -> Dict[str, Any]:
+        spec = SCENARIOS[self.scenario]
+        count = self.batch_size if spec.get("batch") else 1
+        return spec["body"]([self._rng.choice(self.prompts) for _ in range(count)], self.options)
+
+    async def _send(self, client: httpx.AsyncClient, body: Dict[str, Any], started: float) -> Sample:
+        try:
+            response = await client.post(f"{self.base_url}{SCENARIOS[self.scenario]['path']}",
+                                         json=body, timeout=self.timeout)
+            latency_ms = (time.perf_counter() - started) * 1000
+            error = None if response.is_success else f"HTTP {response.status_code}"
+            return Sample(response.status_code, latency_ms, error, extract_stages(response))
+        except httpx.HTTPError as e:
+            return Sample(0, (time.perf_counter() - started) * 1000, type(e).__name__)
+
+    async def _with_client(self, run: Callable[[httpx.AsyncClient], Any]):
+        if self.client is not None:
+            return await run(self.client)
+        limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+        async with httpx.AsyncClient(limits=limits) as client:
+            return await run(client)
+
+    async def closed_loop(self, concurrency: int, duration: Optional[float] = None,
+                          total_requests: Optional[int] = None) -> Dict[str, Any]:
+        """concurrency clients back to back until duration or total_requests is reached"""
+        if duration is None and total_requests is None:
+            raise ValueError("closed_loop needs a duration or a request count")
+        samples: List[Sample] = []
+        started = time.perf_counter()
+        stop_at = started + duration if duration is not None else math.inf
+        issued = 0
+
+        async def worker(client):
+            nonlocal issued
+            while time.perf_counter() < stop_at and (total_requests is None or issued < total_requests):
+                issued += 1
+                samples.append(await self._send(client, self._next_body(), time.perf_counter()))
+
+        await self._with_client(lambda client: asyncio.gather(*[worker(client) for _ in range(concurrency)]))
+        return summarize(samples, time.perf_counter() - started)
+
+    async def open_loop(self, rate: float, duration: float, max_in_flight: int = 1000) -> Dict[str, Any]:
+        """Poisson arrivals at rate requests/second for duration seconds"""
+        samples: List[Sample] = []
+        dropped = 0
+        in_flight = 0
+        started = time.perf_counter()
+
+        async def send(client, body, scheduled):
+            nonlocal in_flight
+            try:
+                samples.append(await self._send(client, body, scheduled))
+            finally:
+                in_flight -= 1
+
+        async def run(client):
+            nonlocal dropped, in_flight
+            tasks = []
+            scheduled = started
+            while True:
+                scheduled += self._rng.expovariate(rate)
+                if scheduled - started >= duration:
+                    break
+                delay = scheduled - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                if in_flight >= max_in_flight:
+                    dropped += 1  # The server is not keeping up; don't let the backlog grow forever
+                    continue
+                # Latency counts from the scheduled time, not the (possibly late) actual send
+                in_flight += 1
+                tasks.append(asyncio.create_task(send(client, self._next_body(), scheduled)))
+            await asyncio.gather(*tasks)
+
+        await self._with_client(run)
+        return summarize(samples, time.perf_counter() - started, dropped=dropped)
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True,
+                              text=True, timeout=10).stdout.strip() or "unknown"
+    except (OSError, subprocess.SubprocessError):
+        return "unknown"
+
+def save_result(summary: Dict[str, Any], config: Dict[str, Any], output_dir: str = "load_results",
+                path: Optional[str] = None) -> str:
+    """Write a run as JSON; returns the file path"""
+    revision = git_revision()
+    result = {
+        "schema": RESULT_SCHEMA,
+        "revision": revision,
+        "timestamp": datetime.now().isoformat(),
+        "config": config,
+        "summary": summary
+    }
+    if path is None:
+        os.makedirs(output_dir, exist_ok=True)
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        name = f"{config.get('target', 'url')}-{config['scenario']}-{config['mode']}-{revision}-{stamp}.json"
+        path = os.path.join(output_dir, name)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2)
+    return path
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any], tolerance: float = 0.1) -> List[str]:
+    """
+    Regressions of current vs baseline result (both as saved by save_result)
+
+    Latency percentiles may grow and throughput may shrink by tolerance (relative);
+    the error rate may grow by one percentage point.
+    """
+    regressions = []
+    base, cur = baseline["summary"], current["summary"]
+    for key in ("p50", "p95", "p99"):
+        before, after = base["latency_ms"].get(key), cur["latency_ms"].get(key)
+        if before and after and after > before * (1 + tolerance):
+            regressions.append(f"latency {key}: {before:.0f}ms → {after:.0f}ms (+{after / before - 1:.0%})")
+    if base["throughput_rps"] and cur["throughput_rps"] < base["throughput_rps"] * (1 - tolerance):
+        regressions.append(f"throughput: {base['throughput_rps']} → {cur['throughput_rps']} req/s")
+    if cur["error_rate"] > base["error_rate"] + 0.01:
+        regressions.append(f"error rate: {base['error_rate']:.1%} → {cur['error_rate']:.1%}")
+    return regressions
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+class SpawnedTarget:
+    """
+    Runs a target app as a subprocess against an in-process mock OpenRouter server
+    """
+
+    def __init__(self, target: str, mock_config: Optional[Dict[str, Any]] = None,
+                 firestore_emulator: Optional[str] = None, mongo_url: Optional[str] = None,
+                 log_dir: Optional[str] = None, startup_timeout: float = 60.0):
+        if target not in TARGETS:
+            raise ValueError(f"Unknown target '{target}' (choose from {', '.join(TARGETS)})")
+        self.target = target
+        self.mock_config = mock_config or {}
+        self.firestore_emulator = firestore_emulator
+        self.mongo_url = mongo_url
+        self.log_dir = log_dir or tempfile.mkdtemp(prefix="orchestratex-load-")
+        self.startup_timeout = startup_timeout
+        self.base_url = ""
+        self._mock_server = None
+        self._process: Optional[subprocess.Popen] = None
+        self._log = None
+
+    def _environment(self, port: int) -> Dict[str, str]:
+        env = dict(os.environ)
+        env["PORT"] = str(port)
+        env["OPENROUTER_BASE_URL"] = self._mock_server.base_url
+        env["FIRESTORE_JOURNAL_PATH"] = os.path.join(self.log_dir, "firestore_journal.jsonl")
+        env["PYTHONUNBUFFERED"] = "1"
+        for provider in PROVIDERS:
+            env.setdefault(f"PROVIDER_{provider}_API_KEY", f"load-test-{provider.lower()}")
+        if self.firestore_emulator:
+            env["FIRESTORE_EMULATOR_HOST"] = self.firestore_emulator
+            env.setdefault("GOOGLE_CLOUD_PROJECT", "orchestratex-load-test")
+        if self.mongo_url:
+            env["MONGODB_CONNECTION_STRING"] = self.mongo_url
+        return env
+
+    def start(self) -> str:
+        from mock_openrouter import MockOpenRouter, MockOpenRouterServer
+
+        self._mock_server = MockOpenRouterServer(MockOpenRouter.from_config(self.mock_config))
+        self._mock_server.start()
+
+        spec = TARGETS[self.target]
+        port = _free_port()
+        self._log = open(os.path.join(self.log_dir, f"{self.target}.log"), "w", encoding="utf-8")
+        self._process = subprocess.Popen([part.replace("{port}", str(port)) for part in spec["cmd"]],
+                                         cwd=spec["cwd"], env=self._environment(port),
+                                         stdout=self._log, stderr=subprocess.STDOUT)
+        self.base_url = f"http://127.0.0.1:{port}"
+
+        deadline = time.monotonic() + self.startup_timeout
+        while time.monotonic() < deadline:
+            if self._process.poll() is not None:
+                log_path = self._log.name
+                self.stop()
+                raise RuntimeError(f"{self.target} exited during startup, see {log_path}")
+            try:
+                if httpx.get(f"{self.base_url}{spec['health']}", timeout=2).status_code < 500:
+                    logger.info(f"🚀 {self.target} ready on {self.base_url}")
+                    return self.base_url
+            except httpx.HTTPError:
+                pass
+            time.sleep(0.25)
+        log_path = self._log.name
+        self.stop()
+        raise RuntimeError(f"{self.target} not healthy after {self.startup_timeout:.0f}s, see {log_path}")
+
+    def stop(self):
+        if self._process is not None and self._process.poll() is None:
+            self._process.terminate()
+            try:
+                self._process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self._process.kill()
+        if self._mock_server is not None:
+            self._mock_server.stop()
+        if self._log is not None:
+            self._log.close()
+        self._process = self._mock_server = self._log = None
+
+    def __enter__(self) -> "SpawnedTarget":
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+def print_summary(summary: Dict[str, Any]):
+    latency = summary["latency_ms"]
+    print(f"📊 {summary['requests']} requests in {summary['duration_seconds']}s "
+          f"({summary['throughput_rps']} req/s, error rate {summary['error_rate']:.1%}, dropped {summary['dropped']})")
+    print(f"   latency p50 {latency['p50']}ms  p95 {latency['p95']}ms  p99 {latency['p99']}ms  max {latency['max']}ms")
+    print(f"   status codes: {summary['status_codes']}")
+    for error, count in summary["errors"].items():
+        print(f"   ❌ {error}: {count}")
+    for stage, stage_latency in summary["stages"].items():
+        print(f"   ⏱️ {stage}: p50 {stage_latency['p50']}ms  p95 {stage_latency['p95']}ms  p99 {stage_latency['p99']}ms")
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline load test for the OrchestrateX endpoints")
+    where = parser.add_mutually_exclusive_group(required=True)
+    where.add_argument("--url", help="Base URL of an already running server")
+    where.add_argument("--spawn", choices=sorted(TARGETS), help="Start this app against a mock OpenRouter")
+    parser.add_argument("--scenario", choices=sorted(SCENARIOS), default="chat")
+    load = parser.add_mutually_exclusive_group()
+    load.add_argument("--concurrency", type=int, help="Closed loop: number of concurrent clients (default 8)")
+    load.add_argument("--rate", type=float, help="Open loop: Poisson arrivals per second")
+    parser.add_argument("--duration", type=float, help="Seconds of load (default 30 unless --requests is given)")
+    parser.add_argument("--requests", type=int, help="Closed loop: stop after this many requests")
+    parser.add_argument("--prompts", help="Prompt mix: .txt (one per line) or .jsonl (e.g. requests.jsonl)")
+    parser.add_argument("--batch-size", type=int, default=10, help="Prompts per /batch request")
+    parser.add_argument("--bypass-cache", action="store_true", help="Send bypass_cache with /chat requests")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--mock-config", help="mock_openrouter profile file for --spawn")
+    parser.add_argument("--firestore-emulator", help="host:port of a Firestore emulator for --spawn")
+    parser.add_argument("--mongo-url", help="MongoDB connection string for --spawn backend")
+    parser.add_argument("--output", help="Result file (default load_results/<target>-<scenario>-...json)")
+    parser.add_argument("--compare", help="Previous result file to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="Relative slack before a regression")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    mode = "open" if args.rate else "closed"
+    config = {
+        "target": args.spawn or "url",
+        "scenario": args.scenario,
+        "mode": mode,
+        "concurrency": None if args.rate else (args.concurrency or 8),
+        "rate": args.rate,
+        "duration": args.duration if args.duration or args.requests else 30.0,
+        "requests": args.requests,
+        "prompts": args.prompts or "builtin",
+        "batch_size": args.batch_size,
+        "bypass_cache": args.bypass_cache,
+        "seed": args.seed
+    }
+
+    spawned = None
+    if args.spawn:
+        mock_config = {}
+        if args.mock_config:
+            with open(args.mock_config, encoding="utf-8") as f:
+                mock_config = json.load(f)
+        spawned = SpawnedTarget(args.spawn, mock_config, args.firestore_emulator, args.mongo_url)
+        base_url = spawned.start()
+    else:
+        base_url = args.url
+
+    try:
+        generator = LoadGenerator(base_url, args.scenario, load_prompts(args.prompts), batch_size=args.batch_size,
+                                  timeout=args.timeout, seed=args.seed,
+                                  options={"bypass_cache": args.bypass_cache})
+        print(f"🔥 {args.scenario} against {base_url}: "
+              + (f"open loop at {args.rate} req/s" if args.rate else f"closed loop x{config['concurrency']}"))
+        if args.rate:
+            summary = asyncio.run(generator.open_loop(args.rate, config["duration"] or 30.0))
+        else:
+            summary = asyncio.run(generator.closed_loop(config["concurrency"], config["duration"], args.requests))
+    finally:
+        if spawned is not None:
+            spawned.stop()
+
+    print_summary(summary)
+    path = save_result(summary, config, path=args.output)
+    print(f"💾 Saved {path}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        with open(path, encoding="utf-8") as f:
+            current = json.load(f)
+        regressions = compare(baseline, current, args.tolerance)
+        if regressions:
+            print(f"⚠️ Regressions vs {baseline['revision']}:")
+            for regression in regressions:
+                print(f"   {regression}")
+            sys.exit(1)
+        print(f"✅ No regressions vs {baseline['revision']}")
+
+if __name__ == "__main__":
+    main()
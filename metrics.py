@@ -0,0 +1,396 @@
+#!/usr/bin/env python3
+"""
+Metrics for OrchestrateX
+Counters and HDR-style latency histograms, exported in Prometheus text format
+
+Recording is meant for the hot path (every model call, every pipeline stage):
+1. Each metric keeps one shard per thread, so recording takes no lock; a
+   scrape merges the shards (the shards of finished threads are folded into
+   one when a new thread registers)
+2. Histograms use log-linear buckets like HdrHistogram: 16 linear sub-buckets
+   per power of two of microseconds (relative error under 1/16 from 1µs to an
+   hour), recorded with a bit_length and a shift instead of a bucket search
+3. The exporter maps them onto fixed Prometheus `le` buckets, and get_stats()
+   reports p50/p90/p99 for the JSON status pages
+
+Standard metrics (labels in brackets):
+    orchestratex_stage_seconds [pipeline, stage, model, outcome]
+        Pipeline stages: select, primary, critique, persist (store_* stages), ...
+    orchestratex_pipeline_seconds [pipeline, outcome]
+    orchestratex_model_call_seconds [model, outcome]   Upstream HTTP calls
+    orchestratex_model_calls_total [model, outcome]    Including calls skipped locally
+    orchestratex_tokens_total [model, direction]
+    orchestratex_http_request_seconds [app, route, method, status]
+
+Exposed at /metrics by working_api (Flask), working_api_asgi and the FastAPI
+backend (install_flask_metrics / install_asgi_metrics).
+"""
+
+import time
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+SUB_BUCKET_BITS = 4
+SUB_BUCKETS = 1 << SUB_BUCKET_BITS  # Linear sub-buckets per power of two
+MAX_MICROS = 3600 * 1_000_000  # Larger values are clamped to an hour
+
+# Prometheus `le` bounds in seconds
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+def bucket_index(micros: int) -> int:
+    """HDR bucket of a value in microseconds"""
+    if micros < SUB_BUCKETS:
+        return micros if micros > 0 else 0
+    shift = micros.bit_length() - SUB_BUCKET_BITS - 1
+    return ((shift + 1) << SUB_BUCKET_BITS) + (micros >> shift) - SUB_BUCKETS
+
+def bucket_range(index: int) -> Tuple[int, int]:
+    """[low, high) microseconds covered by an HDR bucket"""
+    if index < SUB_BUCKETS:
+        return index, index + 1
+    shift = (index >> SUB_BUCKET_BITS) - 1
+    low = (SUB_BUCKETS + (index & (SUB_BUCKETS - 1))) << shift
+    return low, low + (1 << shift)
+
+class _Shard:
+    __slots__ = ("thread", "counts", "total", "value")
+
+    def __init__(self, thread: Optional[threading.Thread]):
+        self.thread = thread
+        self.counts: Dict[int, int] = {}  # HDR bucket -> count (histograms)
+        self.total = 0.0  # Sum of observed seconds (histograms)
+        self.value = 0.0  # Counter value
+
+class _Sharded:
+    """One shard per recording thread; only that thread writes to it"""
+
+    def __init__(self):
+        self._local = threading.local()
+        self._shards: List[_Shard] = []
+        self._retired = _Shard(None)  # Folded shards of finished threads
+        self._lock = threading.Lock()
+
+    def _shard(self) -> _Shard:
+        try:
+            return self._local.shard
+        except AttributeError:
+            pass
+        shard = _Shard(threading.current_thread())
+        with self._lock:
+            alive = []
+            for old in self._shards:
+                if old.thread.is_alive():
+                    alive.append(old)
+                else:
+                    self._fold(old)
+            alive.append(shard)
+            self._shards = alive
+        self._local.shard = shard
+        return shard
+
+    def _fold(self, shard: _Shard):
+        retired = self._retired
+        for index, count in shard.counts.items():
+            retired.counts[index] = retired.counts.get(index, 0) + count
+        retired.total += shard.total
+        retired.value += shard.value
+
+    def _all_shards(self) -> List[_Shard]:
+        with self._lock:
+            return [self._retired] + list(self._shards)
+
+class CounterChild(_Sharded):
+    """Monotonic counter for one label combination"""
+
+    def inc(self, amount: float = 1.0):
+        self._shard().value += amount
+
+    @property
+    def value(self) -> float:
+        return sum(shard.value for shard in self._all_shards())
+
+class HistogramChild(_Sharded):
+    """Latency histogram for one label combination (values in seconds)"""
+
+    def observe(self, seconds: float):
+        micros = int(seconds * 1_000_000)
+        if micros > MAX_MICROS:
+            micros = MAX_MICROS
+        shard = self._shard()
+        index = bucket_index(micros)
+        counts = shard.counts
+        counts[index] = counts.get(index, 0) + 1
+        shard.total += seconds
+
+    @contextmanager
+    def time(self) -> Iterator[None]:
+        """Observe the duration of a with-block"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+    def snapshot(self) -> Tuple[Dict[int, int], float]:
+        """Merged (bucket counts, sum of seconds)"""
+        counts: Dict[int, int] = {}
+        total = 0.0
+        for shard in self._all_shards():
+            for index, count in list(shard.counts.items()):
+                counts[index] = counts.get(index, 0) + count
+            total += shard.total
+        return counts, total
+
+    @staticmethod
+    def _quantile(counts: Dict[int, int], count: int, q: float) -> float:
+        rank = q * count
+        seen = 0
+        for index in sorted(counts):
+            seen += counts[index]
+            if seen >= rank:
+                low, high = bucket_range(index)
+                return (low + high) / 2 / 1_000_000
+        return 0.0
+
+    def quantile(self, q: float) -> float:
+        counts, _ = self.snapshot()
+        return self._quantile(counts, sum(counts.values()), q)
+
+    def summary(self) -> Dict[str, Any]:
+        counts, total = self.snapshot()
+        count = sum(counts.values())
+        return {
+            "count": count,
+            "sum_seconds": round(total, 6),
+            "p50_ms": round(self._quantile(counts, count, 0.5) * 1000, 3),
+            "p90_ms": round(self._quantile(counts, count, 0.9) * 1000, 3),
+            "p99_ms": round(self._quantile(counts, count, 0.99) * 1000, 3),
+            "max_ms": round(bucket_range(max(counts))[1] / 1000, 3) if counts else 0.0
+        }
+
+class MetricFamily:
+    """A named metric with labels; labels(...) returns the child to record on"""
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str], kind: str,
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self.kind = kind
+        self.buckets = tuple(buckets)
+        self._children: Dict[Tuple[str, ...], Any] = {}  # Label values as strings -> child
+        self._lookup: Dict[Tuple[Any, ...], Any] = {}  # Label values as passed -> child (lock-free reads)
+        self._lock = threading.Lock()
+
+    def labels(self, *values) -> Any:
+        child = self._lookup.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}, got {values}")
+            key = tuple(str(value) for value in values)
+            with self._lock:
+                child = self._children.get(key)
+                if child is None:
+                    child = HistogramChild() if self.kind == "histogram" else CounterChild()
+                    self._children[key] = child
+                self._lookup[values] = child
+        return child
+
+    def children(self) -> List[Tuple[Tuple[str, ...], Any]]:
+        with self._lock:
+            return list(self._children.items())
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _label_text(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+class MetricsRegistry:
+    """All metrics of the process"""
+
+    def __init__(self):
+        self._families: Dict[str, MetricFamily] = {}
+        self._lock = threading.Lock()
+
+    def _family(self, name: str, help_text: str, labelnames: Sequence[str], kind: str, **kwargs) -> MetricFamily:
+        with self._lock:
+            family = self._families.get(name)
+            if family is None:
+                family = MetricFamily(name, help_text, labelnames, kind, **kwargs)
+                self._families[name] = family
+            elif family.kind != kind or family.labelnames != tuple(labelnames):
+                raise ValueError(f"Metric {name} already registered as {family.kind}{family.labelnames}")
+            return family
+
+    def counter(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> MetricFamily:
+        return self._family(name, help_text, labelnames, "counter")
+
+    def histogram(self, name: str, help_text: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> MetricFamily:
+        return self._family(name, help_text, labelnames, "histogram", buckets=buckets)
+
+    def render(self) -> str:
+        """Prometheus text exposition format"""
+        lines = []
+        with self._lock:
+            families = list(self._families.values())
+        for family in families:
+            lines.append(f"# HELP {family.name} {family.help_text}")
+            lines.append(f"# TYPE {family.name} {family.kind}")
+            for values, child in family.children():
+                if family.kind == "counter":
+                    lines.append(f"{family.name}{_label_text(family.labelnames, values)} {_number(child.value)}")
+                    continue
+                counts, total = child.snapshot()
+                ordered = sorted(counts.items())
+                labels = _label_text(family.labelnames, values)
+                cumulative, position = 0, 0
+                for bound in family.buckets:
+                    # An HDR bucket counts below a bound if its midpoint is
+                    limit = bound * 1_000_000
+                    while position < len(ordered) and sum(bucket_range(ordered[position][0])) / 2 <= limit:
+                        cumulative += ordered[position][1]
+                        position += 1
+                    bucket_labels = _label_text(family.labelnames, values, 'le="%s"' % bound)
+                    lines.append(f"{family.name}_bucket{bucket_labels} {cumulative}")
+                count = sum(counts.values())
+                bucket_labels = _label_text(family.labelnames, values, 'le="+Inf"')
+                lines.append(f"{family.name}_bucket{bucket_labels} {count}")
+                lines.append(f"{family.name}_sum{labels} {_number(round(total, 6))}")
+                lines.append(f"{family.name}_count{labels} {count}")
+        return "\n".join(lines) + "\n"
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """JSON-friendly view: counter values and histogram percentiles per label combination"""
+        stats = {}
+        with self._lock:
+            families = list(self._families.values())
+        for family in families:
+            stats[family.name] = {
+                ",".join(f"{n}={v}" for n, v in zip(family.labelnames, values)) or "_":
+                    child.summary() if family.kind == "histogram" else child.value
+                for values, child in family.children()
+            }
+        return stats
+
+# Global registry and the standard metrics
+metrics = MetricsRegistry()
+
+STAGE_SECONDS = metrics.histogram(
+    "orchestratex_stage_seconds", "Duration of pipeline stages", ["pipeline", "stage", "model", "outcome"])
+PIPELINE_SECONDS = metrics.histogram(
+    "orchestratex_pipeline_seconds", "Duration of whole pipeline runs", ["pipeline", "outcome"])
+MODEL_CALL_SECONDS = metrics.histogram(
+    "orchestratex_model_call_seconds", "Latency of upstream model API calls", ["model", "outcome"])
+MODEL_CALLS = metrics.counter(
+    "orchestratex_model_calls_total", "Model calls by outcome, including calls skipped locally", ["model", "outcome"])
+TOKENS = metrics.counter(
+    "orchestratex_tokens_total", "Tokens reported by the model API", ["model", "direction"])
+HTTP_REQUEST_SECONDS = metrics.histogram(
+    "orchestratex_http_request_seconds", "Latency of HTTP requests served", ["app", "route", "method", "status"])
+
+def outcome_for_status(status_code: int) -> str:
+    """Outcome label of an upstream HTTP status"""
+    if 200 <= status_code < 300:
+        return "success"
+    if status_code == 429:
+        return "rate_limited"
+    return "server_error" if status_code >= 500 else "client_error"
+
+def record_stage(pipeline: str, stage_name: str, seconds: float, outcome: str):
+    """Record a pipeline stage: 'critique:GLM-4.5' → stage critique, model GLM-4.5; store_* → persist"""
+    stage, _, model = stage_name.partition(":")
+    if stage.startswith("store_"):
+        stage = "persist"
+    STAGE_SECONDS.labels(pipeline, stage, model, outcome).observe(seconds)
+
+def record_model_call(model: str, outcome: str, seconds: Optional[float] = None):
+    """Record one model call; seconds is None for calls that never reached the API"""
+    MODEL_CALLS.labels(model, outcome).inc()
+    if seconds is not None:
+        MODEL_CALL_SECONDS.labels(model, outcome).observe(seconds)
+
+def record_tokens(model: str, input_tokens: int = 0, output_tokens: int = 0):
+    if input_tokens:
+        TOKENS.labels(model, "input").inc(input_tokens)
+    if output_tokens:
+        TOKENS.labels(model, "output").inc(output_tokens)
+
+def install_flask_metrics(app, name: str, registry: MetricsRegistry = metrics, path: str = "/metrics"):
+    """Time every request of a Flask app and serve the registry at `path`"""
+    from flask import Response, g, request
+
+    @app.before_request
+    def _start_timer():
+        g.metrics_start = time.perf_counter()
+
+    @app.after_request
+    def _record_request(response):
+        start = getattr(g, "metrics_start", None)
+        if start is not None and request.path != path:
+            route = request.url_rule.rule if request.url_rule else "unmatched"
+            HTTP_REQUEST_SECONDS.labels(name, route, request.method, str(response.status_code)).observe(
+                time.perf_counter() - start)
+        return response
+
+    app.add_url_rule(path, "metrics", lambda: Response(registry.render(), mimetype=CONTENT_TYPE))
+
+def install_asgi_metrics(app, name: str, registry: MetricsRegistry = metrics, path: str = "/metrics"):
+    """Time every request of a FastAPI app and serve the registry at `path`"""
+    from fastapi import Request
+    from fastapi.responses import Response
+
+    @app.middleware("http")
+    async def _record_request(request: Request, call_next):
+        start = time.perf_counter()
+        status = 500
+        try:
+            response = await call_next(request)
+            status = response.status_code
+            return response
+        finally:
+            if request.url.path != path:
+                route = request.scope.get("route")
+                HTTP_REQUEST_SECONDS.labels(name, getattr(route, "path", "unmatched"), request.method,
+                                            str(status)).observe(time.perf_counter() - start)
+
+    @app.get(path, include_in_schema=False)
+    async def _metrics():
+        return Response(registry.render(), media_type=CONTENT_TYPE)
+
+def benchmark_recording(threads: int = 8, observations: int = 100000) -> Dict[str, float]:
+    """Wall time per histogram observation (labels lookup + observe) with `threads` recording at once"""
+    registry = MetricsRegistry()
+    family = registry.histogram("benchmark_seconds", "Benchmark", ["model", "outcome"])
+
+    def worker():
+        for i in range(observations):
+            family.labels("GLM4.5", "success").observe((i % 5000) / 1000)
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    start = time.perf_counter()
+    for worker_thread in workers:
+        worker_thread.start()
+    for worker_thread in workers:
+        worker_thread.join()
+    elapsed = time.perf_counter() - start
+
+    count = family.labels("GLM4.5", "success").summary()["count"]
+    return {"threads": threads, "observations": count,
+            "ns_per_observation": round(elapsed / count * 1e9, 1)}
+
+if __name__ == "__main__":
+    result = benchmark_recording()
+    print(f"📈 {result['observations']} observations from {result['threads']} threads: "
+          f"{result['ns_per_observation']}ns per observation")
@@ -0,0 +1,385 @@
+#!/usr/bin/env python3
+"""
+Mock OpenRouter Server for OrchestrateX
+Local stand-in for the OpenRouter API so full-stack performance tests run offline
+
+Speaks the /api/v1/chat/completions protocol the clients use:
+1. Regular JSON responses and SSE streaming ("stream": true), both with usage fields
+2. x-ratelimit-limit / -remaining / -reset headers from a per-key request window,
+   with 429 + Retry-After once the window is used up
+3. Per-model profiles: time-to-first-token distribution, tokens/sec, output length,
+   random 429 and 5xx rates
+
+Results are deterministic: each request's outcome is drawn from a generator
+seeded with (seed, model, prompt, n-th repeat of that prompt), so the same test
+produces the same responses and failures regardless of request interleaving.
+
+Run:
+    python mock_openrouter.py --port 8099 --config mock_profiles.json --seed 7
+    export OPENROUTER_BASE_URL=http://127.0.0.1:8099/api/v1
+
+Config file:
+    {"seed": 7, "models": {"*": {"latency_ms": 300},
+                           "z-ai/*": {"latency_ms": 900, "error_rate_429": 0.1}}}
+
+In tests:
+    with MockOpenRouterServer(MockOpenRouter({"*": ModelProfile(latency_ms=50)})) as server:
+        os.environ["OPENROUTER_BASE_URL"] = server.base_url
+"""
+
+import json
+import math
+import time
+import random
+import socket
+import asyncio
+import hashlib
+import logging
+import argparse
+import threading
+from fnmatch import fnmatch
+from dataclasses import dataclass, asdict, fields
+from typing import Any, Dict, List, Optional, Tuple
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+logger = logging.getLogger(__name__)
+
+_WORDS = (
+    "the model response orchestrate critique analysis result answer data system request "
+    "performance latency token stream quality improve review context detail example code "
+    "function value test step approach reason summary point option case issue solution"
+).split()
+
+@dataclass
+class ModelProfile:
+    """Simulated behaviour of one model"""
+    latency_ms: float = 300.0         # Median time to first token
+    latency_sigma: float = 0.25       # Log-normal spread of the latency (0 = fixed)
+    tokens_per_second: float = 80.0   # Generation speed after the first token
+    output_tokens: int = 120          # Mean completion length (capped by max_tokens)
+    error_rate_429: float = 0.0       # Random upstream rate limits (no Retry-After)
+    error_rate_5xx: float = 0.0       # Random 500/502/503 responses
+    requests_per_window: int = 0      # Per-key request limit (0 = unlimited)
+    window_seconds: float = 60.0
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "ModelProfile":
+        known = {f.name for f in fields(cls)}
+        unknown = set(data) - known
+        if unknown:
+            raise ValueError(f"Unknown profile settings: {', '.join(sorted(unknown))}")
+        return cls(**data)
+
+class _Plan:
+    """Outcome of one request, drawn before any waiting happens"""
+
+    def __init__(self, status: int, first_token_delay: float, words: List[str],
+                 finish_reason: str, generation_id: str, headers: Dict[str, str]):
+        self.status = status
+        self.first_token_delay = first_token_delay
+        self.words = words
+        self.finish_reason = finish_reason
+        self.generation_id = generation_id
+        self.headers = headers
+
+def _prompt_text(messages: List[Dict[str, Any]]) -> str:
+    parts = []
+    for message in messages or []:
+        content = message.get("content", "")
+        if isinstance(content, list):  # Multi-part content
+            content = " ".join(part.get("text", "") for part in content if isinstance(part, dict))
+        parts.append(str(content))
+    return "\n".join(parts)
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about 4 characters per token)"""
+    return max(1, math.ceil(len(text) / 4))
+
+class MockOpenRouter:
+    """
+    Request simulation and state (rate-limit windows, statistics) behind the server
+    """
+
+    def __init__(self, profiles: Optional[Dict[str, ModelProfile]] = None, seed: int = 0):
+        """
+        Args:
+            profiles: Model ID or fnmatch pattern -> profile; "*" is the fallback
+            seed: Base seed for every random draw
+        """
+        self.profiles = dict(profiles or {})
+        self.profiles.setdefault("*", ModelProfile())
+        self.seed = seed
+        self._repeats: Dict[Tuple[str, str], int] = {}
+        self._windows: Dict[Tuple[str, str], Tuple[float, int]] = {}  # -> (window start, requests)
+        self._lock = threading.Lock()
+        self.reset()
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any], seed: Optional[int] = None) -> "MockOpenRouter":
+        profiles = {name: ModelProfile.from_dict(data) for name, data in config.get("models", {}).items()}
+        return cls(profiles, seed=config.get("seed", 0) if seed is None else seed)
+
+    def reset(self):
+        """Forget windows, repeat counters and statistics (the next run replays identically)"""
+        with self._lock:
+            self._repeats.clear()
+            self._windows.clear()
+            self.stats = {"requests": 0, "streamed": 0, "completion_tokens": 0, "prompt_tokens": 0,
+                          "status_codes": {}, "models": {}}
+
+    def profile_for(self, model: str) -> ModelProfile:
+        if model in self.profiles:
+            return self.profiles[model]
+        for pattern, profile in self.profiles.items():
+            if pattern != "*" and fnmatch(model, pattern):
+                return profile
+        return self.profiles["*"]
+
+    def _window(self, model: str, api_key: str, profile: ModelProfile, now: float) -> Tuple[bool, Dict[str, str]]:
+        """Count the request in its fixed window; returns (allowed, rate-limit headers)"""
+        if profile.requests_per_window <= 0:
+            return True, {}
+        key = (model, api_key)
+        start, count = self._windows.get(key, (now, 0))
+        if now - start >= profile.window_seconds:
+            start, count = now, 0
+        allowed = count < profile.requests_per_window
+        if allowed:
+            count += 1
+        self._windows[key] = (start, count)
+
+        reset_at = start + profile.window_seconds
+        headers = {
+            "X-RateLimit-Limit": str(profile.requests_per_window),
+            "X-RateLimit-Remaining": str(profile.requests_per_window - count),
+            "X-RateLimit-Reset": str(int(reset_at * 1000))  # Epoch milliseconds, like OpenRouter
+        }
+        if not allowed:
+            headers["Retry-After"] = str(max(1, math.ceil(reset_at - now)))
+        return allowed, headers
+
+    def plan(self, payload: Dict[str, Any], api_key: str) -> _Plan:
+        """Decide status, latency and completion for one request"""
+        model = str(payload.get("model", ""))
+        prompt = _prompt_text(payload.get("messages", []))
+        profile = self.profile_for(model)
+
+        with self._lock:
+            repeat = self._repeats.get((model, prompt), 0)
+            self._repeats[(model, prompt)] = repeat + 1
+            allowed, headers = self._window(model, api_key, profile, time.time())
+
+        digest = hashlib.sha256(f"{self.seed}|{model}|{prompt}|{repeat}".encode("utf-8")).hexdigest()
+        rng = random.Random(digest)
+        first_token_delay = profile.latency_ms / 1000 * (
+            rng.lognormvariate(0, profile.latency_sigma) if profile.latency_sigma > 0 else 1.0
+        )
+        roll = rng.random()
+
+        if not allowed:
+            status = 429
+        elif roll < profile.error_rate_429:
+            status = 429
+        elif roll < profile.error_rate_429 + profile.error_rate_5xx:
+            status = rng.choice([500, 502, 503])
+        else:
+            status = 200
+
+        words, finish_reason = [], "stop"
+        if status == 200:
+            length = max(1, int(rng.gauss(profile.output_tokens, profile.output_tokens * 0.2)))
+            max_tokens = payload.get("max_tokens")
+            if max_tokens and length > max_tokens:
+                length, finish_reason = int(max_tokens), "length"
+            words = [rng.choice(_WORDS) for _ in range(length)]
+
+        return _Plan(status, first_token_delay, words, finish_reason, f"gen-{digest[:24]}", headers)
+
+    def record(self, model: str, status: int, streamed: bool, prompt_tokens: int, completion_tokens: int):
+        with self._lock:
+            self.stats["requests"] += 1
+            self.stats["streamed"] += int(streamed)
+            self.stats["prompt_tokens"] += prompt_tokens
+            self.stats["completion_tokens"] += completion_tokens
+            codes = self.stats["status_codes"]
+            codes[str(status)] = codes.get(str(status), 0) + 1
+            self.stats["models"][model] = self.stats["models"].get(model, 0) + 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return json.loads(json.dumps(self.stats))
+
+def _error_body(status: int) -> Dict[str, Any]:
+    messages = {
+        401: "No auth credentials found",
+        429: "Rate limit exceeded: too many requests",
+        500: "Internal Server Error",
+        502: "Upstream provider returned an error",
+        503: "No available provider could serve the request"
+    }
+    return {"error": {"code": status, "message": messages.get(status, "Error")}}
+
+def _sse(data: Any) -> str:
+    return f"data: {json.dumps(data)}\n\n"
+
+def create_app(mock: MockOpenRouter) -> FastAPI:
+    """ASGI app serving the OpenRouter endpoints from a MockOpenRouter"""
+    app = FastAPI(title="Mock OpenRouter")
+
+    @app.post("/api/v1/chat/completions")
+    async def chat_completions(request: Request):
+        auth = request.headers.get("authorization", "")
+        if not auth.lower().startswith("bearer ") or not auth[7:].strip():
+            return JSONResponse(_error_body(401), status_code=401)
+        payload = await request.json()
+        model = str(payload.get("model", ""))
+        streamed = bool(payload.get("stream"))
+        profile = mock.profile_for(model)
+        plan = mock.plan(payload, auth[7:].strip())
+        prompt_tokens = estimate_tokens(_prompt_text(payload.get("messages", [])))
+
+        if plan.status != 200:
+            await asyncio.sleep(plan.first_token_delay)
+            mock.record(model, plan.status, streamed, 0, 0)
+            return JSONResponse(_error_body(plan.status), status_code=plan.status, headers=plan.headers)
+
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": len(plan.words),
+            "total_tokens": prompt_tokens + len(plan.words)
+        }
+        created = int(time.time())
+        base = {"id": plan.generation_id, "provider": "Mock", "model": model, "created": created}
+        token_delay = 1.0 / profile.tokens_per_second if profile.tokens_per_second > 0 else 0.0
+
+        if not streamed:
+            await asyncio.sleep(plan.first_token_delay + token_delay * max(0, len(plan.words) - 1))
+            mock.record(model, 200, False, prompt_tokens, len(plan.words))
+            return JSONResponse({
+                **base,
+                "object": "chat.completion",
+                "choices": [{
+                    "index": 0,
+                    "finish_reason": plan.finish_reason,
+                    "message": {"role": "assistant", "content": " ".join(plan.words)}
+                }],
+                "usage": usage
+            }, headers=plan.headers)
+
+        async def events():
+            yield ": OPENROUTER PROCESSING\n\n"
+            await asyncio.sleep(plan.first_token_delay)
+            for i, word in enumerate(plan.words):
+                if i:
+                    await asyncio.sleep(token_delay)
+                yield _sse({**base, "object": "chat.completion.chunk", "choices": [{
+                    "index": 0,
+                    "delta": {"role": "assistant", "content": word if i == 0 else f" {word}"},
+                    "finish_reason": None
+                }]})
+            yield _sse({**base, "object": "chat.completion.chunk", "choices": [{
+                "index": 0, "delta": {}, "finish_reason": plan.finish_reason
+            }], "usage": usage})
+            yield "data: [DONE]\n\n"
+            mock.record(model, 200, True, prompt_tokens, len(plan.words))
+
+        return StreamingResponse(events(), media_type="text/event-stream", headers=plan.headers)
+
+    @app.get("/api/v1/models")
+    async def models():
+        return {"data": [{"id": name, "name": name} for name in mock.profiles if not any(c in name for c in "*?[")]}
+
+    @app.get("/mock/stats")
+    async def stats():
+        return {**mock.get_stats(), "seed": mock.seed,
+                "profiles": {name: asdict(profile) for name, profile in mock.profiles.items()}}
+
+    @app.post("/mock/reset")
+    async def reset():
+        mock.reset()
+        return {"status": "reset"}
+
+    return app
+
+class MockOpenRouterServer:
+    """
+    Runs the mock in a background thread (uvicorn on its own event loop)
+    """
+
+    def __init__(self, mock: Optional[MockOpenRouter] = None, host: str = "127.0.0.1", port: int = 0):
+        """
+        Args:
+            mock: Simulation to serve (defaults to the default profile)
+            host: Interface to bind
+            port: Port to bind; 0 picks a free one
+        """
+        self.mock = mock or MockOpenRouter()
+        self.host = host
+        self.port = port
+        self._server: Optional[uvicorn.Server] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        """Value for OPENROUTER_BASE_URL"""
+        return f"http://{self.host}:{self.port}/api/v1"
+
+    def start(self, timeout: float = 10.0) -> str:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((self.host, self.port))
+        self.port = sock.getsockname()[1]
+
+        config = uvicorn.Config(create_app(self.mock), log_level="warning", lifespan="off",
+                                timeout_keep_alive=30, backlog=2048)
+        self._server = uvicorn.Server(config)
+        self._thread = threading.Thread(target=self._server.run, kwargs={"sockets": [sock]},
+                                        name="mock-openrouter", daemon=True)
+        self._thread.start()
+
+        deadline = time.monotonic() + timeout
+        while not self._server.started:
+            if not self._thread.is_alive() or time.monotonic() > deadline:
+                raise RuntimeError("Mock OpenRouter server failed to start")
+            time.sleep(0.01)
+        logger.info(f"🧪 Mock OpenRouter listening on {self.base_url}")
+        return self.base_url
+
+    def stop(self, timeout: float = 5.0):
+        if self._server is not None:
+            self._server.should_exit = True
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self._server = self._thread = None
+
+    def __enter__(self) -> "MockOpenRouterServer":
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock OpenRouter server for offline performance tests")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--config", help="JSON file with seed and per-model profiles")
+    parser.add_argument("--seed", type=int, help="Overrides the seed from the config file")
+    args = parser.parse_args()
+
+    config = {}
+    if args.config:
+        with open(args.config, encoding="utf-8") as f:
+            config = json.load(f)
+    mock = MockOpenRouter.from_config(config, seed=args.seed)
+
+    print(f"🧪 Mock OpenRouter on http://{args.host}:{args.port}/api/v1 (seed {mock.seed})")
+    for name, profile in mock.profiles.items():
+        print(f"   {name}: {asdict(profile)}")
+    uvicorn.run(create_app(mock), host=args.host, port=args.port, log_level="warning")
+
+if __name__ == "__main__":
+    main()
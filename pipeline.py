@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+"""
+Pipeline Executor for OrchestrateX
+Runs an orchestration workflow declared as a DAG of async stages
+
+Each stage names the stages it depends on. A stage starts as soon as all of
+its dependencies have finished, so independent stages run concurrently and
+the workflow's latency shrinks to its true dependency chain (critical path).
+Stages get optional per-stage timeouts and retries, and every stage records
+its timing (also into the orchestratex_stage_seconds histogram, see metrics).
+
+Usage:
+    pipeline = Pipeline("chat")
+    pipeline.add_stage("select", select_model)
+    pipeline.add_stage("primary", generate_primary, depends_on=["select"], timeout=60, retries=1)
+    pipeline.add_stage("store_prompt", store_prompt)
+    result = await pipeline.run({"prompt": prompt})
+    result.results["primary"], result.timings["primary"].duration_ms
+"""
+
+import time
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Union
+
+from metrics import PIPELINE_SECONDS, record_stage
+from http_transport import run_in_background_loop
+
+logger = logging.getLogger(__name__)
+
+StageFunc = Callable[[Dict[str, Any]], Union[Any, Awaitable[Any]]]
+
+class PipelineError(Exception):
+    """Raised when a required stage fails or the DAG is invalid"""
+    def __init__(self, pipeline: str, stage: Optional[str], error_msg: str):
+        self.pipeline = pipeline
+        self.stage = stage
+        self.error_msg = error_msg
+        self.results: Dict[str, Any] = {}  # Results of stages that completed before the failure
+        super().__init__(f"{pipeline}.{stage}: {error_msg}" if stage else f"{pipeline}: {error_msg}")
+
+@dataclass
+class Stage:
+    """A single step in a pipeline"""
+    name: str
+    func: StageFunc
+    depends_on: List[str] = field(default_factory=list)
+    timeout: Optional[float] = None
+    retries: int = 0
+    retry_delay: float = 0.5
+    required: bool = True  # Failure of an optional stage yields None instead of aborting
+
+@dataclass
+class StageTiming:
+    """Timing and outcome of one stage execution"""
+    name: str
+    start_ms: float
+    end_ms: float
+    attempts: int
+    status: str  # "success", "failed" or "cancelled"
+    error: Optional[str] = None
+
+    @property
+    def duration_ms(self) -> float:
+        return self.end_ms - self.start_ms
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "stage": self.name,
+            "start_ms": round(self.start_ms, 1),
+            "duration_ms": round(self.duration_ms, 1),
+            "attempts": self.attempts,
+            "status": self.status,
+            "error": self.error
+        }
+
+@dataclass
+class PipelineResult:
+    """Results and timings of a pipeline run"""
+    pipeline: str
+    results: Dict[str, Any]
+    timings: Dict[str, StageTiming]
+    total_ms: float
+    critical_path: List[str]
+
+    def __getitem__(self, stage_name: str) -> Any:
+        return self.results[stage_name]
+
+    def timing_summary(self) -> Dict[str, Any]:
+        """JSON-friendly timing report"""
+        return {
+            "pipeline": self.pipeline,
+            "total_ms": round(self.total_ms, 1),
+            "critical_path": self.critical_path,
+            "stages": [timing.to_dict() for timing in sorted(self.timings.values(), key=lambda t: t.start_ms)]
+        }
+
+class Pipeline:
+    """
+    DAG of async (or sync) stages executed with maximal concurrency
+
+    Stage functions receive a context dict holding the initial context plus
+    the results of all completed stages, keyed by stage name. Sync stage
+    functions run in a worker thread so they do not block the event loop.
+    """
+
+    def __init__(self, name: str, on_stage_complete: Optional[Callable[[StageTiming], None]] = None):
+        self.name = name
+        self.stages: Dict[str, Stage] = {}
+        self.on_stage_complete = on_stage_complete
+
+    def add_stage(self, name: str, func: StageFunc, depends_on: Optional[List[str]] = None,
+                  timeout: Optional[float] = None, retries: int = 0, retry_delay: float = 0.5,
+                  required: bool = True) -> "Pipeline":
+        """
+        Register a stage; returns the pipeline for chaining
+
+        A sync stage that times out is not retried: its worker thread cannot be
+        cancelled and keeps running, so a retry would run the call twice at
+        once. Use a coroutine stage for calls that should be retried on timeout.
+        """
+        if name in self.stages:
+            raise PipelineError(self.name, name, "duplicate stage name")
+        self.stages[name] = Stage(name, func, list(depends_on or []), timeout, retries, retry_delay, required)
+        return self
+
+    def validate(self):
+        """Check that all dependencies exist and the graph has no cycles"""
+        for stage in self.stages.values():
+            for dependency in stage.depends_on:
+                if dependency not in self.stages:
+                    raise PipelineError(self.name, stage.name, f"unknown dependency '{dependency}'")
+
+        remaining = {name: set(stage.depends_on) for name, stage in self.stages.items()}
+        while remaining:
+            ready = [name for name, deps in remaining.items() if not deps]
+            if not ready:
+                raise PipelineError(self.name, None, f"dependency cycle among {sorted(remaining)}")
+            for name in ready:
+                del remaining[name]
+            for deps in remaining.values():
+                deps.difference_update(ready)
+
+    async def _run_stage(self, stage: Stage, context: Dict[str, Any], origin: float,
+                         timings: Dict[str, StageTiming]) -> Any:
+        start_ms = (time.perf_counter() - origin) * 1000
+        attempts = 0
+        last_error: Optional[BaseException] = None
+
+        is_async = asyncio.iscoroutinefunction(stage.func)
+        while attempts <= stage.retries:
+            attempts += 1
+            try:
+                if is_async:
+                    call = stage.func(context)
+                else:
+                    call = asyncio.to_thread(stage.func, context)
+                result = await asyncio.wait_for(call, timeout=stage.timeout)
+                self._record(timings, stage, start_ms, origin, attempts, "success")
+                return result
+            except asyncio.CancelledError:
+                self._record(timings, stage, start_ms, origin, attempts, "cancelled")
+                raise
+            except Exception as e:
+                last_error = e
+                reason = f"timed out after {stage.timeout}s" if isinstance(e, asyncio.TimeoutError) else str(e)
+                logger.warning(f"⚠️ {self.name}.{stage.name} attempt {attempts}/{stage.retries + 1} failed: {reason}")
+                if not is_async and isinstance(e, asyncio.TimeoutError):
+                    break  # The timed-out call is still running in its thread
+                if attempts <= stage.retries:
+                    await asyncio.sleep(stage.retry_delay * (2 ** (attempts - 1)))
+
+        error_msg = f"timed out after {stage.timeout}s" if isinstance(last_error, asyncio.TimeoutError) else str(last_error)
+        self._record(timings, stage, start_ms, origin, attempts, "failed", error_msg)
+        if stage.required:
+            raise PipelineError(self.name, stage.name, error_msg) from last_error
+        return None
+
+    def _record(self, timings: Dict[str, StageTiming], stage: Stage, start_ms: float, origin: float,
+                attempts: int, status: str, error: Optional[str] = None):
+        timing = StageTiming(stage.name, start_ms, (time.perf_counter() - origin) * 1000, attempts, status, error)
+        timings[stage.name] = timing
+        record_stage(self.name, stage.name, timing.duration_ms / 1000, status)
+        logger.debug(f"⏱️ {self.name}.{stage.name}: {timing.duration_ms:.1f}ms ({status})")
+        if self.on_stage_complete:
+            try:
+                self.on_stage_complete(timing)
+            except Exception as e:
+                logger.error(f"❌ Stage timing callback failed: {e}")
+
+    def _critical_path(self, timings: Dict[str, StageTiming]) -> List[str]:
+        """Walk back from the last-finishing stage through its latest-finishing dependency"""
+        if not timings:
+            return []
+        current = max(timings.values(), key=lambda t: t.end_ms).name
+        path = [current]
+        while self.stages[current].depends_on:
+            current = max(self.stages[current].depends_on,
+                          key=lambda dep: timings[dep].end_ms if dep in timings else -1)
+            path.append(current)
+        return list(reversed(path))
+
+    async def run(self, context: Optional[Dict[str, Any]] = None) -> PipelineResult:
+        """
+        Execute all stages, starting each one as soon as its dependencies finish
+
+        Args:
+            context: Initial values made available to every stage
+
+        Returns:
+            PipelineResult with per-stage results and timings
+
+        Raises:
+            PipelineError: If a required stage fails (pending stages are cancelled);
+                its results attribute holds the stages completed so far
+        """
+        self.validate()
+        origin = time.perf_counter()
+        timings: Dict[str, StageTiming] = {}
+        ctx: Dict[str, Any] = dict(context or {})
+        results: Dict[str, Any] = {}
+
+        pending = dict(self.stages)
+        running: Dict[asyncio.Task, str] = {}
+
+        try:
+            while pending or running:
+                for name in [n for n, s in pending.items() if all(d in results for d in s.depends_on)]:
+                    stage = pending.pop(name)
+                    running[asyncio.create_task(self._run_stage(stage, ctx, origin, timings))] = name
+
+                done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    name = running.pop(task)
+                    results[name] = task.result()
+                    ctx[name] = results[name]
+        except PipelineError as e:
+            e.results = dict(results)
+            PIPELINE_SECONDS.labels(self.name, "failed").observe(time.perf_counter() - origin)
+            raise
+        finally:
+            for task in running:
+                task.cancel()
+            if running:
+                await asyncio.gather(*running, return_exceptions=True)
+
+        total_ms = (time.perf_counter() - origin) * 1000
+        PIPELINE_SECONDS.labels(self.name, "success").observe(total_ms / 1000)
+        result = PipelineResult(self.name, results, timings, total_ms, self._critical_path(timings))
+        logger.info(f"⏱️ Pipeline {self.name} completed in {total_ms:.0f}ms (critical path: {' → '.join(result.critical_path)})")
+        return result
+
+    def run_sync(self, context: Optional[Dict[str, Any]] = None) -> PipelineResult:
+        """
+        Run the pipeline from synchronous code (e.g. a Flask handler)
+
+        Runs on the shared background loop rather than a fresh asyncio.run()
+        loop, so stages reuse its pooled HTTP client across requests.
+        """
+        return run_in_background_loop(self.run(context))
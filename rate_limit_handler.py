@@ -2,17 +2,29 @@
 """
 Rate Limit Detection and Response Handler for OrchestrateX
 Integrates with API Key Rotation Manager to handle OpenRouter API limits
+
+Requests run as coroutines on the shared pooled async client
+(acall_model_with_rotation); call_model_with_rotation is a blocking wrapper
+for threaded callers such as the Flask app.
 """
 
-import requests
+import httpx
 import json
 import time
-from typing import Dict, Tuple, Optional, Any
+import random
+import asyncio
+from typing import Any, Awaitable, Dict, Tuple, Optional
 import logging
 from datetime import datetime
 
 # Import our rotation manager
 from api_key_rotation import rotation_manager, get_api_key, handle_rate_limit, increment_usage
+from response_cache import response_cache, make_cache_key
+from http_transport import get_async_client, openrouter_base_url, run_in_background_loop
+from concurrency_limiter import concurrency_limiters
+from token_bucket import rate_limiters, parse_reset
+from token_accounting import size_max_tokens, usage_from_response, completion_budget_hit
+from metrics import outcome_for_status, record_model_call, record_tokens
 
 logger = logging.getLogger(__name__)
 
@@ -22,14 +34,14 @@ class RateLimitAwareAPIClient:
     """
     
     def __init__(self):
-        self.base_url = "https://openrouter.ai/api/v1/chat/completions"
+        self.base_url = f"{openrouter_base_url()}/chat/completions"
         self.default_headers = {
             "Content-Type": "application/json",
             "HTTP-Referer": "https://orchestratex.me",
             "X-Title": "OrchestrateX"
         }
         
-    def _is_rate_limit_error(self, response: requests.Response) -> bool:
+    def _is_rate_limit_error(self, response: httpx.Response) -> bool:
         """Check if response indicates rate limiting"""
         if response.status_code == 429:
             return True
@@ -48,7 +60,7 @@ class RateLimitAwareAPIClient:
         
         return False
     
-    def _extract_rate_limit_info(self, response: requests.Response) -> Dict:
+    def _extract_rate_limit_info(self, response: httpx.Response) -> Dict:
         """Extract rate limit information from response headers and body"""
         rate_limit_info = {
             'status_code': response.status_code,
@@ -75,22 +87,56 @@ class RateLimitAwareAPIClient:
         
         return rate_limit_info
     
-    def call_openrouter_api(self, provider: str, model_id: str, prompt: str, max_tokens: int = 2000, 
-                           temperature: float = 0.7, max_retries: int = 3) -> Dict:
+    def _retry_delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """Backoff before the next attempt: Retry-After if the server sent one, else full jitter"""
+        if retry_after is not None:
+            return retry_after + random.uniform(0, 0.5)
+        return random.uniform(0, min(2 ** attempt, 10))
+    
+    async def _acquire_request_token(self, provider: str, api_key: str) -> Tuple[Optional[str], float]:
+        """
+        Wait locally for a request token of the provider's documented rate
+        
+        If the current key's bucket is empty, the request is routed to the
+        provider's key with the shortest wait instead.
+        
+        Returns:
+            Tuple of (api_key to use, or None if no token within max_wait; wait in seconds)
+        """
+        wait = rate_limiters.get(provider, api_key).wait_time()
+        all_keys = rotation_manager.api_keys.get(provider, {}).get('all_keys', [])
+        if wait > 0 and len(all_keys) > 1:
+            best_key, best_wait = rate_limiters.best_key(provider, all_keys)
+            if best_key and best_key != api_key and best_wait < wait:
+                logger.info(f"🪣 {provider} key bucket empty, routing to another key (wait {best_wait:.1f}s vs {wait:.1f}s)")
+                api_key, wait = best_key, best_wait
+        
+        if not await rate_limiters.get(provider, api_key).acquire_async(timeout=rate_limiters.max_wait):
+            return None, wait
+        return api_key, wait
+    
+    async def acall_openrouter_api(self, provider: str, model_id: str, prompt: str, max_tokens: Optional[int] = None,
+                                   temperature: float = 0.7, max_retries: int = 3) -> Dict:
         """
         Call OpenRouter API with automatic key rotation on rate limits
         
+        Runs on the shared pooled async client; retries back off with jitter
+        (honoring Retry-After) without blocking a thread, and cancelling the
+        coroutine aborts the request and any pending backoff.
+        
         Args:
             provider: Provider name (e.g., 'GLM45', 'GPTOSS')
             model_id: Model identifier for OpenRouter
             prompt: The prompt to send
-            max_tokens: Maximum tokens to generate
+            max_tokens: Maximum tokens to generate (sized from the prompt's intent if None)
             temperature: Temperature for generation
             max_retries: Maximum number of key rotations to attempt
         
         Returns:
             Dict with success status, response data, and metadata
         """
+        if max_tokens is None:
+            max_tokens = size_max_tokens(provider, prompt)
         
         for attempt in range(max_retries + 1):
             # Get current API key for this provider
@@ -103,6 +149,20 @@ class RateLimitAwareAPIClient:
                     'attempt': attempt
                 }
             
+            # Client-side rate limit: wait for a token instead of sending a request that will fail
+            api_key, token_wait = await self._acquire_request_token(provider, api_key)
+            if not api_key:
+                logger.warning(f"🪣 {provider}: no request slot within {rate_limiters.max_wait:.0f}s (next in {token_wait:.1f}s)")
+                record_model_call(provider, "rate_limited_locally")
+                return {
+                    'success': False,
+                    'error': f'Rate limit for {provider} reached locally, next slot in {token_wait:.0f}s',
+                    'rate_limited_locally': True,
+                    'retry_after': token_wait,
+                    'provider': provider,
+                    'attempt': attempt + 1
+                }
+            
             # Prepare request
             headers = self.default_headers.copy()
             headers["Authorization"] = f"Bearer {api_key}"
@@ -118,20 +178,34 @@ class RateLimitAwareAPIClient:
             
             try:
                 logger.info(f"🔄 Calling {provider} (attempt {attempt + 1}/{max_retries + 1})")
-                response = requests.post(self.base_url, headers=headers, json=payload, timeout=30)
+                # Shared keep-alive pool (no TLS handshake per call) within the
+                # provider/key's adaptive concurrency limit
+                async with concurrency_limiters.get(provider, api_key).slot() as permit:
+                    response = await get_async_client().post(self.base_url, headers=headers, json=payload, timeout=30)
+                    permit.record(status_code=response.status_code)
+                
+                # Keep the local bucket in line with what the server reports
+                bucket = rate_limiters.get(provider, api_key)
+                bucket.update_from_headers(response.headers)
+                if bucket.blocked_for() > 0:
+                    # Quota used up: steer traffic to other keys until the window resets
+                    rotation_manager.refresh_schedule(provider)
                 
                 # Increment usage counter
-                increment_usage(provider)
+                increment_usage(provider, api_key)
                 
                 response_time = time.time() - start_time
+                record_model_call(provider, outcome_for_status(response.status_code), response_time)
                 
                 # Check for rate limiting
                 if self._is_rate_limit_error(response):
                     rate_limit_info = self._extract_rate_limit_info(response)
                     logger.warning(f"⚠️ Rate limit detected for {provider}: {rate_limit_info}")
+                    if not rate_limit_info['headers']:
+                        bucket.penalize()
                     
                     # Handle rate limit and try rotation
-                    rotation_success = handle_rate_limit(provider, rate_limit_info)
+                    rotation_success = handle_rate_limit(provider, rate_limit_info, api_key)
                     
                     if not rotation_success and attempt == max_retries:
                         return {
@@ -142,15 +216,26 @@ class RateLimitAwareAPIClient:
                             'attempts': attempt + 1
                         }
                     
-                    # If we have more attempts or rotation was successful, continue to next iteration
-                    if rotation_success or attempt < max_retries:
-                        wait_time = min(2 ** attempt, 10)  # Exponential backoff, max 10 seconds
-                        logger.info(f"🕐 Waiting {wait_time}s before retry...")
-                        time.sleep(wait_time)
-                        continue
+                    # A fresh key goes straight to its own token bucket; otherwise wait
+                    # as long as the server asked (Retry-After), unless that is too long
+                    if not rotation_success:
+                        retry_after = parse_reset(response.headers.get('retry-after', ''))
+                        if retry_after is not None and retry_after > rate_limiters.max_wait:
+                            return {
+                                'success': False,
+                                'error': f'All API keys for {provider} are rate limited, retry in {retry_after:.0f}s',
+                                'rate_limit_info': rate_limit_info,
+                                'retry_after': retry_after,
+                                'provider': provider,
+                                'attempts': attempt + 1
+                            }
+                        wait_time = self._retry_delay(attempt, retry_after)
+                        logger.info(f"🕐 Waiting {wait_time:.1f}s before retry...")
+                        await asyncio.sleep(wait_time)
+                    continue
                 
                 # Check for other HTTP errors
-                if not response.ok:
+                if not response.is_success:
                     error_data = {
                         'status_code': response.status_code,
                         'response_text': response.text[:500]
@@ -178,9 +263,12 @@ class RateLimitAwareAPIClient:
                     if 'choices' in result and len(result['choices']) > 0:
                         generated_text = result['choices'][0]['message']['content']
                         
-                        # Calculate tokens and cost (rough estimates)
-                        input_tokens = len(prompt.split()) * 1.3  # Rough estimate
-                        output_tokens = len(generated_text.split()) * 1.3
+                        # Tokens and cost as reported by OpenRouter (estimated if missing)
+                        usage = usage_from_response(result, prompt, generated_text, model_id)
+                        record_tokens(provider, usage['input_tokens'], usage['output_tokens'])
+                        truncated = completion_budget_hit(result)
+                        if truncated:
+                            logger.info(f"✂️ {provider} answer hit max_tokens={max_tokens}")
                         
                         return {
                             'success': True,
@@ -188,9 +276,9 @@ class RateLimitAwareAPIClient:
                             'metadata': {
                                 'provider': provider,
                                 'model_id': model_id,
-                                'input_tokens': int(input_tokens),
-                                'output_tokens': int(output_tokens),
-                                'total_tokens': int(input_tokens + output_tokens),
+                                **usage,
+                                'max_tokens': max_tokens,
+                                'truncated': truncated,
                                 'response_time_ms': int(response_time * 1000),
                                 'attempt': attempt + 1,
                                 'timestamp': datetime.now().isoformat()
@@ -215,8 +303,9 @@ class RateLimitAwareAPIClient:
                         'attempt': attempt + 1
                     }
                     
-            except requests.exceptions.Timeout:
+            except httpx.TimeoutException:
                 logger.warning(f"⏰ Timeout for {provider} attempt {attempt + 1}")
+                record_model_call(provider, "timeout", time.time() - start_time)
                 if attempt == max_retries:
                     return {
                         'success': False,
@@ -226,11 +315,12 @@ class RateLimitAwareAPIClient:
                     }
                 
                 # Wait before retry
-                time.sleep(min(2 ** attempt, 10))
+                await asyncio.sleep(self._retry_delay(attempt))
                 continue
                 
-            except requests.exceptions.RequestException as e:
+            except httpx.HTTPError as e:
                 logger.error(f"❌ Request error for {provider}: {e}")
+                record_model_call(provider, "error", time.time() - start_time)
                 if attempt == max_retries:
                     return {
                         'success': False,
@@ -240,7 +330,7 @@ class RateLimitAwareAPIClient:
                     }
                 
                 # Wait before retry
-                time.sleep(min(2 ** attempt, 10))
+                await asyncio.sleep(self._retry_delay(attempt))
                 continue
         
         # Should not reach here, but just in case
@@ -250,16 +340,65 @@ class RateLimitAwareAPIClient:
             'provider': provider,
             'attempts': max_retries + 1
         }
+    
+    def call_openrouter_api(self, provider: str, model_id: str, prompt: str, max_tokens: Optional[int] = None,
+                            temperature: float = 0.7, max_retries: int = 3) -> Dict:
+        """Blocking wrapper around acall_openrouter_api for threaded callers"""
+        return run_sync(self.acall_openrouter_api(provider, model_id, prompt, max_tokens=max_tokens,
+                                                  temperature=temperature, max_retries=max_retries))
+
+def run_sync(coro: Awaitable[Any]) -> Any:
+    """Run a coroutine of this module to completion from synchronous code (see http_transport.BackgroundLoop)"""
+    return run_in_background_loop(coro)
 
 # Global client instance
 api_client = RateLimitAwareAPIClient()
 
+async def acall_model_with_rotation(provider: str, model_id: str, prompt: str, use_cache: bool = True, **kwargs) -> Dict:
+    """
+    Call a model with automatic key rotation from async code
+
+    Successful responses are cached per (model, prompt, request parameters)
+    and concurrent identical calls share one upstream request.
+    Pass use_cache=False to always call the API.
+    """
+    if kwargs.get('max_tokens') is None:
+        kwargs['max_tokens'] = size_max_tokens(provider, prompt)
+    cache_key = make_cache_key(
+        model_id,
+        prompt,
+        temperature=kwargs.get('temperature', 0.7),
+        max_tokens=kwargs['max_tokens'],
+        **{k: v for k, v in kwargs.items() if k not in ('temperature', 'max_tokens')}
+    )
+    
+    upstream_called = []
+    
+    async def compute():
+        upstream_called.append(True)
+        return await api_client.acall_openrouter_api(provider, model_id, prompt, **kwargs)
+    
+    result = await response_cache.aget_or_compute(
+        cache_key,
+        compute,
+        bypass=not use_cache,
+        should_cache=lambda r: r.get('success', False)
+    )
+    
+    if result.get('success'):
+        result['metadata']['cache_hit'] = not upstream_called
+    
+    return result
+
 # Convenience function for easy import
-def call_model_with_rotation(provider: str, model_id: str, prompt: str, **kwargs) -> Dict:
+def call_model_with_rotation(provider: str, model_id: str, prompt: str, use_cache: bool = True, **kwargs) -> Dict:
     """
     Convenience function to call a model with automatic key rotation
+
+    Blocking wrapper around acall_model_with_rotation; the request itself runs
+    on the shared background event loop, so waiting threads hold no sockets.
     """
-    return api_client.call_openrouter_api(provider, model_id, prompt, **kwargs)
+    return run_sync(acall_model_with_rotation(provider, model_id, prompt, use_cache=use_cache, **kwargs))
 
 if __name__ == "__main__":
     # Test the rate limit aware client
@@ -0,0 +1,373 @@
+#!/usr/bin/env python3
+"""
+Response Cache for OrchestrateX
+Reuses model responses for identical (model, prompt, parameters) requests
+
+Two tiers are supported:
+1. In-memory LRU tier (always on, per process)
+2. Optional persistent tier with TTL (SQLite file or MongoDB collection)
+
+Concurrent identical requests are coalesced (single-flight) so only one
+upstream call is made while the others wait for its result.
+"""
+
+import os
+import copy
+import json
+import time
+import sqlite3
+import asyncio
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+def normalize_prompt(prompt: str) -> str:
+    """Collapse whitespace so trivially different prompts share a cache entry"""
+    return " ".join((prompt or "").split())
+
+def make_cache_key(model_id: str, prompt: str, temperature: float = 0.7, max_tokens: int = 2000,
+                   **params: Any) -> str:
+    """
+    Build the cache key for a request
+
+    The key combines the model id, a hash of the normalized prompt,
+    the temperature (rounded to 2 decimals), max_tokens and a hash of any
+    other request parameters (top_p, stop, system prompt, ...), so requests
+    that differ in any parameter never share an entry.
+    """
+    prompt_hash = hashlib.sha256(normalize_prompt(prompt).encode("utf-8")).hexdigest()
+    key = f"{model_id}|{prompt_hash}|{float(temperature):.2f}|{int(max_tokens)}"
+    if params:
+        encoded = json.dumps(params, sort_keys=True, default=str, ensure_ascii=False)
+        key += f"|{hashlib.sha256(encoded.encode('utf-8')).hexdigest()[:16]}"
+    return key
+
+class MemoryLRUTier:
+    """Thread-safe in-memory LRU tier with per-entry expiry"""
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at < time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any, ttl_seconds: float):
+        with self._lock:
+            self._entries[key] = (value, time.time() + ttl_seconds)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+class SQLiteTier:
+    """Persistent tier backed by a local SQLite file"""
+
+    def __init__(self, db_path: str = "response_cache.db"):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS response_cache (
+                cache_key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                expires_at REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_response_cache_expires ON response_cache(expires_at)")
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM response_cache WHERE cache_key = ?", (key,)
+            ).fetchone()
+        if row is None or row[1] < time.time():
+            return None
+        return json.loads(row[0])
+
+    def set(self, key: str, value: Any, ttl_seconds: float):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO response_cache (cache_key, value, expires_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value, default=str), time.time() + ttl_seconds)
+            )
+            self._conn.commit()
+
+    def purge_expired(self) -> int:
+        """Delete expired rows, returns number of rows removed"""
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM response_cache WHERE expires_at < ?", (time.time(),))
+            self._conn.commit()
+            return cursor.rowcount
+
+class MongoTier:
+    """Persistent tier backed by a MongoDB collection with a TTL index"""
+
+    def __init__(self, connection_string: str, database_name: str = "orchestratex",
+                 collection_name: str = "response_cache"):
+        from pymongo import MongoClient
+
+        self._client = MongoClient(connection_string, serverSelectionTimeoutMS=5000)
+        self._collection = self._client[database_name][collection_name]
+        # MongoDB removes documents once expires_at has passed
+        self._collection.create_index("expires_at", expireAfterSeconds=0)
+
+    def get(self, key: str) -> Optional[Any]:
+        doc = self._collection.find_one({"_id": key})
+        if doc is None or doc["expires_at"] < datetime.utcnow():
+            return None
+        return json.loads(doc["value"])
+
+    def set(self, key: str, value: Any, ttl_seconds: float):
+        self._collection.replace_one(
+            {"_id": key},
+            {
+                "_id": key,
+                "value": json.dumps(value, default=str),
+                "expires_at": datetime.utcnow() + timedelta(seconds=ttl_seconds)
+            },
+            upsert=True
+        )
+
+class _Flight:
+    """An in-progress upstream call shared by concurrent identical requests"""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+class ResponseCache:
+    """
+    Two-tier response cache with single-flight request coalescing
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 3600,
+                 persistent_tier: Optional[Any] = None):
+        self.ttl_seconds = ttl_seconds
+        self.memory = MemoryLRUTier(max_entries)
+        self.persistent = persistent_tier
+
+        self._flights: Dict[str, _Flight] = {}
+        # Per event loop: a future can only be awaited on the loop it belongs to
+        self._async_flights: Dict[Tuple[asyncio.AbstractEventLoop, str], asyncio.Future] = {}
+        self._flights_lock = threading.Lock()
+
+        # Updated from request threads, asyncio.to_thread workers and the event loop
+        self._stats_lock = threading.Lock()
+        self.stats = {
+            "hits": 0,
+            "persistent_hits": 0,
+            "misses": 0,
+            "coalesced": 0,
+            "bypassed": 0
+        }
+
+    def _count(self, name: str):
+        with self._stats_lock:
+            self.stats[name] += 1
+
+    def get(self, key: str) -> Optional[Any]:
+        """Look up a key in the memory tier, then the persistent tier"""
+        value = self.memory.get(key)
+        if value is not None:
+            self._count("hits")
+            return copy.deepcopy(value)
+
+        if self.persistent is not None:
+            try:
+                value = self.persistent.get(key)
+            except Exception as e:
+                logger.warning(f"⚠️ Persistent cache read failed: {e}")
+                value = None
+            if value is not None:
+                self._count("persistent_hits")
+                self.memory.set(key, value, self.ttl_seconds)
+                return copy.deepcopy(value)
+
+        return None
+
+    def set(self, key: str, value: Any, ttl_seconds: Optional[float] = None):
+        """Store a value in both tiers"""
+        ttl = ttl_seconds if ttl_seconds is not None else self.ttl_seconds
+        self.memory.set(key, copy.deepcopy(value), ttl)
+
+        if self.persistent is not None:
+            try:
+                self.persistent.set(key, value, ttl)
+            except Exception as e:
+                logger.warning(f"⚠️ Persistent cache write failed: {e}")
+
+    def get_or_compute(self, key: str, compute: Callable[[], Any], bypass: bool = False,
+                       should_cache: Callable[[Any], bool] = lambda value: True) -> Any:
+        """
+        Return the cached value for key, or compute it exactly once
+
+        Args:
+            key: Cache key (see make_cache_key)
+            compute: Zero-argument callable performing the upstream call
+            bypass: Skip the cache entirely for this request
+            should_cache: Predicate deciding whether a computed value is stored
+
+        Returns:
+            The cached or freshly computed value
+        """
+        if bypass:
+            self._count("bypassed")
+            return compute()
+
+        cached = self.get(key)
+        if cached is not None:
+            return cached
+
+        with self._flights_lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = _Flight()
+                self._flights[key] = flight
+
+        if not leader:
+            self._count("coalesced")
+            flight.event.wait()
+            if flight.error is not None:
+                raise flight.error
+            return copy.deepcopy(flight.result)
+
+        self._count("misses")
+        try:
+            flight.result = compute()
+            if should_cache(flight.result):
+                self.set(key, flight.result)
+            return flight.result
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._flights_lock:
+                self._flights.pop(key, None)
+            flight.event.set()
+
+    async def aget_or_compute(self, key: str, compute: Callable[[], Awaitable[Any]], bypass: bool = False,
+                              should_cache: Callable[[Any], bool] = lambda value: True) -> Any:
+        """Async counterpart of get_or_compute for coroutine-based callers"""
+        if bypass:
+            self._count("bypassed")
+            return await compute()
+
+        cached = self.memory.get(key)
+        if cached is not None:
+            self._count("hits")
+            return copy.deepcopy(cached)
+
+        loop = asyncio.get_running_loop()
+        pending = self._async_flights.get((loop, key))
+        if pending is not None:
+            self._count("coalesced")
+            try:
+                return copy.deepcopy(await asyncio.shield(pending))
+            except asyncio.CancelledError:
+                # The leading call was cancelled, not this one: make our own call
+                if not pending.cancelled():
+                    raise
+                return await compute()
+
+        future = loop.create_future()
+        self._async_flights[(loop, key)] = future
+        try:
+            if self.persistent is not None:
+                cached = await asyncio.to_thread(self.get, key)
+                if cached is not None:
+                    future.set_result(cached)
+                    return cached
+
+            self._count("misses")
+            result = await compute()
+            if should_cache(result):
+                if self.persistent is not None:
+                    await asyncio.to_thread(self.set, key, result)
+                else:
+                    self.set(key, result)
+            future.set_result(result)
+            return result
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # Waiters re-raise the error; mark it retrieved for the leader
+            future.exception()
+            raise
+        finally:
+            self._async_flights.pop((loop, key), None)
+
+    def clear(self):
+        """Clear the in-memory tier"""
+        self.memory.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get cache statistics"""
+        with self._stats_lock:
+            stats = dict(self.stats)
+        lookups = stats["hits"] + stats["persistent_hits"] + stats["misses"]
+        return {
+            **stats,
+            "memory_entries": len(self.memory),
+            "hit_rate": (stats["hits"] + stats["persistent_hits"]) / lookups if lookups else 0.0,
+            "persistent_tier": type(self.persistent).__name__ if self.persistent else None
+        }
+
+def build_cache_from_env() -> ResponseCache:
+    """
+    Create the response cache from environment variables
+
+    RESPONSE_CACHE_BACKEND: memory (default), sqlite or mongo
+    RESPONSE_CACHE_TTL_SECONDS: entry lifetime (default 3600)
+    RESPONSE_CACHE_MAX_ENTRIES: in-memory LRU size (default 1024)
+    RESPONSE_CACHE_SQLITE_PATH: SQLite file for the sqlite backend
+    RESPONSE_CACHE_MONGO_URL: connection string for the mongo backend
+    """
+    backend = os.environ.get("RESPONSE_CACHE_BACKEND", "memory").lower()
+    ttl_seconds = float(os.environ.get("RESPONSE_CACHE_TTL_SECONDS", 3600))
+    max_entries = int(os.environ.get("RESPONSE_CACHE_MAX_ENTRIES", 1024))
+
+    persistent_tier = None
+    try:
+        if backend == "sqlite":
+            persistent_tier = SQLiteTier(os.environ.get("RESPONSE_CACHE_SQLITE_PATH", "response_cache.db"))
+        elif backend == "mongo":
+            persistent_tier = MongoTier(
+                os.environ.get("RESPONSE_CACHE_MONGO_URL", "mongodb://localhost:27017"),
+                database_name=os.environ.get("DATABASE_NAME", "orchestratex")
+            )
+    except Exception as e:
+        logger.warning(f"⚠️ Persistent response cache unavailable ({backend}): {e}")
+        persistent_tier = None
+
+    logger.info(f"🗄️ Response cache initialized (backend={backend if persistent_tier else 'memory'}, ttl={ttl_seconds:.0f}s)")
+    return ResponseCache(max_entries=max_entries, ttl_seconds=ttl_seconds, persistent_tier=persistent_tier)
+
+# Global instance
+response_cache = build_cache_from_env()
@@ -0,0 +1,391 @@
+#!/usr/bin/env python3
+"""
+Result Store for OrchestrateX
+Append-only, indexed storage of orchestration results for evaluation runs
+
+One pretty-printed JSON file per result is slow to write at volume and can
+only be analyzed by globbing files. A result store instead:
+
+1. Appends results in batches (one transaction / one write per batch_size
+   results or flush_interval seconds)
+2. Indexes every result by prompt hash, selected model, timestamp and success
+3. Streams query results back one record at a time
+4. Compacts the store, keeping the latest result per (prompt, selected model)
+   and optionally dropping results older than a cutoff
+
+Backends:
+    sqlite: one database file, indexed columns plus the JSON record (WAL, so
+            queries can stream while a run is writing)
+    jsonl:  one append-only JSON Lines file, indexed in memory when opened
+
+Usage:
+    store = SQLiteResultStore("results.db")
+    store.append(result)                       # OrchestrationResult or its to_dict()
+    for record in store.query(selected_model="GLM4.5", success=False):
+        ...
+    store.summary()
+
+    python result_store.py results.db [--model GLM4.5] [--failed] [--compact]
+"""
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import argparse
+import threading
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+def prompt_hash(prompt: str) -> str:
+    """Hash of the whitespace-normalized prompt, so reruns of one prompt share it"""
+    return hashlib.sha256(" ".join((prompt or "").split()).encode("utf-8")).hexdigest()[:32]
+
+def _index_fields(record: Dict[str, Any]) -> Tuple[str, str, str, int]:
+    """(prompt hash, selected model, timestamp, success) of a result record"""
+    summary = record.get("summary") or {}
+    return (
+        prompt_hash(record.get("prompt", "")),
+        record.get("selected_model") or "unknown",
+        summary.get("timestamp") or record.get("timestamp") or "",
+        1 if summary.get("success", record.get("success")) else 0
+    )
+
+class _ResultStore:
+    """Write batching shared by the backends; subclasses implement _write_batch and the reads"""
+
+    def __init__(self, batch_size: int = 100, flush_interval: float = 2.0):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._pending: List[Dict[str, Any]] = []
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+        self.stats = {"appended": 0, "batches": 0, "compacted": 0}
+
+    def append(self, result: Any):
+        """Queue a result (OrchestrationResult or dict) for the next batch write"""
+        record = result.to_dict() if hasattr(result, "to_dict") else dict(result)
+        with self._lock:
+            self._pending.append(record)
+            if (len(self._pending) >= self.batch_size
+                    or time.monotonic() - self._last_flush >= self.flush_interval):
+                self._flush_locked()
+
+    def extend(self, results: List[Any]):
+        for result in results:
+            self.append(result)
+
+    def flush(self):
+        """Write every queued result"""
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        self._last_flush = time.monotonic()
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, []
+        self._write_batch([(_index_fields(record), record) for record in batch])
+        self.stats["appended"] += len(batch)
+        self.stats["batches"] += 1
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def query(self, prompt: Optional[str] = None, selected_model: Optional[str] = None,
+              success: Optional[bool] = None, since: Optional[str] = None, until: Optional[str] = None,
+              limit: Optional[int] = None, newest_first: bool = False) -> Iterator[Dict[str, Any]]:
+        """
+        Stream stored results matching every given filter
+
+        Args:
+            prompt: Results for this prompt (matched by hash)
+            selected_model: Results whose primary came from this model
+            success: Only successful (True) or failed (False) results
+            since / until: ISO timestamps, inclusive / exclusive
+            limit: Maximum number of results
+            newest_first: Latest appended first instead of oldest first
+        """
+        self.flush()
+        return self._query(prompt_hash(prompt) if prompt is not None else None, selected_model,
+                           success, since, until, limit, newest_first)
+
+    def count(self, **filters) -> int:
+        return sum(1 for _ in self.query(**filters))
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {**self.stats, "pending": len(self._pending), "backend": type(self).__name__}
+
+class SQLiteResultStore(_ResultStore):
+    """Results in a SQLite table with one index per queried field"""
+
+    def __init__(self, db_path: str = "orchestration_results.db", batch_size: int = 100,
+                 flush_interval: float = 2.0, busy_timeout_ms: int = 5000):
+        super().__init__(batch_size, flush_interval)
+        self.db_path = db_path
+        self.busy_timeout_ms = busy_timeout_ms
+        self._conn = self._connect()
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS orchestration_results (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                prompt_hash TEXT NOT NULL,
+                selected_model TEXT NOT NULL,
+                timestamp TEXT NOT NULL,
+                success INTEGER NOT NULL,
+                record TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_results_prompt ON orchestration_results(prompt_hash);
+            CREATE INDEX IF NOT EXISTS idx_results_model ON orchestration_results(selected_model, timestamp);
+            CREATE INDEX IF NOT EXISTS idx_results_timestamp ON orchestration_results(timestamp);
+            CREATE INDEX IF NOT EXISTS idx_results_success ON orchestration_results(success, timestamp);
+        """)
+        self._conn.commit()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=self.busy_timeout_ms / 1000)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")  # Durable at checkpoints; a batch is cheap to redo
+        return conn
+
+    def _write_batch(self, rows):
+        with self._conn:
+            self._conn.executemany(
+                "INSERT INTO orchestration_results (prompt_hash, selected_model, timestamp, success, record) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [(*fields, json.dumps(record, ensure_ascii=False, default=str)) for fields, record in rows]
+            )
+
+    def _query(self, hashed, selected_model, success, since, until, limit, newest_first):
+        clauses, params = [], []
+        for column, op, value in (("prompt_hash", "=", hashed), ("selected_model", "=", selected_model),
+                                  ("success", "=", None if success is None else int(success)),
+                                  ("timestamp", ">=", since), ("timestamp", "<", until)):
+            if value is not None:
+                clauses.append(f"{column} {op} ?")
+                params.append(value)
+        sql = "SELECT record FROM orchestration_results"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY id DESC" if newest_first else " ORDER BY id"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(int(limit))
+
+        # Own connection: the rows stream while other threads keep appending
+        conn = self._connect()
+        try:
+            cursor = conn.execute(sql, params)
+            while True:
+                rows = cursor.fetchmany(500)
+                if not rows:
+                    break
+                for (record,) in rows:
+                    yield json.loads(record)
+        finally:
+            conn.close()
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        """Results, successes and success rate per selected model"""
+        self.flush()
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT selected_model, COUNT(*), SUM(success) FROM orchestration_results GROUP BY selected_model"
+            ).fetchall()
+        return {model: {"results": total, "successful": ok, "success_rate": ok / total}
+                for model, total, ok in rows}
+
+    def compact(self, before: Optional[str] = None) -> int:
+        """
+        Keep only the latest result per (prompt, selected model), drop results
+        older than `before` (ISO timestamp) and reclaim the space; returns the
+        number of results removed
+        """
+        self.flush()
+        with self._lock:
+            with self._conn:
+                removed = self._conn.execute(
+                    "DELETE FROM orchestration_results WHERE id NOT IN "
+                    "(SELECT MAX(id) FROM orchestration_results GROUP BY prompt_hash, selected_model)"
+                ).rowcount
+                if before is not None:
+                    removed += self._conn.execute(
+                        "DELETE FROM orchestration_results WHERE timestamp < ?", (before,)
+                    ).rowcount
+            self._conn.execute("VACUUM")
+            self.stats["compacted"] += removed
+        logger.info(f"🗜️ Result store compacted: {removed} results removed")
+        return removed
+
+    def close(self):
+        super().close()
+        self._conn.close()
+
+class JSONLResultStore(_ResultStore):
+    """Results appended to one JSON Lines file; the index of byte offsets is kept in memory"""
+
+    def __init__(self, path: str = "orchestration_results.jsonl", batch_size: int = 100,
+                 flush_interval: float = 2.0):
+        super().__init__(batch_size, flush_interval)
+        self.path = path
+        # (offset, prompt hash, selected model, timestamp, success) per result, in file order
+        self._index: List[Tuple[int, str, str, str, int]] = []
+        self._file = self._open()
+
+    def _open(self):
+        """Index the file and open it for appending after any line cut off by a crash"""
+        self._index = []
+        end = 0
+        if os.path.exists(self.path):
+            with open(self.path, "rb") as f:
+                offset = 0
+                for line in f:
+                    if line.endswith(b"\n"):
+                        try:
+                            self._index.append((offset, *_index_fields(json.loads(line))))
+                        except ValueError:
+                            logger.warning(f"⚠️ Skipping unreadable result at byte {offset} of {self.path}")
+                        end = offset + len(line)
+                    offset += len(line)
+            if end < offset:
+                with open(self.path, "r+b") as f:
+                    f.truncate(end)  # Torn last line of an interrupted batch
+        return open(self.path, "ab")
+
+    def _write_batch(self, rows):
+        offset = self._file.tell()
+        lines = []
+        for fields, record in rows:
+            line = (json.dumps(record, ensure_ascii=False, default=str) + "\n").encode("utf-8")
+            self._index.append((offset, *fields))
+            offset += len(line)
+            lines.append(line)
+        self._file.write(b"".join(lines))
+        self._file.flush()
+
+    def _query(self, hashed, selected_model, success, since, until, limit, newest_first):
+        with self._lock:
+            entries = list(reversed(self._index) if newest_first else self._index)
+        matched = 0
+        with open(self.path, "rb") as f:
+            for offset, entry_hash, model, timestamp, ok in entries:
+                if ((hashed is not None and entry_hash != hashed)
+                        or (selected_model is not None and model != selected_model)
+                        or (success is not None and ok != int(success))
+                        or (since is not None and timestamp < since)
+                        or (until is not None and timestamp >= until)):
+                    continue
+                if limit is not None and matched >= limit:
+                    return
+                f.seek(offset)
+                matched += 1
+                yield json.loads(f.readline())
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        """Results, successes and success rate per selected model"""
+        self.flush()
+        counts: Dict[str, List[int]] = {}
+        with self._lock:
+            for _, _, model, _, ok in self._index:
+                total = counts.setdefault(model, [0, 0])
+                total[0] += 1
+                total[1] += ok
+        return {model: {"results": total, "successful": ok, "success_rate": ok / total}
+                for model, (total, ok) in counts.items()}
+
+    def compact(self, before: Optional[str] = None) -> int:
+        """
+        Rewrite the file keeping only the latest result per (prompt, selected
+        model), without results older than `before` (ISO timestamp); returns the
+        number of results removed
+        """
+        self.flush()
+        with self._lock:
+            latest = {}
+            for position, (_, hashed, model, timestamp, _) in enumerate(self._index):
+                if before is None or timestamp >= before:
+                    latest[(hashed, model)] = position
+            keep = sorted(latest.values())
+            removed = len(self._index) - len(keep)
+
+            self._file.close()
+            temp_path = f"{self.path}.compact"
+            with open(self.path, "rb") as source, open(temp_path, "wb") as target:
+                for position in keep:
+                    source.seek(self._index[position][0])
+                    target.write(source.readline())
+                target.flush()
+                os.fsync(target.fileno())
+            os.replace(temp_path, self.path)
+            self._file = self._open()
+            self.stats["compacted"] += removed
+        logger.info(f"🗜️ Result store compacted: {removed} results removed")
+        return removed
+
+    def close(self):
+        super().close()
+        self._file.close()
+
+def build_result_store_from_env():
+    """
+    Create the result store from environment variables (None when disabled)
+
+    RESULT_STORE_BACKEND: none (default), sqlite or jsonl
+    RESULT_STORE_PATH: database / JSON Lines file (default orchestration_results.db / .jsonl)
+    RESULT_STORE_BATCH_SIZE: results per batch write (default 100)
+    """
+    backend = os.environ.get("RESULT_STORE_BACKEND", "none").lower()
+    batch_size = int(os.environ.get("RESULT_STORE_BATCH_SIZE", 100))
+    try:
+        if backend == "sqlite":
+            return SQLiteResultStore(os.environ.get("RESULT_STORE_PATH", "orchestration_results.db"),
+                                     batch_size=batch_size)
+        if backend == "jsonl":
+            return JSONLResultStore(os.environ.get("RESULT_STORE_PATH", "orchestration_results.jsonl"),
+                                    batch_size=batch_size)
+    except Exception as e:
+        logger.warning(f"⚠️ Result store unavailable ({backend}): {e}")
+    return None
+
+def open_result_store(path: str, **kwargs):
+    """Open a store by file extension: .jsonl for JSON Lines, anything else SQLite"""
+    if path.endswith(".jsonl"):
+        return JSONLResultStore(path, **kwargs)
+    return SQLiteResultStore(path, **kwargs)
+
+def main():
+    parser = argparse.ArgumentParser(description="Query an OrchestrateX result store")
+    parser.add_argument("path", help="results .db (SQLite) or .jsonl file")
+    parser.add_argument("--model", help="only results whose primary came from this model")
+    parser.add_argument("--prompt", help="only results for this prompt")
+    parser.add_argument("--failed", action="store_true", help="only failed results")
+    parser.add_argument("--since", help="only results at or after this ISO timestamp")
+    parser.add_argument("--limit", type=int, default=20, help="results to print (default 20)")
+    parser.add_argument("--compact", action="store_true", help="compact the store first")
+    args = parser.parse_args()
+
+    with open_result_store(args.path) as store:
+        if args.compact:
+            print(f"🗜️ Removed {store.compact()} results")
+
+        print("📊 Results per selected model")
+        for model, row in sorted(store.summary().items()):
+            print(f"  {model}: {row['results']} results, {row['success_rate'] * 100:.1f}% successful")
+
+        print()
+        for record in store.query(prompt=args.prompt, selected_model=args.model,
+                                  success=False if args.failed else None, since=args.since,
+                                  limit=args.limit, newest_first=True):
+            status = "✅" if record["summary"]["success"] else "❌"
+            print(f"{status} {record['summary']['timestamp']} {record['selected_model']}: {record['prompt'][:60]}")
+
+if __name__ == "__main__":
+    main()
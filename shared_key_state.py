@@ -0,0 +1,376 @@
+#!/usr/bin/env python3
+"""
+Shared Key State for OrchestrateX
+Key health, cooldowns and usage counters shared by every instance of the API
+
+Each Cloud Run instance (and each gunicorn worker) has its own in-process
+rotation_manager; without shared state every one of them discovers the same
+throttled key by hitting its own 429s. A backend stores, per provider and key:
+
+1. Cooldowns: the wall-clock time until which a key is rate limited
+2. Usage: request counters
+3. A version number that changes on every cooldown update, so instances can
+   poll one value (every ROTATION_STATE_POLL_SECONDS, default 50ms) and only
+   re-read cooldowns when something changed
+
+Backends:
+    memory: in-process only (default, the previous behaviour)
+    sqlite: one database file with SQLite's file locking, for several processes on one host
+    redis:  any Redis-protocol server (Redis, Valkey, Memorystore), spoken over a
+            plain socket so no client library is needed
+
+Keys are stored by a short hash, never in clear text.
+"""
+
+import os
+import time
+import socket
+import sqlite3
+import hashlib
+import logging
+import threading
+from typing import Any, Callable, Dict, List, Optional
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+def key_id(api_key: str) -> str:
+    """Stable short identifier of an API key (the key itself is never stored)"""
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:12]
+
+class MemoryStateBackend:
+    """In-process state; the behaviour of a single instance"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._cooldowns: Dict[str, Dict[str, float]] = {}
+        self._usage: Dict[str, Dict[str, int]] = {}
+        self._version = 0
+
+    def mark_limited(self, provider: str, key: str, until: float):
+        with self._lock:
+            self._cooldowns.setdefault(provider, {})[key] = until
+            self._version += 1
+
+    def clear(self, provider: str, keys: List[str]):
+        with self._lock:
+            for key in keys:
+                self._cooldowns.get(provider, {}).pop(key, None)
+            self._version += 1
+
+    def cooldowns(self, provider: str) -> Dict[str, float]:
+        now = time.time()
+        with self._lock:
+            return {key: until for key, until in self._cooldowns.get(provider, {}).items() if until > now}
+
+    def incr_usage(self, provider: str, key: str, amount: int = 1):
+        with self._lock:
+            usage = self._usage.setdefault(provider, {})
+            usage[key] = usage.get(key, 0) + amount
+
+    def usage(self, provider: str) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._usage.get(provider, {}))
+
+    def version(self) -> int:
+        return self._version
+
+class SQLiteStateBackend:
+    """State in one SQLite file, shared by every process on the host (WAL + file locks)"""
+
+    def __init__(self, db_path: str = "key_state.db", busy_timeout_ms: int = 5000):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=busy_timeout_ms / 1000)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(f"PRAGMA busy_timeout={int(busy_timeout_ms)}")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS key_cooldowns (
+                provider TEXT NOT NULL,
+                key_id TEXT NOT NULL,
+                until REAL NOT NULL,
+                PRIMARY KEY (provider, key_id)
+            );
+            CREATE TABLE IF NOT EXISTS key_usage (
+                provider TEXT NOT NULL,
+                key_id TEXT NOT NULL,
+                requests INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (provider, key_id)
+            );
+            CREATE TABLE IF NOT EXISTS key_state_version (
+                id INTEGER PRIMARY KEY CHECK (id = 0),
+                version INTEGER NOT NULL
+            );
+            INSERT OR IGNORE INTO key_state_version (id, version) VALUES (0, 0);
+        """)
+        self._conn.commit()
+
+    def _write(self, statements):
+        with self._lock:
+            with self._conn:  # One transaction: the change and its version bump
+                for sql, params in statements:
+                    self._conn.execute(sql, params)
+
+    def mark_limited(self, provider: str, key: str, until: float):
+        self._write([
+            ("INSERT INTO key_cooldowns (provider, key_id, until) VALUES (?, ?, ?) "
+             "ON CONFLICT(provider, key_id) DO UPDATE SET until = MAX(until, excluded.until)", (provider, key, until)),
+            ("UPDATE key_state_version SET version = version + 1 WHERE id = 0", ())
+        ])
+
+    def clear(self, provider: str, keys: List[str]):
+        self._write(
+            [("DELETE FROM key_cooldowns WHERE provider = ? AND key_id = ?", (provider, key)) for key in keys]
+            + [("UPDATE key_state_version SET version = version + 1 WHERE id = 0", ())]
+        )
+
+    def cooldowns(self, provider: str) -> Dict[str, float]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT key_id, until FROM key_cooldowns WHERE provider = ? AND until > ?", (provider, time.time())
+            ).fetchall()
+        return dict(rows)
+
+    def incr_usage(self, provider: str, key: str, amount: int = 1):
+        self._write([(
+            "INSERT INTO key_usage (provider, key_id, requests) VALUES (?, ?, ?) "
+            "ON CONFLICT(provider, key_id) DO UPDATE SET requests = requests + excluded.requests",
+            (provider, key, amount)
+        )])
+
+    def usage(self, provider: str) -> Dict[str, int]:
+        with self._lock:
+            rows = self._conn.execute("SELECT key_id, requests FROM key_usage WHERE provider = ?", (provider,)).fetchall()
+        return dict(rows)
+
+    def version(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT version FROM key_state_version WHERE id = 0").fetchone()[0]
+
+class RespError(Exception):
+    """Error reply from a Redis-protocol server"""
+
+class RespClient:
+    """
+    Minimal Redis-protocol (RESP2) client over one socket
+
+    Enough for the handful of commands the state backend needs; commands are
+    serialized by a lock and the connection is re-opened once after a failure.
+    Error replies are raised as RespError only after every reply of the
+    pipeline was read, so the connection stays in step with its commands.
+    """
+
+    def __init__(self, url: str = "redis://localhost:6379/0", timeout: float = 2.0):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or "localhost"
+        self.port = parsed.port or 6379
+        self.password = parsed.password
+        self.db = int(parsed.path.lstrip("/") or 0)
+        self.timeout = timeout
+        self._sock: Optional[socket.socket] = None
+        self._buffer = b""
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        self._sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        self._sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._buffer = b""
+        try:
+            if self.password:
+                self._call(["AUTH", self.password])
+            if self.db:
+                self._call(["SELECT", self.db])
+        except Exception:
+            self.close_unlocked()  # Not authenticated / wrong database: never reuse it
+            raise
+
+    @staticmethod
+    def _encode(args) -> bytes:
+        parts = [b"*%d\r\n" % len(args)]
+        for arg in args:
+            data = arg if isinstance(arg, bytes) else str(arg).encode("utf-8")
+            parts.append(b"$%d\r\n%s\r\n" % (len(data), data))
+        return b"".join(parts)
+
+    def _readline(self) -> bytes:
+        while b"\r\n" not in self._buffer:
+            chunk = self._sock.recv(65536)
+            if not chunk:
+                raise ConnectionError("Connection closed by server")
+            self._buffer += chunk
+        line, self._buffer = self._buffer.split(b"\r\n", 1)
+        return line
+
+    def _read_exact(self, size: int) -> bytes:
+        while len(self._buffer) < size + 2:
+            chunk = self._sock.recv(65536)
+            if not chunk:
+                raise ConnectionError("Connection closed by server")
+            self._buffer += chunk
+        data, self._buffer = self._buffer[:size], self._buffer[size + 2:]
+        return data
+
+    def _read_reply(self) -> Any:
+        line = self._readline()
+        kind, rest = line[:1], line[1:]
+        if kind == b"+":
+            return rest.decode("utf-8")
+        if kind == b"-":
+            return RespError(rest.decode("utf-8"))
+        if kind == b":":
+            return int(rest)
+        if kind == b"$":
+            size = int(rest)
+            return None if size < 0 else self._read_exact(size).decode("utf-8")
+        if kind == b"*":
+            size = int(rest)
+            return None if size < 0 else [self._read_reply() for _ in range(size)]
+        # Out of step with the server: drop the connection
+        raise ConnectionError(f"Unexpected reply: {line[:50]!r}")
+
+    def _call(self, *commands) -> List[Any]:
+        self._sock.sendall(b"".join(self._encode(command) for command in commands))
+        replies = [self._read_reply() for _ in commands]
+        for reply in replies:
+            if isinstance(reply, RespError):
+                raise reply
+        return replies
+
+    def pipeline(self, *commands) -> List[Any]:
+        """Send several commands in one round trip; returns their replies"""
+        with self._lock:
+            for attempt in range(2):
+                try:
+                    if self._sock is None:
+                        self._connect()
+                    return self._call(*commands)
+                except RespError:
+                    raise  # An error reply; the connection is still usable
+                except (OSError, ConnectionError):
+                    self.close_unlocked()
+                    if attempt:
+                        raise
+
+    def execute(self, *args) -> Any:
+        return self.pipeline(list(args))[0]
+
+    def close_unlocked(self):
+        if self._sock is not None:
+            try:
+                self._sock.close()
+            except OSError:
+                pass
+        self._sock = None
+
+    def close(self):
+        with self._lock:
+            self.close_unlocked()
+
+# Keep the later deadline (as the SQLite backend does) and bump the version, atomically
+MARK_LIMITED_SCRIPT = """
+local current = tonumber(redis.call('HGET', KEYS[1], ARGV[1]))
+if current == nil or current < tonumber(ARGV[2]) then
+    redis.call('HSET', KEYS[1], ARGV[1], ARGV[2])
+end
+return redis.call('INCR', KEYS[2])
+"""
+
+class RedisStateBackend:
+    """State in a Redis-protocol server, shared by every instance that points at it"""
+
+    def __init__(self, url: str = "redis://localhost:6379/0", prefix: str = "orchestratex:keys"):
+        self.client = RespClient(url)
+        self.prefix = prefix
+        self.client.execute("PING")
+
+    def _name(self, *parts: str) -> str:
+        return ":".join((self.prefix,) + parts)
+
+    def mark_limited(self, provider: str, key: str, until: float):
+        self.client.execute("EVAL", MARK_LIMITED_SCRIPT, 2, self._name("cooldowns", provider), self._name("version"),
+                            key, repr(until))
+
+    def clear(self, provider: str, keys: List[str]):
+        commands = [["HDEL", self._name("cooldowns", provider)] + list(keys)] if keys else []
+        self.client.pipeline(*commands, ["INCR", self._name("version")])
+
+    def cooldowns(self, provider: str) -> Dict[str, float]:
+        flat = self.client.execute("HGETALL", self._name("cooldowns", provider)) or []
+        now = time.time()
+        pairs = {flat[i]: float(flat[i + 1]) for i in range(0, len(flat), 2)}
+        return {key: until for key, until in pairs.items() if until > now}
+
+    def incr_usage(self, provider: str, key: str, amount: int = 1):
+        self.client.execute("HINCRBY", self._name("usage", provider), key, amount)
+
+    def usage(self, provider: str) -> Dict[str, int]:
+        flat = self.client.execute("HGETALL", self._name("usage", provider)) or []
+        return {flat[i]: int(flat[i + 1]) for i in range(0, len(flat), 2)}
+
+    def version(self) -> int:
+        return int(self.client.execute("GET", self._name("version")) or 0)
+
+class SharedStateWatcher:
+    """
+    Background thread that polls the backend's version and calls on_change
+    when another instance updated a cooldown; on_poll runs first on every
+    poll (the rotation manager publishes its queued changes there)
+    """
+
+    def __init__(self, backend, on_change: Callable[[], None], poll_seconds: float = 0.05,
+                 on_poll: Optional[Callable[[], None]] = None):
+        self.backend = backend
+        self.on_change = on_change
+        self.on_poll = on_poll
+        self.poll_seconds = poll_seconds
+        self._last_version: Optional[int] = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="shared-key-state", daemon=True)
+
+    def start(self) -> "SharedStateWatcher":
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join(timeout=2)
+
+    def check(self) -> bool:
+        """Poll once; True if the state changed since the last poll"""
+        version = self.backend.version()
+        changed = version != self._last_version
+        self._last_version = version
+        if changed:
+            self.on_change()
+        return changed
+
+    def _run(self):
+        failures = 0
+        while not self._stop.wait(self.poll_seconds):
+            try:
+                if self.on_poll is not None:
+                    self.on_poll()
+                self.check()
+                failures = 0
+            except Exception as e:
+                failures += 1
+                if failures == 1:
+                    logger.warning(f"⚠️ Shared key state unavailable ({e}), using local state")
+
+def build_shared_state_from_env():
+    """
+    Create the shared state backend from environment variables (None for memory)
+
+    ROTATION_STATE_BACKEND: memory (default), sqlite or redis
+    ROTATION_STATE_SQLITE_PATH: database file for the sqlite backend (default key_state.db)
+    ROTATION_STATE_REDIS_URL: redis://[:password@]host:port/db for the redis backend
+    """
+    backend = os.environ.get("ROTATION_STATE_BACKEND", "memory").lower()
+    try:
+        if backend == "sqlite":
+            return SQLiteStateBackend(os.environ.get("ROTATION_STATE_SQLITE_PATH", "key_state.db"))
+        if backend == "redis":
+            return RedisStateBackend(os.environ.get("ROTATION_STATE_REDIS_URL", "redis://localhost:6379/0"))
+    except Exception as e:
+        logger.warning(f"⚠️ Shared key state unavailable ({backend}): {e}, keeping state per instance")
+    return None
@@ -0,0 +1,390 @@
+#!/usr/bin/env python3
+"""
+SQLite Storage for the OrchestrateX Model APIs
+One WAL-mode database per file with a batching writer thread and pooled readers
+
+Opening a connection per insert and committing each row with the default
+rollback journal costs an fsync per request, and concurrent requests fail
+with "database is locked". A storage instead:
+
+1. Puts the database in WAL mode, so readers never block the writer
+2. Sends every write to one writer thread through a queue; the writer
+   commits whatever has queued up (up to batch_size writes) in one transaction
+3. Serves reads from a small pool of long-lived read-only connections
+4. Keeps its connections open, so each statement is prepared once per
+   connection and reused from sqlite3's statement cache
+
+Writes are asynchronous by default: they are committed within milliseconds
+but a read issued right after may not see them yet. Pass wait=True (or call
+flush()) when the caller needs the write committed.
+
+Usage:
+    storage = get_storage("user_conversations.db")     # Shared per database file
+    storage.executescript("CREATE TABLE IF NOT EXISTS ...")
+    storage.write("INSERT INTO conversations (...) VALUES (?, ?)", (a, b))
+    rows = storage.read("SELECT * FROM conversations LIMIT ?", (10,))
+
+    python sqlite_storage.py --benchmark [--inserts 5000] [--threads 8]
+
+Environment:
+    SQLITE_WRITE_BATCH_SIZE: most writes per transaction (default 500)
+    SQLITE_READ_POOL_SIZE: read connections per database (default 4)
+"""
+
+import os
+import time
+import queue
+import atexit
+import sqlite3
+import logging
+import argparse
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+class _Write:
+    """One queued write; `done` is set once it is committed (or failed) when the caller waits"""
+
+    __slots__ = ("kind", "sql", "params", "done", "error", "rowcount")
+
+    def __init__(self, kind: str, sql: str = "", params: Any = (), wait: bool = False):
+        self.kind = kind  # execute, executemany, script, flush or close
+        self.sql = sql
+        self.params = params
+        self.done = threading.Event() if wait else None
+        self.error: Optional[BaseException] = None
+        self.rowcount = 0
+
+    def finish(self):
+        if self.done is not None:
+            self.done.set()
+
+class SQLiteStorage:
+    """A WAL-mode SQLite database with a single batching writer and a pool of readers"""
+
+    def __init__(self, db_path: str, batch_size: int = 500, read_pool_size: int = 4,
+                 max_queued: int = 10000, busy_timeout_ms: int = 5000, cached_statements: int = 256):
+        self.db_path = db_path
+        self.batch_size = max(1, batch_size)
+        self.read_pool_size = max(1, read_pool_size)
+        self.busy_timeout_ms = busy_timeout_ms
+        self.cached_statements = cached_statements
+        self.stats = {"writes": 0, "failed_writes": 0, "batches": 0, "largest_batch": 0, "reads": 0}
+
+        self._lock = threading.Lock()
+        self._closed = False
+        self._queue: "queue.Queue[_Write]" = queue.Queue(maxsize=max_queued)  # Bounded: callers wait when the writer falls behind
+        self._readers: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._opened_readers = 0
+
+        # Switch to WAL before any reader opens; the mode is stored in the database file
+        self._writer_conn = self._connect()
+        self._writer_conn.execute("PRAGMA journal_mode=WAL")
+        self._writer = threading.Thread(target=self._run, name=f"sqlite-writer:{os.path.basename(db_path)}",
+                                        daemon=True)
+        self._writer.start()
+
+    def _connect(self, read_only: bool = False) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=self.busy_timeout_ms / 1000,
+                               cached_statements=self.cached_statements)
+        conn.execute("PRAGMA synchronous=NORMAL")  # WAL stays consistent; only the last batches can be lost on power failure
+        if read_only:
+            conn.execute("PRAGMA query_only=ON")
+            conn.row_factory = sqlite3.Row
+        return conn
+
+    # Writes
+
+    def _submit(self, op: _Write) -> _Write:
+        if self._closed or not self._writer.is_alive():
+            raise RuntimeError(f"SQLite storage for {self.db_path} is closed")
+        self._queue.put(op)
+        if op.done is not None:
+            op.done.wait()
+            if op.error is not None:
+                raise op.error
+        return op
+
+    def write(self, sql: str, params: Sequence[Any] = (), wait: bool = False) -> Optional[int]:
+        """Queue one parameterized statement; with wait=True block until committed and return its rowcount"""
+        op = self._submit(_Write("execute", sql, tuple(params), wait))
+        return op.rowcount if wait else None
+
+    def write_many(self, sql: str, rows: Sequence[Sequence[Any]], wait: bool = False) -> Optional[int]:
+        """Queue one statement for many parameter rows, committed in the same transaction"""
+        op = self._submit(_Write("executemany", sql, [tuple(row) for row in rows], wait))
+        return op.rowcount if wait else None
+
+    def executescript(self, script: str):
+        """Run a schema script (CREATE TABLE / INDEX ...) on the writer and wait for it"""
+        self._submit(_Write("script", script, wait=True))
+
+    def flush(self):
+        """Block until every write queued before this call is committed"""
+        self._submit(_Write("flush", wait=True))
+
+    def _run(self):
+        conn = self._writer_conn
+        while True:
+            batch = [self._queue.get()]
+            # Group whatever else is already queued; control operations end the batch
+            while len(batch) < self.batch_size and batch[-1].kind in ("execute", "executemany"):
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            control = batch.pop() if batch[-1].kind not in ("execute", "executemany") else None
+            try:
+                if batch:
+                    self._commit(conn, batch)
+                    with self._lock:
+                        self.stats["batches"] += 1
+                        self.stats["largest_batch"] = max(self.stats["largest_batch"], len(batch))
+                if control is not None and control.kind == "script":
+                    try:
+                        conn.executescript(control.sql)
+                    except Exception as e:
+                        control.error = e
+            except Exception as e:
+                # Whatever went wrong, the writer keeps running and fails only this batch
+                logger.error(f"❌ SQLite writer error on {self.db_path}: {e}")
+                for op in batch:
+                    if op.error is None:
+                        op.error = e
+            finally:
+                for op in batch:
+                    op.finish()
+                if control is not None:
+                    control.finish()
+
+            if control is not None and control.kind == "close":
+                conn.close()
+                return
+
+    def _commit(self, conn: sqlite3.Connection, ops: List[_Write]):
+        try:
+            with conn:
+                for op in ops:
+                    if op.kind == "executemany":
+                        op.rowcount = conn.executemany(op.sql, op.params).rowcount
+                    else:
+                        op.rowcount = conn.execute(op.sql, op.params).rowcount
+        except Exception as e:
+            # Not only sqlite3.Error: binding can raise e.g. UnicodeEncodeError or OverflowError
+            if len(ops) > 1:
+                # One bad write (e.g. a duplicate key) must not drop the rest of the batch
+                for op in ops:
+                    self._commit(conn, [op])
+                return
+            ops[0].error = e
+            with self._lock:
+                self.stats["failed_writes"] += 1
+            logger.error(f"❌ SQLite write failed on {self.db_path}: {e}")
+        else:
+            with self._lock:
+                self.stats["writes"] += len(ops)
+
+    # Reads
+
+    @contextmanager
+    def reader(self) -> Iterator[sqlite3.Connection]:
+        """Borrow a read-only connection from the pool, opening one if the pool is not full yet"""
+        try:
+            conn = self._readers.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                conn = self._connect(read_only=True) if self._opened_readers < self.read_pool_size else None
+                if conn is not None:
+                    self._opened_readers += 1
+            if conn is None:
+                conn = self._readers.get()
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            self._readers.put(conn)
+
+    def read(self, sql: str, params: Sequence[Any] = ()) -> List[Dict[str, Any]]:
+        """Run a query on a pooled connection and return its rows as dicts (committed writes only)"""
+        with self.reader() as conn:
+            rows = conn.execute(sql, tuple(params)).fetchall()
+        with self._lock:
+            self.stats["reads"] += 1
+        return [dict(row) for row in rows]
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self.stats, "queued": self._queue.qsize(), "read_connections": self._opened_readers}
+
+    def close(self):
+        """Commit the queued writes, stop the writer and close every connection"""
+        if self._closed:
+            return
+        self._closed = True  # Later writes are refused instead of queueing behind the close
+        self._queue.put(_Write("close"))
+        self._writer.join()
+        while True:
+            # A write that raced the close is failed rather than left waiting forever
+            try:
+                op = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            op.error = RuntimeError(f"SQLite storage for {self.db_path} is closed")
+            op.finish()
+        while True:
+            try:
+                self._readers.get_nowait().close()
+            except queue.Empty:
+                break
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+_storages: Dict[str, SQLiteStorage] = {}
+_storages_lock = threading.Lock()
+
+def get_storage(db_path: str, **kwargs) -> SQLiteStorage:
+    """
+    The process-wide storage for a database file, opened on first use
+
+    Every module writing to the same file shares its one writer thread;
+    options default to SQLITE_WRITE_BATCH_SIZE / SQLITE_READ_POOL_SIZE.
+    """
+    key = os.path.abspath(db_path)
+    with _storages_lock:
+        storage = _storages.get(key)
+        if storage is None or storage._closed:
+            kwargs.setdefault("batch_size", int(os.environ.get("SQLITE_WRITE_BATCH_SIZE", 500)))
+            kwargs.setdefault("read_pool_size", int(os.environ.get("SQLITE_READ_POOL_SIZE", 4)))
+            storage = _storages[key] = SQLiteStorage(db_path, **kwargs)
+        return storage
+
+@atexit.register
+def close_storages():
+    """Flush and close every shared storage (runs at interpreter exit)"""
+    with _storages_lock:
+        storages = list(_storages.values())
+        _storages.clear()
+    for storage in storages:
+        try:
+            storage.close()
+        except Exception as e:
+            logger.warning(f"⚠️ Failed to close SQLite storage {storage.db_path}: {e}")
+
+_BENCHMARK_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS conversations (
+        conversation_id TEXT PRIMARY KEY,
+        user_id TEXT,
+        prompt TEXT NOT NULL,
+        response TEXT,
+        model_used TEXT,
+        tokens_used INTEGER
+    )
+"""
+_BENCHMARK_INSERT = ("INSERT INTO conversations (conversation_id, user_id, prompt, response, model_used, tokens_used) "
+                     "VALUES (?, ?, ?, ?, ?, ?)")
+
+def benchmark_inserts(inserts: int = 2000, threads: int = 8, directory: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Inserts per second from `threads` concurrent request threads, writing the
+    way the Model APIs used to (connect, insert, commit, close per row with the
+    default rollback journal) and through a SQLiteStorage, both queued
+    (fire and forget) and waited (each request blocks until its batch commits,
+    as the Model APIs do when they return the new id)
+    """
+    def row(i):
+        return (f"conv_{i}", f"user_{i % 50}", f"prompt {i} " * 10, f"response {i} " * 40, "GLM4.5", 150)
+
+    def run_threads(target) -> float:
+        per_thread = inserts // threads
+        workers = [threading.Thread(target=target, args=(t * per_thread, per_thread)) for t in range(threads)]
+        start = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        return time.perf_counter() - start
+
+    with tempfile.TemporaryDirectory(dir=directory) as tmp:
+        baseline_path = os.path.join(tmp, "per_request.db")
+        conn = sqlite3.connect(baseline_path)
+        conn.execute(_BENCHMARK_SCHEMA)
+        conn.commit()
+        conn.close()
+        locked = []
+
+        def per_request(first, count):
+            for i in range(first, first + count):
+                try:
+                    conn = sqlite3.connect(baseline_path)
+                    conn.execute(_BENCHMARK_INSERT, row(i))
+                    conn.commit()
+                    conn.close()
+                except sqlite3.OperationalError:
+                    locked.append(i)  # "database is locked" past the default 5 s timeout
+
+        baseline_seconds = run_threads(per_request)
+
+        storage = SQLiteStorage(os.path.join(tmp, "storage.db"))
+        storage.executescript(_BENCHMARK_SCHEMA)
+
+        def pooled(first, count):
+            for i in range(first, first + count):
+                storage.write(_BENCHMARK_INSERT, row(i))
+
+        # Timed until everything is committed, not just queued
+        storage_seconds = run_threads(pooled)
+        flush_start = time.perf_counter()
+        storage.flush()
+        storage_seconds += time.perf_counter() - flush_start
+        stats = storage.get_stats()
+
+        def waited(first, count):
+            for i in range(first, first + count):
+                storage.write(_BENCHMARK_INSERT, (f"waited_{i}",) + row(i)[1:], wait=True)
+
+        waited_seconds = run_threads(waited)
+        storage.close()
+
+    written = inserts // threads * threads
+    return {
+        "inserts": written,
+        "threads": threads,
+        "per_request_inserts_per_second": round((written - len(locked)) / baseline_seconds),
+        "per_request_locked_errors": len(locked),
+        "storage_inserts_per_second": round(written / storage_seconds),
+        "storage_batches": stats["batches"],
+        "storage_waited_inserts_per_second": round(written / waited_seconds),
+        "speedup": round(baseline_seconds / storage_seconds, 1)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="OrchestrateX SQLite storage")
+    parser.add_argument("--benchmark", action="store_true", help="compare per-request connections with the storage")
+    parser.add_argument("--inserts", type=int, default=2000, help="rows to insert (default 2000)")
+    parser.add_argument("--threads", type=int, default=8, help="concurrent writer threads (default 8)")
+    parser.add_argument("--dir", help="directory for the benchmark databases (default: system temp)")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        result = benchmark_inserts(args.inserts, args.threads, args.dir)
+        print(f"📊 {result['inserts']} inserts from {result['threads']} threads")
+        print(f"  connect + commit per insert: {result['per_request_inserts_per_second']} inserts/s "
+              f"({result['per_request_locked_errors']} 'database is locked' errors)")
+        print(f"  SQLiteStorage:               {result['storage_inserts_per_second']} inserts/s "
+              f"in {result['storage_batches']} batches")
+        print(f"  SQLiteStorage, wait=True:    {result['storage_waited_inserts_per_second']} inserts/s")
+        print(f"  🚀 {result['speedup']}x faster")
+    else:
+        parser.print_help()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+Token Accounting for OrchestrateX
+Real usage from provider responses, a fast local estimator and max_tokens sizing
+
+1. usage_from_response() reads the "usage" block OpenRouter returns (including
+   its cost when usage accounting is on) and only falls back to the local
+   estimate when a response has none
+2. estimate_tokens() is a cheap pre-flight estimate (no tokenizer download),
+   used to keep prompt + completion within the model's context length
+3. size_max_tokens() reserves a completion budget from what the answer is for:
+   the prompt analyzer's intent for primary answers, a small fixed budget for
+   critiques - instead of reserving 2000-4000 tokens for every call, so a
+   critique can no longer run on for thousands of tokens on the slow free models
+
+Usage:
+    max_tokens = size_max_tokens("GLM-4.5", prompt)                      # primary answer
+    max_tokens = size_max_tokens("GLM-4.5", critique_prompt, "critique")
+    usage = usage_from_response(data, prompt, text, model_id)            # after the call
+"""
+
+import os
+import re
+import csv
+import logging
+import importlib.util
+from functools import lru_cache
+from typing import Any, Callable, Dict, Optional
+
+from token_bucket import normalize_model_name, DEFAULT_TABLE_PATH
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONTEXT_LENGTH = 8000
+CONTEXT_SAFETY_MARGIN = 64  # Template/role tokens the estimate does not see
+MIN_MAX_TOKENS = 16
+
+# Completion budget of a primary answer per prompt analyzer intent
+INTENT_BUDGETS = {
+    "question": 800,
+    "instruction": 1200,
+    "reasoning_task": 1500,
+    "code_request": 2000
+}
+DEFAULT_INTENT = "question"
+
+# Completion budget per response type (batched critiques: per target)
+RESPONSE_BUDGETS = {
+    "critique": 300,
+    "short_critique": 60,
+    "batched_critique": 150
+}
+BATCHED_CRITIQUE_OVERHEAD = 50  # JSON array framing of a batched critique reply
+REFINEMENT_FACTOR = 1.25  # A refined answer keeps the original and adds to it
+
+# Models that spend completion tokens on hidden reasoning before answering
+REASONING_MODELS = {"tngdeepseekr1t2chimera": 2.0}
+
+DEFAULT_PRICE_PER_1K = 0.001
+_ANALYZER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                              "backend", "app", "orchestration", "prompt_analyzer.py")
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+
+def load_model_context_lengths(path: str = DEFAULT_TABLE_PATH) -> Dict[str, int]:
+    """Read "Context Length" (e.g. "32K tokens") per model from the parameter table"""
+    lengths = {}
+    try:
+        with open(path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                match = re.match(r"\s*(\d+(?:\.\d+)?)\s*([kKmM]?)", row.get("Context Length") or "")
+                if not match:
+                    continue
+                scale = {"k": 1000, "m": 1000000}.get(match.group(2).lower(), 1)
+                lengths[normalize_model_name(row["Model Name"])] = int(float(match.group(1)) * scale)
+    except OSError as e:
+        logger.warning(f"⚠️ Model context table not available ({e}), using {DEFAULT_CONTEXT_LENGTH}")
+    return lengths
+
+CONTEXT_LENGTHS = load_model_context_lengths()
+
+def context_length(model: str) -> int:
+    return CONTEXT_LENGTHS.get(normalize_model_name(model), DEFAULT_CONTEXT_LENGTH)
+
+def estimate_tokens(text: str) -> int:
+    """
+    Fast local token estimate for BPE tokenizers
+
+    Counts words and punctuation, plus one token per extra 4 characters of
+    long words; close enough to keep requests inside the context length.
+    """
+    if not text:
+        return 0
+    tokens = 0
+    for piece in _TOKEN_RE.findall(text):
+        tokens += 1 + max(0, len(piece) - 6) // 4
+    return tokens
+
+def _load_analyzer() -> Optional[Callable[[str], Dict[str, Any]]]:
+    """The backend prompt analyzer's extract_prompt_features, if it is deployed"""
+    try:
+        spec = importlib.util.spec_from_file_location("_orchestratex_prompt_analyzer", _ANALYZER_PATH)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        return module.extract_prompt_features
+    except (OSError, ImportError, AttributeError) as e:
+        logger.warning(f"⚠️ Prompt analyzer not available ({e}), sizing every answer as '{DEFAULT_INTENT}'")
+        return None
+
+_extract_prompt_features = _load_analyzer()
+
+@lru_cache(maxsize=1024)
+def detect_intent(prompt: str) -> str:
+    """Intent type of a prompt: question, instruction, code_request or reasoning_task"""
+    if _extract_prompt_features is None or not prompt:
+        return DEFAULT_INTENT
+    try:
+        return _extract_prompt_features(prompt).get("intent_type", DEFAULT_INTENT)
+    except Exception as e:
+        logger.debug(f"Prompt analysis failed: {e}")
+        return DEFAULT_INTENT
+
+def size_max_tokens(model: str, prompt: str, response_type: str = "primary", intent: Optional[str] = None,
+                    targets: int = 1, cap: Optional[int] = None) -> int:
+    """
+    Completion budget for one call
+
+    Args:
+        model: Model name in any of the code base's spellings
+        prompt: The full prompt that will be sent
+        response_type: "primary", "refinement", "critique", "short_critique" or "batched_critique"
+        intent: Analyzer intent of the user's request (detected from prompt if None;
+                only used for primary and refinement answers)
+        targets: Number of responses a batched critique covers
+        cap: Hard upper bound (e.g. a provider's own max_tokens setting)
+    """
+    if response_type in ("primary", "refinement"):
+        budget = INTENT_BUDGETS.get(intent or detect_intent(prompt), INTENT_BUDGETS[DEFAULT_INTENT])
+        if response_type == "refinement":
+            budget = int(budget * REFINEMENT_FACTOR)
+    elif response_type == "batched_critique":
+        budget = RESPONSE_BUDGETS["batched_critique"] * max(1, targets) + BATCHED_CRITIQUE_OVERHEAD
+    else:
+        budget = RESPONSE_BUDGETS.get(response_type, RESPONSE_BUDGETS["critique"])
+
+    budget = int(budget * REASONING_MODELS.get(normalize_model_name(model), 1.0))
+    available = context_length(model) - estimate_tokens(prompt) - CONTEXT_SAFETY_MARGIN
+    if cap is not None:
+        budget = min(budget, cap)
+    return max(MIN_MAX_TOKENS, min(budget, available))
+
+def estimate_cost(model_id: str, prompt_tokens: int, completion_tokens: int) -> float:
+    """Price of a call when the provider did not report one (":free" models cost nothing)"""
+    if (model_id or "").endswith(":free"):
+        return 0.0
+    return (prompt_tokens + completion_tokens) / 1000 * DEFAULT_PRICE_PER_1K
+
+def usage_from_response(data: Dict[str, Any], prompt: str, completion: str, model_id: str = "") -> Dict[str, Any]:
+    """
+    Token usage and cost of a chat completion response
+
+    Returns input_tokens, output_tokens, total_tokens, cost_usd and
+    usage_source ("reported" or "estimated").
+    """
+    usage = data.get("usage") if isinstance(data, dict) else None
+    if isinstance(usage, dict) and usage.get("completion_tokens") is not None:
+        input_tokens = int(usage.get("prompt_tokens") or 0)
+        output_tokens = int(usage["completion_tokens"])
+        total_tokens = int(usage.get("total_tokens") or input_tokens + output_tokens)
+        cost = usage.get("cost")
+        return {
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "total_tokens": total_tokens,
+            "cost_usd": float(cost) if cost is not None else estimate_cost(model_id, input_tokens, output_tokens),
+            "usage_source": "reported"
+        }
+
+    input_tokens = estimate_tokens(prompt)
+    output_tokens = estimate_tokens(completion)
+    return {
+        "input_tokens": input_tokens,
+        "output_tokens": output_tokens,
+        "total_tokens": input_tokens + output_tokens,
+        "cost_usd": estimate_cost(model_id, input_tokens, output_tokens),
+        "usage_source": "estimated"
+    }
+
+def completion_budget_hit(data: Dict[str, Any]) -> bool:
+    """True if the completion was cut off by max_tokens"""
+    try:
+        return data["choices"][0].get("finish_reason") == "length"
+    except (KeyError, IndexError, TypeError, AttributeError):
+        return False
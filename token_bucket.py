@@ -0,0 +1,377 @@
+#!/usr/bin/env python3
+"""
+Client-Side Rate Limiting for OrchestrateX
+Token buckets per model and API key, seeded from Model/Model_parameters.csv
+
+Instead of firing requests and reacting to 429s, every (model, API key) pair
+gets a token bucket that refills at the model's documented "Max Requests/Min":
+1. Short bursts (e.g. the 36 calls of one chat) are absorbed by the bucket
+   capacity, the rest is spread out at the refill rate
+2. x-ratelimit-* and Retry-After headers of every response correct the local
+   view (actual limit, remaining requests, window reset); when the remaining
+   quota would run out before the reset, requests are paced to last the window,
+   and a used-up quota blocks the key exactly until the reset
+3. Callers wait locally for a token, or route to another key or model when
+   the wait would be too long, instead of sending a request that will fail
+
+Usage:
+    bucket = rate_limiters.get("GLM45", api_key)
+    if bucket.acquire(timeout=rate_limiters.max_wait):   # or await acquire_async()
+        response = client.post(...)
+        bucket.update_from_headers(response.headers)
+"""
+
+import os
+import re
+import csv
+import time
+import asyncio
+import hashlib
+import logging
+import threading
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TABLE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Model", "Model_parameters.csv")
+
+# Names used across the code base for the models of the parameter table
+# (rotation provider codes, backend and working_api display names)
+_ALIASES = {
+    "llama3": "llama4maverick",
+    "kimi": "moonshotaikimi",
+    "kimik2": "moonshotaikimi",
+    "qwen3": "qwen3coder",
+    "falcon": "tngdeepseekr1t2chimera",
+    "tngdeepseek": "tngdeepseekr1t2chimera",
+    "tngdeepseekr1t2": "tngdeepseekr1t2chimera"
+}
+
+_DURATION_RE = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+
+def normalize_model_name(name: str) -> str:
+    """Lowercase alphanumeric form of a model name, with known aliases resolved"""
+    normalized = re.sub(r"[^a-z0-9]", "", (name or "").lower())
+    return _ALIASES.get(normalized, normalized)
+
+def load_model_rate_limits(path: str = DEFAULT_TABLE_PATH) -> Dict[str, float]:
+    """Read "Max Requests/Min" per model from the parameter table"""
+    limits = {}
+    try:
+        with open(path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                try:
+                    limits[normalize_model_name(row["Model Name"])] = float(row["Max Requests/Min"])
+                except (KeyError, TypeError, ValueError):
+                    continue
+    except OSError as e:
+        logger.warning(f"⚠️ Model rate limit table not available ({e}), using defaults")
+    return limits
+
+def parse_reset(value: str) -> Optional[float]:
+    """Seconds until a rate limit window resets (epoch seconds/ms, delta seconds or "1m30s")"""
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        parts = _DURATION_RE.findall(str(value or ""))
+        if not parts:
+            return None
+        scale = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+        return sum(float(amount) * scale[unit] for amount, unit in parts)
+
+    if number > 1e12:  # Epoch milliseconds (OpenRouter)
+        return max(0.0, number / 1000 - time.time())
+    if number > 1e9:  # Epoch seconds
+        return max(0.0, number - time.time())
+    return max(0.0, number)
+
+def _first_header(headers: Mapping[str, str], *names: str) -> Optional[str]:
+    for name in names:
+        if name in headers:
+            return headers[name]
+    return None
+
+class RateLimitExceeded(Exception):
+    """Raised when no request token becomes available within the allowed wait"""
+    def __init__(self, name: str, retry_in: float):
+        self.name = name
+        self.retry_in = retry_in
+        super().__init__(f"Rate limit for {name} reached locally (next slot in {retry_in:.1f}s)")
+
+class TokenBucket:
+    """Requests-per-minute token bucket for one model / API key pair"""
+
+    def __init__(self, name: str, rate_per_min: float, burst_seconds: float = 10.0):
+        self.name = name
+        self.burst_seconds = burst_seconds
+        self.rate_per_min = float(rate_per_min)
+        self.capacity = self._capacity_for(self.rate_per_min)
+
+        # Tokens may go negative: each waiting caller has reserved a future token
+        self.tokens = self.capacity
+        self.blocked_until = 0.0  # Monotonic time before which the server refuses calls
+        # Server quota window from x-ratelimit-remaining/-reset, counted down locally between responses
+        self.window_remaining: Optional[float] = None
+        self.window_reset_at = 0.0
+        self._paced_next = 0.0  # Earliest start of the next request while pacing
+        self.stats = {"acquired": 0, "waited": 0, "total_wait_ms": 0, "rejected": 0,
+                      "penalties": 0, "header_updates": 0, "paced": 0}
+
+        self._last_refill = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _capacity_for(self, rate_per_min: float) -> float:
+        return max(1.0, rate_per_min * self.burst_seconds / 60.0)
+
+    def _refill(self, now: float):
+        elapsed = now - self._last_refill
+        self._last_refill = now
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.rate_per_min / 60.0)
+
+    def _wait(self, now: float) -> float:
+        deficit = 1.0 - self.tokens
+        wait = deficit * 60.0 / self.rate_per_min if deficit > 0 else 0.0
+        if self._pacing(now) is not None:
+            wait = max(wait, self._paced_next - now)
+        return max(wait, self.blocked_until - now)
+
+    def _pacing(self, now: float) -> Optional[float]:
+        """
+        Spacing between requests that makes the server's remaining quota last
+        until its reset, if that is slower than the bucket's own rate
+        """
+        if self.window_remaining is None:
+            return None
+        if now >= self.window_reset_at:
+            self.window_remaining = None  # Window over: the server's limit applies afresh
+            return None
+        spacing = (self.window_reset_at - now) / max(self.window_remaining, 1.0)
+        return spacing if spacing > 60.0 / self.rate_per_min else None
+
+    def wait_time(self) -> float:
+        """Seconds until a token would be available (0.0 if one is available now)"""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            return self._wait(now)
+
+    def reserve(self, max_wait: Optional[float] = None) -> Optional[float]:
+        """
+        Reserve the next token
+
+        Returns:
+            Seconds the caller must wait before sending, or None (nothing
+            reserved) if that would exceed max_wait
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            wait = self._wait(now)
+            if max_wait is not None and wait > max_wait:
+                self.stats["rejected"] += 1
+                return None
+            self.tokens -= 1.0
+            self.stats["acquired"] += 1
+            spacing = self._pacing(now)
+            if spacing is not None:
+                # Running out before the reset at this rate: spread what is left over the window
+                self._paced_next = now + wait + spacing
+                self.stats["paced"] += 1
+            if self.window_remaining is not None:
+                self.window_remaining -= 1.0
+                if self.window_remaining <= 0:
+                    # Quota used up: resume exactly when the server's window resets
+                    self.blocked_until = max(self.blocked_until, self.window_reset_at)
+            if wait > 0:
+                self.stats["waited"] += 1
+                self.stats["total_wait_ms"] += int(wait * 1000)
+            return wait
+
+    def cancel_reservation(self):
+        """Give back a reserved token that was never used"""
+        with self._lock:
+            self.tokens = min(self.capacity, self.tokens + 1.0)
+            if self.window_remaining is not None:
+                self.window_remaining += 1.0
+            self.stats["acquired"] -= 1
+
+    def try_acquire(self) -> bool:
+        """Take a token only if one is available right now"""
+        return self.reserve(max_wait=0.0) is not None
+
+    def acquire(self, timeout: Optional[float] = None) -> bool:
+        """Block the calling thread until a token is available; False if it takes longer than timeout"""
+        wait = self.reserve(max_wait=timeout)
+        if wait is None:
+            return False
+        if wait > 0:
+            time.sleep(wait)
+        return True
+
+    async def acquire_async(self, timeout: Optional[float] = None) -> bool:
+        """Coroutine counterpart of acquire()"""
+        wait = self.reserve(max_wait=timeout)
+        if wait is None:
+            return False
+        if wait > 0:
+            try:
+                await asyncio.sleep(wait)
+            except asyncio.CancelledError:
+                self.cancel_reservation()
+                raise
+        return True
+
+    def penalize(self, retry_after: Optional[float] = None):
+        """Server said 429: stop sending until retry_after (default: one refill interval)"""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.tokens = min(self.tokens, 0.0)
+            self.blocked_until = max(self.blocked_until, now + (retry_after or 60.0 / self.rate_per_min))
+            self.stats["penalties"] += 1
+
+    def update_from_headers(self, headers: Mapping[str, str]):
+        """Correct the bucket from x-ratelimit-* / Retry-After response headers"""
+        headers = {str(key).lower(): value for key, value in headers.items()}
+        limit = _first_header(headers, "x-ratelimit-limit-requests", "x-ratelimit-limit")
+        remaining = _first_header(headers, "x-ratelimit-remaining-requests", "x-ratelimit-remaining")
+        reset = _first_header(headers, "x-ratelimit-reset-requests", "x-ratelimit-reset")
+        retry_after = _first_header(headers, "retry-after")
+        if limit is None and remaining is None and retry_after is None:
+            return
+
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.stats["header_updates"] += 1
+
+            try:
+                server_limit = float(limit) if limit is not None else None
+            except ValueError:
+                server_limit = None
+            if server_limit and abs(server_limit - self.rate_per_min) >= 1:
+                # The table is documentation; the server's limit is the truth (per minute window)
+                logger.info(f"🪣 {self.name}: rate {self.rate_per_min:.0f} → {server_limit:.0f}/min from response headers")
+                self.rate_per_min = server_limit
+                self.capacity = self._capacity_for(server_limit)
+                self.tokens = min(self.tokens, self.capacity)
+
+            try:
+                server_remaining = float(remaining) if remaining is not None else None
+            except ValueError:
+                server_remaining = None
+            if server_remaining is not None:
+                self.tokens = min(self.tokens, server_remaining)
+                reset_in = parse_reset(reset) if reset is not None else None
+                if reset_in:
+                    self.window_remaining = server_remaining
+                    self.window_reset_at = now + reset_in
+                if server_remaining <= 0 and reset_in:
+                    self.blocked_until = max(self.blocked_until, now + reset_in)
+
+            reset_in = parse_reset(retry_after) if retry_after is not None else None
+            if reset_in:
+                self.tokens = min(self.tokens, 0.0)
+                self.blocked_until = max(self.blocked_until, now + reset_in)
+
+    def blocked_for(self) -> float:
+        """Seconds until the server accepts calls again (quota used up or 429), 0.0 if it does now"""
+        with self._lock:
+            return max(0.0, self.blocked_until - time.monotonic())
+
+    def effective_rate(self) -> float:
+        """Requests per minute this key can sustain until its server window resets"""
+        with self._lock:
+            now = time.monotonic()
+            if self.blocked_until > now:
+                return 0.0
+            if self._pacing(now) is None:
+                return self.rate_per_min
+            return max(self.window_remaining, 0.0) * 60.0 / (self.window_reset_at - now)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            window_active = self.window_remaining is not None and now < self.window_reset_at
+            return {
+                "rate_per_min": self.rate_per_min,
+                "window_remaining": self.window_remaining if window_active else None,
+                "window_resets_in": round(self.window_reset_at - now, 2) if window_active else None,
+                "capacity": round(self.capacity, 2),
+                "tokens": round(self.tokens, 2),
+                "wait_seconds": round(self._wait(now), 2),
+                **self.stats
+            }
+
+class RateLimiterRegistry:
+    """
+    One token bucket per (model, API key), created on first use with the
+    model's documented rate
+    """
+
+    def __init__(self, model_limits: Optional[Dict[str, float]] = None, default_rate: float = 20.0,
+                 burst_seconds: float = 10.0, max_wait: float = 30.0):
+        self.model_limits = model_limits or {}
+        self.default_rate = default_rate
+        self.burst_seconds = burst_seconds
+        self.max_wait = max_wait
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key_id(api_key: Optional[str]) -> str:
+        # Never expose the key itself in stats or logs
+        return hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:8] if api_key else "default"
+
+    def rate_for(self, model: str) -> float:
+        """Documented requests per minute for a model (default_rate if unknown)"""
+        return self.model_limits.get(normalize_model_name(model), self.default_rate)
+
+    def get(self, model: str, api_key: Optional[str] = None) -> TokenBucket:
+        name = f"{model}:{self._key_id(api_key)}"
+        with self._lock:
+            if name not in self._buckets:
+                self._buckets[name] = TokenBucket(name, self.rate_for(model), self.burst_seconds)
+            return self._buckets[name]
+
+    def best_key(self, model: str, api_keys: List[str]) -> Tuple[Optional[str], float]:
+        """The key of a model with the shortest wait for its next token"""
+        best, best_wait = None, float("inf")
+        for api_key in api_keys:
+            wait = self.get(model, api_key).wait_time()
+            if wait < best_wait:
+                best, best_wait = api_key, wait
+        return best, best_wait
+
+    def pick(self, candidates: List[str], api_keys: Optional[Dict[str, Optional[str]]] = None) -> Optional[str]:
+        """First candidate model that gets a token within max_wait, or None"""
+        api_keys = api_keys or {}
+        for model in candidates:
+            if self.get(model, api_keys.get(model)).wait_time() <= self.max_wait:
+                return model
+        return None
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            buckets = dict(self._buckets)
+        return {name: bucket.get_stats() for name, bucket in buckets.items()}
+
+def build_registry_from_env() -> RateLimiterRegistry:
+    """
+    Create the registry from the model table and environment variables
+
+    RATE_LIMIT_TABLE: path of the model parameter CSV (default Model/Model_parameters.csv)
+    RATE_LIMIT_DEFAULT_RPM: requests per minute for models not in the table (default 20)
+    RATE_LIMIT_BURST_SECONDS: bucket capacity in seconds of refill (default 10)
+    RATE_LIMIT_MAX_WAIT: longest local wait before routing elsewhere or failing (default 30)
+    """
+    return RateLimiterRegistry(
+        model_limits=load_model_rate_limits(os.environ.get("RATE_LIMIT_TABLE", DEFAULT_TABLE_PATH)),
+        default_rate=float(os.environ.get("RATE_LIMIT_DEFAULT_RPM", 20)),
+        burst_seconds=float(os.environ.get("RATE_LIMIT_BURST_SECONDS", 10)),
+        max_wait=float(os.environ.get("RATE_LIMIT_MAX_WAIT", 30))
+    )
+
+# Global instance
+rate_limiters = build_registry_from_env()
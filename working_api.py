@@ -14,10 +14,22 @@ import random
 import time
 import json
 import os
+import asyncio
 
 # Import our new rotation system
-from rate_limit_handler import call_model_with_rotation
+from rate_limit_handler import acall_model_with_rotation, run_sync
 from api_key_rotation import get_status
+from response_cache import response_cache
+from http_transport import get_transport_stats
+from concurrency_limiter import concurrency_limiters
+from token_bucket import rate_limiters
+from token_accounting import size_max_tokens, estimate_tokens
+from batched_critique import build_batched_critique_prompt, parse_batched_critiques
+from critique_compression import CritiqueCompressor
+from pipeline import Pipeline
+from firestore_writer import build_writer_from_env
+from response_scorer import score_responses
+from metrics import install_flask_metrics
 
 # EMERGENCY HOTFIX: Load API keys directly from environment
 def load_api_keys_directly():
@@ -102,10 +114,13 @@ setup_api_keys_from_env()
 # EMERGENCY HOTFIX: Force load API keys
 load_api_keys_directly()
 
+CORS_ORIGINS = ['http://localhost:5176', 'http://localhost:5175', 'http://localhost:5174', 'http://127.0.0.1:5176', 'http://127.0.0.1:5175', 'http://127.0.0.1:5174', 'https://orchestratex-frontend-84388526388.us-central1.run.app', 'https://chat.orchestratex.me', 'https://orchestratex.me', 'https://orchestratex-chat.web.app']
+
 app = Flask(__name__)
-CORS(app, origins=['http://localhost:5176', 'http://localhost:5175', 'http://localhost:5174', 'http://127.0.0.1:5176', 'http://127.0.0.1:5175', 'http://127.0.0.1:5174', 'https://orchestratex-frontend-84388526388.us-central1.run.app', 'https://chat.orchestratex.me', 'https://orchestratex.me', 'https://orchestratex-chat.web.app'], 
+CORS(app, origins=CORS_ORIGINS, 
      methods=['GET', 'POST', 'OPTIONS'], 
      allow_headers=['Content-Type', 'Authorization'])
+install_flask_metrics(app, "working_api")  # Request latencies + Prometheus /metrics
 
 # Model provider mappings for the rotation system
 PROVIDER_MAPPINGS = {
@@ -161,10 +176,12 @@ def load_api_config():
         }
     return models
 
-def call_openrouter_api(model_name, prompt, max_tokens=2000):
+async def acall_openrouter_api(model_name, prompt, max_tokens=None, use_cache=True):
     """
     Call OpenRouter API with automatic key rotation
     This function now uses the new rotation system
+    Identical requests are served from the response cache unless use_cache is False
+    max_tokens defaults to a budget sized from the prompt (see token_accounting)
     """
     if model_name not in PROVIDER_MAPPINGS:
         return {
@@ -176,12 +193,13 @@ def call_openrouter_api(model_name, prompt, max_tokens=2000):
     provider, model_id = PROVIDER_MAPPINGS[model_name]
     
     # Use the new rotation-aware API client
-    result = call_model_with_rotation(
+    result = await acall_model_with_rotation(
         provider=provider,
         model_id=model_id,
         prompt=prompt,
         max_tokens=max_tokens,
-        temperature=0.7
+        temperature=0.7,
+        use_cache=use_cache
     )
     
     # Convert to the expected format for backward compatibility
@@ -192,7 +210,7 @@ def call_openrouter_api(model_name, prompt, max_tokens=2000):
             'model_name': model_name,
             'provider': provider,
             'tokens_used': result['metadata']['total_tokens'],
-            'cost_usd': result['metadata']['total_tokens'] * 0.000001
+            'cost_usd': result['metadata']['cost_usd']
         }
     else:
         return {
@@ -202,6 +220,10 @@ def call_openrouter_api(model_name, prompt, max_tokens=2000):
             'provider': provider
         }
 
+def call_openrouter_api(model_name, prompt, max_tokens=None, use_cache=True):
+    """Blocking wrapper around acall_openrouter_api"""
+    return run_sync(acall_openrouter_api(model_name, prompt, max_tokens=max_tokens, use_cache=use_cache))
+
 # Latest 5 Model configurations from orche.env
 MODELS = [
     {"name": "GLM-4.5", "specialty": "reasoning", "strength": 0.95, "model_id": "z-ai/glm-4.5-air:free"},
@@ -212,7 +234,26 @@ MODELS = [
     {"name": "TNG-DeepSeek-R1T2", "specialty": "analysis", "strength": 0.92, "model_id": "tngtech/deepseek-r1t2-chimera:free"}
 ]
 
-def real_model_response(model, prompt):
+# Critique mode: "batched" makes one critique call per critic covering all other
+# responses (6 calls per chat), "pairwise" makes one call per (critic, target) pair (30 calls)
+CRITIQUE_MODES = ('batched', 'pairwise')
+CRITIQUE_MODE = os.environ.get('CRITIQUE_MODE', 'batched')
+
+def critique_mode_error(critique_mode):
+    """Error message for an unknown critique_mode in a request, or None"""
+    if critique_mode not in CRITIQUE_MODES:
+        return f"Unknown critique_mode '{critique_mode}' (expected one of: {', '.join(CRITIQUE_MODES)})"
+    return None
+
+# Critics see a compact view of each response (sized to their specialty) instead
+# of the full text; set CRITIQUE_COMPRESSION=off to send full responses
+CRITIQUE_COMPRESSION = os.environ.get('CRITIQUE_COMPRESSION', 'on').lower() != 'off'
+
+# Weight of the static model strength in the final confidence; the rest comes
+# from the local response scorer
+STRENGTH_PRIOR_WEIGHT = 0.2
+
+async def areal_model_response(model, prompt, use_cache=True, max_tokens=None):
     """Call real AI model API instead of simulation"""
     start_time = time.time()
     
@@ -235,7 +276,7 @@ def real_model_response(model, prompt):
         }
     
     # Call real API using the new rotation system
-    result = call_openrouter_api(model_name, prompt)
+    result = await acall_openrouter_api(model_name, prompt, max_tokens=max_tokens, use_cache=use_cache)
     processing_time = time.time() - start_time
     
     if result['success']:
@@ -243,7 +284,7 @@ def real_model_response(model, prompt):
             "model_name": model_name,
             "specialty": model["specialty"],
             "response_text": result['content'],
-            "confidence": model["strength"] + random.uniform(-0.05, 0.05),
+            "confidence": model["strength"],  # Prior only; rescored in the chat "score" stage
             "processing_time": processing_time,
             "processing_time_ms": int(processing_time * 1000),
             "timestamp": datetime.now(),
@@ -265,7 +306,11 @@ def real_model_response(model, prompt):
             "success": False
         }
 
-def generate_critique(critic_model, target_response, user_prompt):
+def real_model_response(model, prompt, use_cache=True, max_tokens=None):
+    """Blocking wrapper around areal_model_response"""
+    return run_sync(areal_model_response(model, prompt, use_cache=use_cache, max_tokens=max_tokens))
+
+async def agenerate_critique(critic_model, target_response, user_prompt, use_cache=True):
     """Generate real critique from one model about another model's response"""
     
     # Create a critique prompt
@@ -277,71 +322,112 @@ User's original question: "{user_prompt}"
 
 Please analyze this response and provide specific feedback on what could be improved, what was done well, and suggest alternative approaches. Keep your critique concise and helpful."""
 
-    # Use the real model API to generate critique
-    critique_response = real_model_response(critic_model, critique_prompt)
+    # Use the real model API to generate critique (a critique-sized budget, not a full answer's)
+    critique_response = await areal_model_response(
+        critic_model, critique_prompt, use_cache=use_cache,
+        max_tokens=size_max_tokens(critic_model['name'], critique_prompt, "critique")
+    )
     
     if critique_response['success']:
         return critique_response['response_text']
     else:
         # Fallback to simple critique if API fails
-        return f"Alternative perspective: [{critic_model['name']} {critic_model['specialty']}] {target_response['model_name']}'s response could benefit from additional analysis."
+        return fallback_critique_text(critic_model, target_response)
+
+def generate_critique(critic_model, target_response, user_prompt, use_cache=True):
+    """Blocking wrapper around agenerate_critique"""
+    return run_sync(agenerate_critique(critic_model, target_response, user_prompt, use_cache=use_cache))
+
+def fallback_critique_text(critic_model, target_response):
+    """Placeholder critique used when the critic model could not be reached"""
+    return f"Alternative perspective: [{critic_model['name']} {critic_model['specialty']}] {target_response['model_name']}'s response could benefit from additional analysis."
+
+async def agenerate_batched_critiques(critic_model, target_responses, user_prompt, use_cache=True):
+    """
+    Generate critiques of several responses from one model in a single API call
+    
+    Returns a dict mapping target model name to (critique_text, critique_score).
+    Targets missing from a malformed reply are critiqued individually;
+    if the critic call itself fails, every target gets the fallback critique.
+    """
+    critique_prompt = build_batched_critique_prompt(critic_model['name'], user_prompt, target_responses)
+    critique_response = await areal_model_response(
+        critic_model, critique_prompt, use_cache=use_cache,
+        max_tokens=size_max_tokens(critic_model['name'], critique_prompt, "batched_critique",
+                                   targets=len(target_responses))
+    )
+    
+    if not critique_response['success']:
+        return {
+            target['model_name']: (fallback_critique_text(critic_model, target), random.uniform(0.6, 0.95))
+            for target in target_responses
+        }
+    
+    parsed = parse_batched_critiques(
+        critique_response['response_text'],
+        [target['model_name'] for target in target_responses]
+    )
+    
+    results = {}
+    missing = []
+    for target in target_responses:
+        critique = parsed.get(target['model_name'])
+        if critique:
+            score = critique['score'] if critique['score'] is not None else random.uniform(0.6, 0.95)
+            results[target['model_name']] = (critique['critique_text'], score)
+        else:
+            print(f"⚠️ {critic_model['name']} batched critique missing {target['model_name']}, critiquing individually")
+            missing.append(target)
+    
+    # Individual fallback critiques run concurrently
+    texts = await asyncio.gather(*[
+        agenerate_critique(critic_model, target, user_prompt, use_cache=use_cache) for target in missing
+    ])
+    for target, text in zip(missing, texts):
+        results[target['model_name']] = (text, random.uniform(0.6, 0.95))
+    return {target['model_name']: results[target['model_name']] for target in target_responses}
+
+def generate_batched_critiques(critic_model, target_responses, user_prompt, use_cache=True):
+    """Blocking wrapper around agenerate_batched_critiques"""
+    return run_sync(agenerate_batched_critiques(critic_model, target_responses, user_prompt, use_cache=use_cache))
+
+# Firestore collection for each storage name
+STORAGE_COLLECTIONS = {
+    "user_prompts": "user_prompts",      # User input prompts
+    "model_responses": "model_responses", # Individual model responses
+    "model_critiques": "model_critiques", # Model critiques
+    "model_suggestions": "model_suggestions", # Best model recommendations
+    "sessions": "sessions",               # Session metadata
+    # Legacy collection names for compatibility
+    "prompts": "user_prompts",
+    "model_outputs": "model_responses"
+}
+
+def _firestore_client():
+    """Firestore client for the background writer (retried if it was down at startup)"""
+    return db if db is not None else firestore.Client()
+
+# Writes are batched in the background and journaled locally until committed
+firestore_writer = build_writer_from_env(_firestore_client)
 
 def save_to_storage(data, collection_name):
-    """Save data to Firestore with proper collection separation"""
-    if firestore_connected and db is not None:
-        try:
-            # Ensure proper collection mapping
-            collection_map = {
-                "user_prompts": "user_prompts",      # User input prompts
-                "model_responses": "model_responses", # Individual model responses
-                "model_critiques": "model_critiques", # Model critiques
-                "model_suggestions": "model_suggestions", # Best model recommendations
-                "sessions": "sessions",               # Session metadata
-                # Legacy collection names for compatibility
-                "prompts": "user_prompts",
-                "model_outputs": "model_responses"
-            }
-            
-            if collection_name in collection_map:
-                firestore_collection = collection_map[collection_name]
-                # Convert datetime objects to Firestore timestamp format
-                data_copy = data.copy()
-                if 'timestamp' in data_copy and isinstance(data_copy['timestamp'], datetime):
-                    data_copy['timestamp'] = data_copy['timestamp']
-                
-                # Add document to Firestore collection
-                doc_ref = db.collection(firestore_collection).add(data_copy)
-                doc_id = doc_ref[1].id  # doc_ref is a tuple (timestamp, DocumentReference)
-                print(f"✅ Stored in Firestore {firestore_collection}: {doc_id}")
-                return doc_id
-            else:
-                print(f"❌ Unknown collection: {collection_name}")
-                return None
-                
-        except Exception as e:
-            print(f"❌ Firestore write failed: {e}")
-            return None
-    else:
-        print("❌ Firestore not connected!")
+    """
+    Queue data for Firestore with proper collection separation
+    
+    Returns the new document ID immediately; the background writer commits
+    it in a batch write (see firestore_writer).
+    """
+    if collection_name not in STORAGE_COLLECTIONS:
+        print(f"❌ Unknown collection: {collection_name}")
         return None
+    return firestore_writer.enqueue(STORAGE_COLLECTIONS[collection_name], data.copy())
 
 def get_from_storage(collection_name):
     """Get data from Firestore only"""
     if firestore_connected and db is not None:
         try:
             # Collection mapping for consistency
-            collection_map = {
-                "user_prompts": "user_prompts",
-                "model_responses": "model_responses", 
-                "model_critiques": "model_critiques",
-                "model_suggestions": "model_suggestions",
-                "sessions": "sessions",
-                # Legacy mapping
-                "prompts": "user_prompts",
-                "model_outputs": "model_responses"
-            }
-            
-            firestore_collection = collection_map.get(collection_name, collection_name)
+            firestore_collection = STORAGE_COLLECTIONS.get(collection_name, collection_name)
             
             # Query Firestore collection ordered by timestamp (newest first), limit 10
             docs = db.collection(firestore_collection).order_by('timestamp', direction=firestore.Query.DESCENDING).limit(10).stream()
@@ -361,131 +447,271 @@ def get_from_storage(collection_name):
         print("❌ Firestore not connected!")
         return []
 
+# ---------------------------------------------------------------------------
+# Chat workflow stages (see build_chat_pipeline)
+# ---------------------------------------------------------------------------
+
+async def _store_prompt_stage(ctx):
+    """Store the user prompt"""
+    user_session = {
+        "user_message": ctx["user_message"],
+        "timestamp": datetime.now(),
+        "session_id": ctx["session_id"],
+        "source": "ui_interface",
+        "status": "processing",
+        "user": "anonymous",  # User column as requested
+        "hash": f"hash_{ctx['session_id']}"  # Add hash field to avoid index conflict
+    }
+    user_id = save_to_storage(user_session, "prompts")  # Use prompts collection
+    print(f"💾 User prompt stored! Session: {ctx['session_id']} | ID: {user_id}")
+    return user_id
+
+def _primary_stage(model):
+    """Phase 1: one model generates its initial response"""
+    async def stage(ctx):
+        response = await areal_model_response(model, ctx["user_message"], use_cache=ctx["use_cache"])
+        print(f"✅ {model['name']}: {response['response_text'][:50]}...")
+        return response
+    return stage
+
+def _compress_stage(ctx):
+    """Parse and score every primary response once for the compact views critics receive"""
+    if not ctx["compress_critique_input"]:
+        return {}
+    return {
+        model["name"]: CritiqueCompressor(ctx[f"primary:{model['name']}"]["response_text"], ctx["user_message"])
+        for model in MODELS
+    }
+
+def _critique_input_tokens(result):
+    """Response tokens the critics were sent, against what full responses would have cost"""
+    compressors = result["compress"] or {}
+    original = sent = 0
+    for critic in MODELS:
+        for target in MODELS:
+            if target is critic:
+                continue
+            text = result[f"primary:{target['name']}"]["response_text"]
+            compressor = compressors.get(target['name'])
+            original += compressor.original_tokens if compressor else estimate_tokens(text)
+            sent += estimate_tokens(compressor.view(critic['specialty'])) if compressor else estimate_tokens(text)
+    return {"original": original, "sent": sent}
+
+def _critique_stage(critic_index):
+    """Phase 2: one model critiques every other model's response"""
+    critic_model = MODELS[critic_index]
+    
+    async def stage(ctx):
+        model_responses = [ctx[f"primary:{model['name']}"] for model in MODELS]
+        # Don't critique yourself
+        targets = [target for j, target in enumerate(model_responses) if j != critic_index]
+        compressors = ctx["compress"]
+        if compressors:
+            targets = [
+                dict(target, response_text=compressors[target['model_name']].view(critic_model['specialty']))
+                for target in targets
+            ]
+        
+        if ctx["critique_mode"] == 'batched':
+            # One call per critic covering every other model's response
+            batch = await agenerate_batched_critiques(critic_model, targets, ctx["user_message"], use_cache=ctx["use_cache"])
+        else:
+            texts = await asyncio.gather(*[
+                agenerate_critique(critic_model, target, ctx["user_message"], use_cache=ctx["use_cache"])
+                for target in targets
+            ])
+            batch = {
+                target['model_name']: (text, random.uniform(0.6, 0.95))
+                for target, text in zip(targets, texts)
+            }
+        
+        critiques = []
+        for target_response in targets:
+            critique_text, critique_score = batch[target_response['model_name']]
+            critiques.append({
+                "critic_model": critic_model["name"],
+                "target_model": target_response["model_name"],
+                "critique_text": f"[{critic_model['name']} critiques {target_response['model_name']}]: {critique_text}",
+                "critique_score": critique_score,
+                "session_id": ctx["session_id"],
+                "timestamp": datetime.now()
+            })
+        return critiques
+    return stage
+
+async def _store_critiques_stage(ctx):
+    """Store ALL critiques (every model critiques every other model)"""
+    critiques = [critique for model in MODELS for critique in ctx[f"critique:{model['name']}"]]
+    print(f"💾 Storing {len(critiques)} critiques in Firestore...")
+    for critique in critiques:
+        save_to_storage(critique, "model_critiques")
+    return len(critiques)
+
+def _score_stage(ctx):
+    """Rank all primary responses in one local batch (no extra LLM call)"""
+    model_responses = [ctx[f"primary:{model['name']}"] for model in MODELS]
+    successful = [resp for resp in model_responses if resp.get("success", True)]
+    scores = score_responses(ctx["user_message"], [resp["response_text"] for resp in successful])
+    strengths = {model["name"]: model["strength"] for model in MODELS}
+    for resp, score in zip(successful, scores):
+        # Measured quality dominates, the model's known strength breaks near-ties
+        resp["quality_score"] = score["overall_score"]
+        resp["confidence"] = round(
+            (1 - STRENGTH_PRIOR_WEIGHT) * score["overall_score"] + STRENGTH_PRIOR_WEIGHT * strengths[resp["model_name"]], 4
+        )
+    return scores
+
+async def _store_outputs_stage(ctx):
+    """Store model outputs in model_outputs collection (as requested by user)"""
+    model_responses = [ctx[f"primary:{model['name']}"] for model in MODELS]
+    print(f"💾 Storing {len(model_responses)} model outputs in Firestore...")
+    response_records = [
+        {
+            "session_id": ctx["session_id"],
+            "user_message": ctx["user_message"],
+            **response,
+            "batch_id": f"batch_{int(time.time())}",
+            "timestamp": datetime.now()
+        }
+        for response in model_responses
+    ]
+    for record in response_records:
+        save_to_storage(record, "model_outputs")  # User requested this collection
+    print(f"✅ All model outputs stored in model_outputs collection!")
+    return len(model_responses)
+
+async def _suggest_stage(ctx):
+    """Store recommended model in model_suggestions collection (as requested by user)"""
+    model_responses = [ctx[f"primary:{model['name']}"] for model in MODELS]
+    best_response = max(model_responses, key=lambda x: x['confidence'])
+    model_suggestion = {
+        "session_id": ctx["session_id"],
+        "user_message": ctx["user_message"],
+        "recommended_model": best_response["model_name"],
+        "confidence_score": best_response["confidence"],
+        "reason": f"Selected {best_response['model_name']} with {best_response['confidence']:.3f} confidence",
+        "timestamp": datetime.now(),
+        "alternatives": [{"model": resp["model_name"], "confidence": resp["confidence"]} for resp in model_responses if resp != best_response]
+    }
+    save_to_storage(model_suggestion, "model_suggestions")  # User requested this collection
+    print(f"🎯 Model suggestion stored: {best_response['model_name']} recommended")
+    return best_response
+
+def build_chat_pipeline():
+    """
+    Declare the chat workflow as a DAG
+    
+    store_prompt ──────────────────────────────────────────────┐
+    primary:<model> x6 ──┬── compress ── critique:<model> x6 ── store_critiques
+                         └── score ──┬── store_outputs
+                                     └── suggest
+    """
+    pipeline = Pipeline("chat")
+    primary_stages = [f"primary:{model['name']}" for model in MODELS]
+    critique_stages = [f"critique:{model['name']}" for model in MODELS]
+    
+    pipeline.add_stage("store_prompt", _store_prompt_stage, required=False)
+    for model, stage_name in zip(MODELS, primary_stages):
+        pipeline.add_stage(stage_name, _primary_stage(model))
+    pipeline.add_stage("compress", _compress_stage, depends_on=primary_stages)
+    for i, stage_name in enumerate(critique_stages):
+        pipeline.add_stage(stage_name, _critique_stage(i), depends_on=["compress"])
+    pipeline.add_stage("store_critiques", _store_critiques_stage, depends_on=critique_stages, required=False)
+    pipeline.add_stage("score", _score_stage, depends_on=primary_stages)
+    pipeline.add_stage("store_outputs", _store_outputs_stage, depends_on=["score"], required=False)
+    pipeline.add_stage("suggest", _suggest_stage, depends_on=["score"])
+    return pipeline
+
+CHAT_PIPELINE = build_chat_pipeline()
+
+async def run_chat(user_message, use_cache=True, critique_mode=CRITIQUE_MODE,
+                   compress_critique_input=CRITIQUE_COMPRESSION):
+    """
+    Run the chat workflow for one prompt and build the UI response
+    
+    Shared by the Flask /chat route and the ASGI serving mode (working_api_asgi)
+    so both return exactly the same payload.
+    """
+    print(f"📱 User Message: {user_message}")
+    
+    # 1. Run the chat workflow as a DAG: the 6 primaries run concurrently, then the
+    # 6 critics, while prompt/output/suggestion writes run as soon as their inputs are ready
+    session_id = f"session_{int(time.time())}"
+    print("🧠 Starting SMART 5-model algorithm with cross-critique...")
+    
+    result = await CHAT_PIPELINE.run({
+        "user_message": user_message,
+        "session_id": session_id,
+        "use_cache": use_cache,
+        "critique_mode": critique_mode,
+        "compress_critique_input": compress_critique_input
+    })
+    
+    model_responses = [result[f"primary:{model['name']}"] for model in MODELS]
+    critiques = [critique for model in MODELS for critique in result[f"critique:{model['name']}"]]
+    best_response = result["suggest"]
+    total_time = result.total_ms / 1000
+    print(f"⚡ Smart algorithm completed in {total_time:.2f} seconds with {len(critiques)} critiques stored")
+    print(f"⏱️ Critical path: {' → '.join(result.critical_path)}")
+    critique_input = _critique_input_tokens(result)
+    print(f"🗜️ Critics were sent {critique_input['sent']} of {critique_input['original']} response tokens")
+    
+    # 5. Return UI-compatible response (matching frontend interface exactly)
+    total_cost = sum(resp["cost_estimate"] for resp in model_responses)
+    success_count = sum(1 for resp in model_responses if resp.get("success", True))
+    success_rate = (success_count / len(model_responses)) * 100 if model_responses else 0
+    
+    return {
+        "success": True,
+        "primary_response": {
+            "success": True,
+            "model_name": best_response["model_name"],
+            "response_text": best_response["response_text"],
+            "tokens_used": best_response["tokens_used"],
+            "cost_usd": best_response["cost_estimate"],
+            "latency_ms": int(total_time * 1000)
+        },
+        "critiques": [
+            {
+                "model_name": resp["model_name"],
+                "critique_text": f"Alternative perspective: {resp['response_text'][:100]}...",
+                "tokens_used": resp["tokens_used"],
+                "cost_usd": resp["cost_estimate"],
+                "latency_ms": int(resp.get("processing_time", 1) * 1000)
+            }
+            for resp in model_responses if resp != best_response
+        ][:3],
+        "total_cost": total_cost,
+        "api_calls": len(model_responses),
+        "success_rate": success_rate,
+        "metadata": {
+            "session_id": session_id,
+            "total_models": len(model_responses),
+            "processing_time_seconds": round(total_time, 2),
+            "stage_timings_ms": {name: round(timing.duration_ms, 1) for name, timing in result.timings.items()},
+            "critique_input_tokens": critique_input,
+            "storage_method": "firestore" if firestore_connected else "temporary_files",
+            "firestore_status": "connected" if firestore_connected else "not_connected"
+        }
+    }
+
 @app.route('/chat', methods=['POST'])
 def chat():
     """Main endpoint: Process user prompt and return response"""
     try:
         data = request.json
         user_message = data.get('message', '')
+        use_cache = not data.get('bypass_cache', False)
+        critique_mode = data.get('critique_mode', CRITIQUE_MODE)
         
         if not user_message:
             return jsonify({"error": "No message provided"}), 400
+        mode_error = critique_mode_error(critique_mode)
+        if mode_error:
+            return jsonify({"error": mode_error}), 400
         
-        print(f"📱 User Message: {user_message}")
-        
-        # 1. Store user prompt in MongoDB or temporary storage
-        session_id = f"session_{int(time.time())}"
-        user_session = {
-            "user_message": user_message,
-            "timestamp": datetime.now(),
-            "session_id": session_id,
-            "source": "ui_interface",
-            "status": "processing",
-            "user": "anonymous",  # User column as requested
-            "hash": f"hash_{session_id}"  # Add hash field to avoid index conflict
-        }
-        
-        # Save user input to MongoDB
-        user_id = save_to_storage(user_session, "prompts")  # Use prompts collection
-        print(f"💾 User prompt stored! Session: {session_id} | ID: {user_id}")
-        
-        # 2. SMART ALGORITHM: Models respond and critique each other
-        print("🧠 Starting SMART 5-model algorithm with cross-critique...")
-        start_time = time.time()
-        
-        # Phase 1: All models generate initial responses
-        model_responses = []
-        for model in MODELS:
-            response = real_model_response(model, user_message)
-            model_responses.append(response)
-            print(f"✅ {model['name']}: {response['response_text'][:50]}...")
-        
-        # Phase 2: Each model critiques others' responses (SMART ALGORITHM)
-        print("🔍 Phase 2: Models critiquing each other...")
-        critiques = []
-        for i, critic_model in enumerate(MODELS):
-            for j, target_response in enumerate(model_responses):
-                if i != j:  # Don't critique yourself
-                    critique = {
-                        "critic_model": critic_model["name"],
-                        "target_model": target_response["model_name"],
-                        "critique_text": f"[{critic_model['name']} critiques {target_response['model_name']}]: {generate_critique(critic_model, target_response, user_message)}",
-                        "critique_score": random.uniform(0.6, 0.95),
-                        "session_id": session_id,
-                        "timestamp": datetime.now()
-                    }
-                    critiques.append(critique)
-                    
-        # Store ALL critiques in MongoDB (every model critiques every other model)
-        print(f"💾 Storing {len(critiques)} critiques in parallel to MongoDB...")
-        for critique in critiques:  # Store ALL critiques, not just top 10
-            save_to_storage(critique, "model_critiques")
-        total_time = time.time() - start_time
-        print(f"⚡ Smart algorithm completed in {total_time:.2f} seconds with {len(critiques)} critiques stored")
-        
-        # 3. Store model outputs in model_outputs collection (as requested by user)
-        print(f"💾 Storing {len(model_responses)} model outputs in MongoDB...")
-        for response in model_responses:
-            response_record = {
-                "session_id": session_id,
-                "user_message": user_message,
-                **response,
-                "batch_id": f"batch_{int(time.time())}",
-                "timestamp": datetime.now()
-            }
-            save_to_storage(response_record, "model_outputs")  # User requested this collection
-        print(f"✅ All model outputs stored in model_outputs collection!")
-        
-        # 4. Store recommended model in model_suggestions collection (as requested by user)
-        best_response = max(model_responses, key=lambda x: x['confidence'])
-        model_suggestion = {
-            "session_id": session_id,
-            "user_message": user_message,
-            "recommended_model": best_response["model_name"],
-            "confidence_score": best_response["confidence"],
-            "reason": f"Selected {best_response['model_name']} with {best_response['confidence']:.3f} confidence",
-            "timestamp": datetime.now(),
-            "alternatives": [{"model": resp["model_name"], "confidence": resp["confidence"]} for resp in model_responses if resp != best_response]
-        }
-        save_to_storage(model_suggestion, "model_suggestions")  # User requested this collection
-        print(f"🎯 Model suggestion stored: {best_response['model_name']} recommended")
-        
-        # 5. Return UI-compatible response (matching frontend interface exactly)
-        total_cost = sum(resp["cost_estimate"] for resp in model_responses)
-        success_count = sum(1 for resp in model_responses if resp.get("success", True))
-        success_rate = (success_count / len(model_responses)) * 100 if model_responses else 0
-        
-        return jsonify({
-            "success": True,
-            "primary_response": {
-                "success": True,
-                "model_name": best_response["model_name"],
-                "response_text": best_response["response_text"],
-                "tokens_used": best_response["tokens_used"],
-                "cost_usd": best_response["cost_estimate"],
-                "latency_ms": int(total_time * 1000)
-            },
-            "critiques": [
-                {
-                    "model_name": resp["model_name"],
-                    "critique_text": f"Alternative perspective: {resp['response_text'][:100]}...",
-                    "tokens_used": resp["tokens_used"],
-                    "cost_usd": resp["cost_estimate"],
-                    "latency_ms": int(resp.get("processing_time", 1) * 1000)
-                }
-                for resp in model_responses if resp != best_response
-            ][:3],
-            "total_cost": total_cost,
-            "api_calls": len(model_responses),
-            "success_rate": success_rate,
-            "metadata": {
-                "session_id": session_id,
-                "total_models": len(model_responses),
-                "processing_time_seconds": round(total_time, 2),
-                "storage_method": "firestore" if firestore_connected else "temporary_files",
-                "firestore_status": "connected" if firestore_connected else "not_connected"
-            }
-        })
+        # Model calls run on the shared background event loop, not in this worker thread
+        return jsonify(run_sync(run_chat(user_message, use_cache, critique_mode)))
         
     except Exception as e:
         print(f"❌ Error: {e}")
@@ -518,13 +744,12 @@ def reload_keys():
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
 
-@app.route('/status', methods=['GET'])
-def status():
+def status_payload():
     """System status with API key rotation info"""
     user_data = get_from_storage("prompts")  # Updated collection name
     response_data = get_from_storage("model_responses")
     
-    return jsonify({
+    return {
         "status": "healthy",
         "storage_method": "firestore" if firestore_connected else "temporary_files",
         "firestore_connected": firestore_connected,
@@ -533,8 +758,18 @@ def status():
         "models_available": [m["name"] for m in MODELS],
         "database_info": "Google Cloud Firestore" if firestore_connected else "File storage backup",
         "api_key_rotation": True,
-        "rotation_status": get_status()
-    })
+        "rotation_status": get_status(),
+        "response_cache": response_cache.get_stats(),
+        "http_transport": get_transport_stats(),
+        "concurrency_limits": concurrency_limiters.get_stats(),
+        "request_rate_limits": rate_limiters.get_stats(),
+        "storage_writer": firestore_writer.get_stats()
+    }
+
+@app.route('/status', methods=['GET'])
+def status():
+    """System status with API key rotation info"""
+    return jsonify(status_payload())
 
 @app.route('/api/key-status', methods=['GET'])
 def get_key_status():
@@ -552,8 +787,7 @@ def get_key_status():
             'error': str(e)
         }), 500
 
-@app.route('/analytics', methods=['GET'])
-def analytics():
+def analytics_payload():
     """Analytics from MongoDB or file storage"""
     user_data = get_from_storage("prompts")
     response_data = get_from_storage("model_responses")
@@ -564,7 +798,7 @@ def analytics():
         model = resp.get("model_name", "unknown")
         model_usage[model] = model_usage.get(model, 0) + 1
     
-    return jsonify({
+    return {
         "total_user_prompts": len(user_data),
         "total_model_responses": len(response_data),
         "model_usage": model_usage,
@@ -573,17 +807,25 @@ def analytics():
             "firestore_connected": firestore_connected,
             "storage_method": "firestore" if firestore_connected else "temporary_files"
         }
-    })
+    }
 
-@app.route('/', methods=['GET'])
-def home():
-    return jsonify({
+@app.route('/analytics', methods=['GET'])
+def analytics():
+    """Analytics from MongoDB or file storage"""
+    return jsonify(analytics_payload())
+
+def home_payload():
+    return {
         "service": "OrchestrateX Working API",
         "status": "running",
         "description": "5-Model Parallel Processing System",
-        "endpoints": ["/chat", "/status", "/analytics"],
+        "endpoints": ["/chat", "/status", "/analytics", "/metrics"],
         "storage": "firestore" if firestore_connected else "temporary_files"
-    })
+    }
+
+@app.route('/', methods=['GET'])
+def home():
+    return jsonify(home_payload())
 
 if __name__ == '__main__':
     print("🚀 OrchestrateX Working API - Latest Models!")
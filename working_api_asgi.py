@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+ASGI Serving Mode for the OrchestrateX Working API
+Same endpoints and response contract as working_api, served from an event loop
+
+The Flask app hands every chat to a background event loop and holds a worker
+thread while it runs. Here the chat workflow is awaited directly:
+1. The 6 primary responses run concurrently, then the 6 critics, each call
+   within its model's concurrency and request-rate limits
+2. Firestore writes are only queued; the background writer commits them
+   in batch writes (see firestore_writer)
+3. Chat latency is roughly max(primary) + max(critique) instead of the sum
+
+Run:
+    uvicorn working_api_asgi:app --host 0.0.0.0 --port 8080
+"""
+
+import asyncio
+from datetime import datetime
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Request
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response
+
+import working_api
+from working_api import (
+    CORS_ORIGINS, CRITIQUE_MODE, critique_mode_error, run_chat, status_payload, analytics_payload, home_payload,
+    setup_api_keys_from_env, get_status
+)
+from http_transport import close_shared_clients
+from metrics import install_asgi_metrics
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    await close_shared_clients()
+    await asyncio.to_thread(working_api.firestore_writer.close)
+
+app = FastAPI(title="OrchestrateX Working API", lifespan=lifespan)
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=CORS_ORIGINS,
+    allow_methods=['GET', 'POST', 'OPTIONS'],
+    allow_headers=['Content-Type', 'Authorization']
+)
+install_asgi_metrics(app, "working_api_asgi")
+
+def json_response(payload, status_code: int = 200) -> Response:
+    """Serialize with Flask's JSON provider so both serving modes return identical bodies"""
+    flask_response = working_api.app.json.response(payload)
+    return Response(flask_response.get_data(), status_code=status_code, media_type=flask_response.mimetype)
+
+async def _chat(data) -> Response:
+    user_message = data.get('message', '')
+    use_cache = not data.get('bypass_cache', False)
+    critique_mode = data.get('critique_mode', CRITIQUE_MODE)
+    
+    if not user_message:
+        return json_response({"error": "No message provided"}, 400)
+    mode_error = critique_mode_error(critique_mode)
+    if mode_error:
+        return json_response({"error": mode_error}, 400)
+    
+    return json_response(await run_chat(user_message, use_cache, critique_mode))
+
+@app.post('/chat')
+async def chat(request: Request):
+    """Main endpoint: Process user prompt and return response"""
+    try:
+        return await _chat(await request.json())
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        return json_response({"error": str(e)}, 500)
+
+@app.post('/api/orchestration/process')
+async def orchestration_process(request: Request):
+    """Orchestration endpoint: Alias for chat endpoint to support chatbot UI"""
+    try:
+        data = await request.json()
+        prompt = data.get('prompt', '')
+        
+        if not prompt:
+            return json_response({"error": "No prompt provided"}, 400)
+        
+        return await _chat({'message': prompt})
+        
+    except Exception as e:
+        print(f"❌ Orchestration Error: {e}")
+        return json_response({"error": str(e)}, 500)
+
+@app.post('/reload-keys')
+async def reload_keys():
+    """Manual API endpoint to reload keys from environment"""
+    try:
+        setup_api_keys_from_env()
+        return json_response({"success": True, "message": "Keys reloaded from environment"})
+    except Exception as e:
+        return json_response({"success": False, "error": str(e)}, 500)
+
+@app.get('/status')
+async def status():
+    """System status with API key rotation info"""
+    # Firestore reads use the sync client; keep them off the event loop
+    return json_response(await asyncio.to_thread(status_payload))
+
+@app.get('/api/key-status')
+async def get_key_status():
+    """Get detailed API key rotation status"""
+    try:
+        return json_response({
+            'success': True,
+            'status': get_status(),
+            'timestamp': datetime.now().isoformat()
+        })
+    except Exception as e:
+        return json_response({'success': False, 'error': str(e)}, 500)
+
+@app.get('/analytics')
+async def analytics():
+    """Analytics from MongoDB or file storage"""
+    return json_response(await asyncio.to_thread(analytics_payload))
+
+@app.get('/')
+async def home():
+    return json_response(home_payload())
+
+if __name__ == '__main__':
+    import os
+    import uvicorn
+    
+    port = int(os.environ.get('PORT', 8002))
+    print(f"🌐 ASGI API running on port: {port}")
+    uvicorn.run(app, host='0.0.0.0', port=port)